@@ -1,18 +1,48 @@
+import logging
+import os
+
 from flask import Flask
 from flask_cors import CORS
 
 # Import all controller Blueprints
 from controllers.auth_controller import auth_controller
-from controllers.user_controller import user_controller
-from controllers.website_controller import website_controller
+from controllers.user_controller import user_controller, rank_ping
+from controllers.website_controller import website_controller, notify_status_change, track_incidents
 from controllers.ping_controller import ping_controller
 from controllers.report_controller import report_controller
 from controllers.onchain_transaction_controller import onchain_transaction_controller
+from controllers.anomaly_controller import anomaly_controller, record_ping_anomalies
+from controllers.reward_controller import reward_controller
+from controllers.dashboard_controller import dashboard_controller
+from controllers.analytics_controller import analytics_controller, feed_analytics, start_analytics_load
+from controllers.region_controller import region_controller, record_region_ping
+from utils.ping_events import publish_ping, register_ping_listener
+from utils.ping_feed import ping_feed
+from utils.leaderboard import LEADERBOARD_REBUILD_ON_START, leaderboard
+from utils.analytics_store import ANALYTICS_ENABLED
+from utils.region_cube import REGION_CUBE_REBUILD_ON_START, region_cube
+from utils.write_spool import PING_TABLE, TX_TABLE, write_spool
+from utils import metrics, profiler, query_budget
+
+def register_ping_side_effects():
+    """
+    Ping listeners that act once per stored ping (anomaly events, notifications, incidents).
+    They run in whichever process stored the ping, so scripts/probe_scheduler.py registers them
+    as well. Reward credit is not a listener: only authenticated manual checks earn rewards
+    (utils/reward_credits.py).
+    """
+    register_ping_listener(record_ping_anomalies)
+    register_ping_listener(notify_status_change)
+    register_ping_listener(track_incidents)
+
 
 def create_app():
     """
     Factory method to create and configure the Flask app.
     """
+    # background subsystems report through `logging`; no-op if the server configured it already
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     app = Flask(__name__)
     CORS(app)
 
@@ -23,6 +53,45 @@ def create_app():
     app.register_blueprint(ping_controller, url_prefix='/pings')
     app.register_blueprint(report_controller, url_prefix='/reports')
     app.register_blueprint(onchain_transaction_controller, url_prefix='/transactions')
+    app.register_blueprint(anomaly_controller, url_prefix='/anomalies')
+    app.register_blueprint(reward_controller, url_prefix='/rewards')
+    app.register_blueprint(dashboard_controller, url_prefix='/dashboard')
+    app.register_blueprint(analytics_controller, url_prefix='/analytics')
+    app.register_blueprint(region_controller, url_prefix='/regions')
+
+    # Subsystems that follow the ping stream
+    register_ping_side_effects()
+    # in-memory views see every stored ping (any worker, the spool drain, the probe scheduler)
+    # through the database-driven feed rather than this process's listeners
+    ping_feed.subscribe(rank_ping)
+    ping_feed.subscribe(record_region_ping)
+
+    # validator leaderboard: opt-in history replay in the background (one process only),
+    # live updates keep it current
+    if LEADERBOARD_REBUILD_ON_START:
+        leaderboard.start_rebuild()
+    # website x region latency cube, same approach (REGION_CUBE_REBUILD_ON_START)
+    if REGION_CUBE_REBUILD_ON_START:
+        region_cube.start_rebuild()
+
+    # optional embedded analytics store (ANALYTICS_ENABLED=1): live feed + background bulk load
+    if ANALYTICS_ENABLED:
+        ping_feed.subscribe(feed_analytics)
+        start_analytics_load()
+    ping_feed.start()
+
+    # local write spool (WRITE_SPOOL_ENABLED=1): rows reach the listeners once they are stored
+    if write_spool is not None:
+        write_spool.on_drained(PING_TABLE, publish_ping)
+        write_spool.on_drained(TX_TABLE, leaderboard.record_transaction)
+        write_spool.start()
+
+    # Prometheus scrape endpoint + per-route request instrumentation
+    metrics.init_app(app)
+    # X-DB-Calls / Server-Timing headers and per-route DB call budgets
+    query_budget.init_app(app)
+    # opt-in sampling profiler (PROFILER_ENABLED=1) + GET /admin/profiles
+    profiler.init_app(app)
 
     return app
 
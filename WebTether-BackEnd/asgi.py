@@ -0,0 +1,130 @@
+# asgi.py
+"""
+ASGI entry point: async-native serving for the I/O-bound ping / website routes.
+
+    uvicorn asgi:app            (or: python serve.py for the tuned production settings)
+
+Requests are dispatched per route:
+ - routes with an async implementation (controllers/async_*_controller.py) run on the Quart app,
+   awaiting Supabase and probe-worker calls, so one process holds hundreds of them in flight;
+ - everything else (and CORS preflights) goes to the regular Flask app from app.create_app(),
+   run on a bounded thread pool (WSGI_FALLBACK_THREADS, default 32).
+
+Both halves share the same process state: ping listeners, rate limiter, metrics (/metrics is
+served by the Flask half), probe result cache.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from dotenv import load_dotenv
+from quart import Quart, g, request
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+
+from app import create_app
+from controllers.async_ping_controller import async_ping_controller
+from controllers.async_website_controller import async_website_controller
+from utils import metrics, query_budget
+from utils.probe_utils import close_async_http_client
+
+load_dotenv()
+
+WSGI_FALLBACK_THREADS = int(os.getenv("WSGI_FALLBACK_THREADS", 32))
+CORS_ALLOW_ORIGIN = os.getenv("CORS_ALLOW_ORIGIN", "*")
+
+
+def create_async_app():
+    """Quart app holding the async blueprints, instrumented like the Flask app."""
+    app = Quart(__name__)
+    app.register_blueprint(async_ping_controller, url_prefix='/pings')
+    app.register_blueprint(async_website_controller, url_prefix='/websites')
+
+    @app.before_request
+    async def _start_request():
+        g._metrics_start = time.perf_counter()
+        metrics.http_in_flight.inc()
+        # each request runs in its own task context, so the token never needs resetting
+        g._query_stats, _token = query_budget.start_tracking()
+
+    @app.after_request
+    async def _finish_request(response):
+        rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            metrics.http_in_flight.dec()
+            if metrics.METRICS_ENABLED:
+                metrics.http_requests_total.inc(request.method, rule, response.status_code)
+                metrics.http_request_duration.observe(time.perf_counter() - start, request.method, rule)
+        stats = g.pop("_query_stats", None)
+        if stats is not None:
+            query_budget.apply_headers(response, stats)
+            query_budget.check_budget(f"{request.method} {rule}", stats)
+        response.headers.setdefault("Access-Control-Allow-Origin", CORS_ALLOW_ORIGIN)
+        return response
+
+    @app.after_serving
+    async def _close_clients():
+        await close_async_http_client()
+
+    return app
+
+
+class _ThreadedWsgiInstance(WsgiToAsgiInstance):
+    """asgiref runs WSGI apps on one shared thread; this one uses our own bounded pool instead."""
+
+    # the undecorated body of WsgiToAsgiInstance.run_wsgi_app
+    _run_sync = staticmethod(WsgiToAsgiInstance.__dict__["run_wsgi_app"].func)
+
+    def __init__(self, wsgi_application, executor):
+        super().__init__(wsgi_application)
+        self._executor = executor
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self._run_sync, thread_sensitive=False, executor=self._executor)(self, body)
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    def __init__(self, wsgi_application, threads: int = WSGI_FALLBACK_THREADS):
+        super().__init__(wsgi_application)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi-fallback")
+
+    async def __call__(self, scope, receive, send):
+        await _ThreadedWsgiInstance(self.wsgi_application, self.executor)(scope, receive, send)
+
+
+class HybridDispatcher:
+    """ASGI app sending each HTTP request to the async app when it has the route, else to Flask."""
+
+    def __init__(self, async_app, wsgi_app):
+        self.async_app = async_app
+        self.fallback = ThreadedWsgiToAsgi(wsgi_app)
+        self._adapter = async_app.url_map.bind("localhost")
+
+    def _is_async_route(self, scope) -> bool:
+        method = scope.get("method", "GET")
+        if method == "OPTIONS":
+            # CORS preflights are answered by flask-cors on the WSGI side
+            return False
+        try:
+            self._adapter.match(scope.get("path", "/"), method=method)
+            return True
+        except (NotFound, MethodNotAllowed):
+            return False
+        except Exception:
+            # e.g. a strict-slash redirect: let the async app answer it
+            return True
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not self._is_async_route(scope):
+            await self.fallback(scope, receive, send)
+            return
+        # lifespan and async routes
+        await self.async_app(scope, receive, send)
+
+
+flask_app = create_app()
+quart_app = create_async_app()
+app = HybridDispatcher(quart_app, flask_app)
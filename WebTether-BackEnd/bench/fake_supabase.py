@@ -0,0 +1,434 @@
+# bench/fake_supabase.py
+"""
+In-memory, PostgREST-compatible stand-in for the Supabase client.
+
+Implements the subset of the query builder the models use:
+  table(name).select(cols, count=None) / insert(rows) / upsert(rows, on_conflict=) / update(data) / delete()
+  .eq .neq .gt .gte .lt .lte .in_ .is_ .order(col, desc=) .limit(n) .offset(n) .range(a, b)
+  .single() .maybe_single() .execute() -> FakeResponse(data, count)
+  rpc(fn, params) for the Postgres functions defined in migrations/ (RPC_FUNCTIONS)
+
+Equality filters are served from lazily built hash indexes, so benchmark numbers reflect the
+application rather than a linear scan over a million fake rows. Not thread-safe for writers
+beyond a single coarse lock - good enough for benchmarks and local load tests.
+"""
+
+import itertools
+import threading
+from datetime import datetime, timezone
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+# table -> (primary key, auto-generated pk?, column defaults)
+TABLE_SCHEMAS = {
+    "users": ("id", True, {"created_at": _now_iso}),
+    "auth": ("id", True, {}),
+    "website": ("wid", True, {"created_at": _now_iso}),
+    "ping": ("pid", True, {"timestamp": _now_iso}),
+    "report": ("rid", True, {}),
+    "onchain_transactions": ("tx_hash", False, {"created_at": _now_iso}),
+    "anomaly_event": ("id", True, {"created_at": _now_iso}),
+    "ping_hourly": ("id", True, {}),
+    "validator_earnings": ("eid", True, {"created_at": _now_iso}),
+    "reward_batch": ("batch_id", True, {"created_at": _now_iso}),
+    "incident": ("id", True, {}),
+    "probe_target": ("target_id", True, {"created_at": _now_iso, "next_probe_at": _now_iso,
+                                         "refcount": lambda: 0, "interval_seconds": lambda: 60}),
+}
+
+# extra unique constraints enforced on insert
+UNIQUE_COLUMNS = {
+    "auth": ("email",),
+    "validator_earnings": ("pid",),
+    "probe_target": ("url",),
+}
+
+
+class FakeAPIError(Exception):
+    pass
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _key(value):
+    return None if value is None else str(value)
+
+
+def _cmp_value(row_value, filter_value):
+    """Compare like PostgREST would after casting the filter literal to the column type."""
+    if row_value is None or filter_value is None:
+        return row_value, filter_value
+    if isinstance(row_value, (int, float)) and not isinstance(row_value, bool) and isinstance(filter_value, str):
+        try:
+            return row_value, float(filter_value)
+        except ValueError:
+            return str(row_value), filter_value
+    if isinstance(row_value, str) and not isinstance(filter_value, str):
+        return row_value, str(filter_value)
+    return row_value, filter_value
+
+
+def _match(row, op, column, value):
+    current = row.get(column)
+    if op == "is":
+        return current is None if value in (None, "null") else current == value
+    if op == "in":
+        keys = {_key(v) for v in value}
+        return _key(current) in keys
+    if current is None:
+        return False
+    a, b = _cmp_value(current, value)
+    try:
+        if op == "eq":
+            return a == b
+        if op == "neq":
+            return a != b
+        if op == "gt":
+            return a > b
+        if op == "gte":
+            return a >= b
+        if op == "lt":
+            return a < b
+        if op == "lte":
+            return a <= b
+    except TypeError:
+        return False
+    raise FakeAPIError(f"Unsupported filter operator: {op}")
+
+
+class FakeTable:
+    def __init__(self, name):
+        self.name = name
+        self.pk, self.auto_pk, self.defaults = TABLE_SCHEMAS.get(name, ("id", True, {}))
+        self.rows = {}
+        self._seq = itertools.count(1)
+        self._indexes = {}
+        self.lock = threading.RLock()
+
+    # indexes are rebuilt lazily after updates/deletes and extended in place on inserts
+    def index(self, column):
+        idx = self._indexes.get(column)
+        if idx is None:
+            idx = {}
+            for rowid, row in self.rows.items():
+                idx.setdefault(_key(row.get(column)), []).append(rowid)
+            self._indexes[column] = idx
+        return idx
+
+    def invalidate(self):
+        self._indexes.clear()
+
+    def _conflicting_rowid(self, row, on_conflict):
+        columns = [c.strip() for c in on_conflict.split(",") if c.strip()]
+        if not columns:
+            return None
+        for rowid in self.index(columns[0]).get(_key(row.get(columns[0])), []):
+            existing = self.rows.get(rowid)
+            if existing is not None and all(_key(existing.get(c)) == _key(row.get(c)) for c in columns):
+                return rowid
+        return None
+
+    def insert_row(self, row, upsert=False, on_conflict=None):
+        row = dict(row)
+        if upsert and on_conflict and row.get(self.pk) is None:
+            rowid = self._conflicting_rowid(row, on_conflict)
+            if rowid is not None:
+                row[self.pk] = rowid
+        for column, default in self.defaults.items():
+            if row.get(column) is None:
+                row[column] = default()
+        if self.auto_pk and row.get(self.pk) is None:
+            row[self.pk] = next(self._seq)
+        rowid = row.get(self.pk)
+        if rowid is None:
+            raise FakeAPIError(f"null value in column \"{self.pk}\" of relation \"{self.name}\"")
+        if rowid in self.rows and not upsert:
+            raise FakeAPIError(f"duplicate key value violates unique constraint \"{self.name}_pkey\"")
+        for column in UNIQUE_COLUMNS.get(self.name, ()):
+            holders = self.index(column).get(_key(row.get(column)), [])
+            if any(h != rowid for h in holders):
+                raise FakeAPIError(f"duplicate key value violates unique constraint \"{self.name}_{column}_key\"")
+        if rowid in self.rows:
+            self.rows[rowid].update(row)
+            self.invalidate()
+        else:
+            self.rows[rowid] = row
+            for column, idx in self._indexes.items():
+                idx.setdefault(_key(row.get(column)), []).append(rowid)
+        return dict(self.rows[rowid])
+
+    def bulk_load(self, rows):
+        """Fast path for seeding: no defaults beyond the pk, no uniqueness checks."""
+        with self.lock:
+            for row in rows:
+                if self.auto_pk and row.get(self.pk) is None:
+                    row[self.pk] = next(self._seq)
+                self.rows[row[self.pk]] = row
+            self.invalidate()
+            if self.auto_pk and self.rows:
+                numeric = [k for k in self.rows if isinstance(k, int)]
+                if numeric:
+                    self._seq = itertools.count(max(numeric) + 1)
+
+
+class FakeQuery:
+    def __init__(self, table: FakeTable):
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+        self.count_mode = None
+        self.payload = None
+        self.filters = []
+        self.orders = []
+        self._limit = None
+        self._offset = 0
+        self.mode = None
+        self.on_conflict = None
+
+    # ------------------------------
+    # verbs
+    # ------------------------------
+    def select(self, *columns, count=None, **_):
+        self.columns = ",".join(columns) if columns else "*"
+        self.count_mode = count
+        return self
+
+    def insert(self, payload, **_):
+        self.action = "insert"
+        self.payload = payload
+        return self
+
+    def upsert(self, payload, on_conflict=None, **_):
+        self.action = "upsert"
+        self.payload = payload
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, payload, **_):
+        self.action = "update"
+        self.payload = payload
+        return self
+
+    def delete(self, **_):
+        self.action = "delete"
+        return self
+
+    # ------------------------------
+    # filters / modifiers
+    # ------------------------------
+    def _filter(self, op, column, value):
+        self.filters.append((op, column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter("eq", column, value)
+
+    def neq(self, column, value):
+        return self._filter("neq", column, value)
+
+    def gt(self, column, value):
+        return self._filter("gt", column, value)
+
+    def gte(self, column, value):
+        return self._filter("gte", column, value)
+
+    def lt(self, column, value):
+        return self._filter("lt", column, value)
+
+    def lte(self, column, value):
+        return self._filter("lte", column, value)
+
+    def in_(self, column, values):
+        return self._filter("in", column, list(values))
+
+    def is_(self, column, value):
+        return self._filter("is", column, value)
+
+    def order(self, column, desc=False, **_):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, n, **_):
+        self._limit = n
+        return self
+
+    def offset(self, n):
+        self._offset = n
+        return self
+
+    def range(self, start, end):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def single(self):
+        self.mode = "single"
+        return self
+
+    def maybe_single(self):
+        self.mode = "maybe_single"
+        return self
+
+    # ------------------------------
+    # execution
+    # ------------------------------
+    def _candidates(self):
+        best = None
+        for op, column, value in self.filters:
+            if op == "eq":
+                bucket = self.table.index(column).get(_key(value), [])
+                if best is None or len(bucket) < len(best):
+                    best = bucket
+        if best is None:
+            return list(self.table.rows.values())
+        rows = self.table.rows
+        return [rows[rowid] for rowid in best if rowid in rows]
+
+    def _matching(self):
+        return [row for row in self._candidates()
+                if all(_match(row, op, column, value) for op, column, value in self.filters)]
+
+    def _sorted(self, rows):
+        for column, desc in reversed(self.orders):
+            present = [r for r in rows if r.get(column) is not None]
+            missing = [r for r in rows if r.get(column) is None]
+            present.sort(key=lambda r: r.get(column), reverse=desc)
+            # PostgREST default: nulls last for asc, nulls first for desc
+            rows = missing + present if desc else present + missing
+        return rows
+
+    def _project(self, row):
+        if self.columns in ("*", ""):
+            return dict(row)
+        wanted = [c.strip() for c in self.columns.split(",") if c.strip()]
+        return {c: row.get(c) for c in wanted}
+
+    def execute(self):
+        table = self.table
+        with table.lock:
+            if self.action in ("insert", "upsert"):
+                rows = self.payload if isinstance(self.payload, list) else [self.payload]
+                data = [table.insert_row(r, upsert=self.action == "upsert", on_conflict=self.on_conflict)
+                        for r in rows]
+                return self._finish(data)
+
+            matched = self._matching()
+            if self.action == "update":
+                for row in matched:
+                    row.update(self.payload or {})
+                table.invalidate()
+                return self._finish([dict(r) for r in matched])
+            if self.action == "delete":
+                for row in matched:
+                    table.rows.pop(row.get(table.pk), None)
+                table.invalidate()
+                return self._finish([dict(r) for r in matched])
+
+            total = len(matched)
+            rows = self._sorted(matched) if self.orders else matched
+            if self._offset:
+                rows = rows[self._offset:]
+            if self._limit is not None:
+                rows = rows[:self._limit]
+            return self._finish([self._project(r) for r in rows], total if self.count_mode else None)
+
+    def _finish(self, data, count=None):
+        if self.mode == "single":
+            if len(data) != 1:
+                raise FakeAPIError(f"JSON object requested, multiple (or no) rows returned ({len(data)})")
+            return FakeResponse(data[0], count)
+        if self.mode == "maybe_single":
+            if not data:
+                return None
+            if len(data) > 1:
+                raise FakeAPIError("Multiple rows returned for maybe_single()")
+            return FakeResponse(data[0], count)
+        return FakeResponse(data, count)
+
+
+# ------------------------------
+# Postgres functions (supabase.rpc), mirroring the SQL in migrations/
+# ------------------------------
+def _rpc_acquire_probe_targets(db, params):
+    table = db.get_table("probe_target")
+    out = {}
+    with table.lock:
+        for url in params.get("target_urls") or []:
+            rowids = table.index("url").get(_key(url), [])
+            row = table.rows.get(rowids[0]) if rowids else None
+            if row is None:
+                row = table.insert_row({"url": url, "refcount": 0})
+                row = table.rows[row["target_id"]]
+            row["refcount"] += 1
+            out[url] = {"target_id": row["target_id"], "url": url}
+        table.invalidate()
+    return list(out.values())
+
+
+def _rpc_release_probe_targets(db, params):
+    table = db.get_table("probe_target")
+    with table.lock:
+        for target_id in params.get("target_ids") or []:
+            row = table.rows.get(target_id)
+            if row is not None:
+                row["refcount"] = max(0, row["refcount"] - 1)
+        for target_id in set(params.get("target_ids") or []):
+            if target_id in table.rows and table.rows[target_id]["refcount"] == 0:
+                table.rows.pop(target_id)
+                for website in db.get_table("website").rows.values():
+                    if website.get("target_id") == target_id:
+                        website["target_id"] = None
+        table.invalidate()
+        db.get_table("website").invalidate()
+    return None
+
+
+RPC_FUNCTIONS = {
+    "acquire_probe_targets": _rpc_acquire_probe_targets,
+    "release_probe_targets": _rpc_release_probe_targets,
+}
+
+
+class FakeRpc:
+    def __init__(self, db, fn, params):
+        self.db, self.fn, self.params = db, fn, params
+
+    def execute(self):
+        handler = RPC_FUNCTIONS.get(self.fn)
+        if handler is None:
+            raise FakeAPIError(f"Could not find the function public.{self.fn}")
+        return FakeResponse(handler(self.db, self.params or {}))
+
+
+class FakeSupabase:
+    """Drop-in for the object returned by supabase.create_client()."""
+
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def get_table(self, name) -> FakeTable:
+        with self._lock:
+            table = self._tables.get(name)
+            if table is None:
+                table = self._tables[name] = FakeTable(name)
+            return table
+
+    def table(self, name):
+        return FakeQuery(self.get_table(name))
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, fn, params=None):
+        return FakeRpc(self, fn, params)
+
+    def row_counts(self):
+        return {name: len(t.rows) for name, t in self._tables.items()}
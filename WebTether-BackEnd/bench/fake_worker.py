@@ -0,0 +1,80 @@
+# bench/fake_worker.py
+"""
+Local stand-in for the Cloudflare probe worker.
+
+Answers POST {"url": ...} with a plausible probe result after an optional artificial delay,
+so manual-ping benchmarks exercise the real HTTP round trip without touching the internet.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _WorkerHTTPServer(ThreadingHTTPServer):
+    # the socketserver default backlog of 5 drops connects under high-concurrency load tests
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class FakeWorker:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay_ms: float = 0.0, down_ratio: float = 0.05):
+        self.delay_ms = delay_ms
+        self.down_ratio = down_ratio
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = _WorkerHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def _handler(self):
+        worker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with worker._lock:
+                    worker.requests += 1
+                if worker.delay_ms:
+                    time.sleep(worker.delay_ms / 1000.0)
+                is_up = random.random() >= worker.down_ratio
+                result = {
+                    "is_up": is_up,
+                    "latency_ms": random.randint(20, 400) if is_up else None,
+                    "region": random.choice(["BOM", "FRA", "IAD", "SIN"]),
+                    "checked_url": body.get("url"),
+                    "dns_ms": random.randint(1, 30),
+                    "connect_ms": random.randint(5, 60),
+                    "tls_ms": random.randint(10, 90),
+                    "ttfb_ms": random.randint(10, 200),
+                    "transfer_ms": random.randint(0, 20)
+                }
+                payload = json.dumps(result).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-worker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
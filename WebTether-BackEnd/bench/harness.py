@@ -0,0 +1,162 @@
+# bench/harness.py
+"""
+Builds the real Flask app (app.create_app()) wired to local stand-ins:
+ - models/db.supabase -> FakeSupabase (in-memory PostgREST fake)
+ - probe worker       -> FakeWorker (local HTTP server)
+
+and seeds deterministic datasets. Shared by the microbenchmarks and the load generator.
+Must be imported before anything from controllers/ so the env overrides below take effect.
+"""
+
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# enough single-use simulated tx codes for long runs; placeholders keep create_client happy if ever reached
+os.environ.setdefault("FAKE_TX_CODE_COUNT", "2000000")
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_KEY", "bench")
+
+from bench.fake_supabase import FakeSupabase  # noqa: E402
+from bench.fake_worker import FakeWorker  # noqa: E402
+
+BENCH_PASSWORD = "bench-password"
+
+
+def build_app(fake_db: FakeSupabase = None, worker: FakeWorker = None, rate_limits: bool = False):
+    """
+    Return (flask_app, fake_db, worker). The worker is started if it isn't already.
+    Rate limiting is disabled by default so it doesn't dominate throughput numbers.
+    """
+    from models import db
+    from utils import probe_utils, rate_limit
+
+    fake_db = fake_db or FakeSupabase()
+    db.set_client(fake_db)
+
+    worker = worker or FakeWorker()
+    if worker._thread is None:
+        worker.start()
+    probe_utils.PROBE_WORKER_URL = worker.url
+
+    rate_limit.RATE_LIMIT_ENABLED = rate_limits
+
+    import app as app_module
+    flask_app = app_module.create_app()
+    flask_app.testing = True
+    return flask_app, fake_db, worker
+
+
+def build_asgi_app(fake_db: FakeSupabase = None, worker: FakeWorker = None, rate_limits: bool = False):
+    """
+    Like build_app(), but returns the hybrid ASGI app from asgi.py (async routes on Quart,
+    the rest on Flask) with the async models pointed at the same fake.
+    """
+    flask_app, fake_db, worker = build_app(fake_db, worker, rate_limits)
+    from models.async_db import set_async_client
+    set_async_client(fake_db)
+
+    from asgi import HybridDispatcher, create_async_app
+    return HybridDispatcher(create_async_app(), flask_app), fake_db, worker
+
+
+def _iso(dt):
+    return dt.isoformat()
+
+
+def seed_dataset(fake_db: FakeSupabase, pings: int, users: int = 1000, websites: int = 2000,
+                 tx_per_ping: float = 0.1, seed: int = 42) -> dict:
+    """
+    Deterministically fill the fake with `users` users (+auth rows), `websites` websites,
+    `pings` pings over the last 30 days and tx_per_ping * pings on-chain transactions.
+    Returns ids useful to the scenarios.
+    """
+    from utils.jwt_utils import hash_password
+
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    password_hash = hash_password(BENCH_PASSWORD)
+
+    user_rows, auth_rows = [], []
+    for uid in range(1, users + 1):
+        user_rows.append({
+            "id": uid,
+            "name": f"user{uid}",
+            "isVisitor": uid % 2 == 0,
+            "role": "validator" if uid % 2 == 0 else "owner",
+            "agent_url": None,
+            "wallet_address": f"0x{uid:040x}",
+            "created_at": _iso(now - timedelta(days=60))
+        })
+        auth_rows.append({"id": uid, "email": f"user{uid}@bench.local", "pass": password_hash, "user_id": uid})
+    fake_db.get_table("users").bulk_load(user_rows)
+    fake_db.get_table("auth").bulk_load(auth_rows)
+
+    owners = [u for u in range(1, users + 1) if u % 2 == 1] or [1]
+    validators = [u for u in range(1, users + 1) if u % 2 == 0] or [1]
+    website_rows = []
+    for wid in range(1, websites + 1):
+        website_rows.append({
+            "wid": wid,
+            "url": f"https://site{wid}.bench.local/",
+            "uid": rng.choice(owners),
+            "name": f"Site {wid}",
+            "category": rng.choice(["blog", "shop", "api", "docs"]),
+            "reward_per_ping": 0.0001,
+            "status": "active",
+            "created_at": _iso(now - timedelta(days=45))
+        })
+    fake_db.get_table("website").bulk_load(website_rows)
+
+    span_seconds = 30 * 24 * 3600
+    ping_rows = []
+    for pid in range(1, pings + 1):
+        validator = rng.choice(validators)
+        is_up = rng.random() > 0.03
+        ping_rows.append({
+            "pid": pid,
+            "wid": rng.randint(1, websites),
+            "uid": validator,
+            "checked_by_uid": validator,
+            "is_up": is_up,
+            "latency_ms": rng.randint(20, 800) if is_up else None,
+            "region": rng.choice(["BOM", "FRA", "IAD", "SIN"]),
+            "source": "manual",
+            "timestamp": _iso(now - timedelta(seconds=span_seconds * (pings - pid) / max(1, pings)))
+        })
+    fake_db.get_table("ping").bulk_load(ping_rows)
+
+    tx_rows = []
+    for i in range(int(pings * tx_per_ping)):
+        uid = rng.choice(validators)
+        tx_rows.append({
+            "tx_hash": f"0xseed{i:016x}",
+            "uid": uid,
+            "pid": rng.randint(1, max(1, pings)),
+            "token_address": "ETH",
+            "token_amount": 0.0002,
+            "gas_used": rng.randint(21000, 50000),
+            "created_at": _iso(now - timedelta(seconds=rng.randint(0, span_seconds)))
+        })
+    fake_db.get_table("onchain_transactions").bulk_load(tx_rows)
+
+    return {
+        "users": users,
+        "websites": websites,
+        "pings": pings,
+        "transactions": len(tx_rows),
+        "owners": owners,
+        "validators": validators,
+        "password": BENCH_PASSWORD
+    }
+
+
+def token_for(uid: int) -> str:
+    """Session token in the same shape auth_controller.signup issues."""
+    from utils.jwt_utils import generate_token
+    return generate_token({"user_id": uid})
@@ -0,0 +1,321 @@
+# bench/loadgen.py
+"""
+End-to-end synthetic load generator: N validators ping M websites while owners and
+validators poll the dashboard endpoints.
+
+By default everything runs locally: the real app (app.create_app()) is served over HTTP by a
+threaded werkzeug server in this process, backed by the in-memory PostgREST fake and the fake
+probe worker. Use --target to point it at an already running backend instead (that server
+needs FAKE_TX_CODE_COUNT large enough for the simulated payments).
+
+Setup goes through the public API only: owners and validators sign up via /auth/signup and
+owners register sites via POST /websites/. The run then ramps the number of concurrent virtual
+users step by step and reports, per step, throughput, p50/p95/p99 latency, error rate and status
+codes, plus the first step at which the system saturated.
+
+Usage (from WebTether-BackEnd/):
+    python -m bench.loadgen --validators 50 --owners 10 --websites 100
+    python -m bench.loadgen --steps 1,4,16,64 --step-seconds 20 --output load.json
+    python -m bench.loadgen --mix manual_ping=1,available_sites=3,wallet_balance=2,owner_websites=2
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from bench.run_benchmarks import summarize
+
+DEFAULT_MIX = "manual_ping=1,available_sites=3,wallet_balance=2,wallet_transactions=1,user_pings=1,owner_websites=2,website_stats=1"
+
+
+class LocalServer:
+    """Serve the benchmark-wired app over real HTTP on an ephemeral port."""
+
+    def __init__(self, rate_limits: bool = False, worker_delay_ms: float = 0.0):
+        from werkzeug.serving import make_server
+        from bench.harness import build_app
+
+        app, self.fake_db, self.worker = build_app(rate_limits=rate_limits)
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        self.worker.delay_ms = worker_delay_ms
+        self.server = make_server("127.0.0.1", 0, app, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="loadgen-server", daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.worker.stop()
+
+
+class Population:
+    """Users and websites created through the public API during setup."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.owners = []       # [{id, token, wids: []}]
+        self.validators = []   # [{id, token}]
+        self.websites = []     # [{wid, url, owner}]
+
+    def _signup(self, session, name, email, is_visitor):
+        resp = session.post(f"{self.base_url}/auth/signup", json={
+            "name": name, "email": email, "password": "loadgen-pw", "isVisitor": is_visitor
+        }, timeout=30)
+        resp.raise_for_status()
+        body = resp.json()
+        return {"id": body["user"]["id"], "token": body["session"]["token"]}
+
+    def build(self, owners: int, validators: int, websites: int, run_id: str):
+        session = requests.Session()
+        for i in range(owners):
+            user = self._signup(session, f"owner{i}", f"owner{i}-{run_id}@loadgen.local", False)
+            user["wids"] = []
+            self.owners.append(user)
+        for i in range(validators):
+            self.validators.append(self._signup(session, f"validator{i}", f"validator{i}-{run_id}@loadgen.local", True))
+        for i in range(websites):
+            owner = self.owners[i % len(self.owners)]
+            url = f"https://site{i}-{run_id}.loadgen.local/"
+            resp = session.post(f"{self.base_url}/websites/", headers={"Authorization": f"Bearer {owner['token']}"},
+                                json={"url": url, "name": f"Site {i}", "reward_per_ping": 0.0001}, timeout=30)
+            resp.raise_for_status()
+            created = resp.json()
+            row = created[0] if isinstance(created, list) else created
+            owner["wids"].append(row["wid"])
+            self.websites.append({"wid": row["wid"], "url": url, "owner": owner["id"]})
+        session.close()
+
+
+class Actions:
+    """One method per request type; each returns the response."""
+
+    def __init__(self, population: Population):
+        self.p = population
+        self.base = population.base_url
+        self._tx_counter = itertools.count(1)
+        self._tx_lock = threading.Lock()
+
+    def _next_tx(self):
+        with self._tx_lock:
+            return f"TX-{str(next(self._tx_counter)).zfill(3)}"
+
+    @staticmethod
+    def _auth(user):
+        return {"Authorization": f"Bearer {user['token']}"}
+
+    def manual_ping(self, session, rng):
+        validator = rng.choice(self.p.validators)
+        site = rng.choice(self.p.websites)
+        return session.post(f"{self.base}/pings/manual", headers=self._auth(validator),
+                            json={"wid": site["wid"], "url": site["url"], "tx_hash": self._next_tx()}, timeout=30)
+
+    def available_sites(self, session, rng):
+        return session.get(f"{self.base}/websites/available-sites", headers=self._auth(rng.choice(self.p.validators)), timeout=30)
+
+    def wallet_balance(self, session, rng):
+        return session.get(f"{self.base}/pings/wallet/balance", headers=self._auth(rng.choice(self.p.validators)), timeout=30)
+
+    def wallet_transactions(self, session, rng):
+        return session.get(f"{self.base}/pings/wallet/transactions", headers=self._auth(rng.choice(self.p.validators)), timeout=30)
+
+    def user_pings(self, session, rng):
+        validator = rng.choice(self.p.validators)
+        return session.get(f"{self.base}/pings/user/{validator['id']}", headers=self._auth(validator), timeout=30)
+
+    def owner_websites(self, session, rng):
+        owner = rng.choice(self.p.owners)
+        return session.get(f"{self.base}/websites/user/{owner['id']}", headers=self._auth(owner), timeout=30)
+
+    def website_stats(self, session, rng):
+        return session.get(f"{self.base}/pings/stats/{rng.choice(self.p.websites)['wid']}", timeout=30)
+
+
+EXPECTED_STATUS = {"manual_ping": 200}
+
+
+def parse_mix(spec: str):
+    mix = []
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name.startswith("_") or not hasattr(Actions, name):
+            raise ValueError(f"unknown action in mix: {name}")
+        mix.append((name, float(weight or 1)))
+    if not mix:
+        raise ValueError("empty mix")
+    return mix
+
+
+def run_step(actions: Actions, mix, concurrency: int, duration: float, seed: int):
+    """Run `concurrency` closed-loop virtual users for `duration` seconds."""
+    names = [n for n, _ in mix]
+    weights = [w for _, w in mix]
+    deadline = time.monotonic() + duration
+    lock = threading.Lock()
+    per_action = {name: {"lat": [], "errors": 0} for name in names}
+    statuses = {}
+
+    def user_loop(idx):
+        rng = random.Random(seed * 1000 + idx)
+        session = requests.Session()
+        local = {name: {"lat": [], "errors": 0} for name in names}
+        local_status = {}
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            t = time.perf_counter()
+            try:
+                resp = getattr(actions, name)(session, rng)
+                code = resp.status_code
+                ok = code == EXPECTED_STATUS.get(name, 200)
+            except requests.RequestException:
+                code, ok = "exception", False
+            local[name]["lat"].append(time.perf_counter() - t)
+            if not ok:
+                local[name]["errors"] += 1
+            local_status[str(code)] = local_status.get(str(code), 0) + 1
+        session.close()
+        with lock:
+            for name, d in local.items():
+                per_action[name]["lat"].extend(d["lat"])
+                per_action[name]["errors"] += d["errors"]
+            for code, n in local_status.items():
+                statuses[code] = statuses.get(code, 0) + n
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user_loop, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    all_lat = [x for d in per_action.values() for x in d["lat"]]
+    all_err = sum(d["errors"] for d in per_action.values())
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(wall, 2),
+        **summarize(all_lat, wall, all_err, len(all_lat)),
+        "status_codes": statuses,
+        "per_action": {name: summarize(d["lat"], wall, d["errors"], len(d["lat"])) for name, d in per_action.items()}
+    }
+
+
+def find_saturation(steps, min_gain: float, p99_slo_ms: float, max_error_rate: float):
+    """
+    First step where adding users stopped paying off: throughput grew by less than min_gain,
+    p99 broke the SLO, or the error rate went above max_error_rate.
+    """
+    previous = None
+    for step in steps:
+        reasons = []
+        if step["latency_ms"]["p99"] is not None and step["latency_ms"]["p99"] > p99_slo_ms:
+            reasons.append(f"p99 {step['latency_ms']['p99']}ms > {p99_slo_ms}ms")
+        if step["error_rate"] > max_error_rate:
+            reasons.append(f"error rate {step['error_rate']} > {max_error_rate}")
+        if previous and previous["throughput_rps"] and step["throughput_rps"] is not None:
+            gain = (step["throughput_rps"] - previous["throughput_rps"]) / previous["throughput_rps"]
+            if gain < min_gain:
+                reasons.append(f"throughput gain {gain:+.1%} < {min_gain:.0%}")
+        if reasons:
+            return {"concurrency": step["concurrency"], "throughput_rps": step["throughput_rps"], "reasons": reasons}
+        previous = step
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic validator/owner load against the WebTether backend")
+    parser.add_argument("--target", help="base URL of a running backend (default: in-process server with fakes)")
+    parser.add_argument("--owners", type=int, default=10)
+    parser.add_argument("--validators", type=int, default=50)
+    parser.add_argument("--websites", type=int, default=100)
+    parser.add_argument("--steps", default="1,2,4,8,16,32", help="concurrent virtual users per step")
+    parser.add_argument("--step-seconds", type=float, default=10.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="action=weight,... request ratio")
+    parser.add_argument("--p99-slo-ms", type=float, default=500.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--min-gain", type=float, default=0.10, help="throughput gain below which a step counts as saturated")
+    parser.add_argument("--worker-delay-ms", type=float, default=50.0, help="fake worker probe time (local mode)")
+    parser.add_argument("--rate-limits", action="store_true", help="keep admission control on (local mode)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    steps = [int(s) for s in args.steps.split(",") if s.strip()]
+
+    server = None
+    base_url = args.target
+    if not base_url:
+        server = LocalServer(rate_limits=args.rate_limits, worker_delay_ms=args.worker_delay_ms).start()
+        base_url = server.url
+
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    results = []
+    # the in-process app prints debug output per request; keep stdout for the report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        print(f"Setting up {args.owners} owners, {args.validators} validators, {args.websites} websites on {base_url}",
+              file=sys.stderr)
+        population = Population(base_url)
+        population.build(args.owners, args.validators, args.websites, run_id)
+        actions = Actions(population)
+
+        for i, concurrency in enumerate(steps):
+            print(f"Step {i + 1}/{len(steps)}: {concurrency} virtual users for {args.step_seconds}s", file=sys.stderr)
+            step = run_step(actions, mix, concurrency, args.step_seconds, args.seed + i)
+            print(f"  {step['throughput_rps']} req/s, p50 {step['latency_ms']['p50']}ms, "
+                  f"p95 {step['latency_ms']['p95']}ms, p99 {step['latency_ms']['p99']}ms, "
+                  f"errors {step['error_rate']:.2%}", file=sys.stderr)
+            results.append(step)
+
+    saturation = find_saturation(results, args.min_gain, args.p99_slo_ms, args.max_error_rate)
+    report = {
+        "meta": {
+            "started_at": run_id,
+            "target": args.target or "local",
+            "owners": args.owners,
+            "validators": args.validators,
+            "websites": args.websites,
+            "mix": dict(mix),
+            "step_seconds": args.step_seconds,
+            "worker_delay_ms": args.worker_delay_ms if not args.target else None
+        },
+        "steps": results,
+        "saturation": saturation
+    }
+
+    if server is not None:
+        server.stop()
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
+    if saturation:
+        print(f"Saturated at {saturation['concurrency']} users: {'; '.join(saturation['reasons'])}", file=sys.stderr)
+    else:
+        print("No saturation within the tested steps", file=sys.stderr)
+    return report
+
+
+if __name__ == "__main__":
+    main()
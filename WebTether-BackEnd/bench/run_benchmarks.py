@@ -0,0 +1,263 @@
+# bench/run_benchmarks.py
+"""
+Offline microbenchmarks for the backend controllers and models.
+
+Runs the real app from app.create_app() in-process (Flask test client) against the in-memory
+PostgREST fake and a local fake worker, for each requested ping-table size, and reports
+throughput plus latency percentiles per scenario as JSON.
+
+Usage (from WebTether-BackEnd/):
+    python -m bench.run_benchmarks                               # 1e3, 1e4, 1e5 pings
+    python -m bench.run_benchmarks --sizes 1000,1000000 --requests 2000 --output run.json
+    python -m bench.run_benchmarks --compare baseline.json --output run.json
+    python -m bench.run_benchmarks --scenarios ping_create,wallet_balance --concurrency 8
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from bench.harness import build_app, seed_dataset, token_for
+from bench.fake_supabase import FakeSupabase
+from utils.ping_stats import percentile
+
+DEFAULT_SIZES = "1000,10000,100000"
+
+
+def summarize(latencies_s, wall_s, errors, requests):
+    ms = sorted(x * 1000.0 for x in latencies_s)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "throughput_rps": round(requests / wall_s, 2) if wall_s > 0 else None,
+        "latency_ms": {
+            "mean": round(sum(ms) / len(ms), 3) if ms else None,
+            "p50": round(percentile(ms, 50), 3) if ms else None,
+            "p90": round(percentile(ms, 90), 3) if ms else None,
+            "p95": round(percentile(ms, 95), 3) if ms else None,
+            "p99": round(percentile(ms, 99), 3) if ms else None,
+            "max": round(ms[-1], 3) if ms else None
+        }
+    }
+
+
+# ------------------------------
+# Scenarios: each returns a callable(client) -> response, and the expected status code
+# ------------------------------
+class Scenarios:
+    def __init__(self, ctx: dict, seed: int = 7):
+        self.ctx = ctx
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tx_counter = itertools.count(1)
+        self._signup_counter = itertools.count(1)
+        self.validator_tokens = {uid: token_for(uid) for uid in ctx["validators"][:200]}
+
+    def _validator(self):
+        with self._lock:
+            uid = self.rng.choice(list(self.validator_tokens))
+        return uid, self.validator_tokens[uid]
+
+    def _wid(self):
+        with self._lock:
+            return self.rng.randint(1, self.ctx["websites"])
+
+    def ping_create(self):
+        def call(client):
+            uid, _ = self._validator()
+            return client.post("/pings/", json={
+                "wid": self._wid(), "is_up": True, "latency_ms": 120, "region": "BOM",
+                "uid": uid, "checked_by_uid": uid, "source": "bench"
+            })
+        return call, 201
+
+    def manual_ping(self):
+        def call(client):
+            uid, token = self._validator()
+            wid = self._wid()
+            tx = f"TX-{str(next(self._tx_counter)).zfill(3)}"
+            return client.post("/pings/manual", headers={"Authorization": f"Bearer {token}"},
+                               json={"wid": wid, "url": f"https://site{wid}.bench.local/", "tx_hash": tx})
+        return call, 200
+
+    def wallet_balance(self):
+        def call(client):
+            _, token = self._validator()
+            return client.get("/pings/wallet/balance", headers={"Authorization": f"Bearer {token}"})
+        return call, 200
+
+    def available_sites(self):
+        def call(client):
+            _, token = self._validator()
+            return client.get("/websites/available-sites", headers={"Authorization": f"Bearer {token}"})
+        return call, 200
+
+    def signup(self):
+        run_id = f"{os.getpid()}{int(time.time())}"
+
+        def call(client):
+            n = next(self._signup_counter)
+            return client.post("/auth/signup", json={
+                "name": f"bench{n}", "email": f"new{run_id}-{n}@bench.local", "password": "pw-123456"
+            })
+        return call, 201
+
+    def login(self):
+        def call(client):
+            with self._lock:
+                uid = self.rng.randint(1, self.ctx["users"])
+            return client.post("/auth/login", json={"email": f"user{uid}@bench.local", "password": self.ctx["password"]})
+        return call, 200
+
+
+SCENARIO_NAMES = ["ping_create", "manual_ping", "wallet_balance", "available_sites", "signup", "login"]
+
+
+def run_scenario(app, call, expected_status, requests, concurrency, warmup):
+    client = app.test_client()
+    for _ in range(warmup):
+        call(client)
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    per_thread = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def worker(n):
+        local_client = app.test_client()
+        local_lat, local_err = [], 0
+        for _ in range(n):
+            t = time.perf_counter()
+            try:
+                resp = call(local_client)
+                ok = resp.status_code == expected_status
+            except Exception:
+                ok = False
+            local_lat.append(time.perf_counter() - t)
+            if not ok:
+                local_err += 1
+        with lock:
+            latencies.extend(local_lat)
+            errors[0] += local_err
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        worker(requests)
+    else:
+        threads = [threading.Thread(target=worker, args=(n,)) for n in per_thread]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    wall = time.perf_counter() - started
+    return summarize(latencies, wall, errors[0], requests)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(baseline: dict, current: dict):
+    """Print p50 / p99 / throughput deltas of `current` against `baseline`."""
+    base = {(r["scenario"], r["dataset_pings"]): r for r in baseline.get("results", [])}
+    print(f"{'scenario':<18}{'pings':>10}{'p50 ms':>18}{'p99 ms':>18}{'rps':>20}", file=sys.stderr)
+    for r in current.get("results", []):
+        b = base.get((r["scenario"], r["dataset_pings"]))
+        if not b:
+            continue
+
+        def fmt(new, old):
+            if new is None or old in (None, 0):
+                return "n/a"
+            return f"{new:.2f} ({(new - old) / old * 100:+.1f}%)"
+
+        print(f"{r['scenario']:<18}{r['dataset_pings']:>10}"
+              f"{fmt(r['latency_ms']['p50'], b['latency_ms']['p50']):>18}"
+              f"{fmt(r['latency_ms']['p99'], b['latency_ms']['p99']):>18}"
+              f"{fmt(r['throughput_rps'], b['throughput_rps']):>20}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline WebTether backend microbenchmarks")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated ping-table sizes (e.g. 1000,1000000)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIO_NAMES))
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--websites", type=int, default=2000)
+    parser.add_argument("--worker-delay-ms", type=float, default=0.0)
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON file to diff against")
+    args = parser.parse_args(argv)
+
+    sizes = [int(float(s)) for s in args.sizes.split(",") if s.strip()]
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIO_NAMES)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "users": args.users,
+            "websites": args.websites,
+            "worker_delay_ms": args.worker_delay_ms
+        },
+        "results": []
+    }
+
+    worker = None
+    for size in sizes:
+        fake_db = FakeSupabase()
+        ctx = seed_dataset(fake_db, pings=size, users=args.users, websites=args.websites)
+        app, fake_db, worker = build_app(fake_db, worker)
+        worker.delay_ms = args.worker_delay_ms
+        suite = Scenarios(ctx)
+
+        for name in scenarios:
+            call, expected = getattr(suite, name)()
+            print(f"[{size} pings] {name} ...", file=sys.stderr)
+            # controllers print debug output on every request; keep it out of the measurements
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                result = run_scenario(app, call, expected, args.requests, args.concurrency, args.warmup)
+            report["results"].append({"scenario": name, "dataset_pings": size, **result})
+
+    if worker is not None:
+        worker.stop()
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# controllers/analytics_controller.py
+"""
+Analytics controller (Flask blueprint)
+
+Endpoints (answered by the embedded analytics store, utils/analytics_store.py):
+ - GET /analytics/status                     -> engine, rows held, whether the bulk load finished
+ - GET /analytics/websites/<wid>/summary     -> uptime / latency percentiles / phases + per-region
+                                               breakdown (?from=&to=)
+ - GET /analytics/websites/<wid>/timeseries  -> per-bucket uptime and latency
+                                               (?from=&to=&bucket=hour|day|<seconds>&smooth=N)
+
+The store is optional: enable it with ANALYTICS_ENABLED=1. feed_analytics(row) is then
+subscribed to the ping feed (utils/ping_feed.py) in app.create_app() and the last
+ANALYTICS_WINDOW_HOURS of history are bulk-loaded in the background; until that finishes these
+endpoints answer 503. Ranges reaching further back only cover the window the store holds.
+"""
+
+from flask import Blueprint, request, jsonify
+from utils.analytics_store import analytics, analytics_ready
+from utils.ping_stats import parse_timestamp
+from utils.retention import iter_ping_history
+from datetime import datetime, timedelta, timezone
+import traceback
+
+analytics_controller = Blueprint("analytics_controller", __name__)
+
+BUCKETS = {"minute": 60, "hour": 3600, "day": 86400}
+TIMESERIES_DEFAULT_DAYS = 7
+TIMESERIES_MAX_BUCKETS = 10000
+
+
+def feed_analytics(row):
+    """Ping feed subscriber: mirror the stored ping into the analytics store."""
+    if analytics is not None:
+        analytics.add(row)
+
+
+def start_analytics_load():
+    """Bulk-load the window's archived + hot pings into the store on a background thread."""
+    if analytics is not None:
+        analytics.start_bulk_load(lambda: iter_ping_history(None, since=analytics.window_start()))
+
+
+def _unavailable():
+    if analytics is None:
+        return jsonify({"error": "Analytics store is disabled (set ANALYTICS_ENABLED=1)"}), 503
+    return jsonify({"error": "Analytics store is still loading, try again shortly"}), 503
+
+
+def _time_range():
+    since, until = request.args.get("from"), request.args.get("to")
+    return (parse_timestamp(since) if since else None,
+            parse_timestamp(until) if until else None)
+
+
+@analytics_controller.route('/status', methods=['GET'])
+def get_status():
+    if analytics is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, "backend": analytics.backend, "ready": analytics.ready,
+                    "rows": analytics.row_count(), "window_hours": analytics.window_hours}), 200
+
+
+@analytics_controller.route('/websites/<int:wid>/summary', methods=['GET'])
+def get_website_summary(wid):
+    if not analytics_ready():
+        return _unavailable()
+    try:
+        since, until = _time_range()
+    except ValueError:
+        return jsonify({"error": "from / to must be ISO-8601 timestamps"}), 400
+    try:
+        return jsonify({"wid": wid, **analytics.rollup(wid, since, until),
+                        "regions": analytics.regions(wid, since, until)}), 200
+    except Exception as e:
+        return jsonify({"error": f"Failed to compute summary: {e}", "trace": traceback.format_exc()}), 500
+
+
+@analytics_controller.route('/websites/<int:wid>/timeseries', methods=['GET'])
+def get_website_timeseries(wid):
+    if not analytics_ready():
+        return _unavailable()
+    try:
+        since, until = _time_range()
+    except ValueError:
+        return jsonify({"error": "from / to must be ISO-8601 timestamps"}), 400
+
+    bucket = request.args.get("bucket", "hour")
+    if bucket in BUCKETS:
+        bucket_seconds = BUCKETS[bucket]
+    elif bucket.isdigit() and int(bucket) > 0:
+        bucket_seconds = int(bucket)
+    else:
+        return jsonify({"error": f"bucket must be one of {', '.join(BUCKETS)} or a number of seconds"}), 400
+    smooth = request.args.get("smooth", "1")
+    if not smooth.isdigit() or int(smooth) < 1:
+        return jsonify({"error": "smooth must be a positive integer"}), 400
+
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(days=TIMESERIES_DEFAULT_DAYS)
+    if (until - since).total_seconds() / bucket_seconds > TIMESERIES_MAX_BUCKETS:
+        return jsonify({"error": f"Range too large for bucket size (max {TIMESERIES_MAX_BUCKETS} buckets)"}), 400
+    try:
+        rows = analytics.timeseries(wid, since, until, bucket_seconds=bucket_seconds, smooth=int(smooth))
+        return jsonify({"wid": wid, "from": since.isoformat(), "to": until.isoformat(),
+                        "bucket_seconds": bucket_seconds, "smooth": int(smooth), "rows": rows}), 200
+    except Exception as e:
+        return jsonify({"error": f"Failed to compute timeseries: {e}", "trace": traceback.format_exc()}), 500
@@ -0,0 +1,74 @@
+# controllers/anomaly_controller.py
+"""
+Anomaly controller (Flask blueprint)
+
+Endpoints:
+ - GET /anomalies/                 -> recent anomaly events (?limit=100&severity=warning|critical)
+ - GET /anomalies/website/<wid>    -> events for one website (?limit=100)
+ - GET /anomalies/website/<wid>/state -> live detector state for one website
+
+Ingestion:
+ - record_ping_anomalies(row) is registered as a ping listener in app.create_app();
+   it feeds the streaming detector and queues any events it emits for the background
+   writer (utils/anomaly_writer.py), so ingestion never waits on the insert.
+"""
+
+from flask import Blueprint, request, jsonify
+from models.anomaly_model import AnomalyModel
+from utils.anomaly_detector import detector
+from utils.anomaly_writer import anomaly_writer
+import logging
+
+anomaly_controller = Blueprint("anomaly_controller", __name__)
+logger = logging.getLogger(__name__)
+anomaly_model = AnomalyModel()
+
+
+def _unwrap_supabase_response(resp):
+    if resp is None:
+        return None
+    if hasattr(resp, "data"):
+        return resp.data
+    return resp
+
+
+def _limit_arg(default: int = 100, maximum: int = 1000):
+    limit = request.args.get("limit")
+    if limit and limit.isdigit():
+        return min(int(limit), maximum)
+    return default
+
+
+def record_ping_anomalies(row):
+    """Ping listener: update detector state and queue emitted events for storage."""
+    for event in detector.observe(row):
+        try:
+            anomaly_writer.enqueue(event)
+        except Exception:
+            logger.exception("Failed to queue anomaly event %s", event)
+
+
+@anomaly_controller.route('/', methods=['GET'])
+def list_anomalies():
+    try:
+        resp = anomaly_model.get_recent_events(limit=_limit_arg(), severity=request.args.get("severity"))
+        return jsonify(_unwrap_supabase_response(resp)), 200
+    except Exception as e:
+        return jsonify({"error": f"Failed to list anomalies: {str(e)}"}), 500
+
+
+@anomaly_controller.route('/website/<int:wid>', methods=['GET'])
+def get_website_anomalies(wid):
+    try:
+        resp = anomaly_model.get_events_by_wid(wid, limit=_limit_arg())
+        return jsonify(_unwrap_supabase_response(resp)), 200
+    except Exception as e:
+        return jsonify({"error": f"Failed to fetch anomalies: {str(e)}"}), 500
+
+
+@anomaly_controller.route('/website/<int:wid>/state', methods=['GET'])
+def get_website_detector_state(wid):
+    state = detector.state_for(wid)
+    if state is None:
+        return jsonify({"error": "No pings observed for website since startup"}), 404
+    return jsonify({"wid": wid, **state}), 200
@@ -0,0 +1,229 @@
+# controllers/async_ping_controller.py
+"""
+Async (Quart) versions of the hot ping endpoints, served by asgi.py.
+
+Endpoints (same paths, payloads and responses as controllers/ping_controller.py):
+ - POST /pings/                 -> record a ping
+ - POST /pings/manual           -> paid manual check (probe + ping + tx)
+ - GET  /pings/wallet/balance   -> simulated wallet balance
+ - GET  /pings/stats/<wid>      -> uptime / latency rollup
+
+Every Supabase call and worker probe is awaited, so one process keeps hundreds of them in
+flight. Ping listeners (anomaly detector, notifier) are synchronous and run in a worker thread,
+as do appends to the write spool when it is enabled (WRITE_SPOOL_ENABLED=1).
+Routes not listed here are served by the Flask app through the WSGI fallback.
+"""
+
+import asyncio
+import logging
+import traceback
+
+from quart import Blueprint, jsonify, request
+
+from controllers.ping_controller import (HISTORY_MAX_ROWS, PING_COST_ETH, _FAKE_TX_CODE_SET,
+                                         _rate_limit_caller, simulate_hardhat_transaction,
+                                         spool_manual_check, wallet_summary)
+from models.async_models import AsyncOnChainTransactionModel, AsyncPingModel, AsyncUserModel
+from models.db import response_data, response_row
+from models.ping_model import PingModel
+from utils.jwt_utils import decode_token, user_id_from_claims
+from utils.idempotency import idempotent
+from utils.ping_events import publish_ping
+from utils.ping_stats import parse_timestamp, rollup_pings
+from utils.probe_utils import PHASE_FIELDS, async_probe_url
+from utils.rate_limit import rate_limit_rejection
+from utils.retention import ping_history
+from utils.reward_credits import reward_credits
+from utils.write_spool import PING_TABLE, write_spool
+
+async_ping_controller = Blueprint("async_ping_controller", __name__)
+logger = logging.getLogger(__name__)
+ping_model = AsyncPingModel()
+user_model = AsyncUserModel()
+tx_model = AsyncOnChainTransactionModel()
+
+
+def _rate_limited(rejection):
+    resp = jsonify(rejection)
+    resp.headers["Retry-After"] = str(rejection["retry_after"])
+    return resp, 429
+
+
+def _bearer_uid():
+    """(uid, None) for a valid Bearer token, otherwise (None, error response tuple)."""
+    auth = request.headers.get("Authorization", "")
+    if not auth.startswith("Bearer "):
+        return None, (jsonify({"error": "Missing or invalid Authorization header"}), 401)
+
+    claims = decode_token(auth.split(" ", 1)[1])
+    if not claims:
+        return None, (jsonify({"error": "Invalid or expired token"}), 401)
+
+    uid = user_id_from_claims(claims)
+    if uid is None:
+        return None, (jsonify({"error": "Invalid user id in token"}), 400)
+    return uid, None
+
+
+async def _publish(row):
+    if row:
+        await asyncio.to_thread(publish_ping, row)
+
+
+@async_ping_controller.route('/', methods=['POST'])
+@idempotent
+async def create_ping():
+    try:
+        data = await request.get_json(silent=True) or {}
+
+        scope, caller = _rate_limit_caller(request.headers, request.remote_addr)
+        rejection = rate_limit_rejection(user_key=caller, caller_scope=scope)
+        if rejection:
+            return _rate_limited(rejection)
+
+        fields = dict(
+            wid=data.get("wid"),
+            is_up=data.get("is_up"),
+            latency_ms=data.get("latency_ms"),
+            region=data.get("region"),
+            uid=data.get("uid"),
+            tx_hash=data.get("tx_hash"),
+            fee_paid_numeric=data.get("fee_paid_numeric"),
+            source=data.get("source", "manual"),
+            checked_by_uid=data.get("checked_by_uid"),
+            **{f: data.get(f) for f in PHASE_FIELDS}
+        )
+        if write_spool is not None:
+            row = await asyncio.to_thread(write_spool.append, PING_TABLE, PingModel.build_payload(**fields))
+            return jsonify([row]), 202
+
+        resp = await ping_model.create_ping(**fields)
+        await _publish(response_row(resp))
+        return jsonify(response_data(resp)), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        tb = traceback.format_exc()
+        return jsonify({"error": "Failed to create ping", "detail": str(e), "trace": tb}), 500
+
+
+@async_ping_controller.route('/manual', methods=['POST'])
+@idempotent
+async def manual_ping():
+    try:
+        uid, error = _bearer_uid()
+        if error:
+            return error
+
+        data = await request.get_json(silent=True) or {}
+        wid = data.get("wid")
+        url = data.get("url")
+        tx_hash = data.get("tx_hash")
+
+        if not (wid and url and tx_hash):
+            return jsonify({"error": "wid, url and tx_hash are required"}), 400
+
+        rejection = rate_limit_rejection(user_key=uid, url=url)
+        if rejection:
+            return _rate_limited(rejection)
+
+        if tx_hash not in _FAKE_TX_CODE_SET:
+            return jsonify({"error": "Only simulated tx codes are supported in local mode"}), 400
+
+        # user lookup and tx-code uniqueness are independent: one round trip instead of two
+        user_resp, existing_resp = await asyncio.gather(user_model.get_user_by_id(uid),
+                                                        tx_model.get_transaction_by_hash(tx_hash))
+        if not response_row(user_resp):
+            return jsonify({"error": "User not found"}), 404
+        if response_row(existing_resp):
+            return jsonify({"error": "Transaction code already used", "tx_hash": tx_hash}), 409
+
+        simulated_tx = simulate_hardhat_transaction(tx_hash)
+        if not simulated_tx:
+            return jsonify({"error": "Failed to simulate transaction"}), 500
+        used_amount_eth = PING_COST_ETH
+        gas_used = simulated_tx["gas_used"]
+
+        # identical concurrent probes of this URL share one execution
+        result = await async_probe_url(url)
+
+        ping_fields = dict(
+            wid=wid,
+            is_up=result.get("is_up", False),
+            latency_ms=result.get("latency_ms"),
+            region=result.get("region", "unknown"),
+            uid=uid,
+            tx_hash=tx_hash,
+            fee_paid_numeric=used_amount_eth,
+            source="manual",
+            checked_by_uid=uid,
+            **{f: result.get(f) for f in PHASE_FIELDS}
+        )
+        tx_fields = dict(tx_hash=tx_hash, uid=uid, token_address="ETH", token_amount=used_amount_eth,
+                         gas_used=gas_used)
+
+        if write_spool is not None:
+            ping_row, _ = await asyncio.to_thread(spool_manual_check, ping_fields, tx_fields)
+            status, code = "spooled", 202
+        else:
+            ping_row = response_row(await ping_model.create_ping(**ping_fields))
+            if not ping_row:
+                return jsonify({"error": "Failed to save ping"}), 500
+            await _publish(ping_row)
+            # the validator is the authenticated caller: credit them off the request path
+            reward_credits.enqueue(uid, wid, ping_row.get("pid"))
+            await tx_model.create_transaction(pid=ping_row.get("pid"), **tx_fields)
+            status, code = "recorded", 200
+
+        return jsonify({
+            "status": status,
+            "ping": ping_row,
+            "onchain": {
+                "tx_hash": tx_hash,
+                "amount": used_amount_eth,
+                "gas_used": gas_used,
+                "simulated": True
+            },
+            "result": result
+        }), code
+
+    except Exception as e:
+        tb = traceback.format_exc()
+        logger.exception("Error in manual ping")
+        return jsonify({"error": "Internal server error", "detail": str(e)}), 500
+
+
+@async_ping_controller.route('/wallet/balance', methods=['GET'])
+async def get_wallet_balance():
+    try:
+        uid, error = _bearer_uid()
+        if error:
+            return error
+
+        tx_resp, user_resp = await asyncio.gather(tx_model.get_transactions_by_user(uid),
+                                                  user_model.get_user_by_id(uid))
+        txns = response_data(tx_resp) or []
+        user_row = response_row(user_resp) or {}
+        return jsonify(wallet_summary(txns, user_row)), 200
+
+    except Exception as e:
+        tb = traceback.format_exc()
+        return jsonify({"error": "Failed to compute wallet balance", "detail": str(e), "trace": tb}), 500
+
+
+@async_ping_controller.route('/stats/<int:wid>', methods=['GET'])
+async def get_website_ping_stats(wid):
+    try:
+        since = parse_timestamp(request.args["from"]) if request.args.get("from") else None
+        until = parse_timestamp(request.args["to"]) if request.args.get("to") else None
+    except ValueError:
+        return jsonify({"error": "from / to must be ISO-8601 timestamps"}), 400
+    try:
+        if since is None and until is None:
+            rows = response_data(await ping_model.get_stats_for_website(wid)) or []
+        else:
+            # ranged stats may read archive segments from disk; keep that off the event loop
+            rows = await asyncio.to_thread(ping_history, wid, since, until, HISTORY_MAX_ROWS)
+        return jsonify({"wid": wid, **rollup_pings(rows)}), 200
+    except Exception as e:
+        return jsonify({"error": f"Failed to compute ping stats: {str(e)}"}), 500
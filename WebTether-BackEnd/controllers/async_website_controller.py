@@ -0,0 +1,93 @@
+# controllers/async_website_controller.py
+"""
+Async (Quart) versions of the hot website endpoints, served by asgi.py.
+
+Endpoints (same paths, payloads and responses as controllers/website_controller.py):
+ - POST /websites/                  -> create website (auth required)
+ - GET  /websites/                  -> list all websites
+ - GET  /websites/<wid>             -> get website by id
+ - GET  /websites/available-sites   -> sites the caller may validate (auth required)
+
+Everything else under /websites (updates, deletes, exports, ...) is served by the Flask app.
+"""
+
+import asyncio
+
+from quart import Blueprint, jsonify, request
+
+from controllers.async_ping_controller import _bearer_uid
+from models.async_models import AsyncWebsiteModel
+from models.db import response_data, response_row
+from utils.probe_targets import acquire_targets, canonical_url, release_targets
+import traceback
+
+async_website_controller = Blueprint("async_website_controller", __name__)
+website_model = AsyncWebsiteModel()
+
+
+@async_website_controller.route('/', methods=['POST'])
+async def create_website():
+    uid, error = _bearer_uid()
+    if error:
+        return error
+
+    data = await request.get_json(silent=True) or {}
+    url = data.get("url")
+    if not url:
+        return jsonify({"error": "Missing required field: url"}), 400
+
+    try:
+        target_id = (await asyncio.to_thread(acquire_targets, [url])).get(canonical_url(url))
+        try:
+            resp = await website_model.create_website(
+                url=url,
+                uid=uid,
+                category=data.get("category"),
+                name=data.get("name"),
+                reward_per_ping=data.get("reward_per_ping"),
+                status=data.get("status"),
+                notify_url=data.get("notify_url"),
+                target_id=target_id
+            )
+        except Exception:
+            await asyncio.to_thread(release_targets, [target_id])
+            raise
+        return jsonify(response_data(resp)), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        tb = traceback.format_exc()
+        return jsonify({"error": f"Failed to create website: {e}", "trace": tb}), 500
+
+
+@async_website_controller.route('/', methods=['GET'])
+async def list_websites():
+    try:
+        resp = await website_model.get_all_websites()
+        return jsonify(response_data(resp)), 200
+    except Exception as e:
+        return jsonify({"error": f"Failed to list websites: {str(e)}"}), 500
+
+
+@async_website_controller.route('/<int:wid>', methods=['GET'])
+async def get_website(wid):
+    try:
+        rec = response_row(await website_model.get_website_by_id(wid))
+        if not rec:
+            return jsonify({"error": "Website not found"}), 404
+        return jsonify(rec), 200
+    except Exception as e:
+        return jsonify({"error": f"Failed to fetch website: {str(e)}"}), 500
+
+
+@async_website_controller.route('/available-sites', methods=['GET'])
+async def get_available_sites():
+    uid, error = _bearer_uid()
+    if error:
+        return error
+
+    try:
+        resp = await website_model.get_websites_excluding_user(uid)
+        return jsonify(response_data(resp)), 200
+    except Exception as e:
+        return jsonify({"error": f"Failed to fetch available sites: {str(e)}"}), 500
@@ -0,0 +1,137 @@
+# controllers/dashboard_controller.py
+"""
+Dashboard controller (Flask blueprint)
+
+Endpoints:
+ - GET /dashboard   -> everything the dashboard page needs in one response (auth required)
+
+Query params:
+ - sections=user,websites,pings,wallet,transactions   (default: all of them)
+ - pings_limit=N                                       (default 100, max 1000)
+
+Replaces the five calls the page used to make (/users/<uid>, /websites/user/<uid>,
+/pings/user/<uid>, /pings/wallet/balance, /pings/wallet/transactions). The token is decoded once
+and the independent reads run concurrently as one QueryBatch (models/query_executor.py).
+wallet and transactions share one onchain_transactions read; wallet reuses the user row.
+A section that fails or misses DASHBOARD_TIMEOUT_SECONDS is reported under "errors" and the
+remaining sections are still returned.
+"""
+
+from flask import Blueprint, request, jsonify
+from controllers.ping_controller import format_transactions, wallet_summary
+from models.db import response_data, response_row
+from models.onchain_transaction_model import OnChainTransactionModel
+from models.ping_model import PingModel
+from models.query_executor import QueryBatch, QueryTimeout
+from models.user_model import UserModel
+from models.website_model import WebsiteModel
+from utils.jwt_utils import decode_token, user_id_from_claims
+from dotenv import load_dotenv
+import logging
+import os
+import time
+import traceback
+
+load_dotenv()
+
+dashboard_controller = Blueprint("dashboard_controller", __name__)
+logger = logging.getLogger(__name__)
+user_model = UserModel()
+website_model = WebsiteModel()
+ping_model = PingModel()
+tx_model = OnChainTransactionModel()
+
+DASHBOARD_TIMEOUT_SECONDS = float(os.getenv("DASHBOARD_TIMEOUT_SECONDS", 5))
+DASHBOARD_SECTIONS = ("user", "websites", "pings", "wallet", "transactions")
+DASHBOARD_MAX_PINGS = 1000
+# columns never sent to the browser
+_PRIVATE_USER_FIELDS = ("secret_key",)
+
+
+def _requested_sections():
+    raw = request.args.get("sections")
+    if not raw:
+        return list(DASHBOARD_SECTIONS)
+    sections = [s.strip() for s in raw.split(",") if s.strip()]
+    unknown = [s for s in sections if s not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown section(s): {', '.join(unknown)}. "
+                         f"Choose from: {', '.join(DASHBOARD_SECTIONS)}")
+    return list(dict.fromkeys(sections))
+
+
+@dashboard_controller.route('', methods=['GET'])
+@dashboard_controller.route('/', methods=['GET'])
+def get_dashboard():
+    auth = request.headers.get("Authorization", "")
+    if not auth.startswith("Bearer "):
+        return jsonify({"error": "Missing or invalid Authorization header"}), 401
+    claims = decode_token(auth.split(" ", 1)[1])
+    if not claims:
+        return jsonify({"error": "Invalid or expired token"}), 401
+    uid = user_id_from_claims(claims)
+    if uid is None:
+        return jsonify({"error": "Invalid user id in token"}), 400
+
+    try:
+        sections = _requested_sections()
+        pings_limit = min(max(int(request.args.get("pings_limit", 100)), 1), DASHBOARD_MAX_PINGS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        started = time.perf_counter()
+        wanted = set(sections)
+
+        # one read per underlying source, even when several sections need it
+        reads = {}
+        with QueryBatch(timeout=DASHBOARD_TIMEOUT_SECONDS) as batch:
+            if wanted & {"user", "wallet"}:
+                reads["user"] = batch.submit(user_model.get_user_by_id, uid)
+            if "websites" in wanted:
+                reads["websites"] = batch.submit(website_model.get_websites_by_user, uid)
+            if "pings" in wanted:
+                reads["pings"] = batch.submit(ping_model.get_pings_by_user, uid, pings_limit)
+            if wanted & {"wallet", "transactions"}:
+                reads["transactions"] = batch.submit(tx_model.get_transactions_by_user, uid)
+
+        results, errors = {}, {}
+        for name, future in reads.items():
+            try:
+                results[name] = future.result()
+            except QueryTimeout:
+                errors[name] = f"timed out after {DASHBOARD_TIMEOUT_SECONDS}s"
+            except Exception as e:
+                logger.warning("Dashboard read %r failed for uid %s: %s", name, uid, e)
+                errors[name] = str(e)
+
+        payload = {"uid": uid, "sections": sections}
+        user_row = response_row(results.get("user")) if "user" in results else None
+        txns = response_data(results.get("transactions")) or []
+
+        for section in sections:
+            source = "transactions" if section == "wallet" else section
+            if source in errors:
+                payload[section] = None
+                continue
+            if section == "user":
+                payload["user"] = ({k: v for k, v in user_row.items() if k not in _PRIVATE_USER_FIELDS}
+                                   if user_row else None)
+            elif section == "websites":
+                payload["websites"] = response_data(results["websites"]) or []
+            elif section == "pings":
+                payload["pings"] = response_data(results["pings"]) or []
+            elif section == "wallet":
+                payload["wallet"] = wallet_summary(txns, user_row)
+            elif section == "transactions":
+                formatted = format_transactions(txns)
+                payload["transactions"] = {"transactions": formatted, "total_count": len(formatted)}
+
+        if errors:
+            payload["errors"] = errors
+        payload["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return jsonify(payload), 200
+
+    except Exception as e:
+        tb = traceback.format_exc()
+        return jsonify({"error": "Failed to build dashboard", "detail": str(e), "trace": tb}), 500
@@ -7,10 +7,15 @@ Endpoints:
  - GET    /transactions/            -> list (all) transactions (supports ?limit & ?offset)
  - GET    /transactions/<tx_hash>   -> fetch single transaction
  - GET    /transactions/user/<uid>  -> fetch transactions for a user (auth recommended)
+ - GET    /transactions/export      -> stream the caller's transactions as csv / ndjson (auth required;
+                                      X-Admin-Token exports any / every user)
  - PUT    /transactions/<tx_hash>   -> update transaction (allowed fields only)
  - DELETE /transactions/<tx_hash>   -> delete transaction
 
 Notes:
+ - POST / honours an Idempotency-Key header, so client retries don't insert twice (utils/idempotency.py).
+ - With WRITE_SPOOL_ENABLED=1, POST / writes to the local write spool (utils/write_spool.py) and
+   answers 202; GET /<tx_hash> and /user/<uid> already include spooled rows.
  - This controller is defensive: it normalizes Supabase responses and validates payloads.
  - Authentication / authorization: for now we expect token for user-specific endpoints.
    In production you should enforce roles (admin vs user) and ensure only owners/admins can update/delete.
@@ -18,13 +23,20 @@ Notes:
 
 from flask import Blueprint, request, jsonify
 from models.onchain_transaction_model import OnChainTransactionModel
-from utils.jwt_utils import decode_token
-from datetime import datetime
+from utils.admin_auth import is_admin_request
+from utils.jwt_utils import decode_token, user_id_from_claims
+from utils.export_stream import EXPORT_FORMATS, export_response, keyset_pages_with_ties, wants_gzip
+from utils.idempotency import idempotent
+from utils.leaderboard import leaderboard
+from utils.ping_stats import parse_timestamp
+from utils.write_spool import TX_TABLE, write_spool
 import traceback
 
 onchain_transaction_controller = Blueprint("onchain_transaction_controller", __name__)
 tx_model = OnChainTransactionModel()
 
+TX_EXPORT_COLUMNS = ["tx_hash", "created_at", "uid", "pid", "token_address", "token_amount", "gas_used"]
+
 
 # Helper to unwrap supabase response object or pass-through python structures
 def _unwrap_resp(resp):
@@ -39,6 +51,7 @@ def _unwrap_resp(resp):
 # Create
 # -------------------------
 @onchain_transaction_controller.route("/", methods=["POST"])
+@idempotent
 def create_onchain_transaction():
     """
     Create a transaction record.
@@ -63,17 +76,23 @@ def create_onchain_transaction():
         if token_amount is None:
             return jsonify({"error": "token_amount is required"}), 400
 
+        fields = dict(tx_hash=tx_hash,
+                      uid=int(uid),
+                      pid=int(pid) if pid is not None else None,
+                      token_address=token_address,
+                      token_amount=float(token_amount),
+                      gas_used=int(gas_used) if gas_used is not None else None)
+        if write_spool is not None:
+            # durable locally; stored (and ranked) when the spool drains
+            return jsonify(write_spool.append(TX_TABLE, OnChainTransactionModel.build_payload(**fields))), 202
+
         # create
-        resp = tx_model.create_transaction(tx_hash=tx_hash,
-                                           uid=int(uid),
-                                           pid=int(pid) if pid is not None else None,
-                                           token_address=token_address,
-                                           token_amount=float(token_amount),
-                                           gas_used=int(gas_used) if gas_used is not None else None)
+        resp = tx_model.create_transaction(**fields)
 
         created = _unwrap_resp(resp)
         # created is usually a list with inserted row(s) — return first element if present
         if isinstance(created, list) and len(created) > 0:
+            leaderboard.record_transaction(created[0])
             return jsonify(created[0]), 201
         return jsonify(created), 201
 
@@ -105,6 +124,54 @@ def list_transactions():
         return jsonify({"error": "Failed to list transactions", "detail": str(e), "trace": tb}), 500
 
 
+@onchain_transaction_controller.route("/export", methods=["GET"])
+def export_transactions():
+    """
+    Stream transactions in (created_at, tx_hash) order without loading them into memory.
+    Query: format=csv|ndjson (default csv), uid, from / to (ISO timestamps on created_at),
+           gzip=1|0 (defaults to the client's Accept-Encoding).
+    Users only export their own transactions; with a valid X-Admin-Token, `uid` picks any user
+    and omitting it exports everyone's.
+    """
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    uid = request.args.get("uid")
+    if uid is not None and not uid.isdigit():
+        return jsonify({"error": "uid must be an integer"}), 400
+
+    if not is_admin_request(request.headers):
+        auth = request.headers.get("Authorization", "")
+        if not auth.startswith("Bearer "):
+            return jsonify({"error": "Missing or invalid Authorization header"}), 401
+
+        token = auth.split(" ", 1)[1]
+        claims = decode_token(token)
+        if not claims:
+            return jsonify({"error": "Invalid or expired token"}), 401
+        token_uid = user_id_from_claims(claims)
+        if token_uid is None:
+            return jsonify({"error": "Token does not identify a user"}), 401
+        if uid is not None and int(uid) != int(token_uid):
+            return jsonify({"error": "Not allowed to export another user's transactions"}), 403
+        uid = str(token_uid)
+    try:
+        since = parse_timestamp(request.args["from"]).isoformat() if request.args.get("from") else None
+        until = parse_timestamp(request.args["to"]).isoformat() if request.args.get("to") else None
+    except ValueError:
+        return jsonify({"error": "from / to must be ISO-8601 timestamps"}), 400
+
+    def fetch(cursor, ties_only, limit):
+        return tx_model.get_transactions_after(cursor, ties_only, limit,
+                                               uid=int(uid) if uid is not None else None,
+                                               since=since, until=until)
+
+    rows = keyset_pages_with_ties(fetch, "created_at", "tx_hash")
+    filename = f"transactions-user-{uid}" if uid is not None else "transactions"
+    return export_response(rows, fmt, filename, TX_EXPORT_COLUMNS,
+                           compress=wants_gzip(request.args, request.headers))
+
+
 @onchain_transaction_controller.route("/<string:tx_hash>", methods=["GET"])
 def get_transaction(tx_hash):
     """Get a single transaction by tx_hash."""
@@ -11,14 +11,29 @@ Responsibilities:
      * stores ping and on-chain transaction records.
  - Provide wallet/transactions endpoints (simulated for local Hardhat flow).
  - Defensive handling of Supabase response shapes (object with .data vs plain list/dict).
+ - POST / and POST /manual honour an Idempotency-Key header: retries replay the first
+   response instead of probing / writing again (utils/idempotency.py).
+ - With WRITE_SPOOL_ENABLED=1, POST / and POST /manual write to the local write spool
+   (utils/write_spool.py) and answer 202 once the rows are on disk; they reach Supabase (and the
+   ping listeners) when the spool drains.
 """
 
 from flask import Blueprint, request, jsonify
 from models.ping_model import PingModel
 from models.user_model import UserModel
 from models.onchain_transaction_model import OnChainTransactionModel
-from utils.jwt_utils import decode_token
-import requests
+from models.db import response_data, response_row
+from models.query_executor import run_parallel
+from utils.jwt_utils import decode_token, user_id_from_claims
+from utils.probe_utils import probe_url, PHASE_FIELDS
+from utils.ping_stats import rollup_pings, parse_timestamp
+from utils.retention import ping_history, hourly_history
+from utils.ping_events import publish_ping
+from utils.rate_limit import check_rate_limits, is_trusted_worker
+from utils.idempotency import idempotent
+from utils.reward_credits import REWARDS_ENABLED, reward_credits
+from utils.write_spool import EARNINGS_TABLE, PING_TABLE, TX_TABLE, new_spool_id, write_spool
+import logging
 import os
 import time
 import random
@@ -27,6 +42,7 @@ from datetime import datetime
 import traceback
 
 ping_controller = Blueprint("ping_controller", __name__)
+logger = logging.getLogger(__name__)
 ping_model = PingModel()
 user_model = UserModel()
 tx_model = OnChainTransactionModel()
@@ -37,7 +53,11 @@ CONTRACT_ADDRESS = os.getenv("PING_PAYMENT_CONTRACT", "0x5FbDB2315678afecb367f03
 PING_COST_ETH = float(os.getenv("PING_COST_ETH", 0.0002))
 
 # Demo fake transaction codes - frontend can pick from these to simulate a payment.
-FAKE_TX_CODES = [f"TX-{str(i+1).zfill(3)}" for i in range(20)]
+# FAKE_TX_CODE_COUNT raises the pool for local benchmarks / load tests (each code is single-use).
+FAKE_TX_CODES = [f"TX-{str(i+1).zfill(3)}" for i in range(int(os.getenv("FAKE_TX_CODE_COUNT", 20)))]
+_FAKE_TX_CODE_SET = frozenset(FAKE_TX_CODES)
+# cap on raw rows a single history / ranged stats request may pull (hot table + archive)
+HISTORY_MAX_ROWS = int(os.getenv("PING_HISTORY_MAX_ROWS", 50000))
 HARDHAT_ACCOUNTS = [
     "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266",
     "0x70997970C51812dc3A010C7d01b50e0d17dc79C8",
@@ -48,55 +68,34 @@ HARDHAT_ACCOUNTS = [
 # -------------------------
 # Utility helpers
 # -------------------------
-def _unwrap_supabase_response(resp):
-    if resp is None:
-        return None
-    if hasattr(resp, "data"):
-        return resp.data
-    return resp
-
-
-def _single_record_from_response(resp):
-    data = _unwrap_supabase_response(resp)
-    if data is None:
-        return None
-    if isinstance(data, dict):
-        return data
-    if isinstance(data, list):
-        return data[0] if len(data) > 0 else None
-    return None
+def _time_range_args():
+    """Parse optional ?from= / ?to= ISO timestamps; raises ValueError on bad input."""
+    since, until = request.args.get("from"), request.args.get("to")
+    return (parse_timestamp(since) if since else None,
+            parse_timestamp(until) if until else None)
 
 
-def _extract_user_id_from_claims(claims):
+def _rate_limit_caller(headers, remote_addr):
     """
-    Accepts shapes like {"user_id": 31} or nested {"user_id": {"user_id": 31}}.
-    Returns int or None.
+    (scope, key) a raw ping is rate limited under: trusted internal workers (X-Worker-Token)
+    share the "worker" bucket, otherwise the uid of a valid Bearer token, otherwise the client IP.
+    Body fields such as checked_by_uid are client-chosen and never used.
     """
-    if not isinstance(claims, dict):
-        return None
-    uid_field = claims.get("user_id") or claims.get("id") or claims.get("uid")
-    if uid_field is None:
-        return None
-    if isinstance(uid_field, dict):
-        for k in ("user_id", "id", "uid"):
-            if k in uid_field:
-                return _extract_user_id_from_claims({k: uid_field[k]})
-        if len(uid_field) == 1:
-            (v,) = uid_field.values()
-            return int(v) if isinstance(v, (int, str)) and str(v).isdigit() else None
-        return None
-    if isinstance(uid_field, int):
-        return uid_field
-    if isinstance(uid_field, str) and uid_field.isdigit():
-        return int(uid_field)
-    return None
+    if is_trusted_worker(headers):
+        return "worker", "workers"
+    auth_header = headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        uid = user_id_from_claims(decode_token(auth_header.split(" ", 1)[1]))
+        if uid is not None:
+            return "user", uid
+    return "user", f"ip:{remote_addr}"
 
 
 def simulate_hardhat_transaction(tx_hash, from_address=None):
     """
     Return a simulated transaction dict for a fake tx code.
     """
-    if tx_hash not in FAKE_TX_CODES:
+    if tx_hash not in _FAKE_TX_CODE_SET:
         return None
     if not from_address:
         from_address = random.choice(HARDHAT_ACCOUNTS)
@@ -114,20 +113,45 @@ def simulate_hardhat_transaction(tx_hash, from_address=None):
     }
 
 
+def spool_manual_check(ping_fields: dict, tx_fields: dict):
+    """
+    Spool a manual check's ping, its payment and the validator's reward credit as one durable
+    unit: (ping_row, tx_row).
+    """
+    ping = PingModel.build_payload(**ping_fields)
+    ping["spool_id"] = new_spool_id()
+    tx = OnChainTransactionModel.build_payload(**tx_fields)
+    items = [(PING_TABLE, ping, None), (TX_TABLE, tx, {"pid": ping["spool_id"]})]
+    if REWARDS_ENABLED:
+        credit = {"uid": ping_fields["checked_by_uid"], "wid": ping_fields["wid"]}
+        items.append((EARNINGS_TABLE, credit, {"pid": ping["spool_id"]}))
+    rows = write_spool.append_many(items)
+    return rows[0], rows[1]
+
+
 # -------------------------
 # CRUD endpoints
 # -------------------------
 @ping_controller.route('/', methods=['POST'])
+@idempotent
 def create_ping():
     """
     Create (record) a ping. This endpoint can be used by internal workers to
     store raw ping results. Body should contain at least: wid, is_up
-    Optional: latency_ms, region, uid, tx_hash, fee_paid_numeric, source, checked_by_uid
+    Workers sending X-Worker-Token are rate limited in their own "worker" scope
+    (see utils/rate_limit.py) rather than per client IP.
+    Optional: latency_ms, region, uid, tx_hash, fee_paid_numeric, source, checked_by_uid,
+              dns_ms, connect_ms, tls_ms, ttfb_ms, transfer_ms
     """
     try:
         data = request.get_json(silent=True) or {}
-        
-        resp = ping_model.create_ping(
+
+        scope, caller = _rate_limit_caller(request.headers, request.remote_addr)
+        limited = check_rate_limits(user_key=caller, caller_scope=scope)
+        if limited:
+            return limited
+
+        fields = dict(
             wid=data.get("wid"),
             is_up=data.get("is_up"),
             latency_ms=data.get("latency_ms"),
@@ -136,9 +160,15 @@ def create_ping():
             tx_hash=data.get("tx_hash"),
             fee_paid_numeric=data.get("fee_paid_numeric"),
             source=data.get("source", "manual"),
-            checked_by_uid=data.get("checked_by_uid")
+            checked_by_uid=data.get("checked_by_uid"),
+            **{f: data.get(f) for f in PHASE_FIELDS}
         )
-        return jsonify(_unwrap_supabase_response(resp)), 201
+        if write_spool is not None:
+            return jsonify([write_spool.append(PING_TABLE, PingModel.build_payload(**fields))]), 202
+
+        resp = ping_model.create_ping(**fields)
+        publish_ping(response_row(resp))
+        return jsonify(response_data(resp)), 201
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
@@ -150,16 +180,63 @@ def create_ping():
 def list_pings():
     try:
         resp = ping_model.get_all_pings()
-        return jsonify(_unwrap_supabase_response(resp)), 200
+        return jsonify(response_data(resp)), 200
     except Exception as e:
         return jsonify({"error": f"Failed to list pings: {str(e)}"}), 500
 
 
+@ping_controller.route('/stats/<int:wid>', methods=['GET'])
+def get_website_ping_stats(wid):
+    """
+    Rollup of a website's recent pings: uptime, latency percentiles and
+    average DNS / connect / TLS / TTFB / transfer timings.
+    With ?from=&to= (ISO timestamps) the rollup covers that range, archived pings included.
+    """
+    try:
+        since, until = _time_range_args()
+    except ValueError:
+        return jsonify({"error": "from / to must be ISO-8601 timestamps"}), 400
+    try:
+        if since is None and until is None:
+            rows = response_data(ping_model.get_stats_for_website(wid)) or []
+        else:
+            rows = ping_history(wid, since, until, limit=HISTORY_MAX_ROWS, ping_model=ping_model)
+        return jsonify({"wid": wid, **rollup_pings(rows)}), 200
+    except Exception as e:
+        return jsonify({"error": f"Failed to compute ping stats: {str(e)}"}), 500
+
+
+@ping_controller.route('/history/<int:wid>', methods=['GET'])
+def get_website_ping_history(wid):
+    """
+    A website's ping history, newest first, reading archived segments transparently.
+    Query: from, to (ISO timestamps), limit (raw rows, default 1000),
+           granularity=raw|hour (hour -> ping_hourly aggregates merged with live rows).
+    """
+    try:
+        since, until = _time_range_args()
+    except ValueError:
+        return jsonify({"error": "from / to must be ISO-8601 timestamps"}), 400
+    granularity = request.args.get("granularity", "raw")
+    if granularity not in ("raw", "hour"):
+        return jsonify({"error": "granularity must be raw or hour"}), 400
+    try:
+        if granularity == "hour":
+            return jsonify({"wid": wid, "granularity": "hour",
+                            "rows": hourly_history(wid, since, until, ping_model=ping_model)}), 200
+        limit = request.args.get("limit")
+        limit = min(int(limit), HISTORY_MAX_ROWS) if limit and limit.isdigit() else 1000
+        return jsonify({"wid": wid, "granularity": "raw",
+                        "rows": ping_history(wid, since, until, limit=limit, ping_model=ping_model)}), 200
+    except Exception as e:
+        return jsonify({"error": f"Failed to fetch ping history: {str(e)}", "trace": traceback.format_exc()}), 500
+
+
 @ping_controller.route('/<int:pid>', methods=['GET'])
 def get_ping(pid):
     try:
         resp = ping_model.get_ping_by_id(pid)
-        rec = _single_record_from_response(resp)
+        rec = response_row(resp)
         if not rec:
             return jsonify({"error": "Ping not found"}), 404
         # optionally enrich returned record with website name (if available)
@@ -174,7 +251,7 @@ def update_ping(pid):
     try:
         data = request.get_json(silent=True) or {}
         resp = ping_model.update_ping(pid, data)
-        return jsonify(_unwrap_supabase_response(resp)), 200
+        return jsonify(response_data(resp)), 200
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
@@ -215,7 +292,7 @@ def delete_ping(pid):
 #         if not claims:
 #             return jsonify({"error": "Invalid or expired token"}), 401
 
-#         uid = _extract_user_id_from_claims(claims)
+#         uid = user_id_from_claims(claims)
         
 #         if uid is None:
 #             return jsonify({"error": "Invalid user id in token"}), 400
@@ -229,12 +306,12 @@ def delete_ping(pid):
 #             return jsonify({"error": "wid, url and tx_hash are required"}), 400
 
 #         # get user row
-#         user_row = _single_record_from_response(user_model.get_user_by_id(uid))
+#         user_row = response_row(user_model.get_user_by_id(uid))
 #         if not user_row:
 #             return jsonify({"error": "User not found"}), 404
 
 #         # check tx uniqueness
-#         existing_tx = _single_record_from_response(tx_model.get_transaction_by_hash(tx_hash))
+#         existing_tx = response_row(tx_model.get_transaction_by_hash(tx_hash))
 #         if existing_tx:
 #             return jsonify({"error": "Transaction code already used", "tx_hash": tx_hash}), 409
 
@@ -275,7 +352,7 @@ def delete_ping(pid):
 #             source="manual",
 #             checked_by_uid=uid
 #         )
-#         ping_row = _single_record_from_response(ping_resp)
+#         ping_row = response_row(ping_resp)
 #         if not ping_row:
 #             return jsonify({"error": "Failed to save ping"}), 500
 
@@ -307,6 +384,7 @@ def delete_ping(pid):
 
 
 @ping_controller.route('/manual', methods=['POST'])
+@idempotent
 def manual_ping():
     try:
         auth = request.headers.get("Authorization", "")
@@ -319,7 +397,7 @@ def manual_ping():
         if not claims:
             return jsonify({"error": "Invalid or expired token"}), 401
 
-        uid = _extract_user_id_from_claims(claims)
+        uid = user_id_from_claims(claims)
         
         if uid is None:
             return jsonify({"error": "Invalid user id in token"}), 400
@@ -332,20 +410,25 @@ def manual_ping():
         if not (wid and url and tx_hash):
             return jsonify({"error": "wid, url and tx_hash are required"}), 400
 
+        # Admission control before any DB or outbound work
+        limited = check_rate_limits(user_key=uid, url=url)
+        if limited:
+            return limited
+
         # Get user row
-        user_row = _single_record_from_response(user_model.get_user_by_id(uid))
+        user_row = response_row(user_model.get_user_by_id(uid))
         if not user_row:
             return jsonify({"error": "User not found"}), 404
 
         # Check tx uniqueness
-        existing_tx = _single_record_from_response(tx_model.get_transaction_by_hash(tx_hash))
+        existing_tx = response_row(tx_model.get_transaction_by_hash(tx_hash))
         if existing_tx:
             return jsonify({"error": "Transaction code already used", "tx_hash": tx_hash}), 409
 
         # Simulate or verify transaction
         used_amount_eth = None
         gas_used = None
-        if tx_hash in FAKE_TX_CODES:
+        if tx_hash in _FAKE_TX_CODE_SET:
             simulated_tx = simulate_hardhat_transaction(tx_hash)
             if not simulated_tx:
                 return jsonify({"error": "Failed to simulate transaction"}), 500
@@ -355,31 +438,10 @@ def manual_ping():
             # For real transactions (not implemented in this demo)
             return jsonify({"error": "Only simulated tx codes are supported in local mode"}), 400
 
-        # Use Cloudflare Worker to perform the actual ping
-        try:
-            worker_url = "https://your-worker.url.workers.dev/"  # Replace with your actual worker URL
-            resp = requests.post(worker_url, json={"url": url}, timeout=20)
-            resp.raise_for_status()
-            result = resp.json()
-        except Exception as e:
-            # Fallback to simple ping if worker fails
-            start_time = time.time()
-            try:
-                ping_resp = requests.head(url, timeout=10)
-                is_up = ping_resp.status_code < 400
-            except:
-                is_up = False
-            latency_ms = int((time.time() - start_time) * 1000) if is_up else None
-            
-            result = {
-                "is_up": is_up,
-                "latency_ms": latency_ms,
-                "region": "unknown",
-                "checked_url": url
-            }
-
-        # Store ping
-        ping_resp = ping_model.create_ping(
+        # Perform the actual check; identical concurrent probes of this URL share one execution
+        result = probe_url(url)
+
+        ping_fields = dict(
             wid=wid,
             is_up=result.get("is_up", False),
             latency_ms=result.get("latency_ms"),
@@ -388,24 +450,31 @@ def manual_ping():
             tx_hash=tx_hash,
             fee_paid_numeric=used_amount_eth,
             source="manual",
-            checked_by_uid=uid
+            checked_by_uid=uid,
+            **{f: result.get(f) for f in PHASE_FIELDS}
         )
-        ping_row = _single_record_from_response(ping_resp)
-        if not ping_row:
-            return jsonify({"error": "Failed to save ping"}), 500
+        tx_fields = dict(tx_hash=tx_hash, uid=uid, token_address="ETH", token_amount=used_amount_eth,
+                         gas_used=gas_used)
 
-        # Log the simulated tx
-        tx_model.create_transaction(
-            tx_hash=tx_hash,
-            uid=uid,
-            pid=ping_row.get("pid"),
-            token_address="ETH",
-            token_amount=used_amount_eth,
-            gas_used=gas_used
-        )
+        if write_spool is not None:
+            # ping + tx durably queued together; the tx gets the ping's pid when they drain
+            ping_row, _ = spool_manual_check(ping_fields, tx_fields)
+            status, code = "spooled", 202
+        else:
+            # Store ping
+            ping_row = response_row(ping_model.create_ping(**ping_fields))
+            if not ping_row:
+                return jsonify({"error": "Failed to save ping"}), 500
+            publish_ping(ping_row)
+            # the validator is the authenticated caller: credit them off the request path
+            reward_credits.enqueue(uid, wid, ping_row.get("pid"))
+
+            # Log the simulated tx
+            tx_model.create_transaction(pid=ping_row.get("pid"), **tx_fields)
+            status, code = "recorded", 200
 
         return jsonify({
-            "status": "recorded",
+            "status": status,
             "ping": ping_row,
             "onchain": {
                 "tx_hash": tx_hash,
@@ -414,16 +483,46 @@ def manual_ping():
                 "simulated": True
             },
             "result": result
-        }), 200
+        }), code
 
     except Exception as e:
-        tb = traceback.format_exc()
-        print(f"Error in manual ping: {str(e)}\n{tb}")
+        logger.exception("Error in manual ping")
         return jsonify({"error": "Internal server error", "detail": str(e)}), 500
 
 # -------------------------
 # Wallet (simulated) endpoints
 # -------------------------
+def wallet_summary(txns, user_row):
+    """Simulated balance from a user's onchain_transactions rows (also used by /dashboard)."""
+    total_spent = sum(float(t.get("token_amount", 0)) for t in txns if isinstance(t, dict))
+    starting_balance = float(os.getenv("SIMULATED_STARTING_ETH", 1.0))
+    current_balance = max(0.0, starting_balance - total_spent)
+    wallet_address = (user_row or {}).get("wallet_address") or random.choice(HARDHAT_ACCOUNTS)
+    return {
+        "wallet_address": wallet_address,
+        "eth_balance": f"{current_balance:.6f}",
+        "usd_value": f"{current_balance * float(os.getenv('SIMULATED_USD_PER_ETH', 2000)):.2f}",
+        "total_spent": f"{total_spent:.6f}",
+        "total_pings": len(txns),
+        "simulated": True
+    }
+
+
+def format_transactions(txns):
+    formatted = []
+    for tx in txns:
+        if not isinstance(tx, dict):
+            continue
+        formatted.append({
+            "tx_hash": tx.get("tx_hash"),
+            "amount": tx.get("token_amount"),
+            "timestamp": tx.get("created_at") or datetime.now().isoformat(),
+            "status": "success",
+            "type": "ping_payment"
+        })
+    return formatted
+
+
 @ping_controller.route('/wallet/balance', methods=['GET'])
 def get_wallet_balance():
     """
@@ -436,31 +535,21 @@ def get_wallet_balance():
             return jsonify({"error": "Missing or invalid Authorization header"}), 401
 
         token = auth.split(" ", 1)[1]
-        print(token)
         claims = decode_token(token)
         
         if not claims:
             return jsonify({"error": "Invalid or expired token"}), 401
 
-        uid = _extract_user_id_from_claims(claims)
+        uid = user_id_from_claims(claims)
         if uid is None:
             return jsonify({"error": "Invalid user id in token"}), 400
 
-        txns = _unwrap_supabase_response(tx_model.get_transactions_by_user(uid)) or []
-        total_spent = sum(float(t.get("token_amount", 0)) for t in txns if isinstance(t, dict))
-        starting_balance = float(os.getenv("SIMULATED_STARTING_ETH", 1.0))
-        current_balance = max(0.0, starting_balance - total_spent)
-        user_row = _single_record_from_response(user_model.get_user_by_id(uid)) or {}
-        wallet_address = user_row.get("wallet_address") or random.choice(HARDHAT_ACCOUNTS)
-
-        return jsonify({
-            "wallet_address": wallet_address,
-            "eth_balance": f"{current_balance:.6f}",
-            "usd_value": f"{current_balance * float(os.getenv('SIMULATED_USD_PER_ETH', 2000)):.2f}",
-            "total_spent": f"{total_spent:.6f}",
-            "total_pings": len(txns),
-            "simulated": True
-        }), 200
+        # independent reads: run them side by side
+        txns_resp, user_resp = run_parallel((tx_model.get_transactions_by_user, uid),
+                                            (user_model.get_user_by_id, uid))
+        txns = response_data(txns_resp) or []
+        user_row = response_row(user_resp) or {}
+        return jsonify(wallet_summary(txns, user_row)), 200
 
     except Exception as e:
         tb = traceback.format_exc()
@@ -482,23 +571,12 @@ def get_transaction_history():
         if not claims:
             return jsonify({"error": "Invalid or expired token"}), 401
 
-        uid = _extract_user_id_from_claims(claims)
+        uid = user_id_from_claims(claims)
         if uid is None:
             return jsonify({"error": "Invalid user id in token"}), 400
 
-        txns = _unwrap_supabase_response(tx_model.get_transactions_by_user(uid)) or []
-        formatted = []
-        for tx in txns:
-            if not isinstance(tx, dict):
-                continue
-            formatted.append({
-                "tx_hash": tx.get("tx_hash"),
-                "amount": tx.get("token_amount"),
-                "timestamp": tx.get("created_at") or datetime.now().isoformat(),
-                "status": "success",
-                "type": "ping_payment"
-            })
-
+        txns = response_data(tx_model.get_transactions_by_user(uid)) or []
+        formatted = format_transactions(txns)
         return jsonify({"transactions": formatted, "total_count": len(formatted)}), 200
 
     except Exception as e:
@@ -537,20 +615,18 @@ def get_user_pings(uid):
 
         token = auth.split(" ", 1)[1]
         claims = decode_token(token)
-        
-        print(claims)
-        
+
         if not claims:
             return jsonify({"error": "Invalid or expired token"}), 401
 
-        current_uid = _extract_user_id_from_claims(claims)
+        current_uid = user_id_from_claims(claims)
         if current_uid is None:
             return jsonify({"error": "Invalid user id in token"}), 400
 
         if current_uid != uid:
             return jsonify({"error": "Unauthorized access to user pings"}), 403
 
-        pings = _unwrap_supabase_response(ping_model.get_pings_by_user(uid)) or []
+        pings = response_data(ping_model.get_pings_by_user(uid)) or []
         return jsonify({"pings": pings}), 200
 
     except Exception as e:
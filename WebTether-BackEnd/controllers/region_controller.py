@@ -0,0 +1,27 @@
+# controllers/region_controller.py
+"""
+Region controller (Flask blueprint)
+
+Endpoints:
+ - GET /regions/summary   -> checks, uptime and latency percentiles per probe region, across
+                             every website (feeds the ValidatorMap view)
+
+Per-website breakdowns are served by GET /websites/<wid>/regions. Both read the in-memory
+region cube (utils/region_cube.py); record_region_ping(row) is subscribed to the ping feed
+(utils/ping_feed.py) in app.create_app() to keep it current.
+"""
+
+from flask import Blueprint, jsonify
+from utils.region_cube import region_cube
+
+region_controller = Blueprint("region_controller", __name__)
+
+
+def record_region_ping(row):
+    """Ping feed subscriber: add the check to its (website, region) cell."""
+    region_cube.record_ping(row)
+
+
+@region_controller.route('/summary', methods=['GET'])
+def get_region_summary():
+    return jsonify(region_cube.summary()), 200
@@ -0,0 +1,96 @@
+# controllers/reward_controller.py
+"""
+Reward controller (Flask blueprint)
+
+Endpoints:
+ - GET  /rewards/earnings        -> caller's ledger: pending / batched / settled totals + recent rows (auth)
+ - POST /rewards/settle          -> run one settlement pass (admin; ?dry_run=1, ?max_batches=N)
+ - GET  /rewards/batches         -> recent payout batches (admin; ?status=&limit=)
+
+Ingestion:
+ - Authenticated manual checks credit the site's reward_per_ping to the validator's
+   `validator_earnings` ledger from a background writer (utils/reward_credits.py). Payouts
+   happen later, in batches (utils/reward_settlement.py).
+"""
+
+from flask import Blueprint, request, jsonify
+from models.db import response_data
+from models.validator_earnings_model import ValidatorEarningsModel
+from models.reward_batch_model import RewardBatchModel
+from models.query_executor import run_parallel
+from utils.admin_auth import require_admin
+from utils.jwt_utils import decode_token, user_id_from_claims
+from utils.reward_settlement import settler
+from web3 import Web3
+import traceback
+
+reward_controller = Blueprint("reward_controller", __name__)
+earnings_model = ValidatorEarningsModel()
+batch_model = RewardBatchModel()
+
+
+# -------------------------
+# Routes
+# -------------------------
+@reward_controller.route('/earnings', methods=['GET'])
+def get_my_earnings():
+    auth = request.headers.get("Authorization", "")
+    if not auth.startswith("Bearer "):
+        return jsonify({"error": "Missing or invalid Authorization header"}), 401
+
+    token = auth.split(" ", 1)[1]
+    claims = decode_token(token)
+    if not claims:
+        return jsonify({"error": "Invalid or expired token"}), 401
+
+    uid = user_id_from_claims(claims)
+    if uid is None:
+        return jsonify({"error": "Invalid user id in token"}), 400
+
+    try:
+        amounts_resp, recent_resp = run_parallel((earnings_model.get_amounts_by_uid, uid),
+                                                 (earnings_model.get_by_uid, uid, None, 50))
+        totals = {"pending": 0, "batched": 0, "settled": 0}
+        for row in response_data(amounts_resp) or []:
+            if row.get("status") in totals:
+                totals[row["status"]] += int(row.get("amount_wei") or 0)
+        recent = response_data(recent_resp) or []
+        return jsonify({
+            "uid": uid,
+            **{f"{status}_wei": str(wei) for status, wei in totals.items()},
+            **{f"{status}_eth": str(Web3.from_wei(wei, "ether")) for status, wei in totals.items()},
+            "recent": recent
+        }), 200
+    except Exception as e:
+        tb = traceback.format_exc()
+        return jsonify({"error": f"Failed to fetch earnings: {str(e)}", "trace": tb}), 500
+
+
+@reward_controller.route('/settle', methods=['POST'])
+@require_admin
+def settle_rewards():
+    max_batches = request.args.get("max_batches")
+    if max_batches is not None and not max_batches.isdigit():
+        return jsonify({"error": "max_batches must be an integer"}), 400
+    try:
+        report = settler.run(max_batches=int(max_batches) if max_batches is not None else None,
+                             dry_run=request.args.get("dry_run") in ("1", "true"))
+        return jsonify(report), 200
+    except Exception as e:
+        tb = traceback.format_exc()
+        return jsonify({"error": f"Settlement failed: {str(e)}", "trace": tb}), 500
+
+
+@reward_controller.route('/batches', methods=['GET'])
+@require_admin
+def list_batches():
+    limit = request.args.get("limit", "100")
+    if not limit.isdigit():
+        return jsonify({"error": "limit must be an integer"}), 400
+    try:
+        resp = batch_model.get_batches(status=request.args.get("status"), limit=min(int(limit), 1000))
+        return jsonify(response_data(resp)), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Failed to list batches: {str(e)}"}), 500
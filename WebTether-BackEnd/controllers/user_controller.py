@@ -6,15 +6,21 @@ User controller (Flask blueprint)
 - Validates input and normalizes Supabase responses to plain JSON structures.
 - Uses defensive programming: returns clear HTTP errors for invalid input and handles Supabase shapes.
 - Note: In production you should protect sensitive endpoints with role checks / admin guard.
+- GET /users/leaderboard serves top validators from the in-memory leaderboard
+  (utils/leaderboard.py); rank_ping(row) is subscribed to the ping feed (utils/ping_feed.py) in
+  app.create_app().
 """
 
 from flask import Blueprint, request, jsonify
 from models.user_model import UserModel
+from utils.leaderboard import METRICS, WINDOWS, leaderboard
 import traceback
 
 user_controller = Blueprint("user_controller", __name__)
 user_model = UserModel()
 
+LEADERBOARD_MAX_LIMIT = 100
+
 
 def _unwrap_supabase_response(resp):
     """
@@ -45,6 +51,11 @@ def _single_record_from_response(resp):
     return None
 
 
+def rank_ping(row):
+    """Ping feed subscriber: count the check towards its validator's leaderboard entry."""
+    leaderboard.record_ping(row)
+
+
 # -----------------------
 # Routes
 # -----------------------
@@ -95,6 +106,35 @@ def list_users():
         return jsonify({"error": f"Failed to list users: {str(e)}"}), 500
 
 
+@user_controller.route('/leaderboard', methods=['GET'])
+def get_leaderboard():
+    """
+    Top validators.
+    Query params:
+      metric = checks (default) | earnings | accuracy
+      window = all (default) | week | day
+      limit  = entries to return (default 10, max 100)
+      uid    = optional user id whose own rank is added as "user"
+    """
+    metric = request.args.get("metric", "checks")
+    window = request.args.get("window", "all")
+    if metric not in METRICS:
+        return jsonify({"error": f"metric must be one of: {', '.join(METRICS)}"}), 400
+    if window not in WINDOWS:
+        return jsonify({"error": f"window must be one of: {', '.join(WINDOWS)}"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), LEADERBOARD_MAX_LIMIT)
+        uid = int(request.args["uid"]) if request.args.get("uid") else None
+    except ValueError:
+        return jsonify({"error": "limit and uid must be integers"}), 400
+
+    result = leaderboard.top(metric=metric, window=window, limit=limit)
+    if uid is not None:
+        result["user"] = leaderboard.rank_of(uid, metric=metric, window=window)
+    result["rebuilding"] = leaderboard.rebuilding
+    return jsonify(result), 200
+
+
 @user_controller.route('/<int:uid>', methods=['GET'])
 def get_user(uid):
     """
@@ -4,11 +4,34 @@ Website controller (Flask blueprint)
 
 Endpoints:
  - POST   /websites          -> create website (auth required)
+ - POST   /websites/bulk     -> import many websites from JSON or CSV (auth required)
  - GET    /websites         -> list all websites (public; consider pagination)
  - GET    /websites/<wid>    -> get website by id
  - PUT    /websites/<wid>    -> update website (owner only)
  - DELETE /websites/<wid>    -> delete website (owner only)
  - GET    /websites/available-sites  -> list sites not owned by current user (auth required)
+ - GET    /websites/notifications/stats -> delivery counters of the status-change notifier (admin)
+ - GET    /websites/<wid>/export     -> stream full check history as csv / ndjson (owner only)
+ - GET    /websites/<wid>/incidents  -> down periods, newest first (?from=&to=&limit=)
+ - GET    /websites/<wid>/uptime     -> uptime over [from, to) from the incident timeline
+ - GET    /websites/<wid>/regions    -> checks, uptime and latency percentiles per probe region
+                                       (in-memory region cube, utils/region_cube.py)
+
+Status-change notifications:
+ - notify_status_change(row) is registered as a ping listener in app.create_app().
+   Up/down flips are queued and POSTed (batched, with retries) to the website's
+   notify_url and/or the global NOTIFY_WEBHOOK_URL, off the request thread. notify_url must
+   resolve to public addresses (utils.notifications.check_notify_url), checked when it is
+   stored, again before each delivery, and on the delivery connection itself. The operator's
+   NOTIFY_WEBHOOK_URL is trusted and may be internal.
+ - track_incidents(row) is registered alongside it and keeps the `incident` timeline
+   (utils/incidents.py) up to date, writing only on up/down transitions.
+
+Shared probe targets:
+ - every website points (target_id) at the probe_target of its normalized URL; create,
+   bulk import, URL changes and delete keep the reference counts in step
+   (utils/probe_targets.py). utils/probe_scheduler.py probes each target once per interval
+   and records a ping for every website subscribed to it.
 
 Notes:
  - Uses defensive helpers to normalize Supabase responses.
@@ -18,12 +41,37 @@ Notes:
 from flask import Blueprint, request, jsonify
 from models.website_model import WebsiteModel
 from models.user_model import UserModel
+from models.incident_model import IncidentModel
+from utils.admin_auth import require_admin
 from utils.jwt_utils import decode_token
+from utils.notifications import (NotificationDispatcher, TransitionDetector, build_status_event,
+                                 check_notify_url, post_json, NOTIFY_ENABLED)
+from utils.export_stream import EXPORT_FORMATS, export_response, wants_gzip
+from utils.incidents import IncidentTracker, uptime_for_window
+from utils.ping_stats import parse_timestamp
+from utils.probe_utils import PHASE_FIELDS
+from utils.probe_targets import acquire_targets, canonical_url, release_targets
+from utils.region_cube import region_cube
+from utils.retention import iter_ping_history
+from utils.website_import import (WEBSITE_BULK_INSERT_BATCH, BulkImportError, existing_url_index,
+                                  parse_csv_text, parse_json_items, plan_import, summarize)
+from datetime import datetime, timedelta, timezone
+import logging
+import os
 import traceback
 
 website_controller = Blueprint("website_controller", __name__)
+logger = logging.getLogger(__name__)
 website_model = WebsiteModel()
 user_model = UserModel()
+incident_model = IncidentModel()
+
+NOTIFY_WEBHOOK_URL = os.getenv("NOTIFY_WEBHOOK_URL")
+# window used by /uptime when ?from= is omitted
+UPTIME_DEFAULT_DAYS = int(os.getenv("UPTIME_DEFAULT_DAYS", 30))
+
+PING_EXPORT_COLUMNS = ["pid", "wid", "timestamp", "is_up", "latency_ms", "region", "source",
+                       "uid", "checked_by_uid", "tx_hash", "fee_paid_numeric", *PHASE_FIELDS]
 
 
 # -------------------------
@@ -75,6 +123,54 @@ def _extract_user_id_from_claims(claims):
     return None
 
 
+# -------------------------
+# Status-change notifications
+# -------------------------
+def _resolve_notify_destinations(event):
+    """Runs on the dispatcher thread, never on the ingestion path."""
+    destinations = []
+    if NOTIFY_WEBHOOK_URL:
+        destinations.append(NOTIFY_WEBHOOK_URL)
+    website_row = _single_record_from_response(website_model.get_website_by_id(event.get("wid")))
+    if website_row and website_row.get("notify_url"):
+        # re-checked here: DNS may have changed since the URL was stored
+        try:
+            destinations.append(check_notify_url(website_row["notify_url"]))
+        except ValueError as e:
+            logger.warning("Skipping notify_url of website %s: %s", event.get("wid"), e)
+    return destinations
+
+
+def _send_notification(url, payload):
+    """Only user-supplied notify_urls are held to public peer addresses."""
+    if url == NOTIFY_WEBHOOK_URL:
+        return post_json(url, payload, public_only=False)
+    return post_json(url, payload)
+
+
+status_transitions = TransitionDetector()
+notification_dispatcher = NotificationDispatcher(_resolve_notify_destinations, send=_send_notification)
+
+
+def notify_status_change(row):
+    """Ping listener: queue an event when a website flips between up and down."""
+    if not NOTIFY_ENABLED or row.get("wid") is None:
+        return
+    change = status_transitions.observe(row.get("wid"), row.get("is_up"))
+    if change is None:
+        return
+    previous, current = change
+    notification_dispatcher.enqueue(build_status_event(row, previous, current))
+
+
+incident_tracker = IncidentTracker(incident_model)
+
+
+def track_incidents(row):
+    """Ping listener: open / close the website's incident on up/down transitions."""
+    incident_tracker.observe(row)
+
+
 # -------------------------
 # Routes
 # -------------------------
@@ -83,7 +179,7 @@ def create_website():
     """
     Create a website record. Requires Authorization header (Bearer <token>).
     Request JSON:
-      { url: string, category?: string, name?: string, reward_per_ping?: number }
+      { url: string, category?: string, name?: string, reward_per_ping?: number, notify_url?: string }
 
     The owner uid is taken from the JWT (do NOT accept uid from body).
     """
@@ -106,14 +202,25 @@ def create_website():
         return jsonify({"error": "Missing required field: url"}), 400
 
     try:
-        resp = website_model.create_website(
-            url=url,
-            uid=uid,
-            category=data.get("category"),
-            name=data.get("name"),
-            reward_per_ping=data.get("reward_per_ping"),
-            status=data.get("status")
-        )
+        notify_url = data.get("notify_url")
+        if notify_url:
+            notify_url = check_notify_url(notify_url)
+        # sites with the same normalized URL share one probe target
+        target_id = acquire_targets([url]).get(canonical_url(url))
+        try:
+            resp = website_model.create_website(
+                url=url,
+                uid=uid,
+                category=data.get("category"),
+                name=data.get("name"),
+                reward_per_ping=data.get("reward_per_ping"),
+                status=data.get("status"),
+                notify_url=notify_url,
+                target_id=target_id
+            )
+        except Exception:
+            release_targets([target_id])
+            raise
         return jsonify(_unwrap_supabase_response(resp)), 201
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
@@ -122,6 +229,96 @@ def create_website():
         return jsonify({"error": f"Failed to create website: {e}", "trace": tb}), 500
 
 
+@website_controller.route('/bulk', methods=['POST'])
+def bulk_create_websites():
+    """
+    Import many websites for the caller in one request. Requires Authorization header.
+    Body: JSON array (URL strings or {url, name?, category?, reward_per_ping?, notify_url?}),
+          {"websites": [...]}, a text/csv body, or a multipart upload in field "file".
+    Query: dry_run=1 validates and reports without inserting.
+
+    Returns one result per input row (created / duplicate / invalid / error) plus a summary.
+    Existing sites are looked up with a single query and new ones are inserted in
+    multi-row batches of WEBSITE_BULK_INSERT_BATCH.
+    """
+    auth = request.headers.get("Authorization", "")
+    if not auth.startswith("Bearer "):
+        return jsonify({"error": "Missing or invalid Authorization header"}), 401
+
+    token = auth.split(" ", 1)[1]
+    claims = decode_token(token)
+    if not claims:
+        return jsonify({"error": "Invalid or expired token"}), 401
+
+    uid = _extract_user_id_from_claims(claims)
+    if uid is None:
+        return jsonify({"error": "Invalid user id in token"}), 400
+
+    try:
+        upload = request.files.get("file")
+        if upload is not None:
+            rows = parse_csv_text(upload.read().decode("utf-8-sig"))
+        elif request.mimetype in ("text/csv", "text/plain"):
+            rows = parse_csv_text(request.get_data(as_text=True))
+        else:
+            payload = request.get_json(silent=True)
+            if payload is None:
+                return jsonify({"error": "Body must be JSON or CSV"}), 400
+            rows = parse_json_items(payload)
+        if not rows:
+            return jsonify({"error": "No websites in request"}), 400
+
+        existing = existing_url_index(_unwrap_supabase_response(website_model.get_urls_by_owner(uid)))
+        results, to_insert = plan_import(rows, existing)
+    except UnicodeDecodeError:
+        return jsonify({"error": "CSV must be UTF-8 encoded"}), 400
+    except BulkImportError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        tb = traceback.format_exc()
+        return jsonify({"error": f"Failed to read import: {e}", "trace": tb}), 500
+
+    dry_run = request.args.get("dry_run") in ("1", "true")
+    for start in range(0, len(to_insert), WEBSITE_BULK_INSERT_BATCH):
+        batch = to_insert[start:start + WEBSITE_BULK_INSERT_BATCH]
+        if dry_run:
+            for i, _ in batch:
+                results[i]["status"] = "valid"
+            continue
+        targets = {}
+        try:
+            targets = acquire_targets([payload["url"] for _, payload in batch])
+            created = _unwrap_supabase_response(website_model.create_websites(
+                [dict(payload, uid=uid, target_id=targets.get(payload["url"])) for _, payload in batch])) or []
+            # URLs are unique within a batch, so inserted rows are matched back by URL
+            created_by_url = {row.get("url"): row for row in created}
+            missing = []
+            for i, payload in batch:
+                row = created_by_url.get(payload["url"])
+                if row is not None:
+                    results[i].update(status="created", wid=row.get("wid"))
+                else:
+                    results[i].update(status="error", error="Row was not returned by the insert")
+                    missing.append(targets.get(payload["url"]))
+            if missing:
+                # no website references these probe targets: give their references back
+                try:
+                    release_targets(missing)
+                except Exception:
+                    logger.exception("Failed to release probe targets of rows missing from an import batch")
+        except Exception as e:
+            try:
+                release_targets(targets.get(payload["url"]) for _, payload in batch)
+            except Exception:
+                logger.exception("Failed to release probe targets after a failed import batch")
+            for i, _ in batch:
+                results[i].update(status="error", error=f"Insert failed: {e}")
+
+    summary = summarize(results)
+    return jsonify({"summary": summary, "dry_run": dry_run, "results": results}), \
+        201 if summary["created"] else 200
+
+
 @website_controller.route('/', methods=['GET'])
 def list_websites():
     """
@@ -147,11 +344,18 @@ def get_website(wid):
         return jsonify({"error": f"Failed to fetch website: {str(e)}"}), 500
 
 
+def _not_found_or_forbidden(wid, action):
+    """Explain an owner-scoped write that matched no row (only read on that failure path)."""
+    if _single_record_from_response(website_model.get_website_by_id(wid)):
+        return jsonify({"error": f"Forbidden: only owner can {action} website"}), 403
+    return jsonify({"error": "Website not found"}), 404
+
+
 @website_controller.route('/<int:wid>', methods=['PUT'])
 def update_website(wid):
     """
     Update website — only owner (or admin) may update.
-    Body may include: url, category, status, name, reward_per_ping
+    Body may include: url, category, status, name, reward_per_ping, notify_url
     """
     auth = request.headers.get("Authorization", "")
     if not auth.startswith("Bearer "):
@@ -166,8 +370,22 @@ def update_website(wid):
     if uid is None:
         return jsonify({"error": "Invalid user id in token"}), 400
 
-    # ensure requester is owner of site
     try:
+        data = dict(request.get_json(silent=True) or {})
+        # target_id follows the URL; it is never set directly
+        data.pop("target_id", None)
+        if data.get("notify_url"):
+            data["notify_url"] = check_notify_url(data["notify_url"])
+
+        if "url" not in data:
+            # ownership is part of the write's filter: one round trip instead of read-then-write
+            resp = website_model.update_website(wid, data, owner_uid=uid)
+            updated = _unwrap_supabase_response(resp)
+            if updated:
+                return jsonify(updated), 200
+            return _not_found_or_forbidden(wid, "update")
+
+        # a URL change needs the stored row (old probe target), so ownership is read first
         website_row = _single_record_from_response(website_model.get_website_by_id(wid))
         if not website_row:
             return jsonify({"error": "Website not found"}), 404
@@ -175,8 +393,20 @@ def update_website(wid):
         if int(website_row.get("uid")) != int(uid):
             return jsonify({"error": "Forbidden: only owner can update website"}), 403
 
-        data = request.get_json(silent=True) or {}
-        resp = website_model.update_website(wid, data)
+        old_target = website_row.get("target_id")
+        new_target = old_target
+        moved = "url" in data and canonical_url(data["url"]) != canonical_url(website_row.get("url"))
+        if moved:
+            new_target = acquire_targets([data["url"]]).get(canonical_url(data["url"]))
+            data["target_id"] = new_target
+        try:
+            resp = website_model.update_website(wid, data, owner_uid=uid)
+        except Exception:
+            if moved:
+                release_targets([new_target])
+            raise
+        if moved:
+            release_targets([old_target])
         return jsonify(_unwrap_supabase_response(resp)), 200
 
     except ValueError as e:
@@ -204,19 +434,129 @@ def delete_website(wid):
     if uid is None:
         return jsonify({"error": "Invalid user id in token"}), 400
 
+    try:
+        # ownership is part of the delete's filter; the deleted row carries its probe target
+        deleted = _unwrap_supabase_response(website_model.delete_website(wid, owner_uid=uid)) or []
+        if isinstance(deleted, dict):
+            deleted = [deleted]
+        if not deleted:
+            return _not_found_or_forbidden(wid, "delete")
+        release_targets([row.get("target_id") for row in deleted])
+        region_cube.drop_website(wid)
+        return jsonify({"message": "Deleted"}), 200
+    except Exception as e:
+        tb = traceback.format_exc()
+        return jsonify({"error": f"Failed to delete website: {e}", "trace": tb}), 500
+
+
+@website_controller.route('/<int:wid>/export', methods=['GET'])
+def export_website_pings(wid):
+    """
+    Stream a website's full check history (archived + live), oldest first — owner only.
+    Query: format=csv|ndjson (default csv), from / to (ISO timestamps), gzip=1|0
+    (defaults to the client's Accept-Encoding).
+    """
+    auth = request.headers.get("Authorization", "")
+    if not auth.startswith("Bearer "):
+        return jsonify({"error": "Missing or invalid Authorization header"}), 401
+
+    token = auth.split(" ", 1)[1]
+    claims = decode_token(token)
+    if not claims:
+        return jsonify({"error": "Invalid or expired token"}), 401
+
+    uid = _extract_user_id_from_claims(claims)
+    if uid is None:
+        return jsonify({"error": "Invalid user id in token"}), 400
+
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    try:
+        since = parse_timestamp(request.args["from"]) if request.args.get("from") else None
+        until = parse_timestamp(request.args["to"]) if request.args.get("to") else None
+    except ValueError:
+        return jsonify({"error": "from / to must be ISO-8601 timestamps"}), 400
+
     try:
         website_row = _single_record_from_response(website_model.get_website_by_id(wid))
         if not website_row:
             return jsonify({"error": "Website not found"}), 404
 
         if int(website_row.get("uid")) != int(uid):
-            return jsonify({"error": "Forbidden: only owner can delete website"}), 403
+            return jsonify({"error": "Forbidden: only owner can export website history"}), 403
 
-        website_model.delete_website(wid)
-        return jsonify({"message": "Deleted"}), 200
+        rows = iter_ping_history(wid, since, until)
+        return export_response(rows, fmt, f"website-{wid}-pings", PING_EXPORT_COLUMNS,
+                               compress=wants_gzip(request.args, request.headers))
     except Exception as e:
         tb = traceback.format_exc()
-        return jsonify({"error": f"Failed to delete website: {e}", "trace": tb}), 500
+        return jsonify({"error": f"Failed to export website history: {e}", "trace": tb}), 500
+
+
+@website_controller.route('/<int:wid>/incidents', methods=['GET'])
+def get_website_incidents(wid):
+    """
+    Down periods of a website, newest first. Ongoing incidents have ended_at = null.
+    Query: from / to (ISO timestamps on started_at), limit (default 100, max 1000).
+    """
+    try:
+        since = parse_timestamp(request.args["from"]).isoformat() if request.args.get("from") else None
+        until = parse_timestamp(request.args["to"]).isoformat() if request.args.get("to") else None
+    except ValueError:
+        return jsonify({"error": "from / to must be ISO-8601 timestamps"}), 400
+    limit = request.args.get("limit", "100")
+    if not limit.isdigit():
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    try:
+        rows = _unwrap_supabase_response(
+            incident_model.get_incidents_by_wid(wid, since, until, limit=min(int(limit), 1000))) or []
+        now = datetime.now(timezone.utc)
+        for row in rows:
+            row["ongoing"] = row.get("ended_at") is None
+            if row["ongoing"]:
+                row["duration_seconds"] = round((now - parse_timestamp(row["started_at"])).total_seconds(), 3)
+        return jsonify({"wid": wid, "incidents": rows}), 200
+    except Exception as e:
+        return jsonify({"error": f"Failed to fetch incidents: {str(e)}"}), 500
+
+
+@website_controller.route('/<int:wid>/uptime', methods=['GET'])
+def get_website_uptime(wid):
+    """
+    Uptime over [from, to) (default: the last UPTIME_DEFAULT_DAYS days), counted from when the
+    website was added. Computed from the incident timeline, not from raw pings.
+    """
+    try:
+        until = parse_timestamp(request.args["to"]) if request.args.get("to") else datetime.now(timezone.utc)
+        since = (parse_timestamp(request.args["from"]) if request.args.get("from")
+                 else until - timedelta(days=UPTIME_DEFAULT_DAYS))
+    except ValueError:
+        return jsonify({"error": "from / to must be ISO-8601 timestamps"}), 400
+    if since >= until:
+        return jsonify({"error": "from must be before to"}), 400
+
+    try:
+        website_row = _single_record_from_response(website_model.get_website_by_id(wid))
+        if not website_row:
+            return jsonify({"error": "Website not found"}), 404
+        created_at = website_row.get("created_at")
+        monitored_from = parse_timestamp(created_at) if created_at else None
+        return jsonify(uptime_for_window(wid, since, until, monitored_from, incident_model)), 200
+    except Exception as e:
+        tb = traceback.format_exc()
+        return jsonify({"error": f"Failed to compute uptime: {str(e)}", "trace": tb}), 500
+
+
+@website_controller.route('/<int:wid>/regions', methods=['GET'])
+def get_website_regions(wid):
+    """
+    How the website looks from each probe region: checks, uptime and latency percentiles, busiest
+    region first. Served from the region cube, so no database read regardless of ping volume;
+    a website without pings has an empty list.
+    """
+    return jsonify(region_cube.website(wid)), 200
 
 
 @website_controller.route('/available-sites', methods=['GET'])
@@ -246,6 +586,13 @@ def get_available_sites():
     except Exception as e:
         return jsonify({"error": f"Failed to fetch available sites: {str(e)}"}), 500
 
+@website_controller.route('/notifications/stats', methods=['GET'])
+@require_admin
+def get_notification_stats():
+    """Counters of the background notification dispatcher (enqueued, delivered, failed, ...)."""
+    return jsonify(dict(notification_dispatcher.stats)), 200
+
+
 @website_controller.route('/user/<int:uid>', methods=['GET'])
 def get_user_websites(uid):
     """
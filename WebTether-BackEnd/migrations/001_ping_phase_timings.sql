@@ -0,0 +1,7 @@
+-- Optional per-phase probe timings (milliseconds) on ping rows.
+ALTER TABLE ping
+    ADD COLUMN IF NOT EXISTS dns_ms integer,
+    ADD COLUMN IF NOT EXISTS connect_ms integer,
+    ADD COLUMN IF NOT EXISTS tls_ms integer,
+    ADD COLUMN IF NOT EXISTS ttfb_ms integer,
+    ADD COLUMN IF NOT EXISTS transfer_ms integer;
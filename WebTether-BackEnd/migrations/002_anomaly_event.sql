@@ -0,0 +1,14 @@
+-- Anomaly events emitted by the streaming per-website detector.
+CREATE TABLE IF NOT EXISTS anomaly_event (
+    id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    wid bigint NOT NULL REFERENCES website(wid) ON DELETE CASCADE,
+    pid bigint REFERENCES ping(pid) ON DELETE SET NULL,
+    kind text NOT NULL,
+    severity text NOT NULL,
+    value numeric,
+    baseline numeric,
+    detail jsonb,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS anomaly_event_wid_created_at_idx ON anomaly_event (wid, created_at DESC);
@@ -0,0 +1,3 @@
+-- Optional webhook that receives batched up/down notifications for a website.
+ALTER TABLE website
+    ADD COLUMN IF NOT EXISTS notify_url text;
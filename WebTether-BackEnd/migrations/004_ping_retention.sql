@@ -0,0 +1,31 @@
+-- Hourly downsampled ping aggregates kept after raw rows are archived (utils/retention.py).
+CREATE TABLE IF NOT EXISTS ping_hourly (
+    wid bigint NOT NULL REFERENCES website(wid) ON DELETE CASCADE,
+    hour timestamptz NOT NULL,
+    total integer NOT NULL,
+    up integer NOT NULL,
+    latency_count integer NOT NULL DEFAULT 0,
+    latency_sum bigint NOT NULL DEFAULT 0,
+    latency_min integer,
+    latency_max integer,
+    latency_p50 integer,
+    latency_p95 integer,
+    PRIMARY KEY (wid, hour)
+);
+
+CREATE INDEX IF NOT EXISTS ping_hourly_hour_idx ON ping_hourly (hour);
+
+-- Retention scans the oldest pings first and history reads filter by site + time range.
+CREATE INDEX IF NOT EXISTS ping_timestamp_idx ON ping (timestamp);
+CREATE INDEX IF NOT EXISTS ping_wid_timestamp_idx ON ping (wid, timestamp DESC);
+
+-- Archived pings leave the hot table; transactions keep their row (the pid stays in the archive).
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'onchain_transactions_pid_fkey') THEN
+        ALTER TABLE onchain_transactions DROP CONSTRAINT onchain_transactions_pid_fkey;
+        ALTER TABLE onchain_transactions
+            ADD CONSTRAINT onchain_transactions_pid_fkey
+            FOREIGN KEY (pid) REFERENCES ping(pid) ON DELETE SET NULL;
+    END IF;
+END $$;
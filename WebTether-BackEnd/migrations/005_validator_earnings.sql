@@ -0,0 +1,37 @@
+-- Off-chain validator earnings ledger, credited per validated ping and paid out in batches
+-- through PingPayment.batchReward (utils/reward_settlement.py).
+CREATE TABLE IF NOT EXISTS reward_batch (
+    batch_id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    status text NOT NULL DEFAULT 'created'
+        CHECK (status IN ('created', 'submitted', 'settled', 'failed')),
+    recipients integer NOT NULL,
+    total_wei numeric(78, 0) NOT NULL,
+    tx_hash text,
+    nonce bigint,
+    gas_used bigint,
+    failed_recipients integer NOT NULL DEFAULT 0,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    submitted_at timestamptz,
+    settled_at timestamptz
+);
+
+CREATE INDEX IF NOT EXISTS reward_batch_status_idx ON reward_batch (status, batch_id);
+
+CREATE TABLE IF NOT EXISTS validator_earnings (
+    eid bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    uid bigint NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    wid bigint REFERENCES website(wid) ON DELETE SET NULL,
+    -- no FK: archived pings leave the hot table (see 004_ping_retention.sql)
+    pid bigint NOT NULL UNIQUE,
+    amount_wei numeric(78, 0) NOT NULL CHECK (amount_wei > 0),
+    status text NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'batched', 'settled')),
+    batch_id bigint REFERENCES reward_batch(batch_id) ON DELETE SET NULL,
+    tx_hash text,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    settled_at timestamptz
+);
+
+-- the batcher drains pending rows in eid order; validators read their own ledger
+CREATE INDEX IF NOT EXISTS validator_earnings_pending_idx ON validator_earnings (eid) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS validator_earnings_uid_idx ON validator_earnings (uid, eid DESC);
+CREATE INDEX IF NOT EXISTS validator_earnings_batch_idx ON validator_earnings (batch_id);
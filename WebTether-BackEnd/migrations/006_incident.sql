@@ -0,0 +1,17 @@
+-- Per-website down periods, maintained from up/down transitions of the ping stream
+-- (utils/incidents.py). Uptime for any window is computed from these rows, not from raw pings.
+CREATE TABLE IF NOT EXISTS incident (
+    id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    wid bigint NOT NULL REFERENCES website(wid) ON DELETE CASCADE,
+    started_at timestamptz NOT NULL,
+    start_pid bigint,
+    ended_at timestamptz,
+    end_pid bigint,
+    duration_seconds numeric,
+    CHECK (ended_at IS NULL OR ended_at >= started_at)
+);
+
+CREATE INDEX IF NOT EXISTS incident_wid_started_at_idx ON incident (wid, started_at DESC);
+
+-- one ongoing incident per site, even with several app workers observing the same transition
+CREATE UNIQUE INDEX IF NOT EXISTS incident_one_open_per_wid ON incident (wid) WHERE ended_at IS NULL;
@@ -0,0 +1,44 @@
+-- Canonical probe targets: websites with the same normalized URL share one target, which the
+-- scheduler (utils/probe_scheduler.py) probes once per interval and fans out to every website.
+CREATE TABLE IF NOT EXISTS probe_target (
+    target_id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    url text NOT NULL UNIQUE,
+    refcount integer NOT NULL DEFAULT 0 CHECK (refcount >= 0),
+    interval_seconds integer NOT NULL DEFAULT 60 CHECK (interval_seconds > 0),
+    next_probe_at timestamptz NOT NULL DEFAULT now(),
+    last_probe_at timestamptz,
+    last_is_up boolean,
+    last_latency_ms integer,
+    created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS probe_target_due_idx ON probe_target (next_probe_at) WHERE refcount > 0;
+
+ALTER TABLE website
+    ADD COLUMN IF NOT EXISTS target_id bigint REFERENCES probe_target(target_id) ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS website_target_id_idx ON website (target_id);
+
+-- +1 reference per array entry (repeats count); returns one row per distinct url
+CREATE OR REPLACE FUNCTION acquire_probe_targets(target_urls text[])
+RETURNS TABLE (target_id bigint, url text)
+LANGUAGE sql AS $$
+    INSERT INTO probe_target AS t (url, refcount)
+    SELECT u, count(*) FROM unnest(target_urls) AS u GROUP BY u
+    ON CONFLICT (url) DO UPDATE SET refcount = t.refcount + EXCLUDED.refcount
+    RETURNING t.target_id, t.url;
+$$;
+
+-- -1 reference per array entry (repeats count); targets nobody references any more are dropped
+CREATE OR REPLACE FUNCTION release_probe_targets(target_ids bigint[])
+RETURNS void
+LANGUAGE sql AS $$
+    WITH released AS (
+        SELECT id, count(*) AS n FROM unnest(target_ids) AS id GROUP BY id
+    )
+    UPDATE probe_target t
+       SET refcount = greatest(t.refcount - released.n, 0)
+      FROM released
+     WHERE t.target_id = released.id;
+    DELETE FROM probe_target WHERE refcount = 0 AND target_id = ANY(target_ids);
+$$;
@@ -0,0 +1,10 @@
+-- Adaptive check cadence (utils/cadence.py): per-owner plan limits and the per-target state the
+-- scheduler folds each probe into. probe_target.interval_seconds now holds the current
+-- adaptive interval.
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS plan text NOT NULL DEFAULT 'free';
+
+-- stable_checks is null until the target is first evaluated (then seeded from `ping` history)
+ALTER TABLE probe_target
+    ADD COLUMN IF NOT EXISTS stable_checks integer,
+    ADD COLUMN IF NOT EXISTS latency_baseline_ms real;
@@ -0,0 +1,6 @@
+-- Local write spool (utils/write_spool.py): spooled pings carry a client-generated id so a row
+-- re-sent after a crash or a lost response is upserted instead of inserted twice.
+ALTER TABLE ping
+    ADD COLUMN IF NOT EXISTS spool_id uuid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ping_spool_id_key ON ping (spool_id);
@@ -0,0 +1,12 @@
+-- Reward batches remember what they were sent with (utils/reward_settlement.py):
+--  - payout maps each paid uid to the wallet it was paid to, so RewardFailed receivers map back
+--    to the right validators even if a wallet changed after the batch was built
+--  - the fee caps of the last send, so a transaction stuck past the confirm timeout is replaced
+--    at the same nonce with fees high enough for the node to accept the replacement
+--  - every hash sent at that nonce, since either the original or a replacement may be mined
+ALTER TABLE reward_batch
+    ADD COLUMN IF NOT EXISTS payout jsonb,
+    ADD COLUMN IF NOT EXISTS tx_hashes jsonb,
+    ADD COLUMN IF NOT EXISTS max_fee_per_gas numeric(78, 0),
+    ADD COLUMN IF NOT EXISTS max_priority_fee_per_gas numeric(78, 0),
+    ADD COLUMN IF NOT EXISTS resends integer NOT NULL DEFAULT 0;
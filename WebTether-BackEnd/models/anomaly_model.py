@@ -0,0 +1,71 @@
+# models/anomaly_model.py
+"""
+AnomalyModel - thin DB layer for the `anomaly_event` table.
+
+Schema (relevant columns):
+ - id (PK bigint), wid (bigint), pid (bigint, nullable), kind (text),
+   severity (text), value (numeric), baseline (numeric), detail (jsonb), created_at (timestamp)
+
+Rows are emitted by the streaming detector (utils.anomaly_detector) on ping ingestion and written
+in batches by utils.anomaly_writer.
+"""
+
+from models.db import supabase
+from typing import Optional
+
+
+class AnomalyModel:
+    def __init__(self):
+        self.supabase = supabase
+        self.table = "anomaly_event"
+
+    @staticmethod
+    def build_payload(wid: int, kind: str, severity: str,
+                      pid: Optional[int] = None,
+                      value: Optional[float] = None,
+                      baseline: Optional[float] = None,
+                      detail: Optional[dict] = None) -> dict:
+        """The row create_event inserts (also what the background event writer batches)."""
+        if wid is None or not kind or not severity:
+            raise ValueError("wid, kind and severity are required")
+
+        payload = {
+            "wid": wid,
+            "kind": kind,
+            "severity": severity
+        }
+        if pid is not None:
+            payload["pid"] = pid
+        if value is not None:
+            payload["value"] = value
+        if baseline is not None:
+            payload["baseline"] = baseline
+        if detail:
+            payload["detail"] = detail
+        return payload
+
+    def create_event(self, wid: int, kind: str, severity: str,
+                     pid: Optional[int] = None,
+                     value: Optional[float] = None,
+                     baseline: Optional[float] = None,
+                     detail: Optional[dict] = None):
+        """
+        Insert one anomaly event. Returns the Supabase response object.
+        """
+        payload = self.build_payload(wid, kind, severity, pid, value, baseline, detail)
+        return self.supabase.table(self.table).insert(payload).execute()
+
+    def create_events(self, rows: list):
+        """Insert several already-built payloads in one request."""
+        if not rows:
+            raise ValueError("rows must not be empty")
+        return self.supabase.table(self.table).insert(rows).execute()
+
+    def get_events_by_wid(self, wid: int, limit: int = 100):
+        return self.supabase.table(self.table).select("*").eq("wid", wid).order("created_at", desc=True).limit(limit).execute()
+
+    def get_recent_events(self, limit: int = 100, severity: Optional[str] = None):
+        builder = self.supabase.table(self.table).select("*")
+        if severity:
+            builder = builder.eq("severity", severity)
+        return builder.order("created_at", desc=True).limit(limit).execute()
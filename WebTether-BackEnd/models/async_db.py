@@ -0,0 +1,117 @@
+# models/async_db.py
+"""
+Async counterpart of models/db.py for the ASGI serving mode (asgi.py).
+
+`async_supabase` wraps supabase's AsyncClient behind the same proxy interface, with one shared,
+pooled httpx.AsyncClient (HTTP/2 when the `h2` package is available) so a single process can keep
+hundreds of PostgREST calls in flight. Queries are built exactly like the sync ones; only
+execute() is a coroutine:
+
+    resp = await async_supabase.table("ping").select("*").eq("pid", pid).maybe_single().execute()
+
+Because every model method ends in `return <builder>.execute()`, the async models
+(models/async_models.py) are the sync model classes pointed at this proxy: each method then
+returns an awaitable instead of a response.
+
+Connection settings:
+ - ASYNC_DB_MAX_CONNECTIONS (default 200), ASYNC_DB_MAX_KEEPALIVE (default 50)
+ - ASYNC_DB_TIMEOUT seconds (default 30), ASYNC_DB_HTTP2 (default on)
+"""
+
+import inspect
+import os
+import threading
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+from models.db import InstrumentedQuery
+from utils import metrics, query_budget
+
+load_dotenv()
+
+ASYNC_DB_MAX_CONNECTIONS = int(os.getenv("ASYNC_DB_MAX_CONNECTIONS", 200))
+ASYNC_DB_MAX_KEEPALIVE = int(os.getenv("ASYNC_DB_MAX_KEEPALIVE", 50))
+ASYNC_DB_TIMEOUT = float(os.getenv("ASYNC_DB_TIMEOUT", 30))
+ASYNC_DB_HTTP2 = os.getenv("ASYNC_DB_HTTP2", "1") not in ("0", "false", "False")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class AsyncInstrumentedQuery(InstrumentedQuery):
+    """InstrumentedQuery whose execute() is awaited; also accepts sync builders (e.g. the bench fake)."""
+
+    __slots__ = ()
+
+    async def execute(self, *args, **kwargs):
+        instrumented = metrics.METRICS_ENABLED
+        if instrumented:
+            metrics.db_in_flight.inc()
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = self._builder.execute(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            ok = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            if instrumented:
+                metrics.db_in_flight.dec()
+                metrics.record_db_call(self._table, self._operation, elapsed, ok)
+            query_budget.record_query(self._table, self._operation, elapsed, self._shape)
+
+
+class AsyncSupabaseProxy:
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _create_client(self):
+        from supabase import AsyncClient, AsyncClientOptions
+
+        http_client = httpx.AsyncClient(
+            http2=ASYNC_DB_HTTP2 and _http2_available(),
+            timeout=httpx.Timeout(ASYNC_DB_TIMEOUT, connect=min(ASYNC_DB_TIMEOUT, 10.0)),
+            limits=httpx.Limits(max_connections=ASYNC_DB_MAX_CONNECTIONS,
+                                max_keepalive_connections=ASYNC_DB_MAX_KEEPALIVE),
+        )
+        options = AsyncClientOptions(postgrest_client_timeout=ASYNC_DB_TIMEOUT, httpx_client=http_client)
+        return AsyncClient(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"), options)
+
+    def get_client(self):
+        # constructing the client does no I/O, so it is safe to do lazily from sync code
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    def set_client(self, client):
+        with self._lock:
+            self._client = client
+
+    def table(self, name: str):
+        return AsyncInstrumentedQuery(self.get_client().table(name), name)
+
+    def rpc(self, fn: str, params: dict = None):
+        return AsyncInstrumentedQuery(self.get_client().rpc(fn, params or {}), fn, "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self.get_client(), name)
+
+
+async_supabase = AsyncSupabaseProxy()
+
+
+def set_async_client(client):
+    """Replace the client used by the async models (sync PostgREST-compatible fakes work too)."""
+    async_supabase.set_client(client)
@@ -0,0 +1,42 @@
+# models/async_models.py
+"""
+Async variants of the models used by the ASGI blueprints.
+
+Each class is the sync model pointed at models.async_db.async_supabase. Since every model
+method ends in `return <builder>.execute()`, the same methods return awaitables here:
+
+    row = await AsyncPingModel().get_ping_by_id(pid)
+
+Validation (ValueError for bad payloads) still raises synchronously, before anything is awaited.
+Methods that post-process a response must be overridden with an async def before use.
+"""
+
+from models.async_db import async_supabase
+from models.onchain_transaction_model import OnChainTransactionModel
+from models.ping_model import PingModel
+from models.user_model import UserModel
+from models.website_model import WebsiteModel
+
+
+class AsyncPingModel(PingModel):
+    def __init__(self):
+        super().__init__()
+        self.supabase = async_supabase
+
+
+class AsyncWebsiteModel(WebsiteModel):
+    def __init__(self):
+        super().__init__()
+        self.supabase = async_supabase
+
+
+class AsyncUserModel(UserModel):
+    def __init__(self):
+        super().__init__()
+        self.supabase = async_supabase
+
+
+class AsyncOnChainTransactionModel(OnChainTransactionModel):
+    def __init__(self):
+        super().__init__()
+        self.supabase = async_supabase
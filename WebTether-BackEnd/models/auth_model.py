@@ -10,14 +10,9 @@ Design goals:
   decide to rollback or surface the error to clients.
 """
 
-from supabase import create_client
-import os
-from dotenv import load_dotenv
+from models.db import supabase
 from utils.jwt_utils import hash_password, verify_password
 
-load_dotenv()
-supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
-
 
 class AuthModel:
     def __init__(self):
@@ -0,0 +1,143 @@
+# models/db.py
+"""
+Shared Supabase client used by every model.
+
+`supabase` is a thin proxy: the real client is created lazily from SUPABASE_URL /
+SUPABASE_KEY on first use, and set_client() can swap in another PostgREST-compatible
+client (the offline benchmark suite installs an in-memory fake this way). Models keep
+writing `self.supabase.table(...)...execute()` exactly as before.
+
+table() hands back an InstrumentedQuery so every execute() is timed and counted per
+table / operation in utils.metrics, and charged to the current request's query budget
+(utils.query_budget) together with the filtered columns, so repeated lookups show up as N+1s.
+"""
+
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+from utils import metrics, query_budget
+
+load_dotenv()
+
+_OPERATIONS = ("select", "insert", "upsert", "update", "delete")
+_BATCH_SHAPE = query_budget.BATCH_SHAPE
+_FILTERS = ("eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "in_", "is_", "contains", "match")
+
+
+class InstrumentedQuery:
+    """Wraps a PostgREST query builder; records latency and outcome when executed."""
+
+    __slots__ = ("_builder", "_table", "_operation", "_shape")
+
+    def __init__(self, builder, table: str, operation: str = "select", shape: tuple = ()):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+        self._shape = shape
+
+    def execute(self, *args, **kwargs):
+        instrumented = metrics.METRICS_ENABLED
+        if instrumented:
+            metrics.db_in_flight.inc()
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = self._builder.execute(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            if instrumented:
+                metrics.db_in_flight.dec()
+                metrics.record_db_call(self._table, self._operation, elapsed, ok)
+            query_budget.record_query(self._table, self._operation, elapsed, self._shape)
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            # properties such as `.not_` return the builder itself
+            if hasattr(attr, "execute"):
+                return type(self)(attr, self._table, self._operation, self._shape)
+            return attr
+        operation = name if name in _OPERATIONS else self._operation
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            # builder methods return the next builder; keep wrapping until execute()
+            if hasattr(result, "execute"):
+                shape = self._shape
+                if name in _FILTERS and args:
+                    shape = shape + (f"{name.rstrip('_')}:{args[0]}",)
+                elif name in ("insert", "upsert") and args and isinstance(args[0], list) and len(args[0]) > 1:
+                    # chunks of one multi-row write are batching, not an N+1
+                    shape = shape + (_BATCH_SHAPE,)
+                return type(self)(result, self._table, operation, shape)
+            return result
+
+        return chained
+
+
+class SupabaseProxy:
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+        return self._client
+
+    def set_client(self, client):
+        with self._lock:
+            self._client = client
+
+    def table(self, name: str):
+        return InstrumentedQuery(self.get_client().table(name), name)
+
+    def rpc(self, fn: str, params: dict = None):
+        """Call a Postgres function; instrumented like table() with the function name as table."""
+        return InstrumentedQuery(self.get_client().rpc(fn, params or {}), fn, "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self.get_client(), name)
+
+
+supabase = SupabaseProxy()
+
+
+def response_rows(resp) -> list:
+    """Rows of a Supabase response (or plain data) as a list: None -> [], a single dict -> [dict]."""
+    data = getattr(resp, "data", resp)
+    if isinstance(data, dict):
+        return [data]
+    return data or []
+
+
+def response_data(resp):
+    """The payload of a Supabase response (resp.data), or resp itself when it is plain data."""
+    if resp is None:
+        return None
+    if hasattr(resp, "data"):
+        return resp.data
+    return resp
+
+
+def response_row(resp):
+    """A single row (dict) of a Supabase response or plain data: the first of a list, else None."""
+    data = response_data(resp)
+    if isinstance(data, dict):
+        return data
+    if isinstance(data, list):
+        return data[0] if len(data) > 0 else None
+    return None
+
+
+def set_client(client):
+    """Replace the client used by all models (e.g. with an in-memory fake)."""
+    supabase.set_client(client)
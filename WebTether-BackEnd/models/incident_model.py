@@ -0,0 +1,68 @@
+# models/incident_model.py
+"""
+IncidentModel - thin DB layer for the `incident` table (one row per down period of a website).
+
+Schema (relevant columns):
+ - id (bigint identity PK), wid (bigint)
+ - started_at (timestamptz, first down ping), start_pid (bigint)
+ - ended_at (timestamptz, first up ping after it; NULL while ongoing), end_pid (bigint)
+ - duration_seconds (numeric, set when closed)
+
+At most one open incident per website (partial unique index). Rows are written on up/down
+transitions by utils.incidents.IncidentTracker, never per ping; it reads the open incidents
+once at start and on each periodic reload, not per ping.
+"""
+
+from models.db import supabase
+from typing import Optional
+
+
+class IncidentModel:
+    def __init__(self):
+        self.supabase = supabase
+        self.table = "incident"
+
+    def open_incident(self, wid: int, started_at: str, start_pid: Optional[int] = None):
+        payload = {"wid": wid, "started_at": started_at}
+        if start_pid is not None:
+            payload["start_pid"] = start_pid
+        return self.supabase.table(self.table).insert(payload).execute()
+
+    def close_incident(self, wid: int, ended_at: str, duration_seconds: float, end_pid: Optional[int] = None):
+        payload = {"ended_at": ended_at, "duration_seconds": duration_seconds}
+        if end_pid is not None:
+            payload["end_pid"] = end_pid
+        return (self.supabase.table(self.table).update(payload)
+                .eq("wid", wid).is_("ended_at", "null").execute())
+
+    def get_open_incident(self, wid: int):
+        return (self.supabase.table(self.table).select("*")
+                .eq("wid", wid).is_("ended_at", "null").limit(1).execute())
+
+    def get_open_incidents(self, limit: int = 100000):
+        """Every open incident (one per website that is currently down)."""
+        return (self.supabase.table(self.table).select("wid,started_at")
+                .is_("ended_at", "null").limit(limit).execute())
+
+    def get_closed_overlapping(self, wid: int, since: str, until: str, limit: int = 10000):
+        """Closed incidents intersecting [since, until)."""
+        return (self.supabase.table(self.table).select("*")
+                .eq("wid", wid).lt("started_at", until).gt("ended_at", since)
+                .order("started_at").limit(limit).execute())
+
+    def get_incidents_by_wid(self, wid: int, since: Optional[str] = None, until: Optional[str] = None,
+                             limit: int = 100):
+        query = self.supabase.table(self.table).select("*").eq("wid", wid)
+        if since is not None:
+            query = query.gte("started_at", since)
+        if until is not None:
+            query = query.lt("started_at", until)
+        return query.order("started_at", desc=True).limit(limit).execute()
+
+    def insert_incidents(self, rows: list):
+        if not rows:
+            raise ValueError("rows must not be empty")
+        return self.supabase.table(self.table).insert(rows).execute()
+
+    def delete_incidents_by_wid(self, wid: int):
+        return self.supabase.table(self.table).delete().eq("wid", wid).execute()
@@ -7,36 +7,28 @@ Schema (relevant columns):
    token_address (text), token_amount (numeric), gas_used (bigint), created_at (timestamp)
 
 This model returns Supabase response objects (so controllers can inspect `.data`).
+Lookups by hash / user include rows still waiting in the local write spool (utils/write_spool.py).
 Controllers should use the helpers used throughout the project to normalize responses.
 """
 
-from supabase import create_client
-import os
-from dotenv import load_dotenv
+from models.db import supabase
+from utils.write_spool import with_pending
 from typing import Optional
 
-load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 
 class OnChainTransactionModel:
     def __init__(self):
         self.supabase = supabase
         self.table = "onchain_transactions"
 
-    def create_transaction(self,
-                           tx_hash: str,
-                           uid: int,
-                           pid: Optional[int] = None,
-                           token_address: Optional[str] = None,
-                           token_amount: Optional[float] = None,
-                           gas_used: Optional[int] = None):
-        """
-        Insert a new on-chain transaction record.
-        Returns the Supabase response object.
-        """
+    @staticmethod
+    def build_payload(tx_hash: str,
+                      uid: int,
+                      pid: Optional[int] = None,
+                      token_address: Optional[str] = None,
+                      token_amount: Optional[float] = None,
+                      gas_used: Optional[int] = None) -> dict:
+        """The row create_transaction inserts (also what the write spool queues)."""
         if not tx_hash or not uid or token_address is None or token_amount is None:
             raise ValueError("tx_hash, uid, token_address and token_amount are required")
 
@@ -50,15 +42,27 @@ class OnChainTransactionModel:
             payload["pid"] = pid
         if gas_used is not None:
             payload["gas_used"] = gas_used
+        return payload
+
+    def create_transaction(self, tx_hash: str, uid: int, **fields):
+        """
+        Insert a new on-chain transaction record (fields as in build_payload).
+        Returns the Supabase response object.
+        """
+        return self.supabase.table(self.table).insert(self.build_payload(tx_hash, uid, **fields)).execute()
 
-        return self.supabase.table(self.table).insert(payload).execute()
+    def upsert_spooled_transactions(self, rows: list):
+        """Drain rows from the write spool; a tx_hash already stored is left untouched."""
+        return (self.supabase.table(self.table)
+                .upsert(rows, on_conflict="tx_hash", ignore_duplicates=True).execute().data)
 
     def get_transaction_by_hash(self, tx_hash: str):
         """
         Return a supabase response for a single tx hash.
         Use maybe_single() to avoid throwing when 0 rows (returns None)
         """
-        return self.supabase.table(self.table).select("*").eq("tx_hash", tx_hash).maybe_single().execute()
+        resp = self.supabase.table(self.table).select("*").eq("tx_hash", tx_hash).maybe_single().execute()
+        return with_pending(resp, self.table, single=True, tx_hash=tx_hash)
 
     def get_transactions_by_user(self, uid: int, limit: Optional[int] = None, offset: Optional[int] = None):
         """
@@ -69,7 +73,9 @@ class OnChainTransactionModel:
             builder = builder.limit(limit)
         if isinstance(offset, int):
             builder = builder.offset(offset)
-        return builder.execute()
+        if offset:
+            return builder.execute()
+        return with_pending(builder.execute(), self.table, limit if isinstance(limit, int) else None, uid=uid)
 
     def get_all_transactions(self, limit: Optional[int] = None, offset: Optional[int] = None):
         """
@@ -82,6 +88,28 @@ class OnChainTransactionModel:
             builder = builder.offset(offset)
         return builder.execute()
 
+    def get_transactions_after(self, cursor: Optional[tuple] = None, ties_only: bool = False, limit: int = 1000,
+                               uid: Optional[int] = None, since: Optional[str] = None, until: Optional[str] = None):
+        """
+        Keyset page ordered by (created_at, tx_hash) for exports.
+        cursor=(created_at, tx_hash) of the last row seen; ties_only pages through rows sharing
+        that created_at, otherwise rows strictly after it.
+        """
+        builder = self.supabase.table(self.table).select("*")
+        if uid is not None:
+            builder = builder.eq("uid", uid)
+        if since is not None:
+            builder = builder.gte("created_at", since)
+        if until is not None:
+            builder = builder.lt("created_at", until)
+        if cursor is not None:
+            created_at, tx_hash = cursor
+            if ties_only:
+                builder = builder.eq("created_at", created_at).gt("tx_hash", tx_hash)
+            else:
+                builder = builder.gt("created_at", created_at)
+        return builder.order("created_at").order("tx_hash").limit(limit).execute()
+
     def update_transaction(self, tx_hash: str, data: dict):
         """
         Update allowed fields for a transaction. tx_hash identifies the record.
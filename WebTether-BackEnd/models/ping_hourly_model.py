@@ -0,0 +1,34 @@
+# models/ping_hourly_model.py
+"""
+PingHourlyModel - thin DB layer for the `ping_hourly` table.
+
+Schema (relevant columns):
+ - wid (bigint), hour (timestamptz, UTC hour start)  -- primary key (wid, hour)
+ - total, up, latency_count, latency_sum, latency_min, latency_max, latency_p50, latency_p95
+
+Rows are produced by the retention job (utils.retention) when raw pings are archived,
+and upserted on (wid, hour) so re-running the job for an hour replaces its aggregate.
+"""
+
+from models.db import supabase
+from typing import Optional
+
+
+class PingHourlyModel:
+    def __init__(self):
+        self.supabase = supabase
+        self.table = "ping_hourly"
+
+    def upsert_rollups(self, rows: list):
+        if not rows:
+            raise ValueError("rows must not be empty")
+        return self.supabase.table(self.table).upsert(rows, on_conflict="wid,hour").execute()
+
+    def get_rollups_by_wid(self, wid: int, since: Optional[str] = None, until: Optional[str] = None,
+                           limit: int = 24 * 366):
+        query = self.supabase.table(self.table).select("*").eq("wid", wid)
+        if since is not None:
+            query = query.gte("hour", since)
+        if until is not None:
+            query = query.lt("hour", until)
+        return query.order("hour", desc=True).limit(limit).execute()
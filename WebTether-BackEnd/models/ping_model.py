@@ -5,38 +5,43 @@ PingModel - CRUD + helper queries for `ping` table.
 Schema (relevant columns):
  - pid, wid, uid, timestamp, latency_ms, region, is_up, replit_used,
    tx_hash, fee_paid_numeric, source, checked_by_uid
+ - optional phase timings (ms): dns_ms, connect_ms, tls_ms, ttfb_ms, transfer_ms
+ - spool_id (uuid, unique): set on rows written through the local write spool
+   (utils/write_spool.py); the recent-ping reads below include rows still in the spool
 
 This model is intentionally thin: controllers enforce auth/ownership and
 higher-level logic; the model only performs DB operations and returns
 Supabase client responses (so controllers can inspect .data).
 """
 
-from supabase import create_client
-import os
-from dotenv import load_dotenv
+from models.db import supabase
+from utils.write_spool import with_pending
 from typing import Optional
 
-load_dotenv()
-supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
-
 
 class PingModel:
     def __init__(self):
         self.supabase = supabase
         self.table = "ping"
 
-    def create_ping(self,
-                    wid: int,
-                    is_up: bool,
-                    latency_ms: Optional[int] = None,
-                    region: Optional[str] = None,
-                    uid: Optional[int] = None,
-                    tx_hash: Optional[str] = None,
-                    fee_paid_numeric: Optional[float] = None,
-                    source: Optional[str] = "manual",
-                    checked_by_uid: Optional[int] = None):
+    @staticmethod
+    def build_payload(wid: int,
+                      is_up: bool,
+                      latency_ms: Optional[int] = None,
+                      region: Optional[str] = None,
+                      uid: Optional[int] = None,
+                      tx_hash: Optional[str] = None,
+                      fee_paid_numeric: Optional[float] = None,
+                      source: Optional[str] = "manual",
+                      checked_by_uid: Optional[int] = None,
+                      dns_ms: Optional[int] = None,
+                      connect_ms: Optional[int] = None,
+                      tls_ms: Optional[int] = None,
+                      ttfb_ms: Optional[int] = None,
+                      transfer_ms: Optional[int] = None) -> dict:
         """
-        Insert a ping record. Returns Supabase response object.
+        The row create_ping inserts (also what the write spool queues).
+        Phase timings are optional; omitted ones are left NULL.
         """
         payload = {
             "wid": wid,
@@ -56,8 +61,27 @@ class PingModel:
             payload["source"] = source
         if checked_by_uid is not None:
             payload["checked_by_uid"] = checked_by_uid
+        for field, value in (("dns_ms", dns_ms), ("connect_ms", connect_ms), ("tls_ms", tls_ms),
+                             ("ttfb_ms", ttfb_ms), ("transfer_ms", transfer_ms)):
+            if value is not None:
+                payload[field] = value
+        return payload
+
+    def create_ping(self, wid: int, is_up: bool, **fields):
+        """
+        Insert a ping record (fields as in build_payload). Returns Supabase response object.
+        """
+        return self.supabase.table(self.table).insert(self.build_payload(wid, is_up, **fields)).execute()
+
+    def create_pings(self, rows: list):
+        """Multi-row insert of already-built ping payloads (scheduler fan-out)."""
+        if not rows:
+            return None
+        return self.supabase.table(self.table).insert(rows).execute()
 
-        return self.supabase.table(self.table).insert(payload).execute()
+    def upsert_spooled_pings(self, rows: list):
+        """Drain rows from the write spool; re-sending one (same spool_id) updates it in place."""
+        return self.supabase.table(self.table).upsert(rows, on_conflict="spool_id").execute().data
 
     def get_all_pings(self):
         return self.supabase.table(self.table).select("*").order("timestamp", desc=True).execute()
@@ -67,7 +91,8 @@ class PingModel:
 
     def update_ping(self, pid: int, data: dict):
         # whitelist allowed update fields to be safe
-        allowed = {"is_up", "latency_ms", "region", "fee_paid_numeric", "source", "checked_by_uid", "tx_hash"}
+        allowed = {"is_up", "latency_ms", "region", "fee_paid_numeric", "source", "checked_by_uid", "tx_hash",
+                   "dns_ms", "connect_ms", "tls_ms", "ttfb_ms", "transfer_ms"}
         payload = {k: v for k, v in (data or {}).items() if k in allowed}
         if not payload:
             raise ValueError("No updatable fields provided")
@@ -77,10 +102,12 @@ class PingModel:
         return self.supabase.table(self.table).delete().eq("pid", pid).execute()
 
     def get_recent_pings_by_wid(self, wid: int, limit: int = 50):
-        return self.supabase.table(self.table).select("*").eq("wid", wid).order("timestamp", desc=True).limit(limit).execute()
+        resp = self.supabase.table(self.table).select("*").eq("wid", wid).order("timestamp", desc=True).limit(limit).execute()
+        return with_pending(resp, self.table, limit, wid=wid)
 
     def get_pings_by_uid(self, uid: int, limit: int = 100):
-        return self.supabase.table(self.table).select("*").eq("uid", uid).order("timestamp", desc=True).limit(limit).execute()
+        resp = self.supabase.table(self.table).select("*").eq("uid", uid).order("timestamp", desc=True).limit(limit).execute()
+        return with_pending(resp, self.table, limit, uid=uid)
 
     def get_stats_for_website(self, wid: int):
         """
@@ -90,4 +117,73 @@ class PingModel:
         return self.get_recent_pings_by_wid(wid, limit=1000)
 
     def get_pings_by_user(self, uid: int, limit: int = 100):
-        return self.supabase.table(self.table).select("*").eq("uid", uid).order("timestamp", desc=True).limit(limit).execute()
+        resp = self.supabase.table(self.table).select("*").eq("uid", uid).order("timestamp", desc=True).limit(limit).execute()
+        return with_pending(resp, self.table, limit, uid=uid)
+
+    # ------------------------------
+    # Retention / history helpers (timestamps are ISO strings)
+    # ------------------------------
+    def get_oldest_ping(self, since: Optional[str] = None, before: Optional[str] = None, wid: Optional[int] = None):
+        query = self.supabase.table(self.table).select("pid,timestamp")
+        if wid is not None:
+            query = query.eq("wid", wid)
+        if since is not None:
+            query = query.gte("timestamp", since)
+        if before is not None:
+            query = query.lt("timestamp", before)
+        return query.order("timestamp").limit(1).execute()
+
+    def get_pings_between(self, start: str, end: str, after_pid: int = 0, limit: int = 1000):
+        """Pings with start <= timestamp < end, keyset-paged by pid (pass the last pid seen)."""
+        return (self.supabase.table(self.table).select("*")
+                .gte("timestamp", start).lt("timestamp", end).gt("pid", after_pid)
+                .order("pid").limit(limit).execute())
+
+    def get_pings_after(self, after_pid: Optional[int] = None, limit: int = 1000,
+                        since: Optional[str] = None, until: Optional[str] = None):
+        """Keyset page of all pings in pid order (pass the last pid seen)."""
+        query = self.supabase.table(self.table).select("*")
+        if after_pid is not None:
+            query = query.gt("pid", after_pid)
+        if since is not None:
+            query = query.gte("timestamp", since)
+        if until is not None:
+            query = query.lt("timestamp", until)
+        return query.order("pid").limit(limit).execute()
+
+    def get_pings_by_wid_between(self, wid: int, since: Optional[str] = None, until: Optional[str] = None,
+                                 limit: int = 1000):
+        query = self.supabase.table(self.table).select("*").eq("wid", wid)
+        if since is not None:
+            query = query.gte("timestamp", since)
+        if until is not None:
+            query = query.lt("timestamp", until)
+        return query.order("timestamp", desc=True).limit(limit).execute()
+
+    def get_pings_by_wid_after(self, wid: int, after_pid: Optional[int] = None, limit: int = 1000,
+                               since: Optional[str] = None, until: Optional[str] = None):
+        """Keyset page of a website's pings in pid order (pass the last pid seen) for exports."""
+        query = self.supabase.table(self.table).select("*").eq("wid", wid)
+        if after_pid is not None:
+            query = query.gt("pid", after_pid)
+        if since is not None:
+            query = query.gte("timestamp", since)
+        if until is not None:
+            query = query.lt("timestamp", until)
+        return query.order("pid").limit(limit).execute()
+
+    # ------------------------------
+    # Feed helpers (utils/ping_feed.py)
+    # ------------------------------
+    def get_latest_pid(self):
+        return self.supabase.table(self.table).select("pid").order("pid", desc=True).limit(1).execute()
+
+    def get_pings_by_ids(self, pids: list):
+        if not pids:
+            raise ValueError("pids must not be empty")
+        return self.supabase.table(self.table).select("*").in_("pid", list(pids)).order("pid").execute()
+
+    def delete_pings(self, pids: list):
+        if not pids:
+            raise ValueError("pids must not be empty")
+        return self.supabase.table(self.table).delete().in_("pid", list(pids)).execute()
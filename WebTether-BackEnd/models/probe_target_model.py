@@ -0,0 +1,57 @@
+# models/probe_target_model.py
+"""
+ProbeTargetModel - DB layer for `probe_target`, the canonical (normalized) URLs actually probed.
+
+Schema (relevant columns):
+ - target_id (bigint identity PK), url (text, unique, normalize_url() form)
+ - refcount (integer, number of website rows pointing at it via website.target_id)
+ - interval_seconds (integer), next_probe_at, last_probe_at (timestamptz)
+ - last_is_up (boolean), last_latency_ms (integer)
+ - stable_checks (integer, null until first evaluated), latency_baseline_ms (real): adaptive
+   cadence state (utils/cadence.py, migrations/008_adaptive_cadence.sql)
+
+Reference counts change only through the acquire_probe_targets / release_probe_targets
+functions (migrations/007_probe_target.sql), so concurrent creates and deletes of websites
+with the same URL never lose an update. A target is deleted when its count reaches zero.
+"""
+
+from models.db import supabase
+from datetime import datetime, timezone
+from typing import Optional
+
+
+class ProbeTargetModel:
+    def __init__(self):
+        self.supabase = supabase
+        self.table = "probe_target"
+
+    def acquire(self, urls: list):
+        """+1 reference per entry of `urls` (normalized; repeats count). Returns [{target_id, url}]."""
+        if not urls:
+            raise ValueError("urls must not be empty")
+        return self.supabase.rpc("acquire_probe_targets", {"target_urls": list(urls)}).execute()
+
+    def release(self, target_ids: list):
+        """-1 reference per entry of `target_ids` (repeats count); unreferenced targets are removed."""
+        if not target_ids:
+            raise ValueError("target_ids must not be empty")
+        return self.supabase.rpc("release_probe_targets", {"target_ids": list(target_ids)}).execute()
+
+    def get_target(self, target_id: int):
+        return self.supabase.table(self.table).select("*").eq("target_id", target_id).maybe_single().execute()
+
+    def get_due_targets(self, now: Optional[str] = None, limit: int = 500):
+        now = now or datetime.now(timezone.utc).isoformat()
+        return (self.supabase.table(self.table).select("*")
+                .gt("refcount", 0).lte("next_probe_at", now)
+                .order("next_probe_at").limit(limit).execute())
+
+    def mark_probed(self, target_id: int, probed_at: str, next_probe_at: str,
+                    is_up: Optional[bool] = None, latency_ms: Optional[int] = None, cadence: dict = None):
+        """Record a probe; `cadence` carries interval_seconds / stable_checks / latency_baseline_ms."""
+        payload = {"last_probe_at": probed_at, "next_probe_at": next_probe_at,
+                   "last_is_up": is_up, "last_latency_ms": latency_ms}
+        if cadence:
+            payload.update({k: cadence[k] for k in ("interval_seconds", "stable_checks", "latency_baseline_ms")
+                            if k in cadence})
+        return self.supabase.table(self.table).update(payload).eq("target_id", target_id).execute()
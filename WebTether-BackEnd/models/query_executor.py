@@ -0,0 +1,117 @@
+# models/query_executor.py
+"""
+Run independent model calls of one request concurrently.
+
+    with QueryBatch() as batch:
+        txns = batch.submit(tx_model.get_transactions_by_user, uid)
+        user = batch.submit(user_model.get_user_by_id, uid, timeout=1.0)
+    rows = txns.result()               # re-raises that call's own error / QueryTimeout
+    user_row = user.result(default=None)  # or swallow it
+
+Calls run on one process-wide bounded pool (QUERY_EXECUTOR_WORKERS), so a burst of requests
+can't open unbounded connections. Each call runs in a copy of the submitting context, so the
+per-request accounting in utils/query_budget still sees it. Futures are request-scoped: leaving
+the `with` block waits for every call up to its deadline and cancels those not started yet, so
+no query outlives the handler. Failures are isolated: one call raising or timing out does not
+affect the others; the error surfaces only where that future's result is read.
+
+Per-call timeouts bound how long the handler waits; a call already running on a worker finishes
+in the background (the HTTP client has its own timeout).
+"""
+
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+QUERY_EXECUTOR_WORKERS = int(os.getenv("QUERY_EXECUTOR_WORKERS", 32))
+QUERY_EXECUTOR_TIMEOUT_SECONDS = float(os.getenv("QUERY_EXECUTOR_TIMEOUT_SECONDS", 5))
+
+_NO_DEFAULT = object()
+_executor = None
+
+
+class QueryTimeout(TimeoutError):
+    pass
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=QUERY_EXECUTOR_WORKERS, thread_name_prefix="query")
+    return _executor
+
+
+class QueryFuture:
+    __slots__ = ("name", "deadline", "_future")
+
+    def __init__(self, name: str, future, deadline: float):
+        self.name = name
+        self.deadline = deadline
+        self._future = future
+
+    def _wait(self):
+        try:
+            return self._future.result(timeout=max(0.0, self.deadline - time.monotonic()))
+        except FutureTimeout:
+            self._future.cancel()
+            raise QueryTimeout(f"{self.name} did not finish in time")
+
+    def result(self, default=_NO_DEFAULT):
+        """The call's return value. Raises its error (or QueryTimeout) unless `default` is given."""
+        try:
+            return self._wait()
+        except Exception:
+            if default is _NO_DEFAULT:
+                raise
+            return default
+
+    def exception(self):
+        try:
+            self._wait()
+        except Exception as e:
+            return e
+        return None
+
+    def done(self) -> bool:
+        return self._future.done()
+
+
+class QueryBatch:
+    def __init__(self, timeout: float = None, executor: ThreadPoolExecutor = None):
+        self.timeout = QUERY_EXECUTOR_TIMEOUT_SECONDS if timeout is None else timeout
+        self._executor = executor
+        self.futures = []
+
+    def submit(self, fn, *args, timeout: float = None, **kwargs) -> QueryFuture:
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        ctx = contextvars.copy_context()
+        future = (self._executor or _pool()).submit(ctx.run, fn, *args, **kwargs)
+        query = QueryFuture(getattr(fn, "__name__", repr(fn)), future, deadline)
+        self.futures.append(query)
+        return query
+
+    def join(self) -> list:
+        """Wait for every call (each up to its own deadline); returns their errors (None = ok)."""
+        return [f.exception() for f in self.futures]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.join()
+        return False
+
+
+def run_parallel(*calls, timeout: float = None) -> list:
+    """
+    run_parallel((fn, arg, ...), (fn2, ...)) -> [result, result2]; raises the first error in
+    call order once all calls have finished.
+    """
+    with QueryBatch(timeout=timeout) as batch:
+        futures = [batch.submit(call[0], *call[1:]) for call in calls]
+    return [f.result() for f in futures]
@@ -1,10 +1,4 @@
-import os
-from dotenv import load_dotenv
-from supabase import create_client
-
-# Load Supabase credentials from environment
-load_dotenv()
-supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+from models.db import supabase
 
 
 class ReportModel:
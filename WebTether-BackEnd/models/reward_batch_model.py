@@ -0,0 +1,70 @@
+# models/reward_batch_model.py
+"""
+RewardBatchModel - thin DB layer for the `reward_batch` table (one row per batchReward payout).
+
+Schema (relevant columns):
+ - batch_id (bigint identity PK, also passed to PingPayment.batchReward)
+ - status ('created' | 'submitted' | 'settled' | 'failed')
+ - recipients (integer), total_wei (numeric(78,0))
+ - tx_hash (text), nonce (bigint), gas_used (bigint), failed_recipients (integer)
+ - created_at, submitted_at, settled_at (timestamptz)
+ - payout (jsonb, {uid: wallet} paid by the last send), tx_hashes (jsonb, every hash sent at
+   this nonce), max_fee_per_gas / max_priority_fee_per_gas (numeric, fee caps of the last
+   send), resends (integer, replacements sent at the same nonce)
+"""
+
+from models.db import supabase
+from datetime import datetime, timezone
+from typing import Optional
+
+BATCH_STATUSES = {"created", "submitted", "settled", "failed"}
+
+
+class RewardBatchModel:
+    def __init__(self):
+        self.supabase = supabase
+        self.table = "reward_batch"
+
+    def create_batch(self, recipients: int, total_wei: int):
+        payload = {"status": "created", "recipients": recipients, "total_wei": int(total_wei)}
+        return self.supabase.table(self.table).insert(payload).execute()
+
+    def get_batch(self, batch_id: int):
+        return self.supabase.table(self.table).select("*").eq("batch_id", batch_id).maybe_single().execute()
+
+    def get_batches(self, status: Optional[str] = None, limit: int = 100):
+        query = self.supabase.table(self.table).select("*")
+        if status is not None:
+            if status not in BATCH_STATUSES:
+                raise ValueError(f"status must be one of {sorted(BATCH_STATUSES)}")
+            query = query.eq("status", status)
+        return query.order("batch_id", desc=True).limit(limit).execute()
+
+    def mark_submitted(self, batch_id: int, tx_hash: str, nonce: int, payout: Optional[dict] = None,
+                       fees: Optional[dict] = None, replaces: Optional[list] = None):
+        """Record a send; `replaces` are the hashes sent earlier at the same nonce."""
+        replaces = list(replaces or [])
+        payload = {"status": "submitted", "tx_hash": tx_hash, "nonce": nonce,
+                   "tx_hashes": replaces + [tx_hash], "resends": len(replaces),
+                   "submitted_at": datetime.now(timezone.utc).isoformat()}
+        if payout is not None:
+            payload["payout"] = {str(uid): wallet for uid, wallet in payout.items()}
+        if fees is not None:
+            payload["max_fee_per_gas"] = int(fees["maxFeePerGas"])
+            payload["max_priority_fee_per_gas"] = int(fees["maxPriorityFeePerGas"])
+        return self.supabase.table(self.table).update(payload).eq("batch_id", batch_id).execute()
+
+    def requeue(self, batch_id: int):
+        """Back to 'created' (rows stay batched) so the next run sends it again with a new nonce."""
+        payload = {"status": "created", "tx_hash": None, "nonce": None, "tx_hashes": None,
+                   "resends": 0, "submitted_at": None}
+        return (self.supabase.table(self.table).update(payload)
+                .eq("batch_id", batch_id).eq("status", "submitted").execute())
+
+    def mark_finished(self, batch_id: int, status: str, gas_used: Optional[int] = None,
+                      failed_recipients: int = 0):
+        if status not in ("settled", "failed"):
+            raise ValueError("status must be 'settled' or 'failed'")
+        payload = {"status": status, "gas_used": gas_used, "failed_recipients": failed_recipients,
+                   "settled_at": datetime.now(timezone.utc).isoformat()}
+        return self.supabase.table(self.table).update(payload).eq("batch_id", batch_id).execute()
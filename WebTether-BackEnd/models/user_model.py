@@ -9,12 +9,7 @@ Responsibilities:
 - Keep business logic out of model (controllers should enforce flows, rollbacks, etc.)
 """
 
-from supabase import create_client
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+from models.db import supabase
 
 
 class UserModel:
@@ -82,6 +77,18 @@ class UserModel:
         """
         return self.supabase.table(self.table).select("*").eq("id", uid).maybe_single().execute()
 
+    def get_wallets_by_ids(self, uids: list):
+        """id + wallet_address for many users in one round trip."""
+        if not uids:
+            raise ValueError("uids must not be empty")
+        return self.supabase.table(self.table).select("id,wallet_address").in_("id", list(uids)).execute()
+
+    def get_plans_by_ids(self, uids: list):
+        """id + plan for many users in one round trip (cadence limits)."""
+        if not uids:
+            raise ValueError("uids must not be empty")
+        return self.supabase.table(self.table).select("id,plan").in_("id", list(uids)).execute()
+
     def update_user(self, uid, data: dict):
         """
         Update user row with fields in `data`.
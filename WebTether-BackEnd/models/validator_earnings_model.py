@@ -0,0 +1,91 @@
+# models/validator_earnings_model.py
+"""
+ValidatorEarningsModel - thin DB layer for the `validator_earnings` ledger.
+
+Schema (relevant columns):
+ - eid (bigint identity PK), uid (bigint, the validator), wid (bigint), pid (bigint, unique)
+ - amount_wei (numeric(78,0)), status ('pending' | 'batched' | 'settled')
+ - batch_id (bigint, nullable), tx_hash (text, nullable), created_at, settled_at (timestamptz)
+
+One row is credited per authenticated manual check (utils.reward_credits, written in the
+background); utils.reward_settlement moves rows pending -> batched -> settled (or back to pending).
+"""
+
+from models.db import supabase
+from datetime import datetime, timezone
+from typing import Optional
+
+EARNING_STATUSES = {"pending", "batched", "settled"}
+
+
+class ValidatorEarningsModel:
+    def __init__(self):
+        self.supabase = supabase
+        self.table = "validator_earnings"
+
+    @staticmethod
+    def build_payload(uid: int, wid: int, pid: int, amount_wei: int) -> dict:
+        """The row credit inserts (also what the background credit writer batches)."""
+        if not uid or not pid or amount_wei is None or int(amount_wei) <= 0:
+            raise ValueError("uid, pid and a positive amount_wei are required")
+        return {
+            "uid": uid,
+            "wid": wid,
+            "pid": pid,
+            "amount_wei": int(amount_wei),
+            "status": "pending"
+        }
+
+    def credit(self, uid: int, wid: int, pid: int, amount_wei: int):
+        payload = self.build_payload(uid, wid, pid, amount_wei)
+        # pid is unique, so the same ping can never be credited twice
+        return self.supabase.table(self.table).insert(payload).execute()
+
+    def credit_many(self, rows: list):
+        """Insert several built payloads; a pid that is already credited is left untouched."""
+        if not rows:
+            raise ValueError("rows must not be empty")
+        return (self.supabase.table(self.table)
+                .upsert(rows, on_conflict="pid", ignore_duplicates=True).execute())
+
+    def get_pending(self, limit: int = 5000, after_eid: int = 0):
+        return (self.supabase.table(self.table).select("*")
+                .eq("status", "pending").gt("eid", after_eid)
+                .order("eid").limit(limit).execute())
+
+    def get_by_batch(self, batch_id: int):
+        return self.supabase.table(self.table).select("*").eq("batch_id", batch_id).execute()
+
+    def get_by_uid(self, uid: int, status: Optional[str] = None, limit: int = 100):
+        query = self.supabase.table(self.table).select("*").eq("uid", uid)
+        if status is not None:
+            if status not in EARNING_STATUSES:
+                raise ValueError(f"status must be one of {sorted(EARNING_STATUSES)}")
+            query = query.eq("status", status)
+        return query.order("eid", desc=True).limit(limit).execute()
+
+    def get_amounts_by_uid(self, uid: int):
+        """Every ledger row of a validator, narrowed to the columns needed for totals."""
+        return self.supabase.table(self.table).select("status,amount_wei").eq("uid", uid).execute()
+
+    def assign_batch(self, eids: list, batch_id: int):
+        if not eids:
+            raise ValueError("eids must not be empty")
+        return (self.supabase.table(self.table)
+                .update({"status": "batched", "batch_id": batch_id})
+                .in_("eid", eids).eq("status", "pending").execute())
+
+    def mark_settled(self, batch_id: int, tx_hash: str):
+        return (self.supabase.table(self.table)
+                .update({"status": "settled", "tx_hash": tx_hash,
+                         "settled_at": datetime.now(timezone.utc).isoformat()})
+                .eq("batch_id", batch_id).eq("status", "batched").execute())
+
+    def release_batch(self, batch_id: int, uids: Optional[list] = None):
+        """Return a batch's rows (optionally only those of `uids`) to the pending pool."""
+        query = (self.supabase.table(self.table)
+                 .update({"status": "pending", "batch_id": None})
+                 .eq("batch_id", batch_id).eq("status", "batched"))
+        if uids:
+            query = query.in_("uid", uids)
+        return query.execute()
@@ -8,12 +8,7 @@ Responsibilities:
  - Return Supabase response objects so controllers can inspect .data / status.
 """
 
-from supabase import create_client
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+from models.db import supabase
 
 
 class WebsiteModel:
@@ -23,7 +18,8 @@ class WebsiteModel:
 
     # Create a website row. uid should be the owner user id.
     def create_website(self, url: str, uid: int, category: str = None,
-                       name: str = None, reward_per_ping: float = None, status: str = None):
+                       name: str = None, reward_per_ping: float = None, status: str = None,
+                       notify_url: str = None, target_id: int = None):
         if not url:
             raise ValueError("url is required")
 
@@ -39,9 +35,19 @@ class WebsiteModel:
             payload["reward_per_ping"] = reward_per_ping
         if status is not None:
             payload["status"] = status
+        if notify_url is not None:
+            payload["notify_url"] = notify_url
+        if target_id is not None:
+            payload["target_id"] = target_id
 
         return self.supabase.table(self.table).insert(payload).execute()
 
+    def create_websites(self, rows: list):
+        """Multi-row insert of already validated payloads (same keys as create_website)."""
+        if not rows:
+            raise ValueError("rows must not be empty")
+        return self.supabase.table(self.table).insert(rows).execute()
+
     # Read operations
     def get_all_websites(self):
         return self.supabase.table(self.table).select("*").execute()
@@ -53,6 +59,22 @@ class WebsiteModel:
     def get_websites_by_owner(self, uid: int):
         return self.supabase.table(self.table).select("*").eq("uid", uid).execute()
 
+    def get_websites_by_target_ids(self, target_ids: list):
+        """wid / owner / target of every website subscribed to the given probe targets."""
+        if not target_ids:
+            raise ValueError("target_ids must not be empty")
+        return (self.supabase.table(self.table).select("wid,uid,target_id")
+                .in_("target_id", list(target_ids)).execute())
+
+    def get_websites_without_target(self, after_wid: int = 0, limit: int = 1000):
+        return (self.supabase.table(self.table).select("wid,url")
+                .is_("target_id", "null").gt("wid", after_wid)
+                .order("wid").limit(limit).execute())
+
+    def get_urls_by_owner(self, uid: int):
+        """wid + url of every site of an owner (dedupe checks)."""
+        return self.supabase.table(self.table).select("wid,url").eq("uid", uid).execute()
+
     def get_websites_excluding_user(self, uid: int):
         """Return websites not owned by the given uid."""
         return self.supabase.table(self.table).select("*").neq("uid", uid).execute()
@@ -65,16 +87,23 @@ class WebsiteModel:
         return self.get_websites_excluding_user(current_uid)
 
     # Update & delete
-    def update_website(self, wid: int, data: dict):
+    # owner_uid makes the write conditional on ownership (no rows returned = not found or not owner)
+    def update_website(self, wid: int, data: dict, owner_uid: int = None):
         # whitelist fields to prevent accidental overwrite
-        allowed = {"url", "category", "status", "name", "reward_per_ping", "uid"}
+        allowed = {"url", "category", "status", "name", "reward_per_ping", "uid", "notify_url", "target_id"}
         payload = {k: v for k, v in (data or {}).items() if k in allowed}
         if not payload:
             raise ValueError("No updatable fields provided")
-        return self.supabase.table(self.table).update(payload).eq("wid", wid).execute()
-
-    def delete_website(self, wid: int):
-        return self.supabase.table(self.table).delete().eq("wid", wid).execute()
+        query = self.supabase.table(self.table).update(payload).eq("wid", wid)
+        if owner_uid is not None:
+            query = query.eq("uid", owner_uid)
+        return query.execute()
+
+    def delete_website(self, wid: int, owner_uid: int = None):
+        query = self.supabase.table(self.table).delete().eq("wid", wid)
+        if owner_uid is not None:
+            query = query.eq("uid", owner_uid)
+        return query.execute()
 
     def get_websites_by_user(self, uid: int):
         return self.supabase.table(self.table).select("*").eq("uid", uid).execute()
\ No newline at end of file
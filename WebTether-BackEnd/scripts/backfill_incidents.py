@@ -0,0 +1,47 @@
+# scripts/backfill_incidents.py
+"""
+Rebuild the incident timeline (utils/incidents.py) from stored ping history.
+
+Usage (from WebTether-BackEnd/):
+    python scripts/backfill_incidents.py --wid 42          # one website
+    python scripts/backfill_incidents.py --all             # every website
+
+Reads archived + live pings oldest first and replaces the website's `incident` rows.
+Run it once after applying migrations/006_incident.sql; afterwards the ping listener keeps
+the timeline current. Prints a JSON report.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.db import response_rows  # noqa: E402
+from models.website_model import WebsiteModel  # noqa: E402
+from utils.incidents import rebuild_incidents  # noqa: E402
+from utils.retention import iter_ping_history  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild website incident timelines from ping history")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--wid", type=int, action="append", help="website id (repeatable)")
+    target.add_argument("--all", action="store_true")
+    args = parser.parse_args()
+
+    if args.all:
+        resp = WebsiteModel().get_all_websites()
+        wids = sorted(row["wid"] for row in response_rows(resp))
+    else:
+        wids = args.wid
+
+    report = {}
+    for wid in wids:
+        report[wid] = rebuild_incidents(wid, iter_ping_history(wid))
+    print(json.dumps({"incidents_by_wid": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# scripts/backfill_probe_targets.py
+"""
+Attach existing websites to canonical probe targets (migrations/007_probe_target.sql).
+
+Usage (from WebTether-BackEnd/):
+    python scripts/backfill_probe_targets.py [--batch 1000]
+
+Walks websites with no target_id in wid order, acquires one reference per website (so shared
+URLs end up with refcount = number of websites) and stores the target_id on each row.
+Safe to re-run: only websites still without a target are touched. Prints a JSON report.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.db import response_rows  # noqa: E402
+from models.website_model import WebsiteModel  # noqa: E402
+from utils.probe_targets import acquire_targets, canonical_url  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assign probe targets to websites created before shared targets")
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    websites = WebsiteModel()
+    report = {"websites": 0, "attached": 0, "skipped": 0, "targets": set()}
+    after = 0
+    while True:
+        resp = websites.get_websites_without_target(after_wid=after, limit=args.batch)
+        rows = response_rows(resp)
+        if not rows:
+            break
+        after = rows[-1]["wid"]
+        report["websites"] += len(rows)
+        targets = acquire_targets([row["url"] for row in rows])
+        for row in rows:
+            target_id = targets.get(canonical_url(row["url"]))
+            if target_id is None:
+                report["skipped"] += 1
+                continue
+            websites.update_website(row["wid"], {"target_id": target_id})
+            report["attached"] += 1
+            report["targets"].add(target_id)
+
+    report["targets"] = len(report["targets"])
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
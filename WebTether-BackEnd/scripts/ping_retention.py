@@ -0,0 +1,54 @@
+# scripts/ping_retention.py
+"""
+Archive and downsample old pings (see utils/retention.py).
+
+Usage (from WebTether-BackEnd/, e.g. hourly from cron):
+    python scripts/ping_retention.py                      # everything older than PING_RETENTION_HOURS
+    python scripts/ping_retention.py --older-than-hours 168 --max-hours 24
+    python scripts/ping_retention.py --dry-run            # report what would be archived
+    python scripts/ping_retention.py --read 2026-01-01T00:00:00Z --wid 42   # dump an archived hour
+
+Prints a JSON report of the hours processed.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ping_archive import PingArchive, floor_hour  # noqa: E402
+from utils.retention import RetentionJob, retention_cutoff  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive, downsample and delete old ping rows")
+    parser.add_argument("--older-than-hours", type=int, help="override PING_RETENTION_HOURS")
+    parser.add_argument("--max-hours", type=int, help="stop after this many hours (bounded runs)")
+    parser.add_argument("--read-batch", type=int)
+    parser.add_argument("--delete-batch", type=int)
+    parser.add_argument("--archive-dir", help="override PING_ARCHIVE_DIR")
+    parser.add_argument("--codec", choices=["gzip", "zstd"], help="override PING_ARCHIVE_CODEC")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--read", metavar="HOUR", help="print the archived rows of one hour instead")
+    parser.add_argument("--wid", type=int, help="with --read: only this website")
+    args = parser.parse_args()
+
+    archive = PingArchive(root=args.archive_dir, codec=args.codec)
+
+    if args.read:
+        hour = floor_hour(args.read)
+        for row in archive.read_hour(hour):
+            if args.wid is None or row["wid"] == args.wid:
+                print(json.dumps(row))
+        return
+
+    job = RetentionJob(archive=archive, read_batch=args.read_batch, delete_batch=args.delete_batch)
+    report = job.run(cutoff=retention_cutoff(hours=args.older_than_hours),
+                     max_hours=args.max_hours, dry_run=args.dry_run)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# scripts/probe_scheduler.py
+"""
+Run the shared-target probe scheduler (utils/probe_scheduler.py).
+
+Usage (from WebTether-BackEnd/):
+    python scripts/probe_scheduler.py            # loop forever
+    python scripts/probe_scheduler.py --once     # one tick, prints a JSON report
+
+Run a single instance per deployment. Websites created before migrations/007_probe_target.sql
+need scripts/backfill_probe_targets.py first, otherwise they have no target to be scheduled by.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import register_ping_side_effects  # noqa: E402
+from utils.probe_scheduler import PROBE_SCHEDULER_TICK_SECONDS, ProbeScheduler  # noqa: E402
+
+
+def main():
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Probe due canonical targets and fan pings out to websites")
+    parser.add_argument("--once", action="store_true", help="run a single tick and exit")
+    parser.add_argument("--tick-seconds", type=float, default=PROBE_SCHEDULER_TICK_SECONDS)
+    args = parser.parse_args()
+
+    # scheduler pings get the same per-ping side effects as pings stored by the API; the API's
+    # in-memory views pick them up from the database through utils/ping_feed.py
+    register_ping_side_effects()
+
+    scheduler = ProbeScheduler()
+    if args.once:
+        print(json.dumps(scheduler.tick(), indent=2))
+        return
+    print(f"Probe scheduler running every {args.tick_seconds}s")
+    try:
+        scheduler.run_forever(args.tick_seconds)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
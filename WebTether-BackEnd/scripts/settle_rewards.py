@@ -0,0 +1,53 @@
+# scripts/settle_rewards.py
+"""
+Pay out pending validator earnings in batches (see utils/reward_settlement.py).
+
+Usage (from WebTether-BackEnd/):
+    python scripts/settle_rewards.py                  # one pass: confirm, resend, submit
+    python scripts/settle_rewards.py --wait 60        # ... then wait for the receipts
+    python scripts/settle_rewards.py --loop 300       # keep settling every 5 minutes
+    python scripts/settle_rewards.py --dry-run        # show the batches that would be sent
+
+Local Hardhat node: deploy with `npx hardhat run scripts/deploy.js --network localhost`,
+fund the contract, and set PING_PAYMENT_CONTRACT plus SETTLEMENT_PRIVATE_KEY. The contract
+owner is the deployer, so use the private key of Hardhat account #0.
+
+Prints a JSON report per pass.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.reward_settlement import RewardSettler  # noqa: E402
+
+
+def main():
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Settle validator earnings through PingPayment.batchReward")
+    parser.add_argument("--max-batches", type=int, help="override SETTLEMENT_MAX_BATCHES")
+    parser.add_argument("--batch-size", type=int, help="override SETTLEMENT_BATCH_SIZE")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--wait", type=float, metavar="SECONDS", help="wait for receipts after submitting")
+    parser.add_argument("--loop", type=float, metavar="SECONDS", help="repeat every SECONDS until interrupted")
+    args = parser.parse_args()
+
+    settler = RewardSettler(batch_size=args.batch_size)
+    while True:
+        report = settler.run(max_batches=args.max_batches, dry_run=args.dry_run)
+        if args.wait and not args.dry_run:
+            report["confirmed"] += settler.wait_for_receipts(timeout=args.wait)
+        print(json.dumps(report, indent=2, default=str))
+        if not args.loop:
+            return
+        time.sleep(args.loop)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# scripts/webhook_sink.py
+"""
+Local HTTP stand-in for notification webhooks.
+
+Usage:
+    python scripts/webhook_sink.py [--port 9099] [--fail-every N]
+
+Prints every JSON batch it receives. --fail-every N answers 503 to every Nth request,
+which exercises the dispatcher's retry/backoff path. Point NOTIFY_WEBHOOK_URL (or a
+website's notify_url, together with NOTIFY_ALLOW_PRIVATE_URLS=1) at http://127.0.0.1:<port>/.
+"""
+
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(fail_every: int):
+    state = {"requests": 0}
+    lock = threading.Lock()
+
+    class SinkHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            with lock:
+                state["requests"] += 1
+                n = state["requests"]
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            if fail_every and n % fail_every == 0:
+                self.send_response(503)
+                self.end_headers()
+                print(f"#{n} -> 503 (simulated failure)")
+                return
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                payload = body.decode("utf-8", "replace")
+            print(f"#{n} {self.path} {json.dumps(payload)}")
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    return SinkHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print webhook deliveries")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9099)
+    parser.add_argument("--fail-every", type=int, default=0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.fail_every))
+    print(f"Webhook sink listening on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# serve.py
+"""
+Production entry point: runs asgi:app under uvicorn with tuned worker / connection settings.
+
+    python serve.py
+
+Environment (defaults in brackets):
+ - HOST [0.0.0.0], PORT [5000]
+ - WEB_CONCURRENCY [number of CPUs]     worker processes, each with its own event loop
+ - WEB_BACKLOG [2048]                   listen() backlog
+ - WEB_LIMIT_CONCURRENCY [1000]         per-worker cap on open connections+tasks (503 beyond it)
+ - WEB_KEEPALIVE_SECONDS [15]           idle keep-alive timeout (keep above the proxy's, e.g. ALB 60 -> 65)
+ - WEB_GRACEFUL_TIMEOUT [30]            seconds to drain in-flight requests on shutdown
+ - WEB_PROXY_HEADERS [1]                trust X-Forwarded-* from FORWARDED_ALLOW_IPS [127.0.0.1]
+ - LOG_LEVEL [info]
+
+Per-process pools are set where they are used: ASYNC_DB_MAX_CONNECTIONS (models/async_db.py),
+PROBE_ASYNC_MAX_CONNECTIONS (utils/probe_utils.py), WSGI_FALLBACK_THREADS (asgi.py).
+uvloop / httptools are used automatically when installed.
+
+Gunicorn-managed equivalent:
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker -w $WEB_CONCURRENCY --graceful-timeout 30 --keep-alive 15
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default) not in ("0", "false", "False")
+
+
+def _optional(module: str) -> bool:
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+def main():
+    import uvicorn
+
+    uvicorn.run(
+        "asgi:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", 5000)),
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop" if _optional("uvloop") else "asyncio",
+        http="httptools" if _optional("httptools") else "h11",
+        backlog=int(os.getenv("WEB_BACKLOG", 2048)),
+        limit_concurrency=int(os.getenv("WEB_LIMIT_CONCURRENCY", 1000)),
+        timeout_keep_alive=int(os.getenv("WEB_KEEPALIVE_SECONDS", 15)),
+        timeout_graceful_shutdown=int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30)),
+        proxy_headers=_flag("WEB_PROXY_HEADERS", "1"),
+        forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        log_level=os.getenv("LOG_LEVEL", "info"),
+        access_log=_flag("WEB_ACCESS_LOG", "0"),
+    )
+
+
+if __name__ == "__main__":
+    main()
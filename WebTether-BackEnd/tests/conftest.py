@@ -0,0 +1,24 @@
+# tests/conftest.py
+"""
+Shared fixtures: the real app wired to the in-memory stand-ins from bench/harness.py.
+bench.harness must be imported before anything from controllers/ (it sets env overrides).
+"""
+
+import pytest
+
+from bench.harness import build_app, seed_dataset
+
+
+@pytest.fixture
+def bench_app():
+    """(flask test client, fake db) on a fresh FakeSupabase with 20 users and 10 websites."""
+    from utils.anomaly_writer import anomaly_writer
+    from utils.reward_credits import reward_credits
+
+    # let background writers finish the previous test's rows before the fake is swapped
+    anomaly_writer.flush()
+    reward_credits.flush()
+    reward_credits._site_cache.clear()
+    app, db, _ = build_app()
+    seed_dataset(db, pings=0, users=20, websites=10)
+    return app.test_client(), db
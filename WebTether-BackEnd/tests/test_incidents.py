@@ -0,0 +1,94 @@
+# tests/test_incidents.py
+"""The incident tracker only touches storage on up/down transitions."""
+
+from bench.harness import token_for
+from controllers import website_controller
+from utils.incidents import IncidentTracker
+
+
+class RecordingIncidents:
+    """IncidentModel stand-in: one open incident per website (like the partial unique index)."""
+
+    def __init__(self):
+        self.rows = []
+        self.calls = []
+
+    def _open_rows(self, wid=None):
+        return [r for r in self.rows if r["ended_at"] is None and wid in (None, r["wid"])]
+
+    def get_open_incidents(self):
+        self.calls.append("get_open_incidents")
+        return [dict(r) for r in self._open_rows()]
+
+    def get_open_incident(self, wid):
+        self.calls.append("get_open_incident")
+        return [dict(r) for r in self._open_rows(wid)]
+
+    def open_incident(self, wid, started_at, start_pid=None):
+        self.calls.append("open_incident")
+        if self._open_rows(wid):
+            raise RuntimeError("duplicate key value violates unique constraint")
+        self.rows.append({"wid": wid, "started_at": started_at, "start_pid": start_pid, "ended_at": None})
+
+    def close_incident(self, wid, ended_at, duration_seconds, end_pid=None):
+        self.calls.append("close_incident")
+        closed = self._open_rows(wid)
+        for r in closed:
+            r.update(ended_at=ended_at, duration_seconds=duration_seconds, end_pid=end_pid)
+        return closed
+
+
+def _ping(pid, is_up, wid=1):
+    return {"pid": pid, "wid": wid, "is_up": is_up, "timestamp": f"2026-10-19T00:{pid:02d}:00+00:00"}
+
+
+def test_writes_only_on_transitions():
+    model = RecordingIncidents()
+    tracker = IncidentTracker(model, refresh_seconds=0)
+    results = [tracker.observe(_ping(pid, up)) for pid, up in
+               enumerate([True, True, False, False, False, True, True, False], start=1)]
+    assert results == [None, None, "opened", None, None, "closed", None, "opened"]
+    assert model.calls == ["get_open_incidents", "open_incident", "close_incident", "open_incident"]
+    assert [(r["start_pid"], r.get("end_pid")) for r in model.rows] == [(3, 6), (8, None)]
+
+
+def test_state_is_seeded_from_storage():
+    model = RecordingIncidents()
+    model.rows.append({"wid": 1, "started_at": "2026-10-18T23:00:00+00:00", "start_pid": 0, "ended_at": None})
+    tracker = IncidentTracker(model, refresh_seconds=0)
+    assert tracker.observe(_ping(1, False)) is None
+    assert tracker.observe(_ping(2, True)) == "closed"
+    assert model.rows[0]["duration_seconds"] == 3720.0
+
+
+def test_racing_trackers_write_each_transition_once():
+    model = RecordingIncidents()
+    a, b = IncidentTracker(model, refresh_seconds=0), IncidentTracker(model, refresh_seconds=0)
+    a.observe(_ping(1, True))
+    b.observe(_ping(2, True))
+    assert a.observe(_ping(3, False)) == "opened"
+    # b still believes the site is up: its insert loses and it adopts the stored incident
+    assert b.observe(_ping(4, False)) is None
+    assert b.is_down(1)
+    assert b.observe(_ping(5, True)) == "closed"
+    # a's close finds nothing open any more
+    assert a.observe(_ping(6, True)) is None
+    assert len(model.rows) == 1 and model.rows[0]["end_pid"] == 5
+
+
+def test_steady_pings_cost_no_incident_reads(bench_app, monkeypatch):
+    client, db = bench_app
+    monkeypatch.setattr(website_controller, "incident_tracker", IncidentTracker(refresh_seconds=0))
+    site = db.get_table("website").rows[1]
+    calls = []
+    for _ in range(3):
+        resp = client.post("/pings/", json={"wid": 1, "is_up": True})
+        assert resp.status_code == 201
+        calls.append(resp.headers["X-DB-Calls"])
+    # the insert, plus loading the open incidents once
+    assert calls == ["2", "1", "1"]
+    resp = client.post("/pings/manual", json={"wid": 1, "url": site["url"], "tx_hash": "TX-001"},
+                       headers={"Authorization": f"Bearer {token_for(2)}"})
+    assert resp.status_code == 200, resp.get_json()
+    # user, tx uniqueness, ping insert, tx insert
+    assert resp.headers["X-DB-Calls"] == "4"
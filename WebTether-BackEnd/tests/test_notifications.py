@@ -0,0 +1,66 @@
+# tests/test_notifications.py
+"""Webhook delivery only connects to public addresses, whatever DNS says after the URL check."""
+
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+import requests
+
+from utils import notifications
+from utils.notifications import check_notify_url, post_json
+
+PUBLIC = [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", ("93.184.216.34", 80))]
+
+
+@pytest.fixture
+def sink():
+    """A local webhook receiver on 127.0.0.1; yields (port, received request paths)."""
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            received.append(self.path)
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1], received
+    server.shutdown()
+    server.server_close()
+
+
+def test_rebound_host_is_refused_at_connect_time(monkeypatch, sink):
+    port, received = sink
+    real_getaddrinfo = socket.getaddrinfo
+    answers = iter([PUBLIC])
+
+    def rebinding_getaddrinfo(host, *args, **kwargs):
+        # public for the URL check, loopback for the connection that follows it
+        if host == "rebind.example":
+            return next(answers, None) or real_getaddrinfo("127.0.0.1", *args, **kwargs)
+        return real_getaddrinfo(host, *args, **kwargs)
+
+    monkeypatch.setattr(notifications, "NOTIFY_ALLOW_PRIVATE_URLS", False)
+    monkeypatch.setattr(socket, "getaddrinfo", rebinding_getaddrinfo)
+    url = check_notify_url(f"http://rebind.example:{port}/hook")
+
+    with pytest.raises(requests.ConnectionError, match="non-public address"):
+        post_json(url, {"events": []})
+    assert received == []
+
+
+def test_trusted_urls_may_be_internal(monkeypatch, sink):
+    port, received = sink
+    monkeypatch.setattr(notifications, "NOTIFY_ALLOW_PRIVATE_URLS", False)
+    assert post_json(f"http://127.0.0.1:{port}/ops", {"events": []}, public_only=False) == 204
+    with pytest.raises(requests.ConnectionError):
+        post_json(f"http://127.0.0.1:{port}/user", {"events": []})
+    assert received == ["/ops"]
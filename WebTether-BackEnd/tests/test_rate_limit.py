@@ -0,0 +1,70 @@
+# tests/test_rate_limit.py
+"""Token-bucket admission control: refunds, limit validation and the worker scope."""
+
+import pytest
+
+from bench.harness import build_app, seed_dataset
+from utils import rate_limit
+from utils.rate_limit import InMemoryBucketStore, RateLimiter
+
+LIMITS = {"user": (0.001, 3), "worker": (0.001, 5), "host": (0.001, 2), "global": (0.001, 100)}
+
+
+def test_rejected_call_refunds_the_buckets_it_passed():
+    limiter = RateLimiter(InMemoryBucketStore(), LIMITS)
+    for _ in range(2):
+        assert limiter.check(user_key="a", host="example.com")[0]
+
+    allowed, retry_after, scope = limiter.check(user_key="a", host="example.com")
+    assert (allowed, scope) == (False, "host")
+    assert retry_after > 0
+
+    # the user bucket kept its last token: "a" is still admitted for a different host
+    assert limiter.check(user_key="a", host="other.example")[0]
+    assert limiter.check(user_key="a", host="third.example")[::2] == (False, "user")
+
+
+def test_global_rejection_leaves_user_and_host_untouched():
+    store = InMemoryBucketStore()
+    limiter = RateLimiter(store, {**LIMITS, "global": (0.001, 1)})
+    assert limiter.check(user_key="a")[0]
+    for _ in range(5):
+        assert limiter.check(user_key="b", host="example.com")[::2] == (False, "global")
+
+    assert store._buckets["user:b"][0] == pytest.approx(3, abs=0.01)
+    assert store._buckets["host:example.com"][0] == pytest.approx(2, abs=0.01)
+
+
+@pytest.mark.parametrize("limits", [{"user": (0, 10)}, {"host": (-1, 10)}, {"global": (5, 0)},
+                                    {"worker": (float("nan"), 10)}])
+def test_non_positive_limits_are_rejected(limits):
+    with pytest.raises(ValueError):
+        RateLimiter(InMemoryBucketStore(), limits)
+
+
+def _limited_client(monkeypatch, token=None):
+    monkeypatch.setattr(rate_limit, "rate_limiter", RateLimiter(InMemoryBucketStore(), LIMITS))
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_WORKER_TOKEN", token or "")
+    app, db, _ = build_app(rate_limits=True)
+    seed_dataset(db, pings=0, users=5, websites=3)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    return app.test_client(), next(iter(db.get_table("website").rows))
+
+
+def test_anonymous_pings_share_the_ip_bucket(monkeypatch):
+    client, wid = _limited_client(monkeypatch)
+    codes = [client.post("/pings/", json={"wid": wid, "is_up": True}).status_code for _ in range(4)]
+    assert codes == [201, 201, 201, 429]
+
+
+def test_trusted_workers_use_their_own_scope(monkeypatch):
+    client, wid = _limited_client(monkeypatch, token="worker-secret")
+    worker = {"X-Worker-Token": "worker-secret"}
+    codes = [client.post("/pings/", json={"wid": wid, "is_up": True}, headers=worker).status_code
+             for _ in range(6)]
+    assert codes == [201] * 5 + [429]
+    assert client.post("/pings/", json={"wid": wid, "is_up": True}, headers=worker).get_json()["scope"] == "worker"
+
+    # a wrong token is an ordinary anonymous caller with a bucket of its own
+    wrong = client.post("/pings/", json={"wid": wid, "is_up": True}, headers={"X-Worker-Token": "guess"})
+    assert wrong.status_code == 201
@@ -0,0 +1,65 @@
+# tests/test_reward_credits.py
+"""Validator rewards are only credited for checks the validator ran authenticated."""
+
+from bench.harness import token_for
+from controllers import ping_controller
+from utils.reward_credits import reward_credits
+from utils.write_spool import EARNINGS_TABLE, PING_TABLE, TX_TABLE, WriteSpool
+
+
+def _foreign_site(db, validator_uid):
+    sites = db.get_table("website").rows
+    return next((wid, row) for wid, row in sites.items() if row["uid"] != validator_uid)
+
+
+def _manual(client, wid, url, tx_hash, uid):
+    return client.post("/pings/manual", json={"wid": wid, "url": url, "tx_hash": tx_hash},
+                       headers={"Authorization": f"Bearer {token_for(uid)}"})
+
+
+def _earnings(db):
+    reward_credits.flush()
+    return [(r["uid"], r["wid"], r["pid"], r["status"]) for r in db.get_table("validator_earnings").rows.values()]
+
+
+def test_body_checked_by_uid_is_never_paid(bench_app):
+    client, db = bench_app
+    wid, _ = _foreign_site(db, 4)
+    for _ in range(5):
+        resp = client.post("/pings/", json={"wid": wid, "is_up": True, "checked_by_uid": 4})
+        assert resp.status_code == 201
+    assert _earnings(db) == []
+
+
+def test_manual_check_credits_the_authenticated_validator(bench_app):
+    client, db = bench_app
+    wid, site = _foreign_site(db, 2)
+    resp = _manual(client, wid, site["url"], "TX-001", 2)
+    assert resp.status_code == 200, resp.get_json()
+    assert _earnings(db) == [(2, wid, resp.get_json()["ping"]["pid"], "pending")]
+
+
+def test_owner_checking_own_site_earns_nothing(bench_app):
+    client, db = bench_app
+    site = db.get_table("website").rows[1]
+    resp = _manual(client, 1, site["url"], "TX-002", site["uid"])
+    assert resp.status_code == 200, resp.get_json()
+    assert _earnings(db) == []
+
+
+def test_spooled_manual_check_credits_when_it_drains(bench_app, tmp_path, monkeypatch):
+    client, db = bench_app
+    writers = {PING_TABLE: ping_controller.ping_model.upsert_spooled_pings,
+               TX_TABLE: ping_controller.tx_model.upsert_spooled_transactions,
+               EARNINGS_TABLE: reward_credits.write}
+    spool = WriteSpool(str(tmp_path), writers=writers)
+    monkeypatch.setattr(ping_controller, "write_spool", spool)
+    wid, site = _foreign_site(db, 2)
+
+    resp = _manual(client, wid, site["url"], "TX-003", 2)
+    assert resp.status_code == 202, resp.get_json()
+    assert _earnings(db) == []
+
+    assert spool.drain() == 3
+    pid = next(r["pid"] for r in db.get_table("ping").rows.values() if r.get("tx_hash") == "TX-003")
+    assert _earnings(db) == [(2, wid, pid, "pending")]
@@ -0,0 +1,66 @@
+# tests/test_website_import.py
+"""Bulk import resolves each notify_url host once, concurrently, with a timeout."""
+
+import socket
+import threading
+import time
+
+from utils import website_import
+from utils.website_import import plan_import
+
+PUBLIC = [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", ("93.184.216.34", 443))]
+PRIVATE = [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", ("10.0.0.5", 443))]
+
+
+def _fake_dns(monkeypatch, answers, delay=0.0):
+    lookups = []
+    lock = threading.Lock()
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        with lock:
+            lookups.append(host)
+        time.sleep(delay if host != "slow.example" else 5)
+        if host not in answers:
+            raise socket.gaierror("unknown host")
+        return answers[host]
+
+    monkeypatch.setattr(website_import, "NOTIFY_ALLOW_PRIVATE_URLS", False)
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+    return lookups
+
+
+def test_each_notify_host_is_resolved_once(monkeypatch):
+    lookups = _fake_dns(monkeypatch, {"hooks.example": PUBLIC, "other.example": PUBLIC}, delay=0.1)
+    rows = [{"url": f"site{i}.example", "notify_url": f"https://{'hooks' if i % 2 else 'other'}.example/h{i}"}
+            for i in range(40)]
+
+    started = time.monotonic()
+    results, to_insert = plan_import(rows, {})
+    assert time.monotonic() - started < 1
+    assert sorted(lookups) == ["hooks.example", "other.example"]
+    assert len(to_insert) == 40
+    assert {r["status"] for r in results} == {"pending"}
+
+
+def test_bad_and_slow_hosts_fail_only_their_rows(monkeypatch):
+    monkeypatch.setattr(website_import, "WEBSITE_IMPORT_RESOLVE_TIMEOUT_SECONDS", 0.2)
+    _fake_dns(monkeypatch, {"hooks.example": PUBLIC, "internal.example": PRIVATE})
+    rows = [{"url": "a.example", "notify_url": "https://hooks.example/h"},
+            {"url": "b.example", "notify_url": "https://internal.example/h"},
+            {"url": "c.example", "notify_url": "https://slow.example/h"},
+            {"url": "d.example", "notify_url": "https://missing.example/h"},
+            {"url": "e.example"},
+            {"url": "e.example", "notify_url": "https://hooks.example/h"}]
+
+    started = time.monotonic()
+    results, to_insert = plan_import(rows, {})
+    assert time.monotonic() - started < 1
+    assert [(r["status"], r.get("error")) for r in results] == [
+        ("pending", None),
+        ("invalid", "notify_url must point to a public address"),
+        ("invalid", "notify_url host did not resolve in time"),
+        ("invalid", "notify_url host does not resolve"),
+        ("pending", None),
+        ("duplicate", None),
+    ]
+    assert [i for i, _ in to_insert] == [0, 4]
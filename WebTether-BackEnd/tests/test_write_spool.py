@@ -0,0 +1,84 @@
+# tests/test_write_spool.py
+"""Write spool: a rejected ping takes its transaction with it; orphaned slots are drained."""
+
+import json
+import os
+import time
+
+from utils.write_spool import PING_TABLE, TX_TABLE, WriteSpool
+
+
+class ForeignKeyViolation(Exception):
+    code = "23503"
+
+
+class RecordingWriters(dict):
+    """Table writers standing in for the models; pings for wid 99 violate a foreign key."""
+
+    def __init__(self):
+        self.stored = {PING_TABLE: [], TX_TABLE: []}
+        super().__init__({PING_TABLE: self._pings, TX_TABLE: self._txs})
+
+    def _pings(self, rows):
+        if any(row.get("wid") == 99 for row in rows):
+            raise ForeignKeyViolation("ping_wid_fkey")
+        start = len(self.stored[PING_TABLE])
+        rows = [dict(row, pid=start + i + 1) for i, row in enumerate(rows)]
+        self.stored[PING_TABLE] += rows
+        return rows
+
+    def _txs(self, rows):
+        self.stored[TX_TABLE] += rows
+        return rows
+
+
+def _manual_check(spool, spool_id, wid, tx_hash):
+    return spool.append_many([(PING_TABLE, {"wid": wid, "spool_id": spool_id}, None),
+                              (TX_TABLE, {"tx_hash": tx_hash}, {"pid": spool_id})])
+
+
+def _dead_letters(spool):
+    with open(os.path.join(spool.directory, "dead-letter.jsonl")) as f:
+        rows = [json.loads(line)["entry"] for line in f]
+    return [(entry["table"], entry["row"].get("spool_id") or entry["row"].get("tx_hash")) for entry in rows]
+
+
+def test_rejected_ping_dead_letters_its_transaction(tmp_path):
+    writers = RecordingWriters()
+    spool = WriteSpool(str(tmp_path), writers=writers, batch=2)
+    spool.append(PING_TABLE, {"wid": 1})
+    _manual_check(spool, "bad", 99, "T1")
+    _manual_check(spool, "good", 2, "T2")
+    # a row referencing the bad ping that arrives after it was rejected follows it too
+    spool.drain()
+    spool.append(TX_TABLE, {"tx_hash": "T3"}, {"pid": "bad"})
+
+    spool.drain()
+    assert spool.backlog() == 0
+    assert [row["wid"] for row in writers.stored[PING_TABLE]] == [1, 2]
+    assert [(row["tx_hash"], row["pid"]) for row in writers.stored[TX_TABLE]] == [("T2", 2)]
+    assert _dead_letters(spool) == [(PING_TABLE, "bad"), (TX_TABLE, "T1"), (TX_TABLE, "T3")]
+    assert spool.dead_lettered == 3
+
+
+def test_orphaned_slot_is_drained_by_a_running_spool(tmp_path):
+    writers = RecordingWriters()
+    survivor = WriteSpool(str(tmp_path), writers=writers)
+    departed = WriteSpool(str(tmp_path), writers=writers)
+    assert survivor.directory != departed.directory
+    departed.append(PING_TABLE, {"wid": 3})
+    departed.append(PING_TABLE, {"wid": 4})
+    departed._lock_file.close()     # its process went away without draining
+
+    seen = []
+    survivor.on_drained(PING_TABLE, lambda row: seen.append(row["wid"]))
+    survivor.start()
+    deadline = time.monotonic() + 5
+    while len(seen) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    survivor.stop(5)
+
+    assert seen == [3, 4]
+    assert [row["wid"] for row in writers.stored[PING_TABLE]] == [3, 4]
+    slot = departed.directory
+    assert WriteSpool(str(tmp_path), writers=writers, claimed=(slot, WriteSpool._lock_slot(slot))).backlog() == 0
@@ -0,0 +1,35 @@
+# utils/admin_auth.py
+"""
+Shared-secret auth for operator endpoints (reward settlement, ...).
+
+Set ADMIN_API_TOKEN and send it as `X-Admin-Token: <token>`. With no token configured the
+admin endpoints are disabled (503) rather than open.
+"""
+
+import hmac
+import os
+from functools import wraps
+
+from dotenv import load_dotenv
+from flask import jsonify, request
+
+load_dotenv()
+
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
+
+def is_admin_request(headers) -> bool:
+    supplied = headers.get("X-Admin-Token", "")
+    return bool(ADMIN_API_TOKEN) and hmac.compare_digest(supplied.encode(), ADMIN_API_TOKEN.encode())
+
+
+def require_admin(fn):
+    """Route decorator: 503 when admin endpoints are disabled, 401 on a missing / wrong token."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_API_TOKEN:
+            return jsonify({"error": "Admin endpoints are disabled (ADMIN_API_TOKEN not set)"}), 503
+        if not is_admin_request(request.headers):
+            return jsonify({"error": "Missing or invalid admin token"}), 401
+        return fn(*args, **kwargs)
+    return wrapper
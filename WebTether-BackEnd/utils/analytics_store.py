@@ -0,0 +1,319 @@
+# utils/analytics_store.py
+"""
+Embedded analytical copy of the ping table for aggregations PostgREST can't express
+(group-by, percentiles, window functions) without pulling raw rows into Python.
+
+Engine: DuckDB when the `duckdb` package is installed (ANALYTICS_BACKEND=auto|duckdb), the
+standard-library sqlite3 otherwise (ANALYTICS_BACKEND=sqlite). Both run in-process and fully
+offline; ANALYTICS_PATH=":memory:" (default) or a file. The SQL sticks to what both engines
+share: percentiles are nearest-rank (same as utils.ping_stats.percentile) computed with
+ROW_NUMBER() / COUNT() windows, timestamps are integer epoch milliseconds.
+
+Feeding:
+ - add(row) from the ping feed (utils/ping_feed.py) buffers rows; they are written in batches of
+   ANALYTICS_FLUSH_ROWS and before every query. The feed tails the database, so the store lags
+   stored pings by up to PING_FEED_INTERVAL_SECONDS.
+ - bulk_load(rows) replays the window's history (archive + hot table) at startup; rows are keyed
+   by pid, so overlap with the live feed is harmless
+Until the bulk load has finished `ready` is False and the /analytics endpoints answer 503.
+
+Every process holds its own copy, so it only keeps the last ANALYTICS_WINDOW_HOURS of pings:
+older rows are never loaded and are pruned every ANALYTICS_PRUNE_SECONDS. It backs the
+/analytics endpoints only; /pings/stats always reads the database.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+from utils.ping_stats import parse_timestamp
+from utils.probe_utils import PHASE_FIELDS
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "0") in ("1", "true", "True")
+ANALYTICS_BACKEND = os.getenv("ANALYTICS_BACKEND", "auto")
+ANALYTICS_PATH = os.getenv("ANALYTICS_PATH", ":memory:")
+ANALYTICS_FLUSH_ROWS = int(os.getenv("ANALYTICS_FLUSH_ROWS", 500))
+ANALYTICS_LOAD_BATCH = int(os.getenv("ANALYTICS_LOAD_BATCH", 5000))
+ANALYTICS_WINDOW_HOURS = int(os.getenv("ANALYTICS_WINDOW_HOURS", 7 * 24))
+ANALYTICS_PRUNE_SECONDS = float(os.getenv("ANALYTICS_PRUNE_SECONDS", 60))
+
+COLUMNS = ("pid", "wid", "checked_by_uid", "ts", "is_up", "latency_ms", "region", "source") + tuple(PHASE_FIELDS)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pings (
+    pid BIGINT PRIMARY KEY,
+    wid BIGINT NOT NULL,
+    checked_by_uid BIGINT,
+    ts BIGINT NOT NULL,
+    is_up INTEGER NOT NULL,
+    latency_ms INTEGER,
+    region VARCHAR,
+    source VARCHAR,
+    {phases}
+)""".format(phases=",\n    ".join(f"{f} INTEGER" for f in PHASE_FIELDS))
+
+
+def _epoch_ms(value) -> int:
+    return int(parse_timestamp(value).timestamp() * 1000)
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def to_record(row: dict):
+    """Tuple in COLUMNS order, or None for rows that can't be stored."""
+    if not isinstance(row, dict) or row.get("pid") is None or row.get("wid") is None or not row.get("timestamp"):
+        return None
+    try:
+        ts = _epoch_ms(row["timestamp"])
+    except (TypeError, ValueError):
+        return None
+    return (row["pid"], row["wid"], row.get("checked_by_uid"), ts, 1 if row.get("is_up") else 0,
+            _number(row.get("latency_ms")), row.get("region"), row.get("source"),
+            *(_number(row.get(f)) for f in PHASE_FIELDS))
+
+
+def _percentile_columns(column: str, pcts) -> str:
+    # nearest rank: the value at rank ceil(p * n / 100) is the smallest one with rn * 100 >= p * n
+    return ", ".join(f"MIN(CASE WHEN rn * 100 >= {p} * n THEN {column} END) AS p{p}" for p in pcts)
+
+
+def _ranked(column: str, where: str) -> str:
+    return (f"SELECT {column}, ROW_NUMBER() OVER (ORDER BY {column}) AS rn, COUNT(*) OVER () AS n "
+            f"FROM pings WHERE {where} AND {column} IS NOT NULL")
+
+
+class AnalyticsStore:
+    def __init__(self, backend: str = ANALYTICS_BACKEND, path: str = ANALYTICS_PATH,
+                 flush_rows: int = ANALYTICS_FLUSH_ROWS, window_hours: int = ANALYTICS_WINDOW_HOURS):
+        if backend == "duckdb" and duckdb is None:
+            raise RuntimeError("ANALYTICS_BACKEND=duckdb requires the 'duckdb' package")
+        self.backend = "duckdb" if backend in ("auto", "duckdb") and duckdb is not None else "sqlite"
+        if self.backend == "duckdb":
+            self._conn = duckdb.connect(path)
+        else:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(_SCHEMA)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pings_wid_ts ON pings (wid, ts)")
+        self._lock = threading.RLock()
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        self.flush_rows = flush_rows
+        self.window_hours = window_hours
+        self._pruned_at = 0.0
+        self.ready = False
+        self._thread = None
+        insert = "INSERT OR REPLACE INTO pings ({cols}) VALUES ({marks})"
+        self._insert_sql = insert.format(cols=", ".join(COLUMNS), marks=", ".join("?" for _ in COLUMNS))
+
+    # ------------------------------
+    # Writes
+    # ------------------------------
+    def add(self, row: dict):
+        record = to_record(row)
+        if record is None:
+            return
+        with self._buffer_lock:
+            self._buffer.append(record)
+            full = len(self._buffer) >= self.flush_rows
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        with self._buffer_lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._write(batch)
+        return len(batch)
+
+    def window_start(self) -> datetime:
+        """Oldest timestamp the store keeps."""
+        return datetime.now(timezone.utc) - timedelta(hours=self.window_hours)
+
+    def _write(self, records):
+        cutoff = int(self.window_start().timestamp() * 1000)
+        records = [r for r in records if r[3] >= cutoff]
+        with self._lock:
+            if records:
+                self._conn.executemany(self._insert_sql, records)
+            if time.monotonic() - self._pruned_at >= ANALYTICS_PRUNE_SECONDS:
+                self._conn.execute("DELETE FROM pings WHERE ts < ?", [cutoff])
+                self._pruned_at = time.monotonic()
+            if self.backend == "sqlite":
+                self._conn.commit()
+
+    def bulk_load(self, rows, batch_size: int = ANALYTICS_LOAD_BATCH) -> int:
+        loaded, batch = 0, []
+        for row in rows:
+            record = to_record(row)
+            if record is None:
+                continue
+            batch.append(record)
+            if len(batch) >= batch_size:
+                self._write(batch)
+                loaded += len(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+            loaded += len(batch)
+        self.ready = True
+        return loaded
+
+    def start_bulk_load(self, rows_factory):
+        """bulk_load(rows_factory()) on a background thread (no-op if one is running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+
+        def run():
+            try:
+                logger.info("Analytics store (%s) loaded %d pings", self.backend, self.bulk_load(rows_factory()))
+            except Exception:
+                logger.exception("Analytics bulk load failed")
+
+        self._thread = threading.Thread(target=run, name="analytics-load", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    # ------------------------------
+    # Reads
+    # ------------------------------
+    def _query(self, sql: str, params=()):
+        self.flush()
+        with self._lock:
+            cur = self._conn.execute(sql, list(params))
+            names = [d[0] for d in cur.description]
+            return [dict(zip(names, r)) for r in cur.fetchall()]
+
+    @staticmethod
+    def _range(wid: int, since: datetime = None, until: datetime = None):
+        where, params = ["wid = ?"], [wid]
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(int(since.timestamp() * 1000))
+        if until is not None:
+            where.append("ts < ?")
+            params.append(int(until.timestamp() * 1000))
+        return " AND ".join(where), params
+
+    def row_count(self) -> int:
+        return self._query("SELECT COUNT(*) AS n FROM pings")[0]["n"]
+
+    def rollup(self, wid: int, since: datetime = None, until: datetime = None, latest: int = None) -> dict:
+        """
+        Same shape as utils.ping_stats.rollup_pings over the website's pings in [since, until)
+        (or its `latest` pings).
+        """
+        where, params = self._range(wid, since, until)
+        if latest is not None:
+            # restrict to the newest `latest` pids of the range
+            where = (f"pid IN (SELECT pid FROM pings WHERE {where} ORDER BY ts DESC, pid DESC LIMIT ?)")
+            params = params + [int(latest)]
+        head = self._query(f"SELECT COUNT(*) AS total, COALESCE(SUM(is_up), 0) AS up FROM pings WHERE {where}",
+                           params)[0]
+        total, up = int(head["total"]), int(head["up"])
+
+        def stats(column, pcts):
+            sql = (f"SELECT COUNT(*) AS samples, AVG({column}) AS avg, {_percentile_columns(column, pcts)} "
+                   f"FROM ({_ranked(column, where)}) ranked")
+            return self._query(sql, params)[0]
+
+        lat = stats("latency_ms", (50, 95, 99))
+        phases = {}
+        for field in PHASE_FIELDS:
+            p = stats(field, (95,))
+            phases[field] = {"samples": int(p["samples"]),
+                             "avg": round(float(p["avg"]), 2) if p["avg"] is not None else None,
+                             "p95": p["p95"]}
+        return {
+            "total": total,
+            "up": up,
+            "uptime_pct": round(up * 100.0 / total, 2) if total else None,
+            "latency_ms": {"avg": round(float(lat["avg"]), 2) if lat["avg"] is not None else None,
+                           "p50": lat["p50"], "p95": lat["p95"], "p99": lat["p99"]},
+            "phases": phases
+        }
+
+    def regions(self, wid: int, since: datetime = None, until: datetime = None) -> list:
+        """Per-region checks, uptime and latency percentiles (GROUP BY region)."""
+        where, params = self._range(wid, since, until)
+        counts = self._query(
+            f"SELECT COALESCE(region, 'unknown') AS region, COUNT(*) AS total, SUM(is_up) AS up "
+            f"FROM pings WHERE {where} GROUP BY COALESCE(region, 'unknown') ORDER BY total DESC", params)
+        region_expr = "COALESCE(region, 'unknown')"
+        lat = {r["region"]: r for r in self._query(
+            f"SELECT region, AVG(latency_ms) AS avg, {_percentile_columns('latency_ms', (50, 95))} "
+            f"FROM (SELECT {region_expr} AS region, latency_ms, "
+            f"ROW_NUMBER() OVER (PARTITION BY {region_expr} ORDER BY latency_ms) AS rn, "
+            f"COUNT(*) OVER (PARTITION BY {region_expr}) AS n "
+            f"FROM pings WHERE {where} AND latency_ms IS NOT NULL) ranked GROUP BY region", params)}
+        out = []
+        for r in counts:
+            total, up = int(r["total"]), int(r["up"] or 0)
+            l = lat.get(r["region"], {})
+            out.append({"region": r["region"], "total": total, "up": up,
+                        "uptime_pct": round(up * 100.0 / total, 2) if total else None,
+                        "latency_avg": round(float(l["avg"]), 2) if l.get("avg") is not None else None,
+                        "latency_p50": l.get("p50"), "latency_p95": l.get("p95")})
+        return out
+
+    def timeseries(self, wid: int, since: datetime = None, until: datetime = None,
+                   bucket_seconds: int = 3600, smooth: int = 1) -> list:
+        """
+        One row per time bucket: checks, uptime, latency avg / p95, plus uptime over the
+        trailing `smooth` buckets (a window function over the grouped rows).
+        """
+        where, params = self._range(wid, since, until)
+        b = int(bucket_seconds) * 1000
+        trailing = max(0, int(smooth) - 1)
+        sql = f"""
+            WITH ranked AS (
+                SELECT ts - (ts % {b}) AS bucket, is_up, latency_ms,
+                       ROW_NUMBER() OVER (PARTITION BY ts - (ts % {b}), latency_ms IS NULL ORDER BY latency_ms) AS rn,
+                       COUNT(latency_ms) OVER (PARTITION BY ts - (ts % {b})) AS n
+                FROM pings WHERE {where}
+            ),
+            buckets AS (
+                SELECT bucket, COUNT(*) AS total, SUM(is_up) AS up, AVG(latency_ms) AS latency_avg,
+                       MIN(CASE WHEN latency_ms IS NOT NULL AND rn * 100 >= 95 * n THEN latency_ms END) AS latency_p95
+                FROM ranked GROUP BY bucket
+            )
+            SELECT bucket, total, up, latency_avg, latency_p95,
+                   SUM(up) OVER (ORDER BY bucket ROWS BETWEEN {trailing} PRECEDING AND CURRENT ROW) AS window_up,
+                   SUM(total) OVER (ORDER BY bucket ROWS BETWEEN {trailing} PRECEDING AND CURRENT ROW) AS window_total
+            FROM buckets ORDER BY bucket"""
+        out = []
+        for r in self._query(sql, params):
+            total, up = int(r["total"]), int(r["up"] or 0)
+            out.append({
+                "bucket": datetime.fromtimestamp(int(r["bucket"]) / 1000, tz=timezone.utc).isoformat(),
+                "total": total,
+                "up": up,
+                "uptime_pct": round(up * 100.0 / total, 2) if total else None,
+                "latency_avg": round(float(r["latency_avg"]), 2) if r["latency_avg"] is not None else None,
+                "latency_p95": r["latency_p95"],
+                "window_uptime_pct": round(int(r["window_up"] or 0) * 100.0 / int(r["window_total"]), 2)
+                if r["window_total"] else None
+            })
+        return out
+
+
+analytics = AnalyticsStore() if ANALYTICS_ENABLED else None
+
+
+def analytics_ready() -> bool:
+    """True when the store is enabled and has finished its bulk load."""
+    return analytics is not None and analytics.ready
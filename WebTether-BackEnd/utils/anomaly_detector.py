@@ -0,0 +1,174 @@
+# utils/anomaly_detector.py
+"""
+Streaming per-website anomaly detection over the ping feed.
+
+Each website keeps a fixed-size state, updated in O(1) per ping:
+ - EWMA mean / variance of latency_ms -> z-score of every new sample ("latency_spike")
+ - one-sided CUSUM of the z-scores    -> sustained upward drift ("latency_shift")
+ - exponentially decayed flap score   -> too many up/down changes ("flapping")
+
+No history is read back from the database; a website is judged as soon as its ping arrives.
+Pure logic only - persisting the events is up to the caller.
+"""
+
+import math
+import os
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ANOMALY_EWMA_ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", 0.05))
+ANOMALY_WARMUP_SAMPLES = int(os.getenv("ANOMALY_WARMUP_SAMPLES", 20))
+# floor for the standard deviation, relative to the mean, so very steady sites don't alert on noise
+ANOMALY_MIN_REL_STD = float(os.getenv("ANOMALY_MIN_REL_STD", 0.05))
+ANOMALY_Z_WARNING = float(os.getenv("ANOMALY_Z_WARNING", 4.0))
+ANOMALY_Z_CRITICAL = float(os.getenv("ANOMALY_Z_CRITICAL", 6.0))
+ANOMALY_CUSUM_K = float(os.getenv("ANOMALY_CUSUM_K", 0.75))
+ANOMALY_CUSUM_H = float(os.getenv("ANOMALY_CUSUM_H", 5.0))
+ANOMALY_FLAP_DECAY = float(os.getenv("ANOMALY_FLAP_DECAY", 0.8))
+ANOMALY_FLAP_THRESHOLD = float(os.getenv("ANOMALY_FLAP_THRESHOLD", 2.5))
+
+SEVERITY_WARNING = "warning"
+SEVERITY_CRITICAL = "critical"
+
+
+class WebsiteState:
+    """Constant-size detector state for one website."""
+
+    __slots__ = ("samples", "mean", "var", "cusum", "last_up", "flap_score", "flapping")
+
+    def __init__(self):
+        self.samples = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.cusum = 0.0
+        self.last_up = None
+        self.flap_score = 0.0
+        self.flapping = False
+
+    def to_dict(self):
+        return {
+            "samples": self.samples,
+            "latency_mean": round(self.mean, 2),
+            "latency_std": round(math.sqrt(self.var), 2),
+            "cusum": round(self.cusum, 3),
+            "last_up": self.last_up,
+            "flap_score": round(self.flap_score, 3),
+            "flapping": self.flapping
+        }
+
+
+class AnomalyDetector:
+    def __init__(self,
+                 alpha: float = ANOMALY_EWMA_ALPHA,
+                 warmup: int = ANOMALY_WARMUP_SAMPLES,
+                 z_warning: float = ANOMALY_Z_WARNING,
+                 z_critical: float = ANOMALY_Z_CRITICAL,
+                 cusum_k: float = ANOMALY_CUSUM_K,
+                 cusum_h: float = ANOMALY_CUSUM_H,
+                 flap_decay: float = ANOMALY_FLAP_DECAY,
+                 flap_threshold: float = ANOMALY_FLAP_THRESHOLD,
+                 min_rel_std: float = ANOMALY_MIN_REL_STD):
+        self.alpha = alpha
+        self.warmup = warmup
+        self.z_warning = z_warning
+        self.z_critical = z_critical
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.flap_decay = flap_decay
+        self.flap_threshold = flap_threshold
+        self.min_rel_std = min_rel_std
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def state_for(self, wid):
+        with self._lock:
+            state = self._states.get(wid)
+            return state.to_dict() if state else None
+
+    def observe(self, row: dict) -> list:
+        """
+        Feed one ping row ({wid, is_up, latency_ms, pid?}).
+        Returns a (usually empty) list of anomaly event dicts:
+          {wid, pid, kind, severity, value, baseline, detail}
+        """
+        wid = row.get("wid")
+        if wid is None:
+            return []
+        is_up = bool(row.get("is_up"))
+        latency = row.get("latency_ms")
+
+        events = []
+        with self._lock:
+            state = self._states.get(wid)
+            if state is None:
+                state = self._states[wid] = WebsiteState()
+
+            self._observe_flap(state, is_up, row, events)
+            if is_up and isinstance(latency, (int, float)) and not isinstance(latency, bool):
+                self._observe_latency(state, float(latency), row, events)
+        return events
+
+    def _event(self, row, kind, severity, value, baseline, **detail):
+        return {
+            "wid": row.get("wid"),
+            "pid": row.get("pid"),
+            "kind": kind,
+            "severity": severity,
+            "value": value,
+            "baseline": baseline,
+            "detail": detail
+        }
+
+    def _observe_flap(self, state, is_up, row, events):
+        changed = state.last_up is not None and state.last_up != is_up
+        state.last_up = is_up
+        state.flap_score = state.flap_score * self.flap_decay + (1.0 if changed else 0.0)
+        if not state.flapping and state.flap_score >= self.flap_threshold:
+            state.flapping = True
+            events.append(self._event(row, "flapping", SEVERITY_WARNING,
+                                      round(state.flap_score, 3), self.flap_threshold))
+        elif state.flapping and state.flap_score < self.flap_threshold / 2:
+            # hysteresis: only re-arm once the site has clearly settled
+            state.flapping = False
+
+    def _observe_latency(self, state, x, row, events):
+        if state.samples >= self.warmup:
+            std = max(math.sqrt(state.var), self.min_rel_std * abs(state.mean), 1.0)
+            z = (x - state.mean) / std
+            baseline = round(state.mean, 2)
+
+            if z >= self.z_critical:
+                events.append(self._event(row, "latency_spike", SEVERITY_CRITICAL, x, baseline, z=round(z, 2)))
+            elif z >= self.z_warning:
+                events.append(self._event(row, "latency_spike", SEVERITY_WARNING, x, baseline, z=round(z, 2)))
+
+            state.cusum = max(0.0, state.cusum + z - self.cusum_k)
+            if state.cusum > self.cusum_h:
+                events.append(self._event(row, "latency_shift", SEVERITY_WARNING, x, baseline,
+                                          cusum=round(state.cusum, 2)))
+                state.cusum = 0.0
+
+        state.samples += 1
+        diff = x - state.mean
+        if state.samples <= self.warmup:
+            # exact running mean / variance (Welford) until the baseline is trustworthy
+            state.mean += diff / state.samples
+            state.var += (diff * (x - state.mean) - state.var) / state.samples
+        else:
+            # EWMA mean / variance (West's incremental form)
+            incr = self.alpha * diff
+            state.mean += incr
+            state.var = (1 - self.alpha) * (state.var + diff * incr)
+
+    def reset(self, wid=None):
+        with self._lock:
+            if wid is None:
+                self._states.clear()
+            else:
+                self._states.pop(wid, None)
+
+
+detector = AnomalyDetector()
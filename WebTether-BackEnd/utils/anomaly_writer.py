@@ -0,0 +1,102 @@
+# utils/anomaly_writer.py
+"""
+Background writer for anomaly events.
+
+The detector runs inside a ping listener, i.e. on the request (or spool drain) thread that
+stored the ping. Storing its events there would add a Supabase round trip to ingestion, so the
+listener only enqueues them here (non-blocking, bounded queue) and a background thread inserts
+them in batches of up to ANOMALY_WRITE_BATCH rows, waiting at most ANOMALY_WRITE_WAIT_SECONDS
+to fill a batch. When the queue is full the event is dropped and counted, as for notifications.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from models.anomaly_model import AnomalyModel
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+ANOMALY_QUEUE_SIZE = int(os.getenv("ANOMALY_QUEUE_SIZE", 10000))
+ANOMALY_WRITE_BATCH = int(os.getenv("ANOMALY_WRITE_BATCH", 100))
+ANOMALY_WRITE_WAIT_SECONDS = float(os.getenv("ANOMALY_WRITE_WAIT_SECONDS", 0.5))
+
+
+class AnomalyEventWriter:
+    def __init__(self, anomaly_model: AnomalyModel = None, queue_size: int = ANOMALY_QUEUE_SIZE,
+                 batch_size: int = ANOMALY_WRITE_BATCH, batch_wait: float = ANOMALY_WRITE_WAIT_SECONDS):
+        self.anomaly_model = anomaly_model or AnomalyModel()
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = {"enqueued": 0, "dropped": 0, "written": 0, "failed": 0}
+
+    def enqueue(self, event: dict) -> bool:
+        """Validate and queue one event (create_event keyword arguments). Never blocks."""
+        payload = AnomalyModel.build_payload(**event)
+        self.start()
+        try:
+            self._queue.put_nowait(payload)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("enqueued")
+        return True
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.stats[name] += n
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="anomaly-writer", daemon=True)
+                self._thread.start()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued event has been written or given up on (useful in tests)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _collect_batch(self) -> list:
+        """Block for the first event, then gather more for up to batch_wait seconds."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                self.anomaly_model.create_events(batch)
+                self._count("written", len(batch))
+            except Exception:
+                self._count("failed", len(batch))
+                logger.exception("Failed to store %d anomaly event(s)", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+anomaly_writer = AnomalyEventWriter()
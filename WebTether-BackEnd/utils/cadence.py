@@ -0,0 +1,151 @@
+# utils/cadence.py
+"""
+Adaptive check cadence for probe targets.
+
+After every scheduled probe the controller picks the target's next interval:
+ - down, an up/down flip, or a latency spike (latency > CADENCE_SPIKE_FACTOR x the target's
+   baseline and at least CADENCE_SPIKE_MIN_MS above it) -> tighten to CADENCE_FAST_RECHECK_SECONDS
+   and reset the stable streak
+ - otherwise the streak grows and the interval backs off geometrically from
+   PROBE_TARGET_INTERVAL_SECONDS by CADENCE_BACKOFF_FACTOR per stable check
+
+and always clamps the result to the owners' plan limits. The per-target state is two columns
+on probe_target (stable_checks, latency_baseline_ms, the latter an EWMA of up latencies); a
+target that has never been evaluated (stable_checks is null) is seeded by replaying its recent
+rows from `ping` through the same rules.
+
+Plan limits (users.plan, migrations/008_adaptive_cadence.sql) are (min, max) interval seconds:
+the fastest cadence an owner's websites may be checked at and the slowest they may fall back
+to. A target shared by several owners runs at the most generous floor among them and the
+strictest ceiling; ProbeScheduler then only records a ping for a website when its own owner's
+floor has elapsed. Override the table with CADENCE_PLAN_LIMITS, e.g.
+'{"free": [300, 1800], "pro": [60, 900]}'.
+"""
+
+import json
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROBE_TARGET_INTERVAL_SECONDS = int(os.getenv("PROBE_TARGET_INTERVAL_SECONDS", 60))
+CADENCE_FAST_RECHECK_SECONDS = int(os.getenv("CADENCE_FAST_RECHECK_SECONDS", 30))
+CADENCE_BACKOFF_FACTOR = float(os.getenv("CADENCE_BACKOFF_FACTOR", 1.5))
+CADENCE_SPIKE_FACTOR = float(os.getenv("CADENCE_SPIKE_FACTOR", 2.0))
+CADENCE_SPIKE_MIN_MS = float(os.getenv("CADENCE_SPIKE_MIN_MS", 100))
+CADENCE_BASELINE_ALPHA = float(os.getenv("CADENCE_BASELINE_ALPHA", 0.2))
+CADENCE_HISTORY_PINGS = int(os.getenv("CADENCE_HISTORY_PINGS", 50))
+
+DEFAULT_PLAN = "free"
+DEFAULT_PLAN_LIMITS = {
+    "free": (300, 1800),
+    "pro": (60, 900),
+    "business": (30, 600),
+}
+
+# outcomes reported per probe
+TIGHTENED, BACKED_OFF = "tightened", "backed_off"
+
+
+def _load_plan_limits() -> dict:
+    raw = os.getenv("CADENCE_PLAN_LIMITS")
+    if not raw:
+        return dict(DEFAULT_PLAN_LIMITS)
+    limits = {}
+    for plan, bounds in json.loads(raw).items():
+        low, high = int(bounds[0]), int(bounds[1])
+        if low <= 0 or high < low:
+            raise ValueError(f"CADENCE_PLAN_LIMITS[{plan!r}] must be [min, max] with 0 < min <= max")
+        limits[plan] = (low, high)
+    if DEFAULT_PLAN not in limits:
+        raise ValueError(f"CADENCE_PLAN_LIMITS must define the {DEFAULT_PLAN!r} plan")
+    return limits
+
+
+PLAN_LIMITS = _load_plan_limits()
+
+
+def plan_limits(plan) -> tuple:
+    """(min, max) interval seconds for a plan name; unknown or missing plans get the default."""
+    return PLAN_LIMITS.get(plan or DEFAULT_PLAN, PLAN_LIMITS[DEFAULT_PLAN])
+
+
+def shared_limits(plans) -> tuple:
+    """Limits for a target shared by owners on `plans`: most generous floor, strictest ceiling."""
+    bounds = [plan_limits(p) for p in plans] or [plan_limits(None)]
+    low = min(b[0] for b in bounds)
+    return low, max(low, min(b[1] for b in bounds))
+
+
+def _latency(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class CadenceController:
+    def __init__(self, base_interval: int = PROBE_TARGET_INTERVAL_SECONDS,
+                 fast_recheck: int = CADENCE_FAST_RECHECK_SECONDS,
+                 backoff_factor: float = CADENCE_BACKOFF_FACTOR,
+                 spike_factor: float = CADENCE_SPIKE_FACTOR, spike_min_ms: float = CADENCE_SPIKE_MIN_MS,
+                 baseline_alpha: float = CADENCE_BASELINE_ALPHA):
+        self.base_interval = base_interval
+        self.fast_recheck = fast_recheck
+        self.backoff_factor = backoff_factor
+        self.spike_factor = spike_factor
+        self.spike_min_ms = spike_min_ms
+        self.baseline_alpha = baseline_alpha
+
+    def is_spike(self, latency, baseline) -> bool:
+        return (latency is not None and baseline is not None
+                and latency > baseline * self.spike_factor and latency - baseline >= self.spike_min_ms)
+
+    def step(self, state: dict, is_up: bool, latency) -> tuple:
+        """
+        Fold one check into `state` ({last_is_up, stable_checks, latency_baseline_ms}).
+        Returns (new_state, outcome).
+        """
+        last_is_up, streak = state.get("last_is_up"), state.get("stable_checks") or 0
+        baseline = _latency(state.get("latency_baseline_ms"))
+        latency = _latency(latency)
+
+        unstable = (not is_up or (last_is_up is not None and bool(last_is_up) != is_up)
+                    or self.is_spike(latency, baseline))
+        if is_up and latency is not None:
+            baseline = latency if baseline is None else baseline + self.baseline_alpha * (latency - baseline)
+        new_state = {"last_is_up": is_up, "stable_checks": 0 if unstable else streak + 1,
+                     "latency_baseline_ms": round(baseline, 2) if baseline is not None else None}
+        return new_state, TIGHTENED if unstable else BACKED_OFF
+
+    def interval(self, stable_checks: int, limits: tuple) -> int:
+        if stable_checks <= 0:
+            seconds = self.fast_recheck
+        else:
+            seconds = self.base_interval * self.backoff_factor ** min(stable_checks - 1, 64)
+        low, high = limits
+        return int(min(max(seconds, low), high))
+
+    def seed(self, history) -> dict:
+        """Replay pings (oldest first) into a fresh state."""
+        state = {"last_is_up": None, "stable_checks": 0, "latency_baseline_ms": None}
+        for row in history:
+            state, _ = self.step(state, bool(row.get("is_up")), row.get("latency_ms"))
+        return state
+
+    def next_check(self, target: dict, result: dict, limits: tuple, history=None) -> dict:
+        """
+        Decide the target's next interval after probing it. `history` (oldest first) seeds
+        targets that have never been evaluated. Returns the probe_target columns to store
+        plus the outcome.
+        """
+        if target.get("stable_checks") is None:
+            state = self.seed(history or [])
+        else:
+            state = {k: target.get(k) for k in ("last_is_up", "stable_checks", "latency_baseline_ms")}
+        state, outcome = self.step(state, bool(result.get("is_up", False)), result.get("latency_ms"))
+        return {"interval_seconds": self.interval(state["stable_checks"], limits),
+                "stable_checks": state["stable_checks"],
+                "latency_baseline_ms": state["latency_baseline_ms"],
+                "outcome": outcome}
@@ -0,0 +1,129 @@
+# utils/export_stream.py
+"""
+Constant-memory CSV / NDJSON exports.
+
+Rows come from generators that page through the database with keyset cursors (never OFFSET,
+never the whole table), are encoded into ~EXPORT_CHUNK_BYTES text chunks and streamed to the
+client with chunked transfer encoding, optionally gzip-compressed on the fly. Memory use is one
+DB page plus one output chunk regardless of how much history is exported.
+"""
+
+import csv
+import io
+import json
+import os
+import zlib
+
+from dotenv import load_dotenv
+from flask import Response, stream_with_context
+
+from models.db import response_rows
+
+load_dotenv()
+
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", 1000))
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", 64 * 1024))
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+def keyset_pages(fetch_after, key: str, page_size: int = None):
+    """
+    Yield rows from fetch_after(last_key, limit) page by page, where the query returns rows
+    with `key` > last_key in ascending `key` order (last_key is None for the first page).
+    """
+    page_size = page_size or EXPORT_PAGE_SIZE
+    last = None
+    while True:
+        page = response_rows(fetch_after(last, page_size))
+        yield from page
+        if len(page) < page_size:
+            return
+        last = page[-1][key]
+
+
+def keyset_pages_with_ties(fetch_after, sort_key: str, tie_key: str, page_size: int = None):
+    """
+    Keyset paging on a non-unique column (e.g. created_at) with a unique tie-breaker (e.g. tx_hash).
+    fetch_after(cursor, ties_only, limit) must return rows ordered by (sort_key, tie_key) where
+      cursor is None                      -> from the start
+      ties_only and cursor=(s, t)         -> sort_key == s and tie_key > t
+      not ties_only and cursor=(s, t)     -> sort_key > s
+    Only equality / greater-than filters are needed, so no OR expression is sent to PostgREST.
+    """
+    page_size = page_size or EXPORT_PAGE_SIZE
+    page = response_rows(fetch_after(None, False, page_size))
+    while True:
+        yield from page
+        if len(page) < page_size:
+            return
+        cursor = (page[-1][sort_key], page[-1][tie_key])
+        # finish every row sharing the last sort value before moving past it
+        while True:
+            ties = response_rows(fetch_after(cursor, True, page_size))
+            yield from ties
+            if len(ties) < page_size:
+                break
+            cursor = (cursor[0], ties[-1][tie_key])
+        page = response_rows(fetch_after(cursor, False, page_size))
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def encode_rows(rows, fmt: str, columns=None):
+    """Yield text chunks of roughly EXPORT_CHUNK_BYTES for `rows` in csv or ndjson."""
+    buf = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        writer = csv.writer(buf)
+        writer.writerow(columns)
+    for row in rows:
+        if writer is not None:
+            writer.writerow([_csv_value(row.get(c)) for c in columns])
+        else:
+            buf.write(json.dumps(row, default=str, separators=(",", ":")))
+            buf.write("\n")
+        if buf.tell() >= EXPORT_CHUNK_BYTES:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        out = compressor.compress(chunk.encode("utf-8"))
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def export_response(rows, fmt: str, filename: str, columns=None, compress: bool = False) -> Response:
+    """Streaming download response for `rows` (an iterator); the iterator runs inside the request context."""
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    body = encode_rows(rows, fmt, columns)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{extension}"',
+               "Cache-Control": "no-store",
+               "X-Accel-Buffering": "no"}
+    if compress:
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+
+def wants_gzip(args, headers) -> bool:
+    """?gzip=1 forces compression, ?gzip=0 disables it, otherwise follow Accept-Encoding."""
+    flag = args.get("gzip")
+    if flag is not None:
+        return flag.lower() in ("1", "true", "yes")
+    return "gzip" in (headers.get("Accept-Encoding") or "").lower()
@@ -0,0 +1,356 @@
+# utils/idempotency.py
+"""
+Idempotency-Key support for write endpoints.
+
+A client that sends `Idempotency-Key: <unique string>` with a POST can retry it safely: the first
+request runs normally and its response is stored; a retry with the same key gets that response
+back (with `Idempotent-Replayed: true`) without running the handler again, so no second probe,
+ping row or transaction is created.
+
+ - Keys are scoped per route and caller (Authorization header, or client IP when anonymous).
+ - The request body is fingerprinted; reusing a key with a different body returns 422.
+ - A retry that arrives while the first attempt is still running waits for it (up to
+   IDEMPOTENCY_WAIT_SECONDS) and then replays; if it is still running after that, 409. The
+   wait is on a condition the store signals when an attempt finishes in this process (the
+   SQLite store also re-checks every IDEMPOTENCY_SQLITE_RECHECK_SECONDS for other workers).
+ - Records of attempts still running are never evicted to make room for new keys.
+ - Only final answers are stored: 5xx and 429 responses are not, so those retries run again.
+ - Requests without the header are untouched.
+
+State lives in a pluggable store:
+ - InMemoryIdempotencyStore (default): per-process, TTL + size bounded
+ - SQLiteIdempotencyStore: survives restarts and is shared by workers on one host;
+   enable with IDEMPOTENCY_BACKEND=sqlite (IDEMPOTENCY_SQLITE_PATH)
+
+Usage: put @idempotent under the route decorator of a Flask or Quart view. Under Quart the
+store is called through asyncio.to_thread, so SQLite I/O and waits never block the event loop.
+"""
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+IDEMPOTENCY_ENABLED = os.getenv("IDEMPOTENCY_ENABLED", "1") not in ("0", "false", "False")
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory")
+IDEMPOTENCY_SQLITE_PATH = os.getenv("IDEMPOTENCY_SQLITE_PATH",
+                                    os.path.join(os.path.dirname(os.path.dirname(__file__)), "idempotency.sqlite3"))
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", 100_000))
+# how long an unfinished first attempt holds its key (covers crashed workers)
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 60))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 10))
+IDEMPOTENCY_MAX_BODY_BYTES = int(os.getenv("IDEMPOTENCY_MAX_BODY_BYTES", 1_000_000))
+IDEMPOTENCY_SQLITE_RECHECK_SECONDS = float(os.getenv("IDEMPOTENCY_SQLITE_RECHECK_SECONDS", 0.25))
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+_MAX_KEY_LENGTH = 255
+
+# begin() outcomes
+STARTED, REPLAY, IN_PROGRESS, MISMATCH = "started", "replay", "in_progress", "mismatch"
+
+
+def _cacheable(status: int) -> bool:
+    return status < 500 and status != 429
+
+
+class InMemoryIdempotencyStore:
+    """Records held in this process only; oldest finished ones evicted beyond max_keys."""
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL_SECONDS, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._records = OrderedDict()   # key -> dict(fingerprint, state, expires, response)
+
+    def _evict(self, now: float):
+        """Drop the oldest records beyond max_keys, skipping attempts still running."""
+        excess = len(self._records) - self.max_keys
+        if excess <= 0:
+            return
+        victims = (k for k, r in self._records.items() if r["state"] != IN_PROGRESS or r["expires"] <= now)
+        for key in list(islice(victims, excess)):
+            del self._records[key]
+
+    def begin(self, key: str, fingerprint: str, lock_seconds: float = IDEMPOTENCY_LOCK_SECONDS):
+        """Claim `key` for a first attempt, or report what is already there: (outcome, response)."""
+        now = time.time()
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None and record["expires"] <= now:
+                del self._records[key]
+                record = None
+            if record is None:
+                self._records[key] = {"fingerprint": fingerprint, "state": IN_PROGRESS,
+                                      "expires": now + lock_seconds, "response": None}
+                self._evict(now)
+                return STARTED, None
+            if record["fingerprint"] != fingerprint:
+                return MISMATCH, None
+            if record["state"] == IN_PROGRESS:
+                return IN_PROGRESS, None
+            return REPLAY, record["response"]
+
+    def complete(self, key: str, response: dict):
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                return
+            record.update(state="done", response=response, expires=time.time() + self.ttl)
+            self._records.move_to_end(key)
+            self._finished.notify_all()
+
+    def abandon(self, key: str):
+        with self._lock:
+            self._records.pop(key, None)
+            self._finished.notify_all()
+
+    def wait(self, key: str, timeout: float):
+        """Block until the attempt holding `key` finishes (or `timeout` passes)."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                record = self._records.get(key)
+                if record is None or record["state"] != IN_PROGRESS or record["expires"] <= time.time():
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                self._finished.wait(remaining)
+
+    def reset(self):
+        with self._lock:
+            self._records.clear()
+
+
+class SQLiteIdempotencyStore:
+    """
+    Records in a local SQLite file (WAL mode), so they outlive restarts and are shared by every
+    worker process on the host. Claiming a key is a single INSERT, atomic across processes.
+    """
+
+    def __init__(self, path: str = IDEMPOTENCY_SQLITE_PATH, ttl: float = IDEMPOTENCY_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._purged_at = 0.0
+        # signalled when an attempt finishes in this process; other workers are seen on re-check
+        self._finished = threading.Condition()
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS idempotency (
+                    key TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    expires REAL NOT NULL,
+                    response TEXT
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idempotency_expires ON idempotency (expires)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _purge(self, conn, now: float):
+        if now - self._purged_at > 60:
+            self._purged_at = now
+            conn.execute("DELETE FROM idempotency WHERE expires <= ?", (now,))
+
+    def begin(self, key: str, fingerprint: str, lock_seconds: float = IDEMPOTENCY_LOCK_SECONDS):
+        now = time.time()
+        conn = self._conn()
+        self._purge(conn, now)
+        conn.execute("DELETE FROM idempotency WHERE key = ? AND expires <= ?", (key, now))
+        claimed = conn.execute(
+            "INSERT OR IGNORE INTO idempotency (key, fingerprint, state, expires) VALUES (?, ?, ?, ?)",
+            (key, fingerprint, IN_PROGRESS, now + lock_seconds)).rowcount
+        if claimed:
+            return STARTED, None
+        row = conn.execute("SELECT fingerprint, state, response FROM idempotency WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            # expired and purged between the two statements: try again
+            return self.begin(key, fingerprint, lock_seconds)
+        if row[0] != fingerprint:
+            return MISMATCH, None
+        if row[1] == IN_PROGRESS:
+            return IN_PROGRESS, None
+        return REPLAY, json.loads(row[2])
+
+    def complete(self, key: str, response: dict):
+        self._conn().execute("UPDATE idempotency SET state = 'done', response = ?, expires = ? WHERE key = ?",
+                             (json.dumps(response), time.time() + self.ttl, key))
+        with self._finished:
+            self._finished.notify_all()
+
+    def abandon(self, key: str):
+        self._conn().execute("DELETE FROM idempotency WHERE key = ? AND state = ?", (key, IN_PROGRESS))
+        with self._finished:
+            self._finished.notify_all()
+
+    def _in_progress(self, key: str) -> bool:
+        row = self._conn().execute("SELECT state, expires FROM idempotency WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] == IN_PROGRESS and row[1] > time.time()
+
+    def wait(self, key: str, timeout: float):
+        """Block until the attempt holding `key` finishes (or `timeout` passes)."""
+        deadline = time.monotonic() + timeout
+        while self._in_progress(key):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            with self._finished:
+                self._finished.wait(min(remaining, IDEMPOTENCY_SQLITE_RECHECK_SECONDS))
+
+    def reset(self):
+        self._conn().execute("DELETE FROM idempotency")
+
+
+def _build_store():
+    if IDEMPOTENCY_BACKEND == "sqlite":
+        return SQLiteIdempotencyStore()
+    return InMemoryIdempotencyStore()
+
+
+store = _build_store()
+
+
+# ------------------------------
+# View decorator (Flask and Quart)
+# ------------------------------
+def _scoped_key(req, key: str) -> str:
+    caller = req.headers.get("Authorization") or f"ip:{req.remote_addr}"
+    raw = f"{req.method} {req.url_rule.rule if req.url_rule is not None else req.path}\n{caller}\n{key}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _fingerprint(body: bytes) -> str:
+    return hashlib.sha256(body or b"").hexdigest()
+
+
+def _error(jsonify, message: str, status: int):
+    resp = jsonify({"error": message})
+    resp.status_code = status
+    return resp
+
+
+def _replay(response_cls, saved: dict):
+    resp = response_cls(saved["body"], status=saved["status"], content_type=saved["content_type"])
+    resp.headers[REPLAYED_HEADER] = "true"
+    return resp
+
+
+def _snapshot(resp, body: bytes) -> dict:
+    return {"status": resp.status_code, "content_type": resp.content_type,
+            "body": body.decode("utf-8", errors="replace")}
+
+
+def _check_key(req):
+    key = req.headers.get(IDEMPOTENCY_HEADER)
+    if key is None or not IDEMPOTENCY_ENABLED:
+        return None, None
+    key = key.strip()
+    if not key or len(key) > _MAX_KEY_LENGTH:
+        return None, f"{IDEMPOTENCY_HEADER} must be 1-{_MAX_KEY_LENGTH} characters"
+    return key, None
+
+
+def idempotent(view):
+    """Replay the stored response for a repeated Idempotency-Key instead of running `view` again."""
+    if inspect.iscoroutinefunction(view):
+        return _idempotent_async(view)
+
+    from flask import Response, jsonify, make_response, request
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key, problem = _check_key(request)
+        if problem:
+            return _error(jsonify, problem, 400)
+        if key is None:
+            return view(*args, **kwargs)
+        if (request.content_length or 0) > IDEMPOTENCY_MAX_BODY_BYTES:
+            return _error(jsonify, "Request body too large for an idempotent request", 413)
+        scoped, fingerprint = _scoped_key(request, key), _fingerprint(request.get_data(cache=True))
+
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        outcome, saved = store.begin(scoped, fingerprint)
+        while outcome == IN_PROGRESS and time.monotonic() < deadline:
+            store.wait(scoped, deadline - time.monotonic())
+            outcome, saved = store.begin(scoped, fingerprint)
+        if outcome == REPLAY:
+            return _replay(Response, saved)
+        if outcome == MISMATCH:
+            return _error(jsonify, f"{IDEMPOTENCY_HEADER} was already used with a different request body", 422)
+        if outcome == IN_PROGRESS:
+            return _error(jsonify, f"A request with this {IDEMPOTENCY_HEADER} is still being processed", 409)
+
+        try:
+            resp = make_response(view(*args, **kwargs))
+        except BaseException:
+            store.abandon(scoped)
+            raise
+        if _cacheable(resp.status_code) and not resp.is_streamed:
+            store.complete(scoped, _snapshot(resp, resp.get_data()))
+        else:
+            store.abandon(scoped)
+        return resp
+
+    return wrapper
+
+
+def _idempotent_async(view):
+    from quart import Response, jsonify, make_response, request
+
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+        key, problem = _check_key(request)
+        if problem:
+            return _error(jsonify, problem, 400)
+        if key is None:
+            return await view(*args, **kwargs)
+        if (request.content_length or 0) > IDEMPOTENCY_MAX_BODY_BYTES:
+            return _error(jsonify, "Request body too large for an idempotent request", 413)
+        scoped, fingerprint = _scoped_key(request, key), _fingerprint(await request.get_data(cache=True))
+
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        outcome, saved = await asyncio.to_thread(store.begin, scoped, fingerprint)
+        while outcome == IN_PROGRESS and time.monotonic() < deadline:
+            await asyncio.to_thread(store.wait, scoped, deadline - time.monotonic())
+            outcome, saved = await asyncio.to_thread(store.begin, scoped, fingerprint)
+        if outcome == REPLAY:
+            return _replay(Response, saved)
+        if outcome == MISMATCH:
+            return _error(jsonify, f"{IDEMPOTENCY_HEADER} was already used with a different request body", 422)
+        if outcome == IN_PROGRESS:
+            return _error(jsonify, f"A request with this {IDEMPOTENCY_HEADER} is still being processed", 409)
+
+        try:
+            resp = await make_response(await view(*args, **kwargs))
+        except BaseException:
+            await asyncio.to_thread(store.abandon, scoped)
+            raise
+        if _cacheable(resp.status_code):
+            await asyncio.to_thread(store.complete, scoped, _snapshot(resp, await resp.get_data()))
+        else:
+            await asyncio.to_thread(store.abandon, scoped)
+        return resp
+
+    return wrapper
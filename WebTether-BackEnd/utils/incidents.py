@@ -0,0 +1,196 @@
+# utils/incidents.py
+"""
+Incident timeline: per-website down periods kept as intervals instead of raw pings.
+
+IncidentTracker follows the ping stream (via a ping listener) and keeps each website's up/down
+state in memory: the open incidents, loaded from storage in one query the first time it is used
+and reloaded every INCIDENT_STATE_REFRESH_SECONDS. A ping that does not change that state costs
+nothing; only a transition touches the database, once: a down ping of an up site opens an
+incident and an up ping of a down site closes it.
+
+Every API worker and the probe scheduler run a tracker, each seeing only the pings it stored, so
+the writes stay conditional (the partial unique index on open incidents / an update filtered on
+ended_at IS NULL): two processes racing on the same transition produce one write, and the loser
+adopts the stored state and reports no change. A process that missed another's transition
+catches up at its next reload.
+
+Uptime for a window is interval arithmetic over the few incidents overlapping it
+(window_downtime), instead of a scan over every ping in the window.
+rebuild_incidents() derives the same intervals from stored ping history (backfill / repair).
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+from models.db import response_rows
+from models.incident_model import IncidentModel
+from utils.ping_stats import parse_timestamp
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# 0 loads the open incidents once and never again
+INCIDENT_STATE_REFRESH_SECONDS = float(os.getenv("INCIDENT_STATE_REFRESH_SECONDS", 60))
+
+
+def _ping_time(row) -> datetime:
+    ts = row.get("timestamp")
+    return parse_timestamp(ts) if ts else datetime.now(timezone.utc)
+
+
+class IncidentTracker:
+    def __init__(self, incident_model: IncidentModel = None,
+                 refresh_seconds: float = INCIDENT_STATE_REFRESH_SECONDS):
+        self.incidents = incident_model or IncidentModel()
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._loading = threading.Lock()
+        self._open = {}             # wid -> started_at of its open incident; absent = up
+        self._loaded_at = None
+
+    def _due(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        return self.refresh_seconds > 0 and time.monotonic() - self._loaded_at >= self.refresh_seconds
+
+    def _load(self):
+        """(Re)load the open incidents when due; one query, skipped while another thread is at it."""
+        if not self._due():
+            return
+        # only the first load makes pings wait; a reload in progress elsewhere is not waited for
+        if not self._loading.acquire(blocking=self._loaded_at is None):
+            return
+        try:
+            if not self._due():
+                return
+            rows = response_rows(self.incidents.get_open_incidents())
+            with self._lock:
+                self._open = {row["wid"]: parse_timestamp(row["started_at"]) for row in rows}
+                self._loaded_at = time.monotonic()
+        except Exception:
+            logger.exception("Failed to load open incidents")
+            if self._loaded_at is None:
+                raise
+        finally:
+            self._loading.release()
+
+    def is_down(self, wid) -> bool:
+        with self._lock:
+            return wid in self._open
+
+    def _open_incident(self, wid, row, at: datetime):
+        try:
+            self.incidents.open_incident(wid, at.isoformat(), row.get("pid"))
+        except Exception:
+            # unique violation: another process opened it since we last loaded the state
+            stored = response_rows(self.incidents.get_open_incident(wid))
+            if not stored:
+                raise
+            with self._lock:
+                self._open[wid] = parse_timestamp(stored[0]["started_at"])
+            return None
+        with self._lock:
+            self._open[wid] = at
+        return "opened"
+
+    def _close_incident(self, wid, row, at: datetime, started: datetime):
+        closed = self.incidents.close_incident(wid, at.isoformat(),
+                                               max(0.0, round((at - started).total_seconds(), 3)),
+                                               row.get("pid"))
+        with self._lock:
+            if self._open.get(wid) == started:
+                del self._open[wid]
+        # the update only matches while the incident is still open
+        return "closed" if response_rows(closed) else None
+
+    def observe(self, row):
+        """Feed one stored ping row. Returns 'opened' / 'closed' when it changed the timeline."""
+        wid, is_up = row.get("wid"), row.get("is_up")
+        if wid is None or is_up is None:
+            return None
+        self._load()
+        with self._lock:
+            started = self._open.get(wid)
+        if not is_up:
+            return None if started is not None else self._open_incident(wid, row, _ping_time(row))
+        if started is None:
+            return None
+        return self._close_incident(wid, row, _ping_time(row), started)
+
+
+def window_downtime(incidents, since: datetime, until: datetime, now: datetime = None) -> float:
+    """Seconds of [since, until) covered by incidents (open ones extend to `now`)."""
+    now = now or datetime.now(timezone.utc)
+    down = 0.0
+    for inc in incidents:
+        start = parse_timestamp(inc["started_at"])
+        end = parse_timestamp(inc["ended_at"]) if inc.get("ended_at") else now
+        overlap = (min(end, until) - max(start, since)).total_seconds()
+        if overlap > 0:
+            down += overlap
+    return down
+
+
+def uptime_for_window(wid: int, since: datetime, until: datetime, monitored_from: datetime = None,
+                      incident_model: IncidentModel = None, now: datetime = None) -> dict:
+    """
+    Uptime of `wid` over [since, until), clipped to [monitored_from, now).
+    Two indexed lookups: closed incidents overlapping the window plus the open one, if any.
+    """
+    incident_model = incident_model or IncidentModel()
+    now = now or datetime.now(timezone.utc)
+    start = max(since, monitored_from) if monitored_from else since
+    end = min(until, now)
+    covered = max(0.0, (end - start).total_seconds())
+    if covered == 0:
+        return {"wid": wid, "from": since.isoformat(), "to": until.isoformat(), "covered_seconds": 0,
+                "downtime_seconds": 0, "uptime_percent": None, "incidents": 0}
+
+    overlapping = response_rows(incident_model.get_closed_overlapping(wid, start.isoformat(), end.isoformat()))
+    overlapping += [r for r in response_rows(incident_model.get_open_incident(wid))
+                    if parse_timestamp(r["started_at"]) < end]
+    down = window_downtime(overlapping, start, end, now)
+    return {
+        "wid": wid,
+        "from": since.isoformat(),
+        "to": until.isoformat(),
+        "covered_seconds": round(covered, 3),
+        "downtime_seconds": round(down, 3),
+        "uptime_percent": round(100.0 * (1 - down / covered), 4),
+        "incidents": len(overlapping)
+    }
+
+
+def incidents_from_pings(wid: int, rows) -> list:
+    """Incident rows (open one last, if the site is still down) from pings in time order."""
+    incidents, current = [], None
+    for row in rows:
+        if row.get("is_up") is None:
+            continue
+        at = _ping_time(row)
+        if not row["is_up"] and current is None:
+            current = {"wid": wid, "started_at": at.isoformat(), "start_pid": row.get("pid")}
+        elif row["is_up"] and current is not None:
+            started = parse_timestamp(current["started_at"])
+            current.update({"ended_at": at.isoformat(), "end_pid": row.get("pid"),
+                            "duration_seconds": round((at - started).total_seconds(), 3)})
+            incidents.append(current)
+            current = None
+    if current is not None:
+        incidents.append(current)
+    return incidents
+
+
+def rebuild_incidents(wid: int, rows, incident_model: IncidentModel = None, batch_size: int = 500) -> int:
+    """Replace the stored timeline of `wid` with one derived from `rows` (pings, oldest first)."""
+    incident_model = incident_model or IncidentModel()
+    incidents = incidents_from_pings(wid, rows)
+    incident_model.delete_incidents_by_wid(wid)
+    for i in range(0, len(incidents), batch_size):
+        incident_model.insert_incidents(incidents[i:i + batch_size])
+    return len(incidents)
@@ -66,10 +66,33 @@ def decode_token(token: str) -> dict | None:
         dict | None: Decoded payload or None if invalid/expired.
     """
     try:
-        decoded = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        print(decoded)
-        return decoded
+        return jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+
+
+def user_id_from_claims(claims) -> int | None:
+    """
+    Defensive extraction of the user id from decoded token claims.
+    Accepts shapes like {"user_id": 31} or nested {"user_id": {"user_id": 31}}.
+    """
+    if not isinstance(claims, dict):
+        return None
+    uid_field = claims.get("user_id") or claims.get("id") or claims.get("uid")
+    if uid_field is None:
+        return None
+    if isinstance(uid_field, dict):
+        for k in ("user_id", "id", "uid"):
+            if k in uid_field:
+                return user_id_from_claims({k: uid_field[k]})
+        if len(uid_field) == 1:
+            (v,) = uid_field.values()
+            return int(v) if isinstance(v, (int, str)) and str(v).isdigit() else None
+        return None
+    if isinstance(uid_field, int):
+        return uid_field
+    if isinstance(uid_field, str) and uid_field.isdigit():
+        return int(uid_field)
+    return None
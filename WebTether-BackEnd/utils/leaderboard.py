@@ -0,0 +1,365 @@
+# utils/leaderboard.py
+"""
+In-memory validator leaderboard, updated incrementally instead of scanning `ping` per request.
+
+Per validator (ping.checked_by_uid / onchain_transactions.uid) and window it keeps:
+ - checks    pings the validator performed
+ - earnings  sum of token_amount of the validator's on-chain transactions
+ - accuracy  share of checks agreeing with the previous ping of the same website (any source);
+             only ranked after LEADERBOARD_MIN_ACCURACY_CHECKS compared checks
+
+Windows: "day" (last 24 hours), "week" (last 168 hours) and "all". Every window holds one sorted
+list per metric keyed by (-value, uid), so an update is O(log n) and top-K / rank-of-user are a
+slice / an index lookup. The rolling windows move at hour granularity: events are also summed
+into hourly buckets, and a bucket is subtracted from a window once it falls out of it.
+
+Updates come from the ping feed (record_ping, utils/ping_feed.py) and from transaction inserts
+(record_transaction). rebuild() replays archived + hot pings and all transactions into a fresh
+state; live events arriving meanwhile are held back and merged before the new state is swapped
+in, deduplicated against what the replay has seen (utils/live_rebuild.py). The replay reads the
+whole history, so it is off at startup unless LEADERBOARD_REBUILD_ON_START=1; enable it on one
+process only. Uses `sortedcontainers` when installed, a bisect-based list otherwise.
+"""
+
+import bisect
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+
+from dotenv import load_dotenv
+
+from models.onchain_transaction_model import OnChainTransactionModel
+from utils.export_stream import keyset_pages_with_ties
+from utils.live_rebuild import LiveRebuild
+from utils.ping_stats import parse_timestamp
+from utils.retention import iter_ping_history
+
+try:
+    from sortedcontainers import SortedList
+except ImportError:
+    SortedList = None
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_MIN_ACCURACY_CHECKS = int(os.getenv("LEADERBOARD_MIN_ACCURACY_CHECKS", 10))
+LEADERBOARD_REBUILD_ON_START = os.getenv("LEADERBOARD_REBUILD_ON_START", "0") in ("1", "true", "True")
+LEADERBOARD_REBUILD_PAGE_SIZE = int(os.getenv("LEADERBOARD_REBUILD_PAGE_SIZE", 5000))
+
+METRICS = ("checks", "earnings", "accuracy")
+WINDOWS = {"day": 24, "week": 7 * 24, "all": None}
+
+# per-validator counters: [checks, compared, agreed, earnings]
+_CHECKS, _COMPARED, _AGREED, _EARNINGS = range(4)
+
+
+class _BisectList:
+    """Minimal stand-in for sortedcontainers.SortedList (O(n) inserts, fine for small boards)."""
+
+    def __init__(self):
+        self._items = []
+
+    def add(self, item):
+        bisect.insort(self._items, item)
+
+    def remove(self, item):
+        i = bisect.bisect_left(self._items, item)
+        if i == len(self._items) or self._items[i] != item:
+            raise ValueError(f"{item!r} not in list")
+        del self._items[i]
+
+    def index(self, item):
+        i = bisect.bisect_left(self._items, item)
+        if i == len(self._items) or self._items[i] != item:
+            raise ValueError(f"{item!r} not in list")
+        return i
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __len__(self):
+        return len(self._items)
+
+
+def _sorted_list():
+    return SortedList() if SortedList is not None else _BisectList()
+
+
+def _hour(at: datetime) -> int:
+    return int(at.timestamp() // 3600)
+
+
+def _event_time(value) -> datetime:
+    if not value:
+        return datetime.now(timezone.utc)
+    try:
+        return parse_timestamp(value)
+    except (TypeError, ValueError):
+        return datetime.now(timezone.utc)
+
+
+def _amount(value) -> Decimal:
+    try:
+        amount = Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        return Decimal(0)
+    return amount if amount.is_finite() else Decimal(0)
+
+
+def _tx_key(row: dict):
+    # transactions are replayed in (created_at, tx_hash) order
+    return _event_time(row.get("created_at")), row["tx_hash"]
+
+
+def _uid(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class _Board:
+    """Totals and rankings of one window."""
+
+    def __init__(self, min_accuracy_checks: int):
+        self.min_accuracy_checks = min_accuracy_checks
+        self.totals = {}
+        self.rankings = {metric: _sorted_list() for metric in METRICS}
+
+    def score(self, metric: str, counters):
+        if metric == "checks":
+            return counters[_CHECKS] or None
+        if metric == "earnings":
+            return counters[_EARNINGS] or None
+        if counters[_COMPARED] < self.min_accuracy_checks:
+            return None
+        return Decimal(counters[_AGREED]) / Decimal(counters[_COMPARED])
+
+    def apply(self, uid: int, delta, sign: int = 1):
+        old = self.totals.get(uid)
+        if old is not None:
+            for metric in METRICS:
+                value = self.score(metric, old)
+                if value is not None:
+                    self.rankings[metric].remove((-value, uid))
+        new = [(old[i] if old else 0) + sign * delta[i] for i in range(4)]
+        if not any(new):
+            self.totals.pop(uid, None)
+            return
+        self.totals[uid] = new
+        for metric in METRICS:
+            value = self.score(metric, new)
+            if value is not None:
+                self.rankings[metric].add((-value, uid))
+
+    def entry(self, uid: int, metric: str, rank: int = None) -> dict:
+        counters = self.totals.get(uid)
+        if counters is None:
+            return None
+        accuracy = (counters[_AGREED] / counters[_COMPARED]) if counters[_COMPARED] else None
+        return {
+            "rank": rank,
+            "uid": uid,
+            "checks": counters[_CHECKS],
+            "earnings": float(counters[_EARNINGS]),
+            "accuracy": round(accuracy, 4) if accuracy is not None else None,
+            "compared_checks": counters[_COMPARED]
+        }
+
+
+class LeaderboardState:
+    """All windows plus the hourly buckets that feed the rolling ones. Not thread-safe."""
+
+    def __init__(self, min_accuracy_checks: int = LEADERBOARD_MIN_ACCURACY_CHECKS):
+        self.boards = {name: _Board(min_accuracy_checks) for name in WINDOWS}
+        self.buckets = {}      # hour -> {uid: counters}
+        self.last_up = {}      # wid -> is_up of its latest ping (for accuracy)
+        self._floors = {}      # window -> last hour already excluded from it
+        self._span = max(h for h in WINDOWS.values() if h)
+
+    def advance(self, now_hour: int):
+        """Drop buckets that fell out of each rolling window."""
+        for name, hours in WINDOWS.items():
+            if hours is None:
+                continue
+            floor = now_hour - hours
+            previous = self._floors.get(name)
+            if previous is not None and floor > previous:
+                board = self.boards[name]
+                for hour in sorted(h for h in self.buckets if previous < h <= floor):
+                    for uid, counters in self.buckets[hour].items():
+                        board.apply(uid, counters, sign=-1)
+            if previous is None or floor > previous:
+                self._floors[name] = floor
+        for hour in [h for h in self.buckets if h <= now_hour - self._span]:
+            del self.buckets[hour]
+
+    def add(self, uid: int, at: datetime, delta, now: datetime = None):
+        now_hour = _hour(now or datetime.now(timezone.utc))
+        self.advance(now_hour)
+        hour = min(_hour(at), now_hour)
+        for name, hours in WINDOWS.items():
+            if hours is None or hour > now_hour - hours:
+                self.boards[name].apply(uid, delta)
+        if hour > now_hour - self._span:
+            bucket = self.buckets.setdefault(hour, {})
+            counters = bucket.setdefault(uid, [0, 0, 0, Decimal(0)])
+            for i in range(4):
+                counters[i] += delta[i]
+
+    def add_ping(self, row: dict, now: datetime = None):
+        wid, is_up = row.get("wid"), row.get("is_up")
+        if is_up is None:
+            return
+        is_up = bool(is_up)
+        previous = self.last_up.get(wid)
+        self.last_up[wid] = is_up
+        uid = _uid(row.get("checked_by_uid"))
+        if uid is None:
+            return
+        compared = 1 if previous is not None else 0
+        agreed = 1 if previous is not None and previous == is_up else 0
+        self.add(uid, _event_time(row.get("timestamp")), [1, compared, agreed, Decimal(0)], now)
+
+    def add_transaction(self, row: dict, now: datetime = None):
+        uid = _uid(row.get("uid"))
+        amount = _amount(row.get("token_amount"))
+        if uid is None or not amount:
+            return
+        self.add(uid, _event_time(row.get("created_at")), [0, 0, 0, amount], now)
+
+
+class Leaderboard:
+    def __init__(self, min_accuracy_checks: int = LEADERBOARD_MIN_ACCURACY_CHECKS):
+        self.min_accuracy_checks = min_accuracy_checks
+        self._state = LeaderboardState(min_accuracy_checks)
+        self._lock = threading.Lock()
+        self._pending = None        # LiveRebuild while rebuilding
+        self._thread = None
+        self.rebuilt_at = None
+
+    @property
+    def rebuilding(self) -> bool:
+        return self._pending is not None
+
+    # ------------------------------
+    # Updates
+    # ------------------------------
+    def record_ping(self, row: dict):
+        with self._lock:
+            if self._pending is not None and row.get("pid") is not None:
+                self._pending.hold("ping", int(row["pid"]), row)
+                return
+            self._state.add_ping(row)
+
+    def record_transaction(self, row: dict):
+        with self._lock:
+            if self._pending is not None and row.get("tx_hash"):
+                self._pending.hold("tx", _tx_key(row), row)
+                return
+            self._state.add_transaction(row)
+
+    # ------------------------------
+    # Reads
+    # ------------------------------
+    def _board(self, window: str, metric: str) -> _Board:
+        if window not in WINDOWS:
+            raise ValueError(f"window must be one of {', '.join(WINDOWS)}")
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+        self._state.advance(_hour(datetime.now(timezone.utc)))
+        return self._state.boards[window]
+
+    def top(self, metric: str = "checks", window: str = "all", limit: int = 10) -> dict:
+        with self._lock:
+            board = self._board(window, metric)
+            ranking = board.rankings[metric]
+            entries = [board.entry(uid, metric, rank=i + 1)
+                       for i, (_, uid) in enumerate(ranking[:max(0, limit)])]
+            return {"metric": metric, "window": window, "ranked": len(ranking), "entries": entries}
+
+    def rank_of(self, uid: int, metric: str = "checks", window: str = "all") -> dict:
+        with self._lock:
+            board = self._board(window, metric)
+            counters = board.totals.get(uid)
+            value = board.score(metric, counters) if counters else None
+            rank = board.rankings[metric].index((-value, uid)) + 1 if value is not None else None
+            return board.entry(uid, metric, rank) or {"rank": None, "uid": uid}
+
+    # ------------------------------
+    # Rebuild
+    # ------------------------------
+    def rebuild(self, pings, transactions) -> dict:
+        """
+        Replace the state with one built from `pings` (oldest first) and `transactions`.
+        Live updates are served from the old state until the swap and are not lost.
+        """
+        with self._lock:
+            if self._pending is not None:
+                raise RuntimeError("Leaderboard rebuild already running")
+            self._pending = LiveRebuild()
+        state = LeaderboardState(self.min_accuracy_checks)
+        counts = {"pings": 0, "transactions": 0}
+        try:
+            for row in pings:
+                if row.get("pid") is not None:
+                    with self._lock:
+                        self._pending.replayed("ping", int(row["pid"]))
+                state.add_ping(row)
+                counts["pings"] += 1
+            for row in transactions:
+                if row.get("tx_hash"):
+                    with self._lock:
+                        self._pending.replayed("tx", _tx_key(row))
+                state.add_transaction(row)
+                counts["transactions"] += 1
+        except Exception:
+            with self._lock:
+                pending, self._pending = self._pending, None
+                for row in pending.merge("ping"):
+                    self._state.add_ping(row)
+                for row in pending.merge("tx"):
+                    self._state.add_transaction(row)
+            raise
+        with self._lock:
+            for row in self._pending.merge("ping"):
+                state.add_ping(row)
+            for row in self._pending.merge("tx"):
+                state.add_transaction(row)
+            counts["merged_live"] = len(self._pending.pending)
+            counts["dropped_live"] = self._pending.dropped
+            self._state, self._pending = state, None
+            self.rebuilt_at = datetime.now(timezone.utc).isoformat()
+        return counts
+
+    def rebuild_from_db(self, ping_model=None, tx_model=None, archive=None,
+                        page_size: int = LEADERBOARD_REBUILD_PAGE_SIZE) -> dict:
+        tx_model = tx_model or OnChainTransactionModel()
+
+        def fetch_transactions(cursor, ties_only, limit):
+            return tx_model.get_transactions_after(cursor, ties_only, limit)
+
+        return self.rebuild(
+            iter_ping_history(None, page_size=page_size, ping_model=ping_model, archive=archive),
+            keyset_pages_with_ties(fetch_transactions, "created_at", "tx_hash", page_size))
+
+    def start_rebuild(self):
+        """Rebuild from the database on a background thread (no-op if one is running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+
+        def run():
+            try:
+                report = self.rebuild_from_db()
+                logger.info("Leaderboard rebuilt: %s", report)
+            except Exception:
+                logger.exception("Leaderboard rebuild failed")
+
+        self._thread = threading.Thread(target=run, name="leaderboard-rebuild", daemon=True)
+        self._thread.start()
+        return self._thread
+
+
+leaderboard = Leaderboard()
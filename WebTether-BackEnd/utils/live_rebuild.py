@@ -0,0 +1,40 @@
+# utils/live_rebuild.py
+"""
+Bookkeeping for rebuilding an in-memory view while live updates keep arriving.
+
+A rebuild replays history (oldest first) into a fresh state while the ping feed keeps delivering
+rows to the old one. Live rows arriving meanwhile are held back and merged into the fresh state
+just before it is swapped in. A live row can race with the replay either way:
+ - it arrives before the replay reaches it: the replay pops it from the pending rows;
+ - it arrives after the replay read it: its key is at or below the highest key the replay has
+   seen of that kind, so it is dropped instead of being counted twice.
+Keys only have to be ordered the way the replay reads them (pid for pings, (created_at,
+tx_hash) for transactions). Not thread-safe: callers hold their own lock around every call.
+"""
+
+
+class LiveRebuild:
+    def __init__(self):
+        self.pending = {}       # (kind, key) -> row held back for the merge
+        self.seen = {}          # kind -> highest key replayed so far
+        self.dropped = 0
+
+    def hold(self, kind: str, key, row: dict):
+        """Hold back a live row unless the replay already covered it."""
+        seen = self.seen.get(kind)
+        if seen is not None and key <= seen:
+            self.dropped += 1
+            return
+        self.pending[(kind, key)] = row
+
+    def replayed(self, kind: str, key):
+        """The replay applied the row with this key: a pending live copy is no longer needed."""
+        self.pending.pop((kind, key), None)
+        seen = self.seen.get(kind)
+        if seen is None or key > seen:
+            self.seen[kind] = key
+
+    def merge(self, kind: str) -> list:
+        """Pending live rows of `kind`, in key order."""
+        rows = [(key, row) for (k, key), row in self.pending.items() if k == kind]
+        return [row for _, row in sorted(rows, key=lambda item: item[0])]
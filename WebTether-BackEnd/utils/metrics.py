@@ -0,0 +1,249 @@
+# utils/metrics.py
+"""
+Minimal Prometheus instrumentation (text exposition format 0.0.4), no extra dependencies.
+
+Metrics:
+ - webtether_http_requests_total{method,route,status}          counter
+ - webtether_http_request_duration_seconds{method,route}        histogram
+ - webtether_http_requests_in_flight                            gauge
+ - webtether_db_calls_total{table,operation,outcome}            counter
+ - webtether_db_call_duration_seconds{table,operation}          histogram
+ - webtether_db_calls_in_flight                                 gauge
+ - webtether_probe_duration_seconds{probe,outcome}              histogram
+ - webtether_probe_requests_total{result}                       counter (executed / coalesced / cached)
+ - webtether_probes_in_flight                                   gauge
+
+init_app(app) installs the request hooks and the GET /metrics route. Recording is a lock,
+a dict lookup and a bisect per observation, cheap enough to leave on in production;
+METRICS_ENABLED=0 turns every hook into a no-op.
+"""
+
+import bisect
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from flask import Response, g, request
+
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") not in ("0", "false", "False")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(v) for v in labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1.0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0.0)]
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket (non-cumulative) counts + overflow, sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][idx] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.register(Counter(
+    "webtether_http_requests_total", "HTTP requests by route and status code.", ("method", "route", "status")))
+http_request_duration = registry.register(Histogram(
+    "webtether_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")))
+http_in_flight = registry.register(Gauge(
+    "webtether_http_requests_in_flight", "HTTP requests currently being served."))
+
+db_calls_total = registry.register(Counter(
+    "webtether_db_calls_total", "Supabase calls by table, operation and outcome.", ("table", "operation", "outcome")))
+db_call_duration = registry.register(Histogram(
+    "webtether_db_call_duration_seconds", "Supabase call latency by table and operation.", ("table", "operation")))
+db_in_flight = registry.register(Gauge(
+    "webtether_db_calls_in_flight", "Supabase calls currently waiting on the network."))
+
+probe_duration = registry.register(Histogram(
+    "webtether_probe_duration_seconds", "Probe execution time by probe path and outcome.", ("probe", "outcome"),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)))
+probe_requests_total = registry.register(Counter(
+    "webtether_probe_requests_total", "Probe requests by how they were served.", ("result",)))
+probes_in_flight = registry.register(Gauge(
+    "webtether_probes_in_flight", "Probe executions currently running."))
+
+
+# ------------------------------
+# Recording helpers used by models/db.py and utils/probe_utils.py
+# ------------------------------
+def record_db_call(table: str, operation: str, seconds: float, ok: bool):
+    if not METRICS_ENABLED:
+        return
+    db_calls_total.inc(table, operation, "ok" if ok else "error")
+    db_call_duration.observe(seconds, table, operation)
+
+
+def record_probe(probe: str, seconds: float, ok: bool):
+    if not METRICS_ENABLED:
+        return
+    probe_duration.observe(seconds, probe, "ok" if ok else "error")
+
+
+def count_probe_request(result: str):
+    if METRICS_ENABLED:
+        probe_requests_total.inc(result)
+
+
+# ------------------------------
+# Flask wiring
+# ------------------------------
+def _route_label():
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+
+def _before_request():
+    g._metrics_start = time.perf_counter()
+    http_in_flight.inc()
+
+
+def _after_request(response):
+    start = g.pop("_metrics_start", None)
+    if start is not None:
+        route = _route_label()
+        http_requests_total.inc(request.method, route, response.status_code)
+        http_request_duration.observe(time.perf_counter() - start, request.method, route)
+    return response
+
+
+def _teardown_request(exc):
+    http_in_flight.dec()
+
+
+def metrics_view():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+def init_app(app):
+    """Install request instrumentation and expose GET /metrics."""
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
+    if not METRICS_ENABLED:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,403 @@
+# utils/notifications.py
+"""
+Asynchronous status-change notifications.
+
+Flow:
+  ping listener -> TransitionDetector (up/down per wid, in memory)
+                -> NotificationDispatcher.enqueue(event)   (non-blocking, bounded queue)
+                -> background thread batches events per destination
+                -> delivery workers POST batches as JSON with retries + exponential backoff,
+                   at most NOTIFY_PER_DESTINATION_CONCURRENCY batches in flight per destination;
+                   further batches for a busy destination wait in its queue without holding a
+                   worker, and a destination's entry is dropped as soon as it is idle
+
+Ingestion never waits on delivery: when the queue is full the event is dropped and counted.
+Destinations are resolved by a caller-supplied function (event -> list of URLs), which keeps
+this module free of database access and makes it easy to point at a local HTTP stand-in.
+
+User-supplied webhook URLs (a website's notify_url) go through check_notify_url() when they are
+stored and again before delivery: only http(s) URLs whose host resolves exclusively to public
+addresses are accepted, so a webhook cannot be aimed at loopback, private, link-local or other
+internal addresses. Because DNS can change between that check and the connection (DNS
+rebinding), post_json() also checks the address it actually connected to and refuses to send
+anything, TLS handshake included, unless it is public. Redirects and environment proxies are
+not used. NOTIFY_ALLOW_PRIVATE_URLS=1 lifts the address checks for local development
+(e.g. scripts/webhook_sink.py on 127.0.0.1).
+"""
+
+import ipaddress
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+NOTIFY_ENABLED = os.getenv("NOTIFY_ENABLED", "1") not in ("0", "false", "False")
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", 10000))
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", 50))
+NOTIFY_BATCH_WAIT_SECONDS = float(os.getenv("NOTIFY_BATCH_WAIT_SECONDS", 1.0))
+NOTIFY_MAX_RETRIES = int(os.getenv("NOTIFY_MAX_RETRIES", 5))
+NOTIFY_BACKOFF_BASE_SECONDS = float(os.getenv("NOTIFY_BACKOFF_BASE_SECONDS", 0.5))
+NOTIFY_BACKOFF_MAX_SECONDS = float(os.getenv("NOTIFY_BACKOFF_MAX_SECONDS", 30))
+NOTIFY_TIMEOUT_SECONDS = float(os.getenv("NOTIFY_TIMEOUT_SECONDS", 5))
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", 8))
+NOTIFY_PER_DESTINATION_CONCURRENCY = int(os.getenv("NOTIFY_PER_DESTINATION_CONCURRENCY", 2))
+NOTIFY_ALLOW_PRIVATE_URLS = os.getenv("NOTIFY_ALLOW_PRIVATE_URLS", "0") in ("1", "true", "True")
+
+
+def _is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def notify_url_endpoint(url: str) -> tuple:
+    """(host, port) a webhook URL connects to; raises ValueError if it is not a usable http(s) URL."""
+    if not isinstance(url, str) or not url.strip():
+        raise ValueError("notify_url must be a URL")
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        raise ValueError("notify_url is not a valid URL")
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("notify_url must be an http(s) URL with a host")
+    if parts.username or parts.password:
+        raise ValueError("notify_url must not contain credentials")
+    return parts.hostname, port or (443 if parts.scheme == "https" else 80)
+
+
+def resolve_public_addresses(host: str, port: int) -> list:
+    """Addresses `host` resolves to; raises ValueError unless there are some and all are public."""
+    try:
+        infos = socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        raise ValueError("notify_url host does not resolve")
+    if not infos or not all(_is_public_address(info[4][0]) for info in infos):
+        raise ValueError("notify_url must point to a public address")
+    return [info[4][0] for info in infos]
+
+
+def check_notify_url(url: str, allow_private: bool = None, resolve: bool = True) -> str:
+    """
+    Return `url` if it is a usable webhook destination, else raise ValueError.
+    The host is resolved and every address it resolves to must be public; resolve=False checks
+    only the URL itself, for callers that resolve hosts themselves (see utils.website_import).
+    """
+    allow_private = NOTIFY_ALLOW_PRIVATE_URLS if allow_private is None else allow_private
+    host, port = notify_url_endpoint(url)
+    if resolve and not allow_private:
+        resolve_public_addresses(host, port)
+    return url.strip()
+
+
+class TransitionDetector:
+    """
+    Remembers the last known is_up per website and reports changes.
+    The first ping seen for a website establishes its state without reporting.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = {}
+
+    def observe(self, wid, is_up: bool):
+        """Return (previous, current) when the state flipped, else None."""
+        is_up = bool(is_up)
+        with self._lock:
+            previous = self._last.get(wid)
+            self._last[wid] = is_up
+        if previous is None or previous == is_up:
+            return None
+        return previous, is_up
+
+    def last_state(self, wid):
+        with self._lock:
+            return self._last.get(wid)
+
+    def prime(self, wid, is_up: bool):
+        """Seed a website's state (e.g. restored from storage) unless it was already observed."""
+        with self._lock:
+            self._last.setdefault(wid, bool(is_up))
+
+
+def build_status_event(row: dict, previous: bool, current: bool) -> dict:
+    return {
+        "type": "website.up" if current else "website.down",
+        "wid": row.get("wid"),
+        "pid": row.get("pid"),
+        "previous": "up" if previous else "down",
+        "current": "up" if current else "down",
+        "latency_ms": row.get("latency_ms"),
+        "region": row.get("region"),
+        "observed_at": row.get("timestamp") or datetime.now(timezone.utc).isoformat()
+    }
+
+
+class _PublicPeerMixin:
+    """Closes a new connection before anything is sent unless its peer address is public."""
+
+    def _new_conn(self):
+        sock = super()._new_conn()
+        address = sock.getpeername()[0]
+        if not _is_public_address(address):
+            sock.close()
+            raise NewConnectionError(self, f"Refusing to deliver to non-public address {address}")
+        return sock
+
+
+class _PublicHTTPConnection(_PublicPeerMixin, HTTPConnection):
+    pass
+
+
+class _PublicHTTPSConnection(_PublicPeerMixin, HTTPSConnection):
+    pass
+
+
+class _PublicHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _PublicHTTPConnection
+
+
+class _PublicHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _PublicHTTPSConnection
+
+
+class PublicAddressAdapter(HTTPAdapter):
+    """requests adapter whose connections are pinned to public peer addresses."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _PublicHTTPConnectionPool,
+                                                   "https": _PublicHTTPSConnectionPool}
+
+
+def _public_session() -> requests.Session:
+    session = requests.Session()
+    session.trust_env = False   # a proxy would be the peer, hiding the real destination
+    adapter = PublicAddressAdapter(pool_maxsize=NOTIFY_WORKERS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_webhook_session = _public_session()
+
+
+def post_json(url: str, payload: dict, timeout: float = NOTIFY_TIMEOUT_SECONDS, public_only: bool = None):
+    """
+    Default transport: POST JSON, raise on non-2xx. With public_only (the default unless
+    NOTIFY_ALLOW_PRIVATE_URLS is set) the connection is refused unless the address actually
+    connected to is public; pass public_only=False for operator-configured URLs.
+    """
+    public_only = not NOTIFY_ALLOW_PRIVATE_URLS if public_only is None else public_only
+    post = _webhook_session.post if public_only else requests.post
+    resp = post(url, json=payload, timeout=timeout, allow_redirects=False)
+    resp.raise_for_status()
+    return resp.status_code
+
+
+class NotificationDispatcher:
+    def __init__(self,
+                 resolve_destinations,
+                 send=post_json,
+                 queue_size: int = NOTIFY_QUEUE_SIZE,
+                 batch_size: int = NOTIFY_BATCH_SIZE,
+                 batch_wait: float = NOTIFY_BATCH_WAIT_SECONDS,
+                 max_retries: int = NOTIFY_MAX_RETRIES,
+                 backoff_base: float = NOTIFY_BACKOFF_BASE_SECONDS,
+                 backoff_max: float = NOTIFY_BACKOFF_MAX_SECONDS,
+                 workers: int = NOTIFY_WORKERS,
+                 per_destination: int = NOTIFY_PER_DESTINATION_CONCURRENCY,
+                 sleep=time.sleep):
+        """
+        resolve_destinations(event) -> iterable of URLs (called on the dispatcher thread)
+        send(url, payload)          -> raises on failure
+        """
+        self.resolve_destinations = resolve_destinations
+        self.send = send
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.per_destination = per_destination
+        self.sleep = sleep
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._workers = workers
+        self._pool = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lifecycle_lock = threading.Lock()
+        self._dest_lock = threading.Lock()
+        self._destinations = {}     # url -> [batches in flight, deque of waiting batches]; idle ones removed
+        self._pending = 0
+        self._pending_cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self.stats = {"enqueued": 0, "dropped": 0, "delivered": 0, "failed": 0, "retries": 0, "batches": 0}
+
+    def _count(self, name: str, n: int = 1):
+        with self._stats_lock:
+            self.stats[name] += n
+
+    # ------------------------------
+    # Producer side (ingestion path)
+    # ------------------------------
+    def enqueue(self, event: dict) -> bool:
+        """Non-blocking. Returns False (and counts a drop) when the queue is full."""
+        self.start()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("enqueued")
+        return True
+
+    # ------------------------------
+    # Lifecycle
+    # ------------------------------
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lifecycle_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="notify")
+            self._thread = threading.Thread(target=self._run, name="notify-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+        self._thread = None
+        self._pool = None
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued event has been delivered or given up on (useful in tests)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._pending_cond:
+                if self._queue.unfinished_tasks == 0 and self._pending == 0:
+                    return True
+                self._pending_cond.wait(0.05)
+        return False
+
+    # ------------------------------
+    # Dispatcher thread
+    # ------------------------------
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            by_destination = {}
+            for event in batch:
+                try:
+                    for url in self.resolve_destinations(event) or ():
+                        by_destination.setdefault(url, []).append(event)
+                except Exception as e:
+                    logger.warning("Failed to resolve notification destinations for %s: %s", event, e)
+            for url, events in by_destination.items():
+                for i in range(0, len(events), self.batch_size):
+                    self._submit(url, events[i:i + self.batch_size])
+            for _ in batch:
+                self._queue.task_done()
+            with self._pending_cond:
+                self._pending_cond.notify_all()
+
+    def _collect_batch(self):
+        """Block for the first event, then gather more for up to batch_wait seconds."""
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _submit(self, url, events):
+        with self._pending_cond:
+            self._pending += 1
+        with self._dest_lock:
+            state = self._destinations.setdefault(url, [0, deque()])
+            if state[0] >= self.per_destination:
+                # the destination is busy: wait in its queue instead of occupying a worker
+                state[1].append(events)
+                return
+            state[0] += 1
+        self._start_delivery(url, events)
+
+    def _start_delivery(self, url, events):
+        try:
+            self._pool.submit(self._deliver, url, events)
+        except RuntimeError:
+            # pool shut down by stop(): give up on this batch and whatever waits behind it
+            self._count("failed", len(events))
+            self._done()
+            self._next_for(url)
+
+    def _next_for(self, url):
+        """A delivery to `url` finished: start its next waiting batch or forget the idle destination."""
+        with self._dest_lock:
+            state = self._destinations[url]
+            if not state[1]:
+                state[0] -= 1
+                if state[0] == 0:
+                    del self._destinations[url]
+                return
+            events = state[1].popleft()
+        self._start_delivery(url, events)
+
+    def _done(self):
+        with self._pending_cond:
+            self._pending -= 1
+            self._pending_cond.notify_all()
+
+    def _deliver(self, url, events):
+        payload = {"events": events, "count": len(events)}
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    self.send(url, payload)
+                    self._count("delivered", len(events))
+                    self._count("batches")
+                    return
+                except Exception as e:
+                    error = e
+                if attempt < self.max_retries:
+                    self._count("retries")
+                    self.sleep(min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+            self._count("failed", len(events))
+            logger.error("Giving up on %d notification(s) to %s: %s", len(events), url, error)
+        finally:
+            self._done()
+            self._next_for(url)
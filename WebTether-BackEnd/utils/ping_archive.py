@@ -0,0 +1,244 @@
+# utils/ping_archive.py
+"""
+On-disk archive of raw ping rows that left the hot `ping` table.
+
+Layout: one segment per UTC hour,
+    <PING_ARCHIVE_DIR>/YYYY/MM/DD/ping-YYYYMMDDHH.ndjson.gz   (or .ndjson.zst)
+
+A segment is compressed NDJSON: a header object, then one JSON array per row in the header's
+column order. Rows are sorted by (wid, timestamp, pid) and wid, pid and timestamp (microseconds
+since the hour start) are delta-encoded against the previous row, so long runs of small integers
+compress well. The header also lists the wids present, letting readers skip segments after
+decompressing only the first line.
+
+Codec is gzip by default; PING_ARCHIVE_CODEC=zstd uses the optional `zstandard` package when it
+is installed (falls back to gzip otherwise). Readers pick the codec from the file extension.
+Segments are written to a temp file, fsynced and renamed into place, so a crash never leaves a
+half-written segment behind.
+"""
+
+import gzip
+import io
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+from utils.ping_stats import parse_timestamp
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+PING_ARCHIVE_DIR = os.getenv("PING_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "archive", "ping"))
+PING_ARCHIVE_CODEC = os.getenv("PING_ARCHIVE_CODEC", "gzip").lower()
+
+ARCHIVE_FORMAT = "webtether-ping-archive"
+ARCHIVE_VERSION = 1
+
+_EXTENSIONS = {"gzip": ".ndjson.gz", "zstd": ".ndjson.zst"}
+# columns delta-encoded as integers; timestamp is stored as microseconds from the hour start
+_DELTA_COLUMNS = ("wid", "pid", "timestamp")
+
+
+def _zstd():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def floor_hour(value) -> datetime:
+    return parse_timestamp(value).replace(minute=0, second=0, microsecond=0)
+
+
+def _micros_since(dt: datetime, origin: datetime) -> int:
+    delta = dt - origin
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def encode_rows(hour: datetime, rows: list) -> list:
+    """Header + delta-encoded row arrays for one segment (rows must all fall in `hour`)."""
+    rows = sorted(rows, key=lambda r: (r["wid"], parse_timestamp(r["timestamp"]), r["pid"]))
+    extra = sorted({k for r in rows for k in r} - set(_DELTA_COLUMNS))
+    columns = list(_DELTA_COLUMNS) + extra
+    header = {
+        "format": ARCHIVE_FORMAT,
+        "version": ARCHIVE_VERSION,
+        "hour": hour.isoformat(),
+        "rows": len(rows),
+        "columns": columns,
+        "wids": sorted({r["wid"] for r in rows}),
+        "min_pid": min((r["pid"] for r in rows), default=None),
+        "max_pid": max((r["pid"] for r in rows), default=None)
+    }
+    lines = [header]
+    prev = [0, 0, 0]
+    for r in rows:
+        current = [int(r["wid"]), int(r["pid"]), _micros_since(parse_timestamp(r["timestamp"]), hour)]
+        encoded = [c - p for c, p in zip(current, prev)]
+        prev = current
+        lines.append(encoded + [r.get(c) for c in extra])
+    return lines
+
+
+def decode_lines(lines) -> tuple:
+    """Inverse of encode_rows(): returns (header, rows)."""
+    lines = iter(lines)
+    header = next(lines, None)
+    if not header or header.get("format") != ARCHIVE_FORMAT:
+        raise ValueError("Not a ping archive segment")
+    if header.get("version") != ARCHIVE_VERSION:
+        raise ValueError(f"Unsupported ping archive version: {header.get('version')}")
+    hour = parse_timestamp(header["hour"])
+    extra = header["columns"][len(_DELTA_COLUMNS):]
+    rows = []
+    wid = pid = micros = 0
+    for values in lines:
+        wid += values[0]
+        pid += values[1]
+        micros += values[2]
+        row = {"wid": wid, "pid": pid, "timestamp": (hour + timedelta(microseconds=micros)).isoformat()}
+        row.update(zip(extra, values[len(_DELTA_COLUMNS):]))
+        rows.append(row)
+    return header, rows
+
+
+class PingArchive:
+    def __init__(self, root: str = None, codec: str = None):
+        self.root = root or PING_ARCHIVE_DIR
+        codec = (codec or PING_ARCHIVE_CODEC).lower()
+        if codec == "zstd" and _zstd() is None:
+            logger.warning("PING_ARCHIVE_CODEC=zstd but the zstandard package is not installed; using gzip")
+            codec = "gzip"
+        if codec not in _EXTENSIONS:
+            raise ValueError(f"Unknown archive codec: {codec}")
+        self.codec = codec
+
+    # ------------------------------
+    # paths
+    # ------------------------------
+    def _dir_for(self, hour: datetime) -> str:
+        return os.path.join(self.root, f"{hour:%Y}", f"{hour:%m}", f"{hour:%d}")
+
+    def segment_path(self, hour: datetime, codec: str = None) -> str:
+        return os.path.join(self._dir_for(hour), f"ping-{hour:%Y%m%d%H}{_EXTENSIONS[codec or self.codec]}")
+
+    def existing_segment(self, hour: datetime):
+        """Path of the segment for `hour` in whichever codec it was written, or None."""
+        for codec in _EXTENSIONS:
+            path = self.segment_path(hour, codec)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def segments_between(self, since=None, until=None, newest_first: bool = False):
+        """Yield (hour, path) for segments overlapping [since, until), oldest first by default."""
+        if not os.path.isdir(self.root):
+            return
+        lo = floor_hour(since) if since is not None else None
+        hi = parse_timestamp(until) if until is not None else None
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort(reverse=newest_first)
+            for name in sorted(filenames, reverse=newest_first):
+                if not name.startswith("ping-") or not name.endswith(tuple(_EXTENSIONS.values())):
+                    continue
+                try:
+                    hour = datetime.strptime(name[5:15], "%Y%m%d%H").replace(tzinfo=timezone.utc)
+                except ValueError:
+                    continue
+                if lo is not None and hour < lo:
+                    continue
+                if hi is not None and hour >= hi:
+                    continue
+                yield hour, os.path.join(dirpath, name)
+
+    # ------------------------------
+    # read / write
+    # ------------------------------
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return _zstd().ZstdCompressor(level=10).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    @staticmethod
+    def _open(path: str):
+        """Binary line reader over the decompressed segment, decompressing as it is read."""
+        if path.endswith(_EXTENSIONS["zstd"]):
+            zstandard = _zstd()
+            if zstandard is None:
+                raise RuntimeError(f"{path} is zstd-compressed but the zstandard package is not installed")
+            raw = open(path, "rb")
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+        return gzip.open(path, "rb")
+
+    def read_header(self, path: str) -> dict:
+        """Only the segment header (rows are not decompressed past the first line)."""
+        with self._open(path) as f:
+            header = json.loads(f.readline() or "null")
+        if not header or header.get("format") != ARCHIVE_FORMAT:
+            raise ValueError("Not a ping archive segment")
+        return header
+
+    def read_segment(self, path: str) -> tuple:
+        with self._open(path) as f:
+            return decode_lines(json.loads(line) for line in f if line.strip())
+
+    def read_hour(self, hour: datetime) -> list:
+        path = self.existing_segment(hour)
+        if path is None:
+            return []
+        return self.read_segment(path)[1]
+
+    def write_segment(self, hour: datetime, rows: list) -> str:
+        """Atomically (re)write the segment for `hour`. Returns the path written."""
+        hour = floor_hour(hour)
+        lines = encode_rows(hour, rows)
+        payload = "\n".join(json.dumps(line, separators=(",", ":"), default=str) for line in lines) + "\n"
+        path = self.segment_path(hour)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(self._compress(payload.encode("utf-8")))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        # a segment previously written with the other codec is superseded by this one
+        for codec in _EXTENSIONS:
+            other = self.segment_path(hour, codec)
+            if other != path and os.path.exists(other):
+                os.remove(other)
+        return path
+
+    def iter_segments(self, wid: int = None, since=None, until=None, newest_first: bool = False,
+                      stop=None):
+        """
+        Yield (hour, rows) per segment overlapping [since, until), rows filtered to `wid` and the
+        range. Segments whose header doesn't list `wid` are skipped without decoding any rows, and
+        iteration ends before decoding a segment whose hour makes stop(hour) true.
+        """
+        lo = parse_timestamp(since) if since is not None else None
+        hi = parse_timestamp(until) if until is not None else None
+        for hour, path in self.segments_between(since, until, newest_first=newest_first):
+            if stop is not None and stop(hour):
+                return
+            if wid is not None and wid not in self.read_header(path).get("wids", ()):
+                continue
+            _header, rows = self.read_segment(path)
+            selected = []
+            for row in rows:
+                if wid is not None and row["wid"] != wid:
+                    continue
+                ts = parse_timestamp(row["timestamp"])
+                if (lo is not None and ts < lo) or (hi is not None and ts >= hi):
+                    continue
+                selected.append(row)
+            if selected:
+                yield hour, selected
+
+    def iter_rows(self, wid: int = None, since=None, until=None):
+        """Archived rows (optionally for one website) with since <= timestamp < until, oldest hour first."""
+        for _hour, rows in self.iter_segments(wid=wid, since=since, until=until):
+            yield from rows
@@ -0,0 +1,41 @@
+# utils/ping_events.py
+"""
+In-process fan-out for freshly recorded ping rows.
+
+Controllers call publish_ping(row) right after a ping is stored; subsystems that keep
+incremental state (anomaly detection, notifications, ...) register a listener once in
+app.create_app(). Listeners run synchronously, so they must be cheap: anything slow
+belongs on a queue. A failing listener never breaks ingestion or the other listeners.
+
+Listeners only see pings stored by their own process. In-memory views that must see every
+ping, whichever worker or script stored it, subscribe to utils/ping_feed.py instead.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+_listeners = []
+
+
+def register_ping_listener(fn):
+    """Register fn(row) to be called for every recorded ping. Registering twice is a no-op."""
+    if fn not in _listeners:
+        _listeners.append(fn)
+    return fn
+
+
+def unregister_ping_listener(fn):
+    if fn in _listeners:
+        _listeners.remove(fn)
+
+
+def publish_ping(row):
+    """Hand a stored ping row (dict) to every listener."""
+    if not isinstance(row, dict):
+        return
+    for fn in list(_listeners):
+        try:
+            fn(row)
+        except Exception:
+            logger.exception("Ping listener %s failed", getattr(fn, "__name__", fn))
@@ -0,0 +1,144 @@
+# utils/ping_feed.py
+"""
+Database-driven feed of stored pings for in-memory views.
+
+publish_ping() (utils/ping_events.py) only reaches listeners in the process that stored the
+ping. The views every API worker keeps in memory (leaderboard, region cube, analytics store) have
+to see the pings of every worker, of the write spool drain and of the probe scheduler, so they
+subscribe here instead: a background thread tails the `ping` table by pid every
+PING_FEED_INTERVAL_SECONDS and hands new rows to the subscribers in pid order.
+
+Concurrent inserts can commit out of pid order, so a pid skipped over by the tail is remembered
+as a gap and looked up again on the next polls for PING_FEED_GAP_SECONDS; a row that commits late
+is still delivered (once), a gap that never fills (rolled-back insert) is forgotten.
+
+The feed starts at the newest pid present when it starts, so subscribers only see pings stored
+after boot; replaying history is up to each view's opt-in rebuild.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from models.db import response_rows
+from models.ping_model import PingModel
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+PING_FEED_INTERVAL_SECONDS = float(os.getenv("PING_FEED_INTERVAL_SECONDS", 1))
+PING_FEED_PAGE_SIZE = int(os.getenv("PING_FEED_PAGE_SIZE", 1000))
+PING_FEED_GAP_SECONDS = float(os.getenv("PING_FEED_GAP_SECONDS", 30))
+
+# pid jumps wider than this (sequence cache after a crash, bulk deletes) are not tracked as gaps
+_MAX_GAP_SPAN = 1000
+_MAX_GAPS = 10000
+_ID_CHUNK = 500
+
+
+class PingFeed:
+    def __init__(self, ping_model: PingModel = None, interval: float = PING_FEED_INTERVAL_SECONDS,
+                 page_size: int = PING_FEED_PAGE_SIZE, gap_seconds: float = PING_FEED_GAP_SECONDS):
+        self.ping_model = ping_model or PingModel()
+        self.interval = interval
+        self.page_size = page_size
+        self.gap_seconds = gap_seconds
+        self._subscribers = []
+        self._cursor = None         # highest pid delivered
+        self._gaps = {}             # pid -> monotonic time it was first skipped
+        self._poll_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def cursor(self):
+        return self._cursor
+
+    def subscribe(self, fn):
+        """Call fn(row) for every ping stored from now on. Subscribing twice is a no-op."""
+        if fn not in self._subscribers:
+            self._subscribers.append(fn)
+        return fn
+
+    def unsubscribe(self, fn):
+        if fn in self._subscribers:
+            self._subscribers.remove(fn)
+
+    def _deliver(self, row: dict):
+        for fn in list(self._subscribers):
+            try:
+                fn(row)
+            except Exception:
+                logger.exception("Ping feed subscriber %s failed", getattr(fn, "__name__", fn))
+
+    def _latest_pid(self) -> int:
+        rows = response_rows(self.ping_model.get_latest_pid())
+        return int(rows[0]["pid"]) if rows else 0
+
+    def poll(self) -> int:
+        """Deliver pings stored since the last poll (and late gap fills). Returns how many."""
+        with self._poll_lock:
+            if self._cursor is None:
+                self._cursor = self._latest_pid()
+                return 0
+            delivered = 0
+            now = time.monotonic()
+
+            missing = sorted(self._gaps)
+            for i in range(0, len(missing), _ID_CHUNK):
+                for row in response_rows(self.ping_model.get_pings_by_ids(missing[i:i + _ID_CHUNK])):
+                    if self._gaps.pop(row["pid"], None) is not None:
+                        self._deliver(row)
+                        delivered += 1
+            for pid in [p for p, since in self._gaps.items() if now - since > self.gap_seconds]:
+                del self._gaps[pid]
+
+            while True:
+                page = response_rows(self.ping_model.get_pings_after(self._cursor, self.page_size))
+                for row in page:
+                    pid = int(row["pid"])
+                    if pid <= self._cursor:
+                        continue
+                    if pid - self._cursor - 1 <= _MAX_GAP_SPAN:
+                        for missing in range(self._cursor + 1, pid):
+                            if len(self._gaps) >= _MAX_GAPS:
+                                break
+                            self._gaps[missing] = now
+                    self._cursor = pid
+                    self._deliver(row)
+                    delivered += 1
+                if len(page) < self.page_size:
+                    return delivered
+
+    def start(self, after_pid: int = None):
+        """Tail the table on a background thread, from `after_pid` or the newest pid stored now."""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        if self._cursor is None and after_pid is not None:
+            self._cursor = after_pid
+        self._stop.clear()
+
+        def run():
+            # the first poll only records the starting pid when none was given
+            while True:
+                try:
+                    self.poll()
+                except Exception:
+                    logger.exception("Ping feed poll failed")
+                if self._stop.wait(self.interval):
+                    return
+
+        self._thread = threading.Thread(target=run, name="ping-feed", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+ping_feed = PingFeed()
@@ -0,0 +1,118 @@
+# utils/ping_stats.py
+"""
+Pure helpers that aggregate ping rows (dicts as returned by Supabase) into rollups.
+No database access here; callers decide which rows to feed in.
+"""
+
+import math
+from datetime import datetime, timezone
+
+from utils.probe_utils import PHASE_FIELDS
+
+
+def percentile(sorted_values, pct: float):
+    """Nearest-rank percentile of an already sorted list (None for an empty list)."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def _numbers(rows, field):
+    out = []
+    for r in rows:
+        v = r.get(field)
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            out.append(v)
+    return out
+
+
+def rollup_pings(rows) -> dict:
+    """
+    Summarize ping rows:
+      total, up, uptime_pct,
+      latency_ms: {avg, p50, p95, p99},
+      phases: {dns_ms: {avg, p95}, connect_ms: ..., ...}  (only rows that carried the phase count)
+    """
+    rows = [r for r in (rows or []) if isinstance(r, dict)]
+    total = len(rows)
+    up = sum(1 for r in rows if r.get("is_up"))
+
+    latencies = sorted(_numbers(rows, "latency_ms"))
+    latency = {
+        "avg": round(sum(latencies) / len(latencies), 2) if latencies else None,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99)
+    }
+
+    phases = {}
+    for field in PHASE_FIELDS:
+        values = sorted(_numbers(rows, field))
+        phases[field] = {
+            "samples": len(values),
+            "avg": round(sum(values) / len(values), 2) if values else None,
+            "p95": percentile(values, 95)
+        }
+
+    return {
+        "total": total,
+        "up": up,
+        "uptime_pct": round(up * 100.0 / total, 2) if total else None,
+        "latency_ms": latency,
+        "phases": phases
+    }
+
+
+def parse_timestamp(value) -> datetime:
+    """Timezone-aware UTC datetime from a Supabase timestamp string (or datetime)."""
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        text = str(value).strip()
+        if "T" not in text:
+            text = text.replace(" ", "T", 1)
+        # a "+00:00" offset arrives as " 00:00" when it wasn't URL-encoded in a query string
+        text = text.replace(" ", "+")
+        if text.endswith("Z"):
+            text = text[:-1] + "+00:00"
+        dt = datetime.fromisoformat(text)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def hour_bucket(timestamp) -> str:
+    """ISO string of the UTC hour a ping timestamp (ISO string or datetime) falls in."""
+    dt = parse_timestamp(timestamp)
+    return dt.replace(minute=0, second=0, microsecond=0).isoformat()
+
+
+def hourly_rollups(rows) -> list:
+    """
+    Downsample ping rows into one aggregate per (wid, UTC hour):
+      wid, hour, total, up, latency_count, latency_sum, latency_min, latency_max, latency_p50, latency_p95
+    Sums and counts are kept (not just averages) so hours can be merged again later.
+    """
+    groups = {}
+    for r in rows or []:
+        if not isinstance(r, dict) or r.get("wid") is None or not r.get("timestamp"):
+            continue
+        groups.setdefault((r["wid"], hour_bucket(r["timestamp"])), []).append(r)
+
+    out = []
+    for (wid, hour), group in sorted(groups.items(), key=lambda item: (item[0][1], str(item[0][0]))):
+        latencies = sorted(_numbers(group, "latency_ms"))
+        out.append({
+            "wid": wid,
+            "hour": hour,
+            "total": len(group),
+            "up": sum(1 for r in group if r.get("is_up")),
+            "latency_count": len(latencies),
+            "latency_sum": sum(latencies),
+            "latency_min": latencies[0] if latencies else None,
+            "latency_max": latencies[-1] if latencies else None,
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95)
+        })
+    return out
@@ -0,0 +1,217 @@
+# utils/probe_scheduler.py
+"""
+Scheduled probing of canonical targets with fan-out to every subscribed website.
+
+Each tick:
+ 1. due targets: probe_target rows with refcount > 0 and next_probe_at <= now (one query)
+ 2. probe each target once, PROBE_SCHEDULER_CONCURRENCY at a time, through probe_url (shares
+    the single-flight / cache with manual checks)
+ 3. subscribers: every website pointing at those targets (one query per 500 targets)
+ 4. one ping row per website (source='scheduler'), written as multi-row inserts and handed to
+    the ping listeners (incidents, anomalies, notifications, rewards) like any other ping;
+    the API workers' in-memory views pick the rows up through utils/ping_feed.py
+ 5. each target's next_probe_at moves forward by the interval the cadence controller picks
+    (utils/cadence.py): stable targets back off towards their plan's maximum, failures and
+    latency spikes tighten to a fast re-check, always within the owners' plan limits
+
+A website only gets a ping when its own owner's plan floor has elapsed since its last scheduled
+ping (tracked in memory, so a restart may record one early ping). Owner plans are read once per
+tick for the subscribers being fanned out to.
+
+Outbound probes per interval = distinct normalized URLs, not websites. Run one scheduler per
+deployment: `python scripts/probe_scheduler.py` (or ProbeScheduler().start() in-process).
+
+Environment:
+ - PROBE_SCHEDULER_TICK_SECONDS [5]     how often due targets are looked up
+ - PROBE_SCHEDULER_BATCH [500]          max targets per tick
+ - PROBE_SCHEDULER_CONCURRENCY [32]     probes in flight
+ - PROBE_TARGET_INTERVAL_SECONDS [60]   starting interval the adaptive cadence backs off from
+ - PROBE_CADENCE_ADAPTIVE [1]           0 = keep each target's stored interval_seconds (still clamped
+                                        to plan limits)
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+from models.db import response_rows
+from models.ping_model import PingModel
+from models.probe_target_model import ProbeTargetModel
+from models.user_model import UserModel
+from models.website_model import WebsiteModel
+from utils.cadence import (CADENCE_HISTORY_PINGS, PROBE_TARGET_INTERVAL_SECONDS, TIGHTENED,
+                           CadenceController, plan_limits, shared_limits)
+from utils.ping_events import publish_ping
+from utils.probe_utils import PHASE_FIELDS, probe_url
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+PROBE_SCHEDULER_TICK_SECONDS = float(os.getenv("PROBE_SCHEDULER_TICK_SECONDS", 5))
+PROBE_SCHEDULER_BATCH = int(os.getenv("PROBE_SCHEDULER_BATCH", 500))
+PROBE_SCHEDULER_CONCURRENCY = int(os.getenv("PROBE_SCHEDULER_CONCURRENCY", 32))
+PROBE_CADENCE_ADAPTIVE = os.getenv("PROBE_CADENCE_ADAPTIVE", "1") not in ("0", "false", "False")
+
+_ID_CHUNK = 500
+_INSERT_CHUNK = 500
+
+
+def ping_payload(wid: int, result: dict) -> dict:
+    """Ping row for one subscribed website from a shared probe result."""
+    payload = {
+        "wid": wid,
+        "is_up": bool(result.get("is_up", False)),
+        "latency_ms": result.get("latency_ms"),
+        "region": result.get("region", "unknown"),
+        "source": "scheduler"
+    }
+    for field in PHASE_FIELDS:
+        if result.get(field) is not None:
+            payload[field] = result[field]
+    return payload
+
+
+class ProbeScheduler:
+    def __init__(self, target_model: ProbeTargetModel = None, website_model: WebsiteModel = None,
+                 ping_model: PingModel = None, user_model: UserModel = None, probe=None,
+                 concurrency: int = None, batch: int = None, cadence: CadenceController = None,
+                 adaptive: bool = None):
+        self.targets = target_model or ProbeTargetModel()
+        self.websites = website_model or WebsiteModel()
+        self.pings = ping_model or PingModel()
+        self.users = user_model or UserModel()
+        self.cadence = cadence or CadenceController()
+        self.adaptive = PROBE_CADENCE_ADAPTIVE if adaptive is None else adaptive
+        self._last_recorded = {}    # wid -> monotonic time of its last scheduled ping
+        self.probe = probe or probe_url
+        self.batch = batch or PROBE_SCHEDULER_BATCH
+        self._pool = ThreadPoolExecutor(max_workers=concurrency or PROBE_SCHEDULER_CONCURRENCY,
+                                        thread_name_prefix="probe-scheduler")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _probe_one(self, target):
+        try:
+            return self.probe(target["url"])
+        except Exception as e:
+            return {"is_up": False, "error": str(e)}
+
+    def interval_for(self, target) -> int:
+        return int(target.get("interval_seconds") or PROBE_TARGET_INTERVAL_SECONDS)
+
+    def _subscribers(self, target_ids) -> dict:
+        by_target = {}
+        for i in range(0, len(target_ids), _ID_CHUNK):
+            for row in response_rows(self.websites.get_websites_by_target_ids(target_ids[i:i + _ID_CHUNK])):
+                by_target.setdefault(row["target_id"], []).append(row)
+        return by_target
+
+    def _owner_plans(self, subscribers: dict) -> dict:
+        uids = sorted({w["uid"] for rows in subscribers.values() for w in rows if w.get("uid") is not None})
+        plans = {}
+        for i in range(0, len(uids), _ID_CHUNK):
+            for row in response_rows(self.users.get_plans_by_ids(uids[i:i + _ID_CHUNK])):
+                plans[row["id"]] = row.get("plan")
+        return plans
+
+    def _history(self, target, websites) -> list:
+        """Recent pings (oldest first) of one subscribed website, to seed a new target's cadence."""
+        if target.get("stable_checks") is not None or not websites:
+            return []
+        try:
+            rows = response_rows(self.pings.get_recent_pings_by_wid(websites[0]["wid"], limit=CADENCE_HISTORY_PINGS))
+        except Exception as e:
+            logger.warning("Cadence history for target %s unavailable: %s", target["target_id"], e)
+            return []
+        return list(reversed(rows))
+
+    def _next_check(self, target, result, limits, websites) -> dict:
+        if self.adaptive:
+            return self.cadence.next_check(target, result, limits, history=self._history(target, websites))
+        low, high = limits
+        return {"interval_seconds": min(max(self.interval_for(target), low), high)}
+
+    def tick(self, now: datetime = None) -> dict:
+        """Probe every due target once and record a ping for each subscribed website."""
+        now = now or datetime.now(timezone.utc)
+        due = response_rows(self.targets.get_due_targets(now.isoformat(), limit=self.batch))
+        if not due:
+            return {"targets": 0, "pings": 0}
+
+        started = time.perf_counter()
+        results = list(self._pool.map(self._probe_one, due))
+        probe_seconds = time.perf_counter() - started
+
+        subscribers = self._subscribers([t["target_id"] for t in due])
+        plans = self._owner_plans(subscribers)
+        # decided before this tick's pings are stored, so a new target's seed history excludes them
+        decisions = []
+        for target, result in zip(due, results):
+            websites = subscribers.get(target["target_id"], [])
+            limits = shared_limits(plans.get(w.get("uid")) for w in websites)
+            decisions.append(self._next_check(target, result, limits, websites))
+
+        clock = time.monotonic()
+        payloads, skipped = [], 0
+        for target, result in zip(due, results):
+            for website in subscribers.get(target["target_id"], []):
+                floor = plan_limits(plans.get(website.get("uid")))[0]
+                last = self._last_recorded.get(website["wid"])
+                # small slack so a website on the target's own floor isn't skipped by tick jitter
+                if last is not None and clock - last < floor - PROBE_SCHEDULER_TICK_SECONDS:
+                    skipped += 1
+                    continue
+                self._last_recorded[website["wid"]] = clock
+                payloads.append(ping_payload(website["wid"], result))
+
+        stored = 0
+        for i in range(0, len(payloads), _INSERT_CHUNK):
+            rows = response_rows(self.pings.create_pings(payloads[i:i + _INSERT_CHUNK]))
+            stored += len(rows)
+            for row in rows:
+                publish_ping(row)
+
+        probed_at = now.isoformat()
+        tightened = 0
+        for target, result, decision in zip(due, results, decisions):
+            tightened += decision.get("outcome") == TIGHTENED
+            next_at = (now + timedelta(seconds=decision["interval_seconds"])).isoformat()
+            self.targets.mark_probed(target["target_id"], probed_at, next_at,
+                                     is_up=bool(result.get("is_up", False)), latency_ms=result.get("latency_ms"),
+                                     cadence=decision)
+
+        return {"targets": len(due), "pings": stored, "skipped_by_plan": skipped, "tightened": tightened,
+                "probe_ms": round(probe_seconds * 1000, 1)}
+
+    # ------------------------------
+    # background loop
+    # ------------------------------
+    def run_forever(self, tick_seconds: float = None):
+        tick_seconds = PROBE_SCHEDULER_TICK_SECONDS if tick_seconds is None else tick_seconds
+        while not self._stop.is_set():
+            report = {}
+            try:
+                report = self.tick()
+            except Exception:
+                logger.exception("Probe scheduler tick failed")
+            # a full batch means more targets are due: go again right away
+            if report.get("targets", 0) < self.batch:
+                self._stop.wait(tick_seconds)
+
+    def start(self, tick_seconds: float = None):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, args=(tick_seconds,),
+                                            name="probe-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,48 @@
+# utils/probe_targets.py
+"""
+Reference-counted canonical probe targets.
+
+Every website row points (website.target_id) at the probe_target for its normalize_url() form,
+so N websites with the same URL share one target and the scheduler probes it once per interval.
+Controllers call acquire_targets() before inserting websites, and release_targets() after
+deleting them or moving them to another URL. Websites whose URL can't be normalized get no
+target and are simply not scheduled.
+"""
+
+from models.db import response_rows
+from models.probe_target_model import ProbeTargetModel
+from utils.probe_utils import normalize_url
+
+_target_model = None
+
+
+def _model(model=None):
+    global _target_model
+    if model is not None:
+        return model
+    if _target_model is None:
+        _target_model = ProbeTargetModel()
+    return _target_model
+
+
+def canonical_url(url):
+    try:
+        return normalize_url(url)
+    except ValueError:
+        return None
+
+
+def acquire_targets(urls, model: ProbeTargetModel = None) -> dict:
+    """+1 reference per URL (repeats count). Returns {canonical url: target_id}."""
+    canonical = [c for c in (canonical_url(u) for u in urls) if c]
+    if not canonical:
+        return {}
+    resp = _model(model).acquire(canonical)
+    return {row["url"]: row["target_id"] for row in response_rows(resp)}
+
+
+def release_targets(target_ids, model: ProbeTargetModel = None):
+    """-1 reference per id (repeats count, None ignored)."""
+    ids = [t for t in target_ids if t is not None]
+    if ids:
+        _model(model).release(ids)
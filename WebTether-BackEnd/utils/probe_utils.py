@@ -0,0 +1,466 @@
+# utils/probe_utils.py
+"""
+Probe helpers used by the manual ping flow.
+
+- normalize_url(): canonical form of a URL, used to decide when two probes hit "the same" target
+- timed_http_probe(): direct HTTP check with DNS / connect / TLS / TTFB / transfer timings
+- SingleFlight: collapses concurrent identical calls into one execution shared by every waiter
+- ProbeResultCache: optional few-second TTL cache so a burst of pings reuses one result
+- probe_url(): worker call (with a direct timed fallback), coalesced and optionally cached
+- async_probe_url(): the same for the ASGI serving mode, on a pooled httpx.AsyncClient
+
+Callers still record their own ping row per request; only the outbound HTTP work is shared.
+"""
+
+import asyncio
+import http.client
+import ipaddress
+import os
+import re
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from dotenv import load_dotenv
+
+from utils.metrics import count_probe_request, probes_in_flight, record_probe
+
+load_dotenv()
+
+PROBE_WORKER_URL = os.getenv("PROBE_WORKER_URL", "https://your-worker.url.workers.dev/")
+PROBE_WORKER_TIMEOUT = float(os.getenv("PROBE_WORKER_TIMEOUT", 20))
+PROBE_FALLBACK_TIMEOUT = float(os.getenv("PROBE_FALLBACK_TIMEOUT", 10))
+# HEAD keeps probes light; use GET to also measure body transfer (capped at PROBE_MAX_BODY_BYTES)
+PROBE_METHOD = os.getenv("PROBE_METHOD", "HEAD").upper()
+PROBE_MAX_BODY_BYTES = int(os.getenv("PROBE_MAX_BODY_BYTES", 65536))
+# 0 disables the result cache; identical in-flight probes are always coalesced
+PROBE_CACHE_TTL_SECONDS = float(os.getenv("PROBE_CACHE_TTL_SECONDS", 0))
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_HOST_LABEL = re.compile(r"^(?!-)[a-z0-9-]{1,63}(?<!-)$")
+
+# async mode: one pooled client per process for worker calls
+PROBE_ASYNC_MAX_CONNECTIONS = int(os.getenv("PROBE_ASYNC_MAX_CONNECTIONS", 500))
+
+# Phase columns stored on ping rows (all optional, milliseconds)
+PHASE_FIELDS = ("dns_ms", "connect_ms", "tls_ms", "ttfb_ms", "transfer_ms")
+
+
+def _check_host(host: str, url: str):
+    """Raise ValueError unless `host` is an IP literal or a syntactically valid (IDNA) hostname."""
+    try:
+        ipaddress.ip_address(host)
+        return
+    except ValueError:
+        pass
+    name = host[:-1] if host.endswith(".") else host
+    try:
+        ascii_name = name.encode("idna").decode("ascii")
+    except UnicodeError:
+        raise ValueError(f"Invalid host in URL: {url}")
+    labels = ascii_name.split(".")
+    if len(ascii_name) > 253 or not all(_HOST_LABEL.match(label) for label in labels):
+        raise ValueError(f"Invalid host in URL: {url}")
+    if labels[-1].isdigit():
+        # "1.2.3" or "999.1.1.1": neither an IPv4 address nor a name with a real TLD
+        raise ValueError(f"Invalid host in URL: {url}")
+
+
+def normalize_url(url: str) -> str:
+    """
+    Return a canonical form of `url`:
+    - scheme defaults to https and is lower-cased, as is the host
+    - default ports are dropped, an empty path becomes "/"
+    - the fragment is removed (never sent to the server anyway)
+    Raises ValueError for empty URLs and for missing or malformed hosts (the host must be an IP
+    literal or a hostname whose IDNA labels are 1-63 letters, digits or inner hyphens).
+    """
+    if not url or not isinstance(url, str):
+        raise ValueError("url is required")
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        raise ValueError(f"Invalid URL: {url}")
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS:
+        raise ValueError(f"Unsupported URL scheme: {parts.scheme}")
+    host = (parts.hostname or "").lower()
+    if not host:
+        raise ValueError(f"URL has no host: {url}")
+    _check_host(host, url)
+
+    netloc = host
+    if ":" in host:
+        # IPv6 literal
+        netloc = f"[{host}]"
+    try:
+        port = parts.port
+    except ValueError:
+        raise ValueError(f"Invalid port in URL: {url}")
+    if port and port != _DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        netloc = f"{userinfo}@{netloc}"
+
+    path = parts.path or "/"
+    return urlunsplit((scheme, netloc, path, parts.query, ""))
+
+
+class _Call:
+    """One in-flight execution that waiters block on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Duplicate call suppression: while a call for `key` is running, further
+    callers with the same key wait for it and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Run fn() once per concurrent key.
+        Returns (result, shared) where shared is True when the result came from another caller's execution.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class ProbeResultCache:
+    """Tiny thread-safe TTL cache. A ttl of 0 turns every operation into a no-op."""
+
+    def __init__(self, ttl_seconds: float = 0):
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, key):
+        if self.ttl <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            # opportunistic sweep keeps the dict bounded by the number of hot URLs
+            if len(self._entries) > 1024:
+                for k in [k for k, (exp, _) in self._entries.items() if exp <= now]:
+                    del self._entries[k]
+            self._entries[key] = (now + self.ttl, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_probe_flight = SingleFlight()
+_probe_cache = ProbeResultCache(PROBE_CACHE_TTL_SECONDS)
+
+
+def _elapsed_ms(start: float) -> int:
+    return int((time.perf_counter() - start) * 1000)
+
+
+def timed_http_probe(url: str, method: str = None, timeout: float = None) -> dict:
+    """
+    Check `url` directly, timing each phase separately:
+      dns_ms      -> name resolution
+      connect_ms  -> TCP handshake
+      tls_ms      -> TLS handshake (None for plain http)
+      ttfb_ms     -> request sent until status line + headers received
+      transfer_ms -> reading the body (capped at PROBE_MAX_BODY_BYTES)
+    latency_ms is the end-to-end total. Phases that were never reached are None.
+    """
+    method = (method or PROBE_METHOD).upper()
+    timeout = timeout or PROBE_FALLBACK_TIMEOUT
+    result = {
+        "is_up": False,
+        "latency_ms": None,
+        "status_code": None,
+        "region": "unknown",
+        "checked_url": url
+    }
+    for field in PHASE_FIELDS:
+        result[field] = None
+
+    try:
+        parts = urlsplit(url)
+        scheme = (parts.scheme or "https").lower()
+        host = parts.hostname
+        port = parts.port or _DEFAULT_PORTS.get(scheme)
+    except ValueError:
+        host = None
+    if not host or scheme not in _DEFAULT_PORTS:
+        result["error"] = "invalid url"
+        return result
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+    sock = None
+    started = time.perf_counter()
+    try:
+        t = time.perf_counter()
+        family, socktype, proto, _, sockaddr = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+        result["dns_ms"] = _elapsed_ms(t)
+
+        t = time.perf_counter()
+        sock = socket.socket(family, socktype, proto)
+        sock.settimeout(timeout)
+        sock.connect(sockaddr)
+        result["connect_ms"] = _elapsed_ms(t)
+
+        if scheme == "https":
+            t = time.perf_counter()
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+            result["tls_ms"] = _elapsed_ms(t)
+
+        host_header = host if port == _DEFAULT_PORTS[scheme] else f"{host}:{port}"
+        request_bytes = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {host_header}\r\n"
+            "User-Agent: WebTether-Probe/1.0\r\n"
+            "Accept: */*\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("latin-1")
+
+        t = time.perf_counter()
+        sock.sendall(request_bytes)
+        resp = http.client.HTTPResponse(sock, method=method)
+        resp.begin()
+        result["ttfb_ms"] = _elapsed_ms(t)
+        result["status_code"] = resp.status
+
+        t = time.perf_counter()
+        if method != "HEAD":
+            resp.read(PROBE_MAX_BODY_BYTES)
+        result["transfer_ms"] = _elapsed_ms(t)
+        resp.close()
+
+        result["is_up"] = resp.status < 400
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        if sock is not None:
+            try:
+                sock.close()
+            except Exception:
+                pass
+
+    if result["is_up"]:
+        result["latency_ms"] = _elapsed_ms(started)
+    return result
+
+
+def run_http_probe(url: str) -> dict:
+    """
+    Perform one HTTP check of `url`.
+    Uses the Cloudflare worker when reachable, otherwise a direct timed probe from this process.
+    """
+    started = time.perf_counter()
+    try:
+        resp = requests.post(PROBE_WORKER_URL, json={"url": url}, timeout=PROBE_WORKER_TIMEOUT)
+        resp.raise_for_status()
+        result = resp.json()
+        record_probe("worker", time.perf_counter() - started, True)
+        return result
+    except Exception:
+        record_probe("worker", time.perf_counter() - started, False)
+
+    # Fallback to a direct check if the worker fails
+    started = time.perf_counter()
+    result = timed_http_probe(url)
+    record_probe("direct", time.perf_counter() - started, bool(result.get("is_up")))
+    return result
+
+
+_PROBE_RUNNERS = {
+    "http": run_http_probe,
+}
+
+
+def probe_url(url: str, probe_type: str = "http") -> dict:
+    """
+    Probe `url`, sharing work with identical concurrent (and, if enabled, recent) probes.
+    Returns a fresh dict per caller so callers may annotate it freely.
+    """
+    runner = _PROBE_RUNNERS.get(probe_type)
+    if runner is None:
+        raise ValueError(f"Unknown probe type: {probe_type}")
+
+    try:
+        target = normalize_url(url)
+    except ValueError:
+        # let the runner report the URL as down instead of failing the request
+        target = url
+    key = (probe_type, target)
+
+    cached = _probe_cache.get(key)
+    if cached is not None:
+        count_probe_request("cached")
+        return dict(cached)
+
+    def _run():
+        probes_in_flight.inc()
+        try:
+            result = runner(target)
+        finally:
+            probes_in_flight.dec()
+        _probe_cache.set(key, result)
+        return result
+
+    result, shared = _probe_flight.do(key, _run)
+    count_probe_request("coalesced" if shared else "executed")
+    return dict(result)
+
+
+# ------------------------------
+# Async (ASGI) variants
+# ------------------------------
+class AsyncSingleFlight:
+    """SingleFlight for coroutines: concurrent awaiters of the same key share one task."""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn):
+        """Await fn() once per concurrent key. Returns (result, shared) like SingleFlight.do()."""
+        task = self._calls.get(key)
+        if task is not None:
+            # shield: one cancelled waiter must not cancel the probe the others are waiting on
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(fn())
+        self._calls[key] = task
+        task.add_done_callback(lambda _t: self._calls.pop(key, None))
+        return await asyncio.shield(task), False
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+_async_probe_flight = AsyncSingleFlight()
+_async_http_client = None
+
+
+def _get_async_http_client():
+    global _async_http_client
+    if _async_http_client is None:
+        import httpx
+        _async_http_client = httpx.AsyncClient(
+            timeout=PROBE_WORKER_TIMEOUT,
+            limits=httpx.Limits(max_connections=PROBE_ASYNC_MAX_CONNECTIONS,
+                                max_keepalive_connections=min(100, PROBE_ASYNC_MAX_CONNECTIONS)),
+        )
+    return _async_http_client
+
+
+async def close_async_http_client():
+    global _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
+
+
+async def async_run_http_probe(url: str) -> dict:
+    """run_http_probe() without blocking the event loop; the direct fallback runs in a thread."""
+    started = time.perf_counter()
+    try:
+        resp = await _get_async_http_client().post(PROBE_WORKER_URL, json={"url": url})
+        resp.raise_for_status()
+        result = resp.json()
+        record_probe("worker", time.perf_counter() - started, True)
+        return result
+    except Exception:
+        record_probe("worker", time.perf_counter() - started, False)
+
+    started = time.perf_counter()
+    result = await asyncio.to_thread(timed_http_probe, url)
+    record_probe("direct", time.perf_counter() - started, bool(result.get("is_up")))
+    return result
+
+
+_ASYNC_PROBE_RUNNERS = {
+    "http": async_run_http_probe,
+}
+
+
+async def async_probe_url(url: str, probe_type: str = "http") -> dict:
+    """Async probe_url(): shares the result cache with the sync path, coalesces per event loop."""
+    runner = _ASYNC_PROBE_RUNNERS.get(probe_type)
+    if runner is None:
+        raise ValueError(f"Unknown probe type: {probe_type}")
+
+    try:
+        target = normalize_url(url)
+    except ValueError:
+        target = url
+    key = (probe_type, target)
+
+    cached = _probe_cache.get(key)
+    if cached is not None:
+        count_probe_request("cached")
+        return dict(cached)
+
+    async def _run():
+        probes_in_flight.inc()
+        try:
+            result = await runner(target)
+        finally:
+            probes_in_flight.dec()
+        _probe_cache.set(key, result)
+        return result
+
+    result, shared = await _async_probe_flight.do(key, _run)
+    count_probe_request("coalesced" if shared else "executed")
+    return dict(result)
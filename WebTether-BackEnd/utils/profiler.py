@@ -0,0 +1,300 @@
+# utils/profiler.py
+"""
+On-demand sampling profiler for single requests.
+
+Off unless PROFILER_ENABLED=1; when off, init_app() installs no request hooks at all. When on,
+a request is profiled if:
+ - it carries `X-Profile: 1` (or `?_profile=1`) together with a valid `X-Admin-Token`
+   (utils/admin_auth.py), or
+ - it is picked by sampling: PROFILER_SAMPLE_EVERY=N profiles about 1 in N requests (0 = never).
+
+A profiled request gets a sampler thread that reads the request thread's stack every
+PROFILER_INTERVAL_MS (sys._current_frames), so the handler itself runs uninstrumented. The
+result is written to PROFILER_DIR as
+ - speedscope JSON (PROFILER_FORMAT=speedscope, default; open at https://www.speedscope.app), or
+ - collapsed stacks (PROFILER_FORMAT=collapsed; `frame;frame;frame count`, for flamegraph.pl)
+next to a small .meta.json, and the response carries `X-Profile-Id`. The directory is bounded:
+the oldest profiles are removed beyond PROFILER_MAX_PROFILES files or PROFILER_MAX_BYTES.
+
+Admin endpoints (X-Admin-Token required):
+ - GET /admin/profiles          -> recent profiles, newest first (?limit=50)
+ - GET /admin/profiles/<id>     -> the profile file
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from flask import g, jsonify, request, send_file
+
+from utils.admin_auth import is_admin_request, require_admin
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") in ("1", "true", "True")
+PROFILER_SAMPLE_EVERY = int(os.getenv("PROFILER_SAMPLE_EVERY", 0))
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", 5))
+PROFILER_FORMAT = os.getenv("PROFILER_FORMAT", "speedscope")
+PROFILER_DIR = os.getenv("PROFILER_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "profiles"))
+PROFILER_MAX_PROFILES = int(os.getenv("PROFILER_MAX_PROFILES", 200))
+PROFILER_MAX_BYTES = int(os.getenv("PROFILER_MAX_BYTES", 100 * 1024 * 1024))
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+FORMATS = {"speedscope": ".speedscope.json", "collapsed": ".folded"}
+_MAX_DEPTH = 256
+_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+_SKIP_PREFIXES = ("/admin/profiles", "/metrics")
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _frame_label(code) -> tuple:
+    filename = code.co_filename
+    if filename.startswith(_ROOT):
+        filename = os.path.relpath(filename, _ROOT)
+    return code.co_name, filename, code.co_firstlineno
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread until stop()."""
+
+    def __init__(self, thread_id: int, interval_ms: float = PROFILER_INTERVAL_MS):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000.0
+        self.stacks = Counter()     # tuple of frame labels, root first -> samples
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self.started = None
+        self.elapsed = 0.0
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < _MAX_DEPTH:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    # ------------------------------
+    # Output
+    # ------------------------------
+    def collapsed(self) -> str:
+        lines = []
+        for stack, count in sorted(self.stacks.items()):
+            names = ";".join(f"{name} ({filename}:{line})" for name, filename, line in stack)
+            lines.append(f"{names} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str) -> dict:
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in self.stacks.items():
+            ids = []
+            for label in stack:
+                if label not in index:
+                    index[label] = len(frames)
+                    frames.append({"name": label[0], "file": label[1], "line": label[2]})
+                ids.append(index[label])
+            samples.append(ids)
+            weights.append(round(count * self.interval * 1000, 3))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(self.elapsed * 1000, 3),
+                "samples": samples,
+                "weights": weights
+            }],
+            "name": name,
+            "exporter": "webtether-profiler"
+        }
+
+
+# ------------------------------
+# Storage
+# ------------------------------
+class ProfileStore:
+    def __init__(self, directory: str = PROFILER_DIR, max_profiles: int = PROFILER_MAX_PROFILES,
+                 max_bytes: int = PROFILER_MAX_BYTES):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _meta_files(self) -> list:
+        """Meta files, oldest first (ids start with a sortable timestamp)."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(n for n in os.listdir(self.directory) if n.endswith(".meta.json"))
+
+    def save(self, sampler: StackSampler, meta: dict, fmt: str = PROFILER_FORMAT) -> str:
+        fmt = fmt if fmt in FORMATS else "speedscope"
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", f"{meta['method']} {meta['route']}").strip("_")[:60]
+        profile_id = f"{stamp}-{slug}-{random.getrandbits(24):06x}"
+        filename = profile_id + FORMATS[fmt]
+        if fmt == "collapsed":
+            body = sampler.collapsed()
+        else:
+            body = json.dumps(sampler.speedscope(f"{meta['method']} {meta['path']}"), separators=(",", ":"))
+        meta = dict(meta, id=profile_id, file=filename, format=fmt, samples=sampler.samples,
+                    created_at=datetime.now(timezone.utc).isoformat())
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, filename), "w") as f:
+                f.write(body)
+            with open(os.path.join(self.directory, profile_id + ".meta.json"), "w") as f:
+                json.dump(meta, f)
+            self._prune()
+        return profile_id
+
+    def _prune(self):
+        sizes = Counter()
+        for name in os.listdir(self.directory):
+            sizes[name.split(".", 1)[0]] += os.path.getsize(os.path.join(self.directory, name))
+        total = sum(sizes.values())
+        for name in self._meta_files():
+            if len(sizes) <= self.max_profiles and total <= self.max_bytes:
+                break
+            profile_id = name[:-len(".meta.json")]
+            for n in os.listdir(self.directory):
+                if n.split(".", 1)[0] == profile_id:
+                    os.remove(os.path.join(self.directory, n))
+            total -= sizes.pop(profile_id, 0)
+
+    def recent(self, limit: int = 50) -> list:
+        out = []
+        for name in reversed(self._meta_files()):
+            if len(out) >= limit:
+                break
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    out.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return out
+
+    def get(self, profile_id: str):
+        """(path, meta) of a stored profile, or None."""
+        if not _ID_PATTERN.match(profile_id or ""):
+            return None
+        try:
+            with open(os.path.join(self.directory, profile_id + ".meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        path = os.path.join(self.directory, meta["file"])
+        return (path, meta) if os.path.exists(path) else None
+
+
+store = ProfileStore()
+
+
+# ------------------------------
+# Flask integration
+# ------------------------------
+def _trigger():
+    """Why this request should be profiled, or None."""
+    if request.path.startswith(_SKIP_PREFIXES):
+        return None
+    if request.headers.get(PROFILE_HEADER) == "1" or request.args.get("_profile") == "1":
+        return "requested" if is_admin_request(request.headers) else None
+    if PROFILER_SAMPLE_EVERY > 0 and random.random() * PROFILER_SAMPLE_EVERY < 1:
+        return "sampled"
+    return None
+
+
+def _before_request():
+    trigger = _trigger()
+    if trigger is not None:
+        g._profiler = (StackSampler(threading.get_ident()).start(), trigger)
+
+
+def _finish(status: int):
+    sampler, trigger = g.pop("_profiler", (None, None))
+    if sampler is None:
+        return None
+    sampler.stop()
+    meta = {"method": request.method, "path": request.path,
+            "route": request.url_rule.rule if request.url_rule is not None else request.path,
+            "status": status, "duration_ms": round(sampler.elapsed * 1000, 2), "trigger": trigger}
+    try:
+        return store.save(sampler, meta)
+    except Exception as e:
+        logger.warning("Failed to save request profile: %s", e)
+        return None
+
+
+def _after_request(response):
+    if "_profiler" in g:
+        profile_id = _finish(response.status_code)
+        if profile_id:
+            response.headers[PROFILE_ID_HEADER] = profile_id
+    return response
+
+
+def _teardown_request(exc):
+    # after_request is skipped when the handler raised
+    if "_profiler" in g:
+        _finish(500)
+
+
+@require_admin
+def list_profiles_view():
+    limit = request.args.get("limit", "50")
+    if not limit.isdigit():
+        return jsonify({"error": "limit must be an integer"}), 400
+    return jsonify({"enabled": PROFILER_ENABLED, "sample_every": PROFILER_SAMPLE_EVERY,
+                    "profiles": store.recent(min(int(limit), 1000))}), 200
+
+
+@require_admin
+def get_profile_view(profile_id):
+    found = store.get(profile_id)
+    if found is None:
+        return jsonify({"error": "Profile not found"}), 404
+    path, meta = found
+    mimetype = "application/json" if meta.get("format") == "speedscope" else "text/plain"
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=meta["file"])
+
+
+def init_app(app):
+    """Expose the admin listing and, only when PROFILER_ENABLED, install the request hooks."""
+    app.add_url_rule("/admin/profiles", "list_profiles", list_profiles_view, methods=["GET"])
+    app.add_url_rule("/admin/profiles/<profile_id>", "get_profile", get_profile_view, methods=["GET"])
+    if not PROFILER_ENABLED:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
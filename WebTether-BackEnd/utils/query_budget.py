@@ -0,0 +1,191 @@
+# utils/query_budget.py
+"""
+Per-request database call accounting.
+
+models/db.py reports every executed Supabase query here. While a request is being served the
+calls are collected in a context-local QueryStats, and on the way out:
+ - `X-DB-Calls` and `Server-Timing` (db + app durations) headers are attached to the response
+ - the call count is checked against the route's budget; going over logs a warning, or raises
+   QueryBudgetExceeded when DB_CALL_BUDGET_STRICT=1 (use that in tests / CI)
+ - the same query shape (table, operation, filtered columns) repeated DB_N_PLUS_ONE_THRESHOLD
+   times is reported as a likely N+1 (multi-row inserts / upserts written in chunks are not)
+
+Budgets come from DB_CALL_BUDGETS, e.g.
+    DB_CALL_BUDGETS="POST /pings/manual=4,GET /pings/wallet/balance=2,POST /auth/signup=4"
+keyed by method and route template; other routes use DB_CALL_BUDGET_DEFAULT (0 = no budget).
+track_queries() gives the same accounting around arbitrary code (scripts, tests).
+"""
+
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from dotenv import load_dotenv
+from flask import g, request
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+DB_CALL_BUDGET_DEFAULT = int(os.getenv("DB_CALL_BUDGET_DEFAULT", 0))
+DB_CALL_BUDGET_STRICT = os.getenv("DB_CALL_BUDGET_STRICT", "0") in ("1", "true", "True")
+DB_N_PLUS_ONE_THRESHOLD = int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", 3))
+# shape marker models/db.py adds to multi-row writes
+BATCH_SHAPE = "rows:many"
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def _parse_budgets(raw: str) -> dict:
+    budgets = {}
+    for item in (raw or "").split(","):
+        if "=" not in item:
+            continue
+        route, _, limit = item.rpartition("=")
+        try:
+            budgets[" ".join(route.split())] = int(limit)
+        except ValueError:
+            logger.warning("Ignoring malformed DB_CALL_BUDGETS entry: %r", item)
+    return budgets
+
+
+DB_CALL_BUDGETS = _parse_budgets(os.getenv("DB_CALL_BUDGETS", ""))
+
+
+class QueryStats:
+    # shared by a request's worker threads when it fans reads out (models/query_executor.py)
+    __slots__ = ("calls", "db_seconds", "shapes", "started", "_lock")
+
+    def __init__(self):
+        self.calls = 0
+        self.db_seconds = 0.0
+        self.shapes = Counter()
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, table: str, operation: str, seconds: float, shape: tuple = ()):
+        with self._lock:
+            self.calls += 1
+            self.db_seconds += seconds
+            self.shapes[(table, operation, shape)] += 1
+
+    def repeated_shapes(self, threshold: int = None):
+        threshold = threshold or DB_N_PLUS_ONE_THRESHOLD
+        return [(shape, n) for shape, n in self.shapes.items()
+                if n >= threshold and BATCH_SHAPE not in shape[2]]
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "db_ms": round(self.db_seconds * 1000, 3),
+            "by_query": [
+                {"table": t, "operation": op, "filters": list(shape), "count": n}
+                for (t, op, shape), n in self.shapes.most_common()
+            ]
+        }
+
+
+_current = contextvars.ContextVar("webtether_query_stats", default=None)
+
+
+def record_query(table: str, operation: str, seconds: float, shape: tuple = ()):
+    """Called by the data-access layer after each executed query; a no-op outside tracking."""
+    stats = _current.get()
+    if stats is not None:
+        stats.add(table, operation, seconds, shape)
+
+
+def current_stats():
+    return _current.get()
+
+
+@contextlib.contextmanager
+def track_queries():
+    """Count the queries executed inside the block: `with track_queries() as stats: ...`."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def budget_for(route_key: str):
+    limit = DB_CALL_BUDGETS.get(route_key, DB_CALL_BUDGET_DEFAULT)
+    return limit if limit > 0 else None
+
+
+def check_budget(route_key: str, stats: QueryStats):
+    """Warn (or raise in strict mode) when `stats` breaks the route's budget or looks like an N+1."""
+    problems = []
+    limit = budget_for(route_key)
+    if limit is not None and stats.calls > limit:
+        problems.append(f"{stats.calls} DB calls, budget is {limit}")
+    for (table, operation, shape), n in stats.repeated_shapes():
+        columns = ",".join(shape) or "-"
+        problems.append(f"possible N+1: {operation} {table} [{columns}] x{n}")
+    if not problems:
+        return
+    message = f"DB query budget: {route_key}: " + "; ".join(problems)
+    if DB_CALL_BUDGET_STRICT:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+# ------------------------------
+# Flask wiring
+# ------------------------------
+def _route_key():
+    rule = request.url_rule
+    return f"{request.method} {rule.rule if rule is not None else request.path}"
+
+
+def start_tracking():
+    """Begin accounting for the current request/task. Returns (stats, token for _current.reset)."""
+    stats = QueryStats()
+    return stats, _current.set(stats)
+
+
+def apply_headers(response, stats: QueryStats):
+    """Attach X-DB-Calls and Server-Timing (db + app durations) to a Flask/Quart response."""
+    app_ms = (time.perf_counter() - stats.started) * 1000
+    db_ms = stats.db_seconds * 1000
+    response.headers["X-DB-Calls"] = str(stats.calls)
+    timing = f'db;dur={db_ms:.2f};desc="{stats.calls} calls", app;dur={app_ms:.2f}'
+    existing = response.headers.get("Server-Timing")
+    response.headers["Server-Timing"] = f"{existing}, {timing}" if existing else timing
+
+
+def _before_request():
+    g._query_stats, g._query_stats_token = start_tracking()
+
+
+def _after_request(response):
+    stats = g.get("_query_stats")
+    if stats is None:
+        return response
+    apply_headers(response, stats)
+    check_budget(_route_key(), stats)
+    return response
+
+
+def _teardown_request(exc):
+    token = g.pop("_query_stats_token", None)
+    if token is not None:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # teardown can run in a different context than before_request (e.g. streamed responses)
+            _current.set(None)
+
+
+def init_app(app):
+    """Track DB calls per request and attach X-DB-Calls / Server-Timing headers."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,251 @@
+# utils/rate_limit.py
+"""
+Token-bucket admission control.
+
+Buckets are kept per scope:
+ - user   -> one bucket per authenticated uid (or client IP when the caller is anonymous);
+             callers pass an identity they verified, never one taken from the request body
+ - worker -> trusted internal workers posting raw pings (POST /pings/ with an X-Worker-Token
+             header equal to RATE_LIMIT_WORKER_TOKEN) share this bucket instead of the user
+             one, so workers behind one IP are not held to a single client's limit
+ - host   -> one bucket per probed target host, so one site is never hammered
+ - global -> a single bucket protecting the whole process (workers included)
+
+Every scope needs a refill rate > 0 and a burst >= 1; anything else is rejected when the
+limits are read. To switch admission control off, set RATE_LIMIT_ENABLED=0.
+
+State lives in a pluggable store:
+ - InMemoryBucketStore (default): per-process, lock-protected dict
+ - RedisBucketStore: shared across workers; enable with RATE_LIMIT_BACKEND=redis
+   and RATE_LIMIT_REDIS_URL (requires the `redis` package)
+
+Controllers call check_rate_limits(...) and, when it returns a response, return it as-is
+(HTTP 429 with a Retry-After header). A call rejected by one bucket gives back the tokens it
+already took from the buckets checked before it.
+"""
+
+import hmac
+import math
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+from flask import jsonify
+
+load_dotenv()
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") not in ("0", "false", "False")
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://127.0.0.1:6379/0")
+RATE_LIMIT_WORKER_TOKEN = os.getenv("RATE_LIMIT_WORKER_TOKEN", "")
+
+# (tokens refilled per second, bucket capacity)
+DEFAULT_LIMITS = {
+    "user": (float(os.getenv("RATE_LIMIT_USER_PER_SEC", 1)), float(os.getenv("RATE_LIMIT_USER_BURST", 10))),
+    "worker": (float(os.getenv("RATE_LIMIT_WORKER_PER_SEC", 50)), float(os.getenv("RATE_LIMIT_WORKER_BURST", 500))),
+    "host": (float(os.getenv("RATE_LIMIT_HOST_PER_SEC", 2)), float(os.getenv("RATE_LIMIT_HOST_BURST", 10))),
+    "global": (float(os.getenv("RATE_LIMIT_GLOBAL_PER_SEC", 100)), float(os.getenv("RATE_LIMIT_GLOBAL_BURST", 200))),
+}
+
+
+def validate_limits(limits: dict):
+    """Raise ValueError unless every scope has a refill rate > 0 and a burst >= 1."""
+    for scope, (rate, burst) in limits.items():
+        if not rate > 0 or not burst >= 1:
+            raise ValueError(f"Rate limit '{scope}' needs a rate > 0 and a burst >= 1 (got rate={rate}, "
+                             f"burst={burst}); set RATE_LIMIT_ENABLED=0 to disable rate limiting")
+
+
+validate_limits(DEFAULT_LIMITS)
+
+
+def is_trusted_worker(headers) -> bool:
+    """True when the request carries the internal workers' X-Worker-Token."""
+    supplied = headers.get("X-Worker-Token", "")
+    return bool(RATE_LIMIT_WORKER_TOKEN) and hmac.compare_digest(supplied.encode(), RATE_LIMIT_WORKER_TOKEN.encode())
+
+
+class InMemoryBucketStore:
+    """Token buckets held in this process only."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self.max_keys = max_keys
+
+    def acquire(self, key: str, rate: float, burst: float, cost: float = 1.0):
+        """
+        Try to take `cost` tokens from bucket `key`.
+        Returns (allowed, retry_after_seconds).
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return True, 0.0
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._evict_idle(now)
+        return False, (cost - tokens) / rate
+
+    def refund(self, key: str, burst: float, cost: float = 1.0):
+        """Give back `cost` tokens taken by acquire() (capped at the bucket's capacity)."""
+        with self._lock:
+            state = self._buckets.get(key)
+            if state is not None:
+                self._buckets[key] = (min(burst, state[0] + cost), state[1])
+
+    def _evict_idle(self, now: float):
+        # buckets idle for an hour have refilled completely and carry no information
+        for k in list(self._buckets):
+            tokens, last = self._buckets[k]
+            if now - last > 3600:
+                del self._buckets[k]
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBucketStore:
+    """
+    Token buckets shared between worker processes through Redis.
+    The refill-and-take step runs as a single Lua script, so it is atomic across workers.
+    """
+
+    _SCRIPT = """
+    local key = KEYS[1]
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local now = tonumber(ARGV[4])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    _REFUND_SCRIPT = """
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+    if tokens then
+        redis.call('HSET', KEYS[1], 'tokens', math.min(tonumber(ARGV[1]), tokens + tonumber(ARGV[2])))
+    end
+    return 1
+    """
+
+    def __init__(self, url: str = RATE_LIMIT_REDIS_URL, prefix: str = "webtether:rl:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(self._SCRIPT)
+        self._refund_script = self.client.register_script(self._REFUND_SCRIPT)
+
+    def acquire(self, key: str, rate: float, burst: float, cost: float = 1.0):
+        allowed, tokens = self._script(keys=[self.prefix + key], args=[rate, burst, cost, time.time()])
+        if int(allowed) == 1:
+            return True, 0.0
+        return False, (cost - float(tokens)) / rate
+
+    def refund(self, key: str, burst: float, cost: float = 1.0):
+        self._refund_script(keys=[self.prefix + key], args=[burst, cost])
+
+
+class RateLimiter:
+    """Applies the caller's (user or worker), host and global buckets in that order (most specific first)."""
+
+    def __init__(self, store=None, limits: dict = None):
+        self.store = store or InMemoryBucketStore()
+        self.limits = dict(DEFAULT_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        validate_limits(self.limits)
+
+    def check(self, user_key: str = None, host: str = None, cost: float = 1.0, caller_scope: str = "user"):
+        """
+        Returns (allowed, retry_after_seconds, scope). `scope` names the bucket that rejected the call.
+        `user_key` is looked up in the `caller_scope` buckets ("user", or "worker" for trusted workers).
+        """
+        scopes = []
+        if user_key:
+            scopes.append((caller_scope, f"{caller_scope}:{user_key}"))
+        if host:
+            scopes.append(("host", f"host:{host}"))
+        scopes.append(("global", "global"))
+
+        taken = []
+        for scope, key in scopes:
+            rate, burst = self.limits[scope]
+            allowed, retry_after = self.store.acquire(key, rate, burst, cost)
+            if not allowed:
+                # a rejected call must not use up the more specific buckets it passed
+                for taken_key, taken_burst in taken:
+                    self.store.refund(taken_key, taken_burst, cost)
+                return False, retry_after, scope
+            taken.append((key, burst))
+        return True, 0.0, None
+
+
+def _build_store():
+    if RATE_LIMIT_BACKEND == "redis":
+        return RedisBucketStore(RATE_LIMIT_REDIS_URL)
+    return InMemoryBucketStore()
+
+
+rate_limiter = RateLimiter(_build_store())
+
+
+def host_from_url(url: str):
+    """Lower-cased host of `url` or None (accepts URLs without a scheme)."""
+    if not url:
+        return None
+    if "://" not in url:
+        url = "https://" + url
+    try:
+        return (urlsplit(url).hostname or "").lower() or None
+    except ValueError:
+        return None
+
+
+def rate_limit_rejection(user_key=None, url: str = None, caller_scope: str = "user"):
+    """
+    Framework-neutral admission check.
+    Returns None when admitted, otherwise the 429 body dict (with an integer "retry_after").
+    """
+    if not RATE_LIMIT_ENABLED:
+        return None
+    allowed, retry_after, scope = rate_limiter.check(
+        user_key=str(user_key) if user_key is not None else None,
+        host=host_from_url(url),
+        caller_scope=caller_scope
+    )
+    if allowed:
+        return None
+    return {"error": "Rate limit exceeded", "scope": scope, "retry_after": max(1, math.ceil(retry_after))}
+
+
+def check_rate_limits(user_key=None, url: str = None, caller_scope: str = "user"):
+    """
+    Run admission control for one request.
+    Returns None when admitted, otherwise a (response, 429) tuple for the controller to return.
+    """
+    rejection = rate_limit_rejection(user_key, url, caller_scope)
+    if rejection is None:
+        return None
+    resp = jsonify(rejection)
+    resp.headers["Retry-After"] = str(rejection["retry_after"])
+    return resp, 429
@@ -0,0 +1,316 @@
+# utils/region_cube.py
+"""
+Website x region latency cube, updated on ingestion instead of scanning `ping` per request.
+
+One cell per (wid, region) holds:
+ - checks / up             -> up ratio
+ - a latency sketch        -> avg, min, max and p50 / p95 / p99 within REGION_CUBE_SKETCH_ACCURACY
+                              relative error
+ - last_checked_at
+
+The sketch keeps counts in logarithmic buckets (bucket i covers (gamma^(i-1), gamma^i] ms,
+gamma = (1 + a) / (1 - a)), so its size depends on the latency range, not on the number of
+pings, and two sketches merge (or subtract) by adding bucket counts. Next to the cells the cube
+keeps one rolled-up cell per region across all websites, so both GET /websites/<wid>/regions and
+GET /regions/summary are answered without touching the database, in time independent of the
+ping volume.
+
+Updates come from the ping feed (record_ping, utils/ping_feed.py); deleting a website drops its cells
+(drop_website). rebuild() replays archived + hot pings into a fresh cube; pings arriving
+meanwhile are held back and merged before the swap with the same bookkeeping as the leaderboard
+(utils/live_rebuild.py). Off at startup unless REGION_CUBE_REBUILD_ON_START=1.
+"""
+
+import logging
+import math
+import os
+import threading
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+from utils.live_rebuild import LiveRebuild
+from utils.ping_stats import parse_timestamp
+from utils.retention import iter_ping_history
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+REGION_CUBE_REBUILD_ON_START = os.getenv("REGION_CUBE_REBUILD_ON_START", "0") in ("1", "true", "True")
+REGION_CUBE_REBUILD_PAGE_SIZE = int(os.getenv("REGION_CUBE_REBUILD_PAGE_SIZE", 5000))
+REGION_CUBE_SKETCH_ACCURACY = float(os.getenv("REGION_CUBE_SKETCH_ACCURACY", 0.01))
+
+UNKNOWN_REGION = "unknown"
+QUANTILES = (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))
+
+
+class LatencySketch:
+    """Log-bucketed latency counts; quantiles are accurate to `accuracy` relative error."""
+
+    __slots__ = ("gamma", "_log_gamma", "buckets", "zeros", "count", "total", "min", "max")
+
+    def __init__(self, accuracy: float = REGION_CUBE_SKETCH_ACCURACY):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}       # bucket index -> count
+        self.zeros = 0          # latencies <= 1 ms
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float, n: int = 1):
+        if value <= 1:
+            self.zeros += n
+        else:
+            i = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[i] = self.buckets.get(i, 0) + n
+        self.count += n
+        self.total += value * n
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "LatencySketch", sign: int = 1):
+        """Add (sign=1) or remove (sign=-1) another sketch's samples. min / max only grow."""
+        for i, n in other.buckets.items():
+            left = self.buckets.get(i, 0) + sign * n
+            if left > 0:
+                self.buckets[i] = left
+            else:
+                self.buckets.pop(i, None)
+        self.zeros += sign * other.zeros
+        self.count += sign * other.count
+        self.total += sign * other.total
+        if sign > 0 and other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def quantile(self, q: float):
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if seen > rank:
+            return min(self.min, 1.0) if self.min is not None else 1.0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen > rank:
+                # midpoint of the bucket (in relative terms), clamped to what was observed
+                estimate = 2 * self.gamma ** i / (self.gamma + 1)
+                return round(min(max(estimate, self.min), self.max), 2)
+        return self.max
+
+    def summary(self) -> dict:
+        out = {"samples": self.count,
+               "avg": round(self.total / self.count, 2) if self.count > 0 else None,
+               "min": self.min if self.count > 0 else None,
+               "max": self.max if self.count > 0 else None}
+        for name, q in QUANTILES:
+            out[name] = self.quantile(q)
+        return out
+
+
+class _Cell:
+    __slots__ = ("checks", "up", "latency", "last_checked_at", "websites")
+
+    def __init__(self, accuracy: float):
+        self.checks = 0
+        self.up = 0
+        self.latency = LatencySketch(accuracy)
+        self.last_checked_at = None
+        self.websites = 0       # only used by the per-region rollup
+
+    def add(self, is_up: bool, latency, at: str):
+        self.checks += 1
+        self.up += 1 if is_up else 0
+        if latency is not None:
+            self.latency.add(latency)
+        if at and (self.last_checked_at is None or at > self.last_checked_at):
+            self.last_checked_at = at
+
+    def subtract(self, other: "_Cell"):
+        self.checks -= other.checks
+        self.up -= other.up
+        self.latency.merge(other.latency, sign=-1)
+
+    def to_dict(self, region: str) -> dict:
+        return {
+            "region": region,
+            "checks": self.checks,
+            "up": self.up,
+            "uptime_pct": round(self.up * 100.0 / self.checks, 2) if self.checks else None,
+            "latency_ms": self.latency.summary(),
+            "last_checked_at": self.last_checked_at
+        }
+
+
+def _region(row: dict) -> str:
+    region = str(row.get("region") or "").strip()
+    return region or UNKNOWN_REGION
+
+
+def _latency(row: dict):
+    value = row.get("latency_ms")
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value >= 0 else None
+
+
+def _checked_at(row: dict):
+    value = row.get("timestamp") or row.get("created_at")
+    if not value:
+        return datetime.now(timezone.utc).isoformat()
+    try:
+        return parse_timestamp(value).isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+class CubeState:
+    def __init__(self, accuracy: float = REGION_CUBE_SKETCH_ACCURACY):
+        self.accuracy = accuracy
+        self.cells = {}         # wid -> {region: _Cell}
+        self.regions = {}       # region -> _Cell rolled up over every website
+
+    def add_ping(self, row: dict):
+        try:
+            wid = int(row.get("wid"))
+        except (TypeError, ValueError):
+            return
+        region = _region(row)
+        is_up, latency, at = bool(row.get("is_up")), _latency(row), _checked_at(row)
+
+        total = self.regions.get(region)
+        if total is None:
+            total = self.regions[region] = _Cell(self.accuracy)
+        by_region = self.cells.setdefault(wid, {})
+        cell = by_region.get(region)
+        if cell is None:
+            cell = by_region[region] = _Cell(self.accuracy)
+            total.websites += 1
+        cell.add(is_up, latency, at)
+        total.add(is_up, latency, at)
+
+    def drop_website(self, wid: int):
+        for region, cell in self.cells.pop(wid, {}).items():
+            total = self.regions.get(region)
+            if total is None:
+                continue
+            total.subtract(cell)
+            total.websites -= 1
+            if total.websites <= 0:
+                del self.regions[region]
+
+
+class RegionCube:
+    def __init__(self, accuracy: float = REGION_CUBE_SKETCH_ACCURACY):
+        self.accuracy = accuracy
+        self._state = CubeState(accuracy)
+        self._lock = threading.Lock()
+        self._pending = None        # LiveRebuild while rebuilding
+        self._dropped = None        # wids deleted while rebuilding
+        self._thread = None
+        self.rebuilt_at = None
+
+    @property
+    def rebuilding(self) -> bool:
+        return self._pending is not None
+
+    # ------------------------------
+    # Updates
+    # ------------------------------
+    def record_ping(self, row: dict):
+        with self._lock:
+            if self._pending is not None and row.get("pid") is not None:
+                self._pending.hold("ping", int(row["pid"]), row)
+                return
+            self._state.add_ping(row)
+
+    def drop_website(self, wid: int):
+        with self._lock:
+            self._state.drop_website(wid)
+            if self._dropped is not None:
+                self._dropped.add(wid)
+
+    # ------------------------------
+    # Reads
+    # ------------------------------
+    def website(self, wid: int) -> dict:
+        with self._lock:
+            by_region = self._state.cells.get(wid, {})
+            regions = sorted((cell.to_dict(region) for region, cell in by_region.items()),
+                             key=lambda r: (-r["checks"], r["region"]))
+        return {"wid": wid, "regions": regions, "rebuilding": self.rebuilding}
+
+    def summary(self) -> dict:
+        with self._lock:
+            regions = []
+            for region, cell in self._state.regions.items():
+                entry = cell.to_dict(region)
+                entry["websites"] = cell.websites
+                regions.append(entry)
+            websites = len(self._state.cells)
+        regions.sort(key=lambda r: (-r["checks"], r["region"]))
+        return {"regions": regions, "websites": websites, "rebuilding": self.rebuilding}
+
+    # ------------------------------
+    # Rebuild
+    # ------------------------------
+    def rebuild(self, pings) -> dict:
+        """Replace the cube with one built from `pings`; live pings are merged, not lost."""
+        with self._lock:
+            if self._pending is not None:
+                raise RuntimeError("Region cube rebuild already running")
+            self._pending, self._dropped = LiveRebuild(), set()
+        state = CubeState(self.accuracy)
+        counts = {"pings": 0}
+        try:
+            for row in pings:
+                if row.get("pid") is not None:
+                    with self._lock:
+                        self._pending.replayed("ping", int(row["pid"]))
+                state.add_ping(row)
+                counts["pings"] += 1
+        except Exception:
+            with self._lock:
+                pending, self._pending, self._dropped = self._pending, None, None
+                for row in pending.merge("ping"):
+                    self._state.add_ping(row)
+            raise
+        with self._lock:
+            for wid in self._dropped:
+                state.drop_website(wid)
+            for row in self._pending.merge("ping"):
+                state.add_ping(row)
+            counts["merged_live"] = len(self._pending.pending)
+            counts["dropped_live"] = self._pending.dropped
+            self._state, self._pending, self._dropped = state, None, None
+            self.rebuilt_at = datetime.now(timezone.utc).isoformat()
+        return counts
+
+    def rebuild_from_db(self, ping_model=None, archive=None,
+                        page_size: int = REGION_CUBE_REBUILD_PAGE_SIZE) -> dict:
+        return self.rebuild(iter_ping_history(None, page_size=page_size, ping_model=ping_model, archive=archive))
+
+    def start_rebuild(self):
+        """Rebuild from the database on a background thread (no-op if one is running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+
+        def run():
+            try:
+                report = self.rebuild_from_db()
+                logger.info("Region cube rebuilt: %s", report)
+            except Exception:
+                logger.exception("Region cube rebuild failed")
+
+        self._thread = threading.Thread(target=run, name="region-cube-rebuild", daemon=True)
+        self._thread.start()
+        return self._thread
+
+
+region_cube = RegionCube()
@@ -0,0 +1,201 @@
+# utils/retention.py
+"""
+Retention for the `ping` table: raw rows older than PING_RETENTION_HOURS are
+ 1. written to a compressed, delta-encoded hourly archive segment (utils.ping_archive),
+ 2. downsampled into `ping_hourly` aggregates (upserted per website and hour),
+ 3. deleted from the hot table in batches of PING_RETENTION_DELETE_BATCH pids.
+
+Work is done one UTC hour at a time, oldest first. Every step is idempotent: if a run is
+interrupted, the next one re-reads what is left of the hour, merges it with the segment already
+on disk (by pid) and rewrites both the segment and the aggregates from the union.
+
+ping_history() is the read side: recent rows from the hot table, older ones from the archive,
+merged so callers don't need to know where the cut-off is. iter_ping_history() walks the same
+data oldest-first in constant memory, for exports.
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from models.db import response_rows
+from models.ping_model import PingModel
+from models.ping_hourly_model import PingHourlyModel
+from utils.export_stream import keyset_pages
+from utils.ping_archive import PingArchive, floor_hour
+from utils.ping_stats import hourly_rollups, parse_timestamp
+
+load_dotenv()
+
+PING_RETENTION_HOURS = int(os.getenv("PING_RETENTION_HOURS", 30 * 24))
+PING_RETENTION_READ_BATCH = int(os.getenv("PING_RETENTION_READ_BATCH", 1000))
+PING_RETENTION_DELETE_BATCH = int(os.getenv("PING_RETENTION_DELETE_BATCH", 200))
+
+_ROLLUP_COLUMNS = ("wid", "timestamp", "is_up", "latency_ms")
+
+
+def retention_cutoff(now: datetime = None, hours: int = None) -> datetime:
+    """Start of the newest hour that is entirely older than the retention window."""
+    now = now or datetime.now(timezone.utc)
+    return floor_hour(now - timedelta(hours=PING_RETENTION_HOURS if hours is None else hours))
+
+
+class RetentionJob:
+    def __init__(self, ping_model: PingModel = None, hourly_model: PingHourlyModel = None,
+                 archive: PingArchive = None, read_batch: int = None, delete_batch: int = None):
+        self.ping_model = ping_model or PingModel()
+        self.hourly_model = hourly_model or PingHourlyModel()
+        self.archive = archive or PingArchive()
+        self.read_batch = read_batch or PING_RETENTION_READ_BATCH
+        self.delete_batch = delete_batch or PING_RETENTION_DELETE_BATCH
+
+    def _hot_rows(self, hour: datetime) -> list:
+        start, end = hour.isoformat(), (hour + timedelta(hours=1)).isoformat()
+        rows, after = [], 0
+        while True:
+            batch = response_rows(self.ping_model.get_pings_between(start, end, after_pid=after, limit=self.read_batch))
+            rows.extend(batch)
+            if len(batch) < self.read_batch:
+                return rows
+            after = batch[-1]["pid"]
+
+    def _next_hour(self, since: datetime, cutoff: datetime):
+        oldest = response_rows(self.ping_model.get_oldest_ping(
+            since=since.isoformat() if since else None, before=cutoff.isoformat()))
+        return floor_hour(oldest[0]["timestamp"]) if oldest else None
+
+    def process_hour(self, hour: datetime, dry_run: bool = False) -> dict:
+        hot = self._hot_rows(hour)
+        merged = {r["pid"]: r for r in self.archive.read_hour(hour)}
+        merged.update((r["pid"], r) for r in hot)
+        rows = list(merged.values())
+        summary = {"hour": hour.isoformat(), "hot_rows": len(hot), "archived_rows": len(rows), "deleted": 0}
+        if not rows or dry_run:
+            return summary
+
+        summary["segment"] = self.archive.write_segment(hour, rows)
+        rollups = hourly_rollups(rows)
+        if rollups:
+            self.hourly_model.upsert_rollups(rollups)
+        pids = [r["pid"] for r in hot]
+        for i in range(0, len(pids), self.delete_batch):
+            self.ping_model.delete_pings(pids[i:i + self.delete_batch])
+            summary["deleted"] += len(pids[i:i + self.delete_batch])
+        return summary
+
+    def run(self, cutoff: datetime = None, max_hours: int = None, dry_run: bool = False) -> dict:
+        """Archive every hour older than `cutoff` (default: the retention window), oldest first."""
+        cutoff = floor_hour(cutoff) if cutoff is not None else retention_cutoff()
+        report = {"cutoff": cutoff.isoformat(), "dry_run": dry_run, "hours": [], "archived_rows": 0, "deleted": 0}
+        since = None
+        while max_hours is None or len(report["hours"]) < max_hours:
+            hour = self._next_hour(since, cutoff)
+            if hour is None:
+                break
+            summary = self.process_hour(hour, dry_run=dry_run)
+            report["hours"].append(summary)
+            report["archived_rows"] += summary["archived_rows"]
+            report["deleted"] += summary["deleted"]
+            since = hour + timedelta(hours=1)
+        return report
+
+
+# ------------------------------
+# Read side
+# ------------------------------
+def ping_history(wid: int, since=None, until=None, limit: int = 1000,
+                 ping_model: PingModel = None, archive: PingArchive = None) -> list:
+    """
+    Pings of `wid` with since <= timestamp < until, newest first, at most `limit` rows.
+    The archive is only consulted when the range reaches past the retention window, and is read
+    newest segment first: reading stops as soon as `limit` rows newer than the next segment's
+    hour are in hand, so an open-ended range doesn't decode the whole archive.
+    """
+    ping_model = ping_model or PingModel()
+    since_iso = parse_timestamp(since).isoformat() if since is not None else None
+    until_iso = parse_timestamp(until).isoformat() if until is not None else None
+
+    def newest(rows):
+        return sorted(rows.values(), key=lambda r: parse_timestamp(r["timestamp"]), reverse=True)[:limit]
+
+    rows = {r["pid"]: r for r in response_rows(ping_model.get_pings_by_wid_between(wid, since_iso, until_iso, limit=limit))}
+    if since is None or parse_timestamp(since) < retention_cutoff():
+        archive = archive or PingArchive()
+        kept = newest(rows)
+
+        def enough(hour):
+            return len(kept) >= limit and parse_timestamp(kept[-1]["timestamp"]) >= hour + timedelta(hours=1)
+
+        for _hour, segment in archive.iter_segments(wid=wid, since=since, until=until, newest_first=True,
+                                                    stop=enough):
+            for row in segment:
+                rows.setdefault(row["pid"], row)
+            kept = newest(rows)
+            rows = {r["pid"]: r for r in kept}
+        return kept
+    return newest(rows)
+
+
+def iter_ping_history(wid: Optional[int], since=None, until=None, page_size: int = 1000,
+                      ping_model: PingModel = None, archive: PingArchive = None):
+    """
+    Every ping of `wid` (of every website when wid is None) in [since, until), oldest first:
+    archived segments, then the hot table keyset-paged by pid. Only archive rows from hours that still have hot rows are remembered
+    (to skip duplicates of a partly processed hour), so memory stays bounded.
+    """
+    ping_model = ping_model or PingModel()
+    archive = archive or PingArchive()
+    since_iso = parse_timestamp(since).isoformat() if since is not None else None
+    until_iso = parse_timestamp(until).isoformat() if until is not None else None
+
+    oldest_hot = response_rows(ping_model.get_oldest_ping(since=since_iso, before=until_iso, wid=wid))
+    overlap_from = floor_hour(oldest_hot[0]["timestamp"]) if oldest_hot else None
+    overlap_pids = set()
+    for row in archive.iter_rows(wid=wid, since=since, until=until):
+        if overlap_from is not None and parse_timestamp(row["timestamp"]) >= overlap_from:
+            overlap_pids.add(row["pid"])
+        yield row
+
+    def fetch(after_pid, limit):
+        if wid is None:
+            return ping_model.get_pings_after(after_pid, limit, since=since_iso, until=until_iso)
+        return ping_model.get_pings_by_wid_after(wid, after_pid, limit, since=since_iso, until=until_iso)
+
+    for row in keyset_pages(fetch, "pid", page_size):
+        if row["pid"] not in overlap_pids:
+            yield row
+
+
+def hourly_history(wid: int, since=None, until=None, ping_model: PingModel = None,
+                   hourly_model: PingHourlyModel = None, page_size: int = PING_RETENTION_READ_BATCH) -> list:
+    """
+    Hourly aggregates for `wid`, newest first: stored `ping_hourly` rows for archived hours plus
+    hours computed on the fly from rows still in the hot table. Only the retention window is read
+    from the hot table (keyset-paged); pings that land late in an archived hour are folded into its
+    stored aggregate by the next retention run.
+    """
+    ping_model = ping_model or PingModel()
+    hourly_model = hourly_model or PingHourlyModel()
+    since_iso = parse_timestamp(since).isoformat() if since is not None else None
+    until_iso = parse_timestamp(until).isoformat() if until is not None else None
+    hot_since = retention_cutoff()
+    if since is not None:
+        hot_since = max(hot_since, parse_timestamp(since))
+
+    hours = {parse_timestamp(r["hour"]): r for r in response_rows(hourly_model.get_rollups_by_wid(wid, since_iso, until_iso))}
+    if until is None or parse_timestamp(until) > hot_since:
+        def fetch(after_pid, limit):
+            return ping_model.get_pings_by_wid_after(wid, after_pid, limit, since=hot_since.isoformat(),
+                                                     until=until_iso)
+
+        # only the columns the rollup needs are kept while paging through the window
+        hot = [{k: r.get(k) for k in _ROLLUP_COLUMNS} for r in keyset_pages(fetch, "pid", page_size)]
+        for rollup in hourly_rollups(hot):
+            key = parse_timestamp(rollup["hour"])
+            stored = hours.get(key)
+            if stored is None or stored.get("total", 0) < rollup["total"]:
+                # an hour caught mid-archive: the hot rows are the fuller view
+                hours[key] = rollup
+    return [hours[k] for k in sorted(hours, reverse=True)]
@@ -0,0 +1,158 @@
+# utils/reward_credits.py
+"""
+Validator reward credits, written off the request path.
+
+Only checks whose validator is authenticated earn a reward: the manual check endpoints
+(POST /pings/manual, sync and async) credit the JWT uid that ran the check. A ping's
+checked_by_uid column alone is never paid, because POST /pings/ takes it from the request body.
+
+Crediting needs the site's owner and reward_per_ping plus an insert into `validator_earnings`,
+so the endpoints only enqueue (uid, wid, pid) here (non-blocking, bounded queue) and a background
+thread writes them in batches of up to REWARD_CREDIT_BATCH, as utils.anomaly_writer does for
+anomaly events. Site lookups are cached for REWARD_SITE_CACHE_SECONDS. With the write spool
+enabled the credit is spooled together with its ping instead (utils/write_spool.py) and written
+by write() when the spool drains, so it survives a restart like the ping does.
+
+Owners checking their own site are not validators for it and earn nothing. A pid is credited at
+most once (validator_earnings.pid is unique and batches are upserted on it).
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from models.db import response_row
+from models.validator_earnings_model import ValidatorEarningsModel
+from models.website_model import WebsiteModel
+from utils.reward_settlement import reward_wei_for_website
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+REWARDS_ENABLED = os.getenv("REWARDS_ENABLED", "1") not in ("0", "false", "False")
+# how long a site's owner / reward_per_ping is cached by the credit writer
+REWARD_SITE_CACHE_SECONDS = float(os.getenv("REWARD_SITE_CACHE_SECONDS", 300))
+REWARD_CREDIT_QUEUE_SIZE = int(os.getenv("REWARD_CREDIT_QUEUE_SIZE", 10000))
+REWARD_CREDIT_BATCH = int(os.getenv("REWARD_CREDIT_BATCH", 100))
+REWARD_CREDIT_WAIT_SECONDS = float(os.getenv("REWARD_CREDIT_WAIT_SECONDS", 0.5))
+
+
+class RewardCreditWriter:
+    def __init__(self, earnings_model: ValidatorEarningsModel = None, website_model: WebsiteModel = None,
+                 queue_size: int = REWARD_CREDIT_QUEUE_SIZE, batch_size: int = REWARD_CREDIT_BATCH,
+                 batch_wait: float = REWARD_CREDIT_WAIT_SECONDS,
+                 site_cache_seconds: float = REWARD_SITE_CACHE_SECONDS):
+        self.earnings_model = earnings_model or ValidatorEarningsModel()
+        self.website_model = website_model or WebsiteModel()
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.site_cache_seconds = site_cache_seconds
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._site_cache = {}       # wid -> (expires at, (owner uid, reward wei) or None)
+        self._thread = None
+        self.stats = {"enqueued": 0, "dropped": 0, "written": 0, "skipped": 0, "failed": 0}
+
+    def enqueue(self, uid: int, wid: int, pid: int) -> bool:
+        """Queue a credit for a check the authenticated validator `uid` ran. Never blocks."""
+        if not REWARDS_ENABLED or uid is None or wid is None or pid is None:
+            return False
+        self.start()
+        try:
+            self._queue.put_nowait({"uid": uid, "wid": wid, "pid": pid})
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("enqueued")
+        return True
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.stats[name] += n
+
+    def _site_reward(self, wid):
+        """(owner uid, reward wei) for a site, or None if it does not exist; cached."""
+        now = time.monotonic()
+        with self._lock:
+            hit = self._site_cache.get(wid)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+        site = response_row(self.website_model.get_website_by_id(wid))
+        value = (site.get("uid"), reward_wei_for_website(site)) if site else None
+        with self._lock:
+            self._site_cache[wid] = (now + self.site_cache_seconds, value)
+        return value
+
+    def write(self, credits: list) -> list:
+        """
+        Store [{"uid", "wid", "pid"}] as pending earnings; returns the credits written. Credits
+        for unknown sites, unrewarded sites and the site's own owner are skipped. Raises on
+        database errors (the spool retries, the background thread logs and counts them).
+        """
+        if not REWARDS_ENABLED:
+            return []
+        payloads = []
+        for credit in credits:
+            uid, wid, pid = credit.get("uid"), credit.get("wid"), credit.get("pid")
+            site = self._site_reward(wid) if None not in (uid, wid, pid) else None
+            if site is None:
+                continue
+            owner_uid, amount_wei = site
+            if (owner_uid is not None and str(owner_uid) == str(uid)) or amount_wei <= 0:
+                continue
+            payloads.append(ValidatorEarningsModel.build_payload(uid, wid, pid, amount_wei))
+        self._count("skipped", len(credits) - len(payloads))
+        if payloads:
+            self.earnings_model.credit_many(payloads)
+            self._count("written", len(payloads))
+        return payloads
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="reward-credit-writer", daemon=True)
+                self._thread.start()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued credit has been written or given up on (useful in tests)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _collect_batch(self) -> list:
+        """Block for the first credit, then gather more for up to batch_wait seconds."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                self.write(batch)
+            except Exception:
+                self._count("failed", len(batch))
+                logger.exception("Failed to credit %d validator reward(s)", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+reward_credits = RewardCreditWriter()
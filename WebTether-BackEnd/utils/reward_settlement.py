@@ -0,0 +1,505 @@
+# utils/reward_settlement.py
+"""
+Batched validator reward payouts.
+
+Validated pings credit the off-chain `validator_earnings` ledger (controllers.reward_controller).
+RewardSettler drains it periodically:
+ 1. confirm: receipts of previously submitted batches. Rows are marked settled, except for
+    receivers the contract reported as RewardFailed. Those go back to pending; receivers map
+    back to validators through the wallets the batch was paid to, not their current ones.
+    A batch without a receipt after SETTLEMENT_CONFIRM_TIMEOUT_SECONDS (dropped, or priced
+    out) is replaced at the same nonce with fees raised by SETTLEMENT_FEE_BUMP. If its nonce
+    was used by another transaction and the batch is not settled, it goes back to 'created'.
+ 2. resubmit: batches created but never sent (crash / RPC error between the two steps). They
+    are resent under the same batch id. PingPayment.settledBatches makes a duplicate a revert,
+    never a second payment.
+ 3. submit: pending rows are summed per validator wallet and split into batches of
+    SETTLEMENT_BATCH_SIZE receivers. Each batch is one batchReward transaction, signed locally.
+    Batches are sent back to back with nonces from NonceManager, without waiting for the
+    previous one to be mined.
+
+One payout costs one raw-transaction RPC for up to SETTLEMENT_BATCH_SIZE validators (plus one
+receipt lookup), instead of a rewardUser call, gas estimate and receipt per ping.
+Run one settler per signing key, e.g. `python scripts/settle_rewards.py --loop 300`.
+
+Environment:
+ - WEB3_RPC_URL [http://127.0.0.1:8545], PING_PAYMENT_CONTRACT, SETTLEMENT_PRIVATE_KEY (contract owner)
+ - REWARD_PER_PING_ETH [0.0001]        credit for sites without reward_per_ping
+ - SETTLEMENT_BATCH_SIZE [200], SETTLEMENT_MAX_BATCHES [10] per run, SETTLEMENT_LEDGER_SCAN [50000]
+ - SETTLEMENT_MIN_PAYOUT_ETH [0]       leave smaller balances pending until they grow
+ - SETTLEMENT_GAS_BASE [60000], SETTLEMENT_GAS_PER_RECIPIENT [25000], SETTLEMENT_PRIORITY_FEE_GWEI [1]
+ - SETTLEMENT_CONFIRM_TIMEOUT_SECONDS [600], SETTLEMENT_FEE_BUMP [1.25] (nodes need >= 1.1)
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+
+from dotenv import load_dotenv
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+from web3.logs import DISCARD
+
+from models.db import response_rows
+from models.reward_batch_model import RewardBatchModel
+from models.user_model import UserModel
+from models.validator_earnings_model import ValidatorEarningsModel
+from utils.ping_stats import parse_timestamp
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+WEB3_RPC_URL = os.getenv("WEB3_RPC_URL", "http://127.0.0.1:8545")
+PING_PAYMENT_CONTRACT = os.getenv("PING_PAYMENT_CONTRACT", "0x5FbDB2315678afecb367f032d93F642f64180aa3")
+SETTLEMENT_PRIVATE_KEY = os.getenv("SETTLEMENT_PRIVATE_KEY", "")
+REWARD_PER_PING_ETH = os.getenv("REWARD_PER_PING_ETH", "0.0001")
+SETTLEMENT_BATCH_SIZE = int(os.getenv("SETTLEMENT_BATCH_SIZE", 200))
+SETTLEMENT_MAX_BATCHES = int(os.getenv("SETTLEMENT_MAX_BATCHES", 10))
+SETTLEMENT_LEDGER_SCAN = int(os.getenv("SETTLEMENT_LEDGER_SCAN", 50000))
+SETTLEMENT_MIN_PAYOUT_ETH = os.getenv("SETTLEMENT_MIN_PAYOUT_ETH", "0")
+SETTLEMENT_GAS_BASE = int(os.getenv("SETTLEMENT_GAS_BASE", 60000))
+SETTLEMENT_GAS_PER_RECIPIENT = int(os.getenv("SETTLEMENT_GAS_PER_RECIPIENT", 25000))
+SETTLEMENT_PRIORITY_FEE_GWEI = os.getenv("SETTLEMENT_PRIORITY_FEE_GWEI", "1")
+SETTLEMENT_CONFIRM_TIMEOUT_SECONDS = float(os.getenv("SETTLEMENT_CONFIRM_TIMEOUT_SECONDS", 600))
+SETTLEMENT_FEE_BUMP = float(os.getenv("SETTLEMENT_FEE_BUMP", 1.25))
+
+# PostgREST puts in_() filters in the URL; keep id lists well under proxy limits
+_ID_CHUNK = 500
+_LEDGER_PAGE = 5000
+
+PING_PAYMENT_ABI = [
+    {
+        "type": "function", "name": "batchReward", "stateMutability": "nonpayable",
+        "inputs": [
+            {"name": "batchId", "type": "uint256"},
+            {"name": "receivers", "type": "address[]"},
+            {"name": "amounts", "type": "uint256[]"}
+        ],
+        "outputs": []
+    },
+    {
+        "type": "function", "name": "settledBatches", "stateMutability": "view",
+        "inputs": [{"name": "", "type": "uint256"}],
+        "outputs": [{"name": "", "type": "bool"}]
+    },
+    {
+        "type": "event", "name": "RewardFailed", "anonymous": False,
+        "inputs": [
+            {"indexed": True, "name": "batchId", "type": "uint256"},
+            {"indexed": True, "name": "receiver", "type": "address"},
+            {"indexed": False, "name": "amount", "type": "uint256"}
+        ]
+    },
+    {
+        "type": "event", "name": "BatchSettled", "anonymous": False,
+        "inputs": [
+            {"indexed": True, "name": "batchId", "type": "uint256"},
+            {"indexed": False, "name": "recipients", "type": "uint256"},
+            {"indexed": False, "name": "paid", "type": "uint256"}
+        ]
+    }
+]
+
+
+def eth_to_wei(value) -> int:
+    """ETH amount (number or numeric string) -> integer wei, without float rounding."""
+    try:
+        return int(Web3.to_wei(Decimal(str(value)), "ether"))
+    except (InvalidOperation, ValueError, TypeError):
+        raise ValueError(f"Invalid ETH amount: {value!r}")
+
+
+DEFAULT_REWARD_WEI = eth_to_wei(REWARD_PER_PING_ETH)
+
+
+def reward_wei_for_website(website_row) -> int:
+    """Per-ping credit for a site: its reward_per_ping, else REWARD_PER_PING_ETH."""
+    value = (website_row or {}).get("reward_per_ping")
+    return DEFAULT_REWARD_WEI if value is None else eth_to_wei(value)
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class NonceManager:
+    """
+    Hands out consecutive nonces for one sender so several transactions can be in flight.
+    The first reservation reads the pending transaction count, later ones count locally.
+    resync() after a failed send, so a skipped nonce never blocks every transaction after it.
+    """
+
+    def __init__(self, w3, address: str):
+        self.w3 = w3
+        self.address = address
+        self._next = None
+        self._lock = threading.Lock()
+
+    def reserve(self) -> int:
+        with self._lock:
+            if self._next is None:
+                self._next = self.w3.eth.get_transaction_count(self.address, "pending")
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def resync(self):
+        with self._lock:
+            self._next = None
+
+
+def _is_nonce_error(exc) -> bool:
+    message = str(exc).lower()
+    return "nonce" in message or "already known" in message or "underpriced" in message
+
+
+class RewardSettler:
+    def __init__(self, w3=None, private_key: str = None, contract_address: str = None,
+                 batch_size: int = None, earnings_model=None, batch_model=None, user_model=None):
+        self._w3 = w3
+        self._private_key = private_key or SETTLEMENT_PRIVATE_KEY
+        self._contract_address = contract_address or PING_PAYMENT_CONTRACT
+        self.batch_size = batch_size or SETTLEMENT_BATCH_SIZE
+        self.earnings = earnings_model or ValidatorEarningsModel()
+        self.batches = batch_model or RewardBatchModel()
+        self.users = user_model or UserModel()
+        self._account = None
+        self._contract = None
+        self._nonces = None
+        self._chain_id = None
+        # one run at a time per process; concurrent runs would interleave nonces needlessly
+        self._run_lock = threading.Lock()
+
+    # ------------------------------
+    # chain access (created lazily so importing this module never needs a node or a key)
+    # ------------------------------
+    @property
+    def w3(self):
+        if self._w3 is None:
+            self._w3 = Web3(Web3.HTTPProvider(WEB3_RPC_URL))
+        return self._w3
+
+    @property
+    def account(self):
+        if self._account is None:
+            if not self._private_key:
+                raise RuntimeError("SETTLEMENT_PRIVATE_KEY is not set")
+            self._account = self.w3.eth.account.from_key(self._private_key)
+        return self._account
+
+    @property
+    def contract(self):
+        if self._contract is None:
+            self._contract = self.w3.eth.contract(address=Web3.to_checksum_address(self._contract_address),
+                                                  abi=PING_PAYMENT_ABI)
+        return self._contract
+
+    @property
+    def nonces(self):
+        if self._nonces is None:
+            self._nonces = NonceManager(self.w3, self.account.address)
+        return self._nonces
+
+    @property
+    def chain_id(self):
+        if self._chain_id is None:
+            self._chain_id = self.w3.eth.chain_id
+        return self._chain_id
+
+    def _fees(self) -> dict:
+        """EIP-1559 fee caps, read once per run."""
+        priority = int(Web3.to_wei(Decimal(SETTLEMENT_PRIORITY_FEE_GWEI), "gwei"))
+        base = self.w3.eth.get_block("latest").get("baseFeePerGas") or 0
+        return {"maxPriorityFeePerGas": priority, "maxFeePerGas": 2 * base + priority}
+
+    def _bumped_fees(self, batch: dict) -> dict:
+        """Current fees, but at least SETTLEMENT_FEE_BUMP x the caps of the send being replaced."""
+        fees = self._fees()
+        for key, column in (("maxPriorityFeePerGas", "max_priority_fee_per_gas"), ("maxFeePerGas", "max_fee_per_gas")):
+            if batch.get(column) is not None:
+                fees[key] = max(fees[key], math.ceil(int(batch[column]) * SETTLEMENT_FEE_BUMP))
+        fees["maxFeePerGas"] = max(fees["maxFeePerGas"], fees["maxPriorityFeePerGas"])
+        return fees
+
+    # ------------------------------
+    # ledger helpers
+    # ------------------------------
+    def _wallets(self, uids) -> dict:
+        """uid -> checksummed wallet address (users without a valid wallet are left out)."""
+        wallets = {}
+        for chunk in _chunks(sorted(set(uids)), _ID_CHUNK):
+            for row in response_rows(self.users.get_wallets_by_ids(chunk)):
+                address = row.get("wallet_address")
+                if address and Web3.is_address(address):
+                    wallets[row["id"]] = Web3.to_checksum_address(address)
+        return wallets
+
+    def _scan_pending(self) -> dict:
+        """uid -> [eid, ...] and summed wei, over at most SETTLEMENT_LEDGER_SCAN pending rows."""
+        per_uid = defaultdict(lambda: {"eids": [], "wei": 0})
+        after, scanned = 0, 0
+        while scanned < SETTLEMENT_LEDGER_SCAN:
+            rows = response_rows(self.earnings.get_pending(limit=min(_LEDGER_PAGE, SETTLEMENT_LEDGER_SCAN - scanned),
+                                                   after_eid=after))
+            for row in rows:
+                entry = per_uid[row["uid"]]
+                entry["eids"].append(row["eid"])
+                entry["wei"] += int(row["amount_wei"])
+            scanned += len(rows)
+            if len(rows) < _LEDGER_PAGE:
+                break
+            after = rows[-1]["eid"]
+        return per_uid
+
+    def _payout_for_batch(self, batch_id: int, wallets: dict = None):
+        """
+        Sum the rows actually assigned to a batch into parallel (receivers, amounts) lists,
+        plus the {uid: wallet} paid.
+        """
+        rows = [r for r in response_rows(self.earnings.get_by_batch(batch_id)) if r.get("status") == "batched"]
+        if wallets is None:
+            wallets = self._wallets(r["uid"] for r in rows) if rows else {}
+        per_wallet = defaultdict(int)
+        payout, orphaned = {}, set()
+        for row in rows:
+            wallet = wallets.get(row["uid"])
+            if wallet is None:
+                orphaned.add(row["uid"])
+            else:
+                per_wallet[wallet] += int(row["amount_wei"])
+                payout[row["uid"]] = wallet
+        if orphaned:
+            # wallet removed since batching: put those rows back rather than paying nobody
+            self.earnings.release_batch(batch_id, sorted(orphaned))
+        receivers = sorted(per_wallet)
+        return receivers, [per_wallet[w] for w in receivers], payout
+
+    # ------------------------------
+    # submit / confirm
+    # ------------------------------
+    def _send(self, batch_id: int, receivers: list, amounts: list, fees: dict, payout: dict,
+              replace: dict = None) -> dict:
+        """Sign and send one batch; `replace` (a submitted batch row) re-sends at its nonce."""
+        data = self.contract.encode_abi("batchReward", args=[batch_id, receivers, amounts])
+        for attempt in (1, 2):
+            nonce = self.nonces.reserve() if replace is None else replace["nonce"]
+            tx = {
+                "type": 2,
+                "chainId": self.chain_id,
+                "from": self.account.address,
+                "to": self.contract.address,
+                "value": 0,
+                "data": data,
+                "nonce": nonce,
+                "gas": SETTLEMENT_GAS_BASE + SETTLEMENT_GAS_PER_RECIPIENT * len(receivers),
+                **fees
+            }
+            signed = self.account.sign_transaction(tx)
+            try:
+                tx_hash = Web3.to_hex(self.w3.eth.send_raw_transaction(signed.raw_transaction))
+            except Exception as e:
+                if replace is not None:
+                    raise
+                # the reserved nonce was not consumed: recount before anything else is sent
+                self.nonces.resync()
+                if attempt == 1 and _is_nonce_error(e):
+                    continue
+                raise
+            replaces = (replace.get("tx_hashes") or [replace["tx_hash"]]) if replace is not None else None
+            self.batches.mark_submitted(batch_id, tx_hash, nonce, payout, fees, replaces)
+            return {"batch_id": batch_id, "tx_hash": tx_hash, "nonce": nonce,
+                    "recipients": len(receivers), "total_wei": sum(amounts)}
+
+    def plan(self, max_batches: int = None) -> list:
+        """Pending balances grouped into batches: [[(uid, wallet, eids, wei), ...], ...]."""
+        max_batches = SETTLEMENT_MAX_BATCHES if max_batches is None else max_batches
+        min_payout = eth_to_wei(SETTLEMENT_MIN_PAYOUT_ETH)
+        per_uid = self._scan_pending()
+        if not per_uid:
+            return []
+        wallets = self._wallets(per_uid.keys())
+        payable = [(uid, wallets[uid], entry["eids"], entry["wei"])
+                   for uid, entry in sorted(per_uid.items())
+                   if uid in wallets and entry["wei"] >= min_payout]
+        # several accounts may share a wallet: keep them in the same batch
+        payable.sort(key=lambda p: p[1])
+        batches, current, current_wallets = [], [], set()
+        for item in payable:
+            if item[1] not in current_wallets and len(current_wallets) >= self.batch_size:
+                batches.append(current)
+                current, current_wallets = [], set()
+                if len(batches) >= max_batches:
+                    break
+            current.append(item)
+            current_wallets.add(item[1])
+        if current and len(batches) < max_batches:
+            batches.append(current)
+        return batches
+
+    def submit(self, max_batches: int = None, fees: dict = None) -> list:
+        submitted = []
+        planned = self.plan(max_batches)
+        if not planned:
+            return submitted
+        fees = fees or self._fees()
+        for items in planned:
+            wallets = {uid: wallet for uid, wallet, _, _ in items}
+            total = sum(wei for _, _, _, wei in items)
+            batch = response_rows(self.batches.create_batch(len(set(wallets.values())), total))[0]
+            batch_id = batch["batch_id"]
+            for chunk in _chunks([eid for _, _, eids, _ in items for eid in eids], _ID_CHUNK):
+                self.earnings.assign_batch(chunk, batch_id)
+            # pay what was actually assigned: rows claimed by someone else in between are excluded
+            receivers, amounts, payout = self._payout_for_batch(batch_id, wallets)
+            if not receivers:
+                self.batches.mark_finished(batch_id, "failed")
+                continue
+            try:
+                submitted.append(self._send(batch_id, receivers, amounts, fees, payout))
+            except Exception as e:
+                # stays 'created' with its rows batched; the next run resends it under the same id
+                logger.warning("Reward batch %s not sent: %s", batch_id, e)
+                break
+        return submitted
+
+    def resubmit_created(self, fees: dict = None) -> list:
+        resent = []
+        for batch in response_rows(self.batches.get_batches(status="created")):
+            receivers, amounts, payout = self._payout_for_batch(batch["batch_id"])
+            if not receivers:
+                self.batches.mark_finished(batch["batch_id"], "failed")
+                continue
+            fees = fees or self._fees()
+            try:
+                resent.append(self._send(batch["batch_id"], receivers, amounts, fees, payout))
+            except Exception as e:
+                logger.warning("Reward batch %s not resent: %s", batch["batch_id"], e)
+                break
+        return resent
+
+    def _receipt(self, batch: dict):
+        """(tx_hash, receipt) of whichever send of the batch was mined, else (tx_hash, None)."""
+        for tx_hash in reversed(batch.get("tx_hashes") or [batch["tx_hash"]]):
+            try:
+                receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+            if receipt is not None:
+                return tx_hash, receipt
+        return batch["tx_hash"], None
+
+    def _unconfirmed(self, batch: dict):
+        """
+        A submitted batch without a receipt. Past SETTLEMENT_CONFIRM_TIMEOUT_SECONDS it is
+        replaced at its nonce while that nonce is unused (the transaction was dropped or is priced
+        out), and re-queued when the nonce went to another transaction. Returns a report or None.
+        """
+        batch_id, tx_hash, nonce = batch["batch_id"], batch["tx_hash"], batch.get("nonce")
+        submitted_at = batch.get("submitted_at")
+        if not submitted_at or nonce is None:
+            return None
+        age = (datetime.now(timezone.utc) - parse_timestamp(submitted_at)).total_seconds()
+        if age < SETTLEMENT_CONFIRM_TIMEOUT_SECONDS:
+            return None
+        if self.w3.eth.get_transaction_count(self.account.address, "latest") <= nonce:
+            receivers, amounts, payout = self._payout_for_batch(batch_id)
+            if not receivers:
+                # every row was released (wallets removed): nothing left to pay
+                self.batches.mark_finished(batch_id, "failed")
+                return {"batch_id": batch_id, "tx_hash": tx_hash, "status": "failed", "gas_used": None}
+            try:
+                sent = self._send(batch_id, receivers, amounts, self._bumped_fees(batch), payout, replace=batch)
+            except Exception as e:
+                # e.g. "nonce too low": the original was mined meanwhile; the next pass sees it
+                logger.warning("Reward batch %s not replaced: %s", batch_id, e)
+                return None
+            logger.warning("Reward batch %s unconfirmed after %.0fs, replaced %s with %s",
+                           batch_id, age, tx_hash, sent["tx_hash"])
+            return {"batch_id": batch_id, "tx_hash": sent["tx_hash"], "status": "replaced", "gas_used": None}
+        if self.contract.functions.settledBatches(batch_id).call():
+            # mined under a hash this row no longer lists (should not happen): settle without failures
+            self.earnings.mark_settled(batch_id, tx_hash)
+            self.batches.mark_finished(batch_id, "settled")
+            return {"batch_id": batch_id, "tx_hash": tx_hash, "status": "settled", "gas_used": None}
+        # another transaction took the nonce: send the batch again under a fresh one
+        self.batches.requeue(batch_id)
+        logger.warning("Reward batch %s lost nonce %s, re-queued", batch_id, nonce)
+        return {"batch_id": batch_id, "tx_hash": tx_hash, "status": "requeued", "gas_used": None}
+
+    def _paid_wallets(self, batch: dict, rows: list) -> dict:
+        """uid -> wallet the batch paid, as recorded when it was sent (current wallets for old rows)."""
+        if batch.get("payout"):
+            return {int(uid): wallet for uid, wallet in batch["payout"].items()}
+        return self._wallets(r["uid"] for r in rows)
+
+    def confirm_submitted(self) -> list:
+        confirmed = []
+        for batch in response_rows(self.batches.get_batches(status="submitted")):
+            batch_id = batch["batch_id"]
+            tx_hash, receipt = self._receipt(batch)
+            if receipt is None:
+                report = self._unconfirmed(batch)
+                if report is not None:
+                    confirmed.append(report)
+                continue
+
+            if receipt["status"] == 1:
+                failed = {Web3.to_checksum_address(ev["args"]["receiver"])
+                          for ev in self.contract.events.RewardFailed().process_receipt(receipt, errors=DISCARD)
+                          if ev["args"]["batchId"] == batch_id}
+                if failed:
+                    rows = response_rows(self.earnings.get_by_batch(batch_id))
+                    wallets = self._paid_wallets(batch, rows)
+                    self.earnings.release_batch(batch_id, sorted(u for u, w in wallets.items() if w in failed))
+                self.earnings.mark_settled(batch_id, tx_hash)
+                self.batches.mark_finished(batch_id, "settled", gas_used=receipt["gasUsed"],
+                                           failed_recipients=len(failed))
+                status = "settled"
+            elif self.contract.functions.settledBatches(batch_id).call():
+                # an earlier send of this batch id was mined; this one reverted as a duplicate
+                self.earnings.mark_settled(batch_id, tx_hash)
+                self.batches.mark_finished(batch_id, "settled", gas_used=receipt["gasUsed"])
+                status = "settled"
+            else:
+                self.earnings.release_batch(batch_id)
+                self.batches.mark_finished(batch_id, "failed", gas_used=receipt["gasUsed"])
+                status = "failed"
+            confirmed.append({"batch_id": batch_id, "tx_hash": tx_hash, "status": status,
+                              "gas_used": receipt["gasUsed"]})
+        return confirmed
+
+    def run(self, max_batches: int = None, dry_run: bool = False) -> dict:
+        """One settlement pass: confirm, resend unsent batches, submit new ones."""
+        with self._run_lock:
+            if dry_run:
+                planned = self.plan(max_batches)
+                return {"dry_run": True, "batches": [
+                    {"recipients": len({w for _, w, _, _ in items}),
+                     "entries": sum(len(eids) for _, _, eids, _ in items),
+                     "total_wei": sum(wei for _, _, _, wei in items)} for items in planned]}
+            report = {"confirmed": self.confirm_submitted()}
+            fees = self._fees()
+            report["resubmitted"] = self.resubmit_created(fees)
+            report["submitted"] = self.submit(max_batches, fees)
+            return report
+
+    def wait_for_receipts(self, timeout: float = 60.0, poll: float = 1.0) -> list:
+        """Confirm until nothing is left in 'submitted' (or the timeout passes)."""
+        confirmed = []
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._run_lock:
+                confirmed.extend(self.confirm_submitted())
+                outstanding = response_rows(self.batches.get_batches(status="submitted", limit=1))
+            if not outstanding or time.monotonic() >= deadline:
+                return confirmed
+            time.sleep(poll)
+
+
+settler = RewardSettler()
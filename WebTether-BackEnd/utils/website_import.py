@@ -0,0 +1,192 @@
+# utils/website_import.py
+"""
+Bulk website import: parsing, validation and de-duplication for POST /websites/bulk.
+
+Accepted input:
+ - JSON: an array of URL strings or objects, or {"websites": [...]}.
+   Objects take url, name, category, reward_per_ping and notify_url.
+ - CSV: a file upload (multipart field "file") or a text/csv body. The header row names the
+   same columns. A file without a header is read as one URL per line.
+
+Each row is validated on its own. URLs are stored in normalize_url() form, so "Example.com" and
+"https://example.com:443/" are the same site, both within the file and against sites the owner
+already has. Only rows that pass all checks are handed back for insertion.
+
+notify_url hosts are resolved once per import, not once per row: the distinct hosts are looked
+up concurrently and a host that has not resolved within WEBSITE_IMPORT_RESOLVE_TIMEOUT_SECONDS
+fails its rows. Delivery checks the address again (utils.notifications).
+"""
+
+import csv
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from decimal import Decimal, InvalidOperation
+
+from dotenv import load_dotenv
+
+from utils.notifications import (NOTIFY_ALLOW_PRIVATE_URLS, check_notify_url, notify_url_endpoint,
+                                 resolve_public_addresses)
+from utils.probe_utils import normalize_url
+
+load_dotenv()
+
+WEBSITE_BULK_MAX_ROWS = int(os.getenv("WEBSITE_BULK_MAX_ROWS", 10000))
+WEBSITE_BULK_INSERT_BATCH = int(os.getenv("WEBSITE_BULK_INSERT_BATCH", 500))
+WEBSITE_IMPORT_RESOLVE_TIMEOUT_SECONDS = float(os.getenv("WEBSITE_IMPORT_RESOLVE_TIMEOUT_SECONDS", 5))
+WEBSITE_IMPORT_RESOLVE_WORKERS = int(os.getenv("WEBSITE_IMPORT_RESOLVE_WORKERS", 16))
+
+IMPORT_COLUMNS = ("url", "name", "category", "reward_per_ping", "notify_url")
+_MAX_TEXT = 255
+
+
+class BulkImportError(ValueError):
+    """The payload as a whole is unusable (as opposed to individual bad rows)."""
+
+
+def parse_json_items(payload) -> list:
+    items = payload.get("websites") if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        raise BulkImportError("Expected a JSON array of websites or {\"websites\": [...]}")
+    rows = []
+    for item in items:
+        if isinstance(item, str):
+            rows.append({"url": item})
+        elif isinstance(item, dict):
+            rows.append({k: item.get(k) for k in IMPORT_COLUMNS if item.get(k) not in (None, "")})
+        else:
+            rows.append({"url": item})
+    return rows
+
+
+def parse_csv_text(text: str) -> list:
+    lines = text.lstrip("\ufeff").splitlines()
+    if not lines:
+        return []
+    first = next(csv.reader([lines[0]]), [])
+    header = [c.strip().lower() for c in first]
+    if "url" in header:
+        reader = csv.DictReader(lines[1:], fieldnames=header)
+        return [{k: (row.get(k) or "").strip() for k in IMPORT_COLUMNS if (row.get(k) or "").strip()}
+                for row in reader if any((v or "").strip() for v in row.values() if isinstance(v, str))]
+    # headerless: first column of every non-empty line is a URL
+    return [{"url": cells[0].strip()} for cells in csv.reader(lines) if cells and cells[0].strip()]
+
+
+def _validate(row: dict) -> dict:
+    """Website payload for one input row; raises ValueError with a row-level message."""
+    url = row.get("url")
+    if not isinstance(url, str) or not url.strip():
+        raise ValueError("url is required")
+    payload = {"url": normalize_url(url)}
+
+    for key in ("name", "category"):
+        value = row.get(key)
+        if value is not None:
+            value = str(value).strip()
+            if len(value) > _MAX_TEXT:
+                raise ValueError(f"{key} is longer than {_MAX_TEXT} characters")
+            if value:
+                payload[key] = value
+
+    reward = row.get("reward_per_ping")
+    if reward is not None and reward != "":
+        try:
+            reward = Decimal(str(reward))
+        except InvalidOperation:
+            raise ValueError("reward_per_ping must be a number")
+        if not reward.is_finite() or reward < 0:
+            raise ValueError("reward_per_ping must be a non-negative number")
+        payload["reward_per_ping"] = float(reward)
+
+    notify_url = row.get("notify_url")
+    if notify_url:
+        # the host is resolved later, once for the whole import (see _check_notify_hosts)
+        payload["notify_url"] = check_notify_url(normalize_url(str(notify_url)), resolve=False)
+    return payload
+
+
+def _check_notify_hosts(payloads) -> dict:
+    """
+    Resolve the distinct notify_url hosts of `payloads` concurrently.
+    Returns {(host, port): error message} for the hosts that failed or timed out.
+    """
+    if NOTIFY_ALLOW_PRIVATE_URLS:
+        return {}
+    endpoints = {notify_url_endpoint(p["notify_url"]) for p in payloads if p.get("notify_url")}
+    if not endpoints:
+        return {}
+    errors = {}
+    pool = ThreadPoolExecutor(max_workers=min(WEBSITE_IMPORT_RESOLVE_WORKERS, len(endpoints)),
+                              thread_name_prefix="notify-resolve")
+    try:
+        futures = {pool.submit(resolve_public_addresses, *endpoint): endpoint for endpoint in endpoints}
+        done, _ = wait(futures, timeout=WEBSITE_IMPORT_RESOLVE_TIMEOUT_SECONDS)
+        for future, endpoint in futures.items():
+            if future not in done:
+                errors[endpoint] = "notify_url host did not resolve in time"
+            elif isinstance(future.exception(), ValueError):
+                errors[endpoint] = str(future.exception())
+            elif future.exception() is not None:
+                errors[endpoint] = "notify_url host does not resolve"
+    finally:
+        # a lookup that is still running is abandoned, not waited for
+        pool.shutdown(wait=False, cancel_futures=True)
+    return errors
+
+
+def plan_import(rows: list, existing_urls) -> tuple:
+    """
+    Validate and de-duplicate `rows` against `existing_urls` (already normalized).
+    Returns (results, to_insert): one result dict per input row, in order, and the payloads to
+    insert as (result index, payload) pairs.
+    """
+    if len(rows) > WEBSITE_BULK_MAX_ROWS:
+        raise BulkImportError(f"At most {WEBSITE_BULK_MAX_ROWS} websites per import (got {len(rows)})")
+    checked = []
+    for row in rows:
+        try:
+            checked.append((_validate(row), None))
+        except ValueError as e:
+            checked.append((None, str(e)))
+    host_errors = _check_notify_hosts(payload for payload, _ in checked if payload)
+
+    seen = {}
+    results, to_insert = [], []
+    for i, (row, (payload, error)) in enumerate(zip(rows, checked)):
+        result = {"row": i + 1, "input": row.get("url")}
+        if payload and payload.get("notify_url"):
+            error = host_errors.get(notify_url_endpoint(payload["notify_url"]))
+        if error:
+            result.update(status="invalid", error=error)
+            results.append(result)
+            continue
+        url = payload["url"]
+        result["url"] = url
+        if url in existing_urls:
+            result.update(status="duplicate", wid=existing_urls[url])
+        elif url in seen:
+            result.update(status="duplicate", duplicate_of_row=seen[url])
+        else:
+            seen[url] = i + 1
+            result["status"] = "pending"
+            to_insert.append((i, payload))
+        results.append(result)
+    return results, to_insert
+
+
+def existing_url_index(rows) -> dict:
+    """normalized url -> wid for an owner's stored sites (legacy unnormalized URLs included)."""
+    index = {}
+    for row in rows or []:
+        try:
+            index.setdefault(normalize_url(row.get("url")), row.get("wid"))
+        except ValueError:
+            continue
+    return index
+
+
+def summarize(results: list) -> dict:
+    summary = {"received": len(results), "created": 0, "duplicate": 0, "invalid": 0, "error": 0}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return summary
@@ -0,0 +1,522 @@
+# utils/write_spool.py
+"""
+Local write-ahead spool for ping and transaction inserts.
+
+With WRITE_SPOOL_ENABLED=1 the write endpoints don't insert into Supabase directly: the row is
+appended to a local append-only log, fsynced, and the request returns (202) as soon as it is on
+disk. A background thread drains the log to Supabase in batches, retrying with exponential
+backoff while the database is slow or unreachable, so an outage delays results instead of
+losing them.
+
+ - Group commit: concurrent appends share one fsync (a syncer thread flushes every
+   WRITE_SPOOL_FSYNC_MS), so write latency is local-disk latency.
+ - Log: JSON lines in size-rotated segments (spool-<first seq>.log) plus an atomically replaced
+   `checkpoint` holding the last drained seq. Fully drained segments are deleted. On start the
+   undrained tail is replayed; a torn last line from a crash is ignored.
+ - Replays are idempotent: every spooled ping carries a spool_id (unique column,
+   migrations/009_write_spool.sql) and is upserted on it; transactions are upserted on tx_hash
+   and never overwrite an existing row.
+ - References: a transaction or reward credit spooled with its ping (manual checks) gets the
+   ping's pid filled in when both drain. They always drain in the same batch. Reward credits
+   are written through utils.reward_credits (site lookup, upsert on pid).
+ - Rows rejected by the database (SQLSTATE class 22 / 23, e.g. a deleted website) are moved to
+   `dead-letter.jsonl` instead of blocking the log; other errors are retried. A rejected ping
+   takes the rows referencing it along, so a transaction is never stored with a missing pid.
+ - Reads of recent data (models: pings by website / user, transactions by user / hash) merge in
+   rows still waiting in the spool, via with_pending().
+ - Ping listeners and the leaderboard see spooled rows once they are stored (on_drained), with
+   their real pid, exactly as for direct writes.
+
+Each process claims its own sub-directory of WRITE_SPOOL_DIR (spool/0, spool/1, ... under an
+exclusive file lock), so several workers can spool side by side and a restarted worker picks up
+whatever an earlier one left behind. On start() a worker also drains every other slot that no
+process holds (e.g. left over after the number of workers went down), one slot at a time under
+that slot's lock.
+"""
+
+import fcntl
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+WRITE_SPOOL_ENABLED = os.getenv("WRITE_SPOOL_ENABLED", "0") in ("1", "true", "True")
+WRITE_SPOOL_DIR = os.getenv("WRITE_SPOOL_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "spool"))
+WRITE_SPOOL_FSYNC_MS = float(os.getenv("WRITE_SPOOL_FSYNC_MS", 2))
+WRITE_SPOOL_BATCH = int(os.getenv("WRITE_SPOOL_BATCH", 500))
+WRITE_SPOOL_DRAIN_INTERVAL_SECONDS = float(os.getenv("WRITE_SPOOL_DRAIN_INTERVAL_SECONDS", 0.2))
+WRITE_SPOOL_RETRY_MAX_SECONDS = float(os.getenv("WRITE_SPOOL_RETRY_MAX_SECONDS", 60))
+WRITE_SPOOL_SEGMENT_BYTES = int(os.getenv("WRITE_SPOOL_SEGMENT_BYTES", 16 * 1024 * 1024))
+
+PING_TABLE = "ping"
+TX_TABLE = "onchain_transactions"
+EARNINGS_TABLE = "validator_earnings"
+_MAX_SLOTS = 64
+_RESOLVED_KEEP = 100_000        # spool_id -> pid of recently drained pings, for late references
+
+
+class _Entry:
+    __slots__ = ("seq", "table", "row", "refs")
+
+    def __init__(self, seq: int, table: str, row: dict, refs: dict = None):
+        self.seq = seq
+        self.table = table
+        self.row = row
+        self.refs = refs or {}
+
+    def to_json(self) -> str:
+        record = {"seq": self.seq, "table": self.table, "row": self.row}
+        if self.refs:
+            record["refs"] = self.refs
+        return json.dumps(record, separators=(",", ":"), default=str)
+
+
+def new_spool_id() -> str:
+    return str(uuid.uuid4())
+
+
+def _rejected(error: Exception) -> bool:
+    """True when the database refused the row itself (retrying would fail the same way)."""
+    code = str(getattr(error, "code", "") or "")
+    return code[:2] in ("22", "23")
+
+
+def _default_writers():
+    from models.onchain_transaction_model import OnChainTransactionModel
+    from models.ping_model import PingModel
+    from utils.reward_credits import reward_credits
+    ping_model, tx_model = PingModel(), OnChainTransactionModel()
+    return {PING_TABLE: ping_model.upsert_spooled_pings, TX_TABLE: tx_model.upsert_spooled_transactions,
+            EARNINGS_TABLE: reward_credits.write}
+
+
+class WriteSpool:
+    def __init__(self, directory: str = WRITE_SPOOL_DIR, writers: dict = None,
+                 fsync_ms: float = WRITE_SPOOL_FSYNC_MS, batch: int = WRITE_SPOOL_BATCH,
+                 segment_bytes: int = WRITE_SPOOL_SEGMENT_BYTES, claimed: tuple = None):
+        self.base_dir = directory
+        self._writers = writers
+        self.fsync_seconds = fsync_ms / 1000.0
+        self.batch = batch
+        self.segment_bytes = segment_bytes
+
+        self._cond = threading.Condition()
+        self._queue = []            # undrained _Entry, seq order
+        self._seq = 0
+        self._written = 0           # highest seq written to the segment file
+        self._synced = 0            # highest seq known to be on disk
+        self._checkpoint = 0        # highest seq drained to the database
+        self._file = None
+        self._segment_path = None
+        self._resolved = OrderedDict()
+        self._dead = set()          # spool_ids of dead-lettered pings
+        self._callbacks = {}
+        self._failures = 0
+        self._retry_at = 0.0
+        self._solo_until = 0        # drain one entry at a time up to this seq (isolating a bad row)
+        self._stop = threading.Event()
+        self._syncer = None
+        self._drainer = None
+        self._adopter = None
+        self.dead_lettered = 0
+
+        self.directory, self._lock_file = claimed or self._claim_directory(directory)
+        self._recover()
+
+    # ------------------------------
+    # Files
+    # ------------------------------
+    @staticmethod
+    def _lock_slot(path: str):
+        """Exclusive lock on a slot directory, or None if another process holds it."""
+        lock_file = open(os.path.join(path, "lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    @classmethod
+    def _claim_directory(cls, base: str):
+        for slot in range(_MAX_SLOTS):
+            path = os.path.join(base, str(slot))
+            os.makedirs(path, exist_ok=True)
+            lock_file = cls._lock_slot(path)
+            if lock_file is not None:
+                return path, lock_file
+        raise RuntimeError(f"No free write spool slot under {base} ({_MAX_SLOTS} in use)")
+
+    def _segments(self) -> list:
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith("spool-") and n.endswith(".log"))
+        return [os.path.join(self.directory, n) for n in names]
+
+    @staticmethod
+    def _first_seq(path: str) -> int:
+        return int(os.path.basename(path)[len("spool-"):-len(".log")])
+
+    def _checkpoint_path(self) -> str:
+        return os.path.join(self.directory, "checkpoint")
+
+    def _write_checkpoint(self, seq: int):
+        path = self._checkpoint_path()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(str(seq))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _recover(self):
+        try:
+            with open(self._checkpoint_path()) as f:
+                self._checkpoint = int(f.read().strip() or 0)
+        except FileNotFoundError:
+            self._checkpoint = 0
+        self._seq = self._checkpoint
+        for path in self._segments():
+            good = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break       # torn write at the tail of a crashed segment
+                    good += len(line)
+                    self._seq = max(self._seq, record["seq"])
+                    if record["seq"] > self._checkpoint:
+                        self._queue.append(_Entry(record["seq"], record["table"], record["row"],
+                                                  record.get("refs")))
+            if good < os.path.getsize(path):
+                os.truncate(path, good)
+        self._written = self._synced = self._seq
+        if self._queue:
+            logger.info("Write spool %s: %d undrained rows recovered", self.directory, len(self._queue))
+
+    def _open_segment(self):
+        """Current segment, rotated once it has grown past segment_bytes. Caller holds _cond."""
+        if self._file is not None and self._file.tell() < self.segment_bytes:
+            return self._file
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        self._segment_path = os.path.join(self.directory, f"spool-{self._seq + 1:020d}.log")
+        self._file = open(self._segment_path, "ab")
+        return self._file
+
+    def _drop_drained_segments(self):
+        segments = self._segments()
+        for path, following in zip(segments, segments[1:]):
+            if path != self._segment_path and self._first_seq(following) - 1 <= self._checkpoint:
+                os.remove(path)
+
+    # ------------------------------
+    # Appends (group commit)
+    # ------------------------------
+    def append(self, table: str, row: dict, refs: dict = None) -> dict:
+        """Durably spool one row; returns it with its spool_id (see append_many)."""
+        return self.append_many([(table, row, refs)])[0]
+
+    def append_many(self, items) -> list:
+        """
+        Durably spool [(table, row, refs)] as one unit and return the rows as queued (pings get
+        a spool_id and timestamp, transactions a created_at). Returns once they are fsynced. refs maps a column of the row
+        to the spool_id of a ping spooled earlier or in the same call; it is filled with that
+        ping's pid on drain.
+        """
+        spooled_at = datetime.now(timezone.utc).isoformat()
+        with self._cond:
+            if self._syncer is None:
+                self._start_syncer()
+            f = self._open_segment()
+            entries = []
+            for table, row, refs in items:
+                self._seq += 1
+                row = dict(row)
+                # stamped now, not when it drains
+                if table == PING_TABLE:
+                    row.setdefault("spool_id", new_spool_id())
+                    row.setdefault("timestamp", spooled_at)
+                elif table == TX_TABLE:
+                    row.setdefault("created_at", spooled_at)
+                entry = _Entry(self._seq, table, row, refs)
+                f.write(entry.to_json().encode("utf-8") + b"\n")
+                entries.append(entry)
+            self._queue.extend(entries)
+            self._written = target = self._seq
+            self._cond.notify_all()
+            while self._synced < target:
+                self._cond.wait()
+        return [dict(e.row) for e in entries]
+
+    def _start_syncer(self):
+        self._syncer = threading.Thread(target=self._sync_loop, name="write-spool-sync", daemon=True)
+        self._syncer.start()
+
+    def _sync_loop(self):
+        while True:
+            with self._cond:
+                while self._synced >= self._written:
+                    self._cond.wait()
+            # let concurrent writers join this fsync
+            time.sleep(self.fsync_seconds)
+            with self._cond:
+                upto = self._written
+                try:
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                except Exception:
+                    logger.exception("Write spool fsync failed")
+                    time.sleep(0.1)
+                    continue
+                self._synced = upto
+                self._cond.notify_all()
+
+    # ------------------------------
+    # Reads
+    # ------------------------------
+    def pending(self, table: str, limit: int = None, **match) -> list:
+        """Undrained rows of `table` whose columns equal `match`, newest first."""
+        with self._cond:
+            entries = list(self._queue)
+        out = []
+        for entry in reversed(entries):
+            if entry.table == table and all(entry.row.get(k) == v for k, v in match.items()):
+                out.append(dict(entry.row, spooled=True))
+                if limit is not None and len(out) >= limit:
+                    break
+        return out
+
+    def backlog(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    # ------------------------------
+    # Drain
+    # ------------------------------
+    def on_drained(self, table: str, fn):
+        """Call fn(stored_row) for every row of `table` once it is in the database."""
+        self._callbacks.setdefault(table, [])
+        if fn not in self._callbacks[table]:
+            self._callbacks[table].append(fn)
+        return fn
+
+    def _resolve(self, entry: _Entry, pid_by_spool: dict) -> dict:
+        row = dict(entry.row)
+        for column, spool_id in entry.refs.items():
+            row[column] = pid_by_spool.get(spool_id, self._resolved.get(spool_id))
+        return row
+
+    def _take(self, size: int) -> list:
+        """The next `size` entries plus the rows referencing a ping among them. Caller holds _cond."""
+        batch = self._queue[:size]
+        spool_ids = {e.row.get("spool_id") for e in batch if e.table == PING_TABLE}
+        # references point back into the same append_many call, so they follow their ping directly
+        for entry in self._queue[size:]:
+            if not spool_ids.intersection(entry.refs.values()):
+                break
+            batch.append(entry)
+        return batch
+
+    def _store(self, batch: list, stored: list, landed: set) -> list:
+        """
+        Write one batch: pings first, so references resolve, then each other table in the order
+        it appears. Appends (table, row) to `stored` and the table to `landed` as each write
+        lands. Returns the entries left out because a ping they reference was dead-lettered.
+        """
+        writers = self._writers if self._writers is not None else _default_writers()
+        self._writers = writers
+        pid_by_spool = {}
+        ping_rows = [e.row for e in batch if e.table == PING_TABLE]
+        if ping_rows:
+            for row in writers[PING_TABLE](ping_rows) or []:
+                pid_by_spool[row.get("spool_id")] = row.get("pid")
+                stored.append((PING_TABLE, row))
+            landed.add(PING_TABLE)
+        for spool_id, pid in pid_by_spool.items():
+            self._resolved[spool_id] = pid
+        while len(self._resolved) > _RESOLVED_KEEP:
+            self._resolved.popitem(last=False)
+        orphaned = [e for e in batch if self._dead.intersection(e.refs.values())]
+        by_table = {}
+        for e in batch:
+            if e.table != PING_TABLE and e not in orphaned:
+                by_table.setdefault(e.table, []).append(self._resolve(e, pid_by_spool))
+        for table, rows in by_table.items():
+            stored.extend((table, row) for row in writers[table](rows) or [])
+            landed.add(table)
+        return orphaned
+
+    def _dead_letter(self, entry: _Entry, error):
+        if entry.table == PING_TABLE and entry.row.get("spool_id"):
+            self._dead.add(entry.row["spool_id"])
+        with open(os.path.join(self.directory, "dead-letter.jsonl"), "a") as f:
+            f.write(json.dumps({"entry": json.loads(entry.to_json()), "error": str(error),
+                                "at": datetime.now(timezone.utc).isoformat()}, default=str) + "\n")
+        self.dead_lettered += 1
+        logger.error("Write spool: %s row seq=%s rejected and dead-lettered: %s", entry.table, entry.seq, error)
+
+    def _advance(self, upto: int):
+        with self._cond:
+            self._queue = [e for e in self._queue if e.seq > upto]
+            self._checkpoint = upto
+        self._write_checkpoint(upto)
+        self._drop_drained_segments()
+
+    def _notify(self, stored: list):
+        for table, row in stored:
+            for fn in self._callbacks.get(table, []):
+                try:
+                    fn(row)
+                except Exception:
+                    logger.exception("Write spool callback %s failed", getattr(fn, "__name__", fn))
+
+    def drain_once(self) -> int:
+        """Store the next batch. Returns the number of rows drained (0 if none or it failed)."""
+        with self._cond:
+            if not self._queue:
+                return 0
+            solo = self._queue[0].seq <= self._solo_until
+            batch = self._take(1 if solo else self.batch)
+        stored, landed = [], set()
+        try:
+            orphaned = self._store(batch, stored, landed)
+        except Exception as e:
+            if _rejected(e) and not solo:
+                # find the offending row(s): retry this range one entry (and its references) at a time
+                self._solo_until = batch[-1].seq
+                return 0
+            if _rejected(e):
+                # dead-letter whatever did not land: the rejected rows and the rows referencing them
+                for entry in batch:
+                    if entry.table not in landed:
+                        self._dead_letter(entry, e)
+                self._advance(batch[-1].seq)
+                self._notify(stored)
+                return 0
+            self._failures += 1
+            delay = min(WRITE_SPOOL_RETRY_MAX_SECONDS, 0.5 * 2 ** min(self._failures - 1, 16))
+            self._retry_at = time.monotonic() + delay
+            logger.warning("Write spool drain failed (%d rows, retry in %.1fs): %s", len(batch), delay, e)
+            return 0
+
+        self._failures = 0
+        for entry in orphaned:
+            self._dead_letter(entry, "referenced ping was dead-lettered")
+        self._advance(batch[-1].seq)
+        self._notify(stored)
+        return len(batch)
+
+    def drain(self) -> int:
+        """Drain until the spool is empty or a batch fails (scripts / shutdown)."""
+        total = 0
+        while True:
+            drained = self.drain_once()
+            if not drained and (not self.backlog() or time.monotonic() < self._retry_at):
+                return total
+            total += drained
+
+    def _drain_loop(self):
+        while not self._stop.is_set():
+            wait = self._retry_at - time.monotonic()
+            if wait > 0:
+                self._stop.wait(wait)
+                continue
+            if not self.drain_once():
+                self._stop.wait(WRITE_SPOOL_DRAIN_INTERVAL_SECONDS)
+
+    def _drain_orphans(self):
+        """Drain every other slot no process holds, each under its lock, then let it go."""
+        for slot in range(_MAX_SLOTS):
+            path = os.path.join(self.base_dir, str(slot))
+            if path == self.directory or not os.path.isdir(path) or self._stop.is_set():
+                continue
+            lock_file = self._lock_slot(path)
+            if lock_file is None:
+                continue
+            try:
+                orphan = WriteSpool(self.base_dir, writers=self._writers, batch=self.batch,
+                                    segment_bytes=self.segment_bytes, claimed=(path, lock_file))
+                if not orphan.backlog():
+                    continue
+                orphan._callbacks = self._callbacks
+                logger.info("Write spool %s: draining %d rows left in %s", self.directory, orphan.backlog(), path)
+                while orphan.backlog() and not self._stop.is_set():
+                    if not orphan.drain():
+                        self._stop.wait(max(orphan._retry_at - time.monotonic(), WRITE_SPOOL_DRAIN_INTERVAL_SECONDS))
+            except Exception:
+                logger.exception("Write spool: draining %s failed", path)
+            finally:
+                lock_file.close()
+
+    def start(self):
+        if self._drainer is None or not self._drainer.is_alive():
+            self._stop.clear()
+            self._drainer = threading.Thread(target=self._drain_loop, name="write-spool-drain", daemon=True)
+            self._drainer.start()
+        if self._adopter is None:
+            self._adopter = threading.Thread(target=self._drain_orphans, name="write-spool-adopt", daemon=True)
+            self._adopter.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        for thread in (self._drainer, self._adopter):
+            if thread is not None:
+                thread.join(timeout)
+
+
+write_spool = WriteSpool() if WRITE_SPOOL_ENABLED else None
+
+
+# ------------------------------
+# Read-side merge for the models
+# ------------------------------
+class _SpooledResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+def _merge(resp, table: str, limit: int, single: bool, match: dict):
+    pending = write_spool.pending(table, limit=limit, **match)
+    if not pending:
+        return resp
+    if single:
+        return resp if resp is not None and getattr(resp, "data", None) else _SpooledResponse(pending[0])
+    data = getattr(resp, "data", None) or []
+    if isinstance(data, dict):
+        data = [data]
+    seen = {row.get("spool_id") for row in pending}
+    merged = pending + [row for row in data if not (row.get("spool_id") and row.get("spool_id") in seen)]
+    if limit is not None:
+        merged = merged[:limit]
+    if resp is None or not hasattr(resp, "data"):
+        return _SpooledResponse(merged)
+    resp.data = merged
+    return resp
+
+
+def with_pending(resp, table: str, limit: int = None, single: bool = False, **match):
+    """
+    Put undrained spooled rows matching `match` in front of a model response (newest first,
+    trimmed to `limit`); with single=True only fills an empty single-row response. Works on a
+    response or on the awaitable an async model returns. No-op while the spool is disabled.
+    """
+    if write_spool is None:
+        return resp
+    if inspect.isawaitable(resp):
+        async def merged():
+            return _merge(await resp, table, limit, single, match)
+        return merged()
+    return _merge(resp, table, limit, single, match)
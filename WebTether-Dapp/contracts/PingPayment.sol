@@ -5,8 +5,13 @@ pragma solidity ^0.8.20;
 contract PingPayment {
     address public owner;
 
+    // batch ids already paid out, so a resubmitted settlement can never pay twice
+    mapping(uint256 => bool) public settledBatches;
+
     event PingPaid(address indexed payer, uint256 amount);
     event RewardGiven(address indexed receiver, uint256 amount);
+    event RewardFailed(uint256 indexed batchId, address indexed receiver, uint256 amount);
+    event BatchSettled(uint256 indexed batchId, uint256 recipients, uint256 paid);
 
     constructor() {
         owner = msg.sender;
@@ -23,5 +28,33 @@ contract PingPayment {
         emit RewardGiven(receiver, 0.0001 ether);
     }
 
+    // Pays many validators in one transaction. A receiver that rejects its payment does not
+    // revert the batch: it gets RewardFailed and its amount stays in the contract.
+    function batchReward(uint256 batchId, address payable[] calldata receivers, uint256[] calldata amounts) external {
+        require(msg.sender == owner, "Only owner can reward");
+        require(receivers.length == amounts.length, "Length mismatch");
+        require(!settledBatches[batchId], "Batch already settled");
+        settledBatches[batchId] = true;
+
+        uint256 total;
+        for (uint256 i = 0; i < amounts.length; i++) {
+            total += amounts[i];
+        }
+        require(address(this).balance >= total, "Insufficient contract balance");
+
+        uint256 paid;
+        for (uint256 i = 0; i < receivers.length; i++) {
+            // 2300 gas stipend, same as transfer(): receivers can't re-enter or burn the batch's gas
+            (bool ok, ) = receivers[i].call{value: amounts[i], gas: 2300}("");
+            if (ok) {
+                paid += amounts[i];
+                emit RewardGiven(receivers[i], amounts[i]);
+            } else {
+                emit RewardFailed(batchId, receivers[i], amounts[i]);
+            }
+        }
+        emit BatchSettled(batchId, receivers.length, paid);
+    }
+
     receive() external payable {}
 }
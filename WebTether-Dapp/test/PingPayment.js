@@ -0,0 +1,139 @@
+const {
+  time,
+  loadFixture,
+} = require("@nomicfoundation/hardhat-toolbox/network-helpers");
+const { expect } = require("chai");
+
+describe("PingPayment", function () {
+  const REWARD = ethers.parseEther("0.0001");
+
+  async function deployFundedPingPaymentFixture() {
+    const [owner, payer, ...validators] = await ethers.getSigners();
+
+    const PingPayment = await ethers.getContractFactory("PingPayment");
+    const pingPayment = await PingPayment.deploy();
+
+    // fund the contract the way production does: users paying for pings
+    for (let i = 0; i < 20; i++) {
+      await pingPayment.connect(payer).payForPing({ value: ethers.parseEther("0.0002") });
+    }
+
+    return { pingPayment, owner, payer, validators };
+  }
+
+  describe("payForPing", function () {
+    it("Should only accept the exact ping cost", async function () {
+      const { pingPayment, payer } = await loadFixture(deployFundedPingPaymentFixture);
+
+      await expect(
+        pingPayment.connect(payer).payForPing({ value: ethers.parseEther("0.0001") })
+      ).to.be.revertedWith("Ping cost is 0.0002 ETH (~Rs 5)");
+    });
+  });
+
+  describe("rewardUser", function () {
+    it("Should pay the fixed reward to one receiver", async function () {
+      const { pingPayment, validators } = await loadFixture(deployFundedPingPaymentFixture);
+
+      await expect(pingPayment.rewardUser(validators[0].address)).to.changeEtherBalances(
+        [validators[0], pingPayment],
+        [REWARD, -REWARD]
+      );
+    });
+  });
+
+  describe("batchReward", function () {
+    it("Should pay every receiver its amount in one transaction", async function () {
+      const { pingPayment, validators } = await loadFixture(deployFundedPingPaymentFixture);
+      const receivers = validators.slice(0, 3);
+      const amounts = [REWARD, REWARD * 2n, REWARD * 3n];
+
+      await expect(
+        pingPayment.batchReward(1, receivers.map((v) => v.address), amounts)
+      ).to.changeEtherBalances(
+        [...receivers, pingPayment],
+        [...amounts, -(REWARD * 6n)]
+      );
+      expect(await pingPayment.settledBatches(1)).to.equal(true);
+    });
+
+    it("Should emit one RewardGiven per receiver and a BatchSettled summary", async function () {
+      const { pingPayment, validators } = await loadFixture(deployFundedPingPaymentFixture);
+
+      await expect(pingPayment.batchReward(7, [validators[0].address, validators[1].address], [REWARD, REWARD]))
+        .to.emit(pingPayment, "RewardGiven")
+        .withArgs(validators[1].address, REWARD)
+        .and.to.emit(pingPayment, "BatchSettled")
+        .withArgs(7, 2, REWARD * 2n);
+    });
+
+    it("Should refuse to settle the same batch twice", async function () {
+      const { pingPayment, validators } = await loadFixture(deployFundedPingPaymentFixture);
+
+      await pingPayment.batchReward(1, [validators[0].address], [REWARD]);
+      await expect(
+        pingPayment.batchReward(1, [validators[0].address], [REWARD])
+      ).to.be.revertedWith("Batch already settled");
+    });
+
+    it("Should revert if called from another account", async function () {
+      const { pingPayment, payer, validators } = await loadFixture(deployFundedPingPaymentFixture);
+
+      await expect(
+        pingPayment.connect(payer).batchReward(1, [validators[0].address], [REWARD])
+      ).to.be.revertedWith("Only owner can reward");
+    });
+
+    it("Should revert on mismatched receivers and amounts", async function () {
+      const { pingPayment, validators } = await loadFixture(deployFundedPingPaymentFixture);
+
+      await expect(
+        pingPayment.batchReward(1, [validators[0].address, validators[1].address], [REWARD])
+      ).to.be.revertedWith("Length mismatch");
+    });
+
+    it("Should revert when the contract can't cover the batch", async function () {
+      const { pingPayment, validators } = await loadFixture(deployFundedPingPaymentFixture);
+
+      await expect(
+        pingPayment.batchReward(1, [validators[0].address], [ethers.parseEther("1")])
+      ).to.be.revertedWith("Insufficient contract balance");
+    });
+
+    it("Should keep paying the rest of the batch when one receiver rejects ETH", async function () {
+      const { pingPayment, validators } = await loadFixture(deployFundedPingPaymentFixture);
+
+      // Lock has no receive() / fallback, so any plain ETH transfer to it fails
+      const Lock = await ethers.getContractFactory("Lock");
+      const rejecting = await Lock.deploy((await time.latest()) + 3600, { value: 1 });
+
+      await expect(
+        pingPayment.batchReward(3, [rejecting.target, validators[0].address], [REWARD, REWARD])
+      )
+        .to.emit(pingPayment, "RewardFailed")
+        .withArgs(3, rejecting.target, REWARD)
+        .and.to.emit(pingPayment, "BatchSettled")
+        .withArgs(3, 2, REWARD);
+      expect(await ethers.provider.getBalance(pingPayment.target)).to.equal(
+        ethers.parseEther("0.0002") * 20n - REWARD
+      );
+    });
+
+    it("Should cost less gas per payout than individual rewards", async function () {
+      const { pingPayment, validators } = await loadFixture(deployFundedPingPaymentFixture);
+      const receivers = validators.slice(0, 10).map((v) => v.address);
+
+      let single = 0n;
+      for (const receiver of receivers) {
+        const receipt = await (await pingPayment.rewardUser(receiver)).wait();
+        single += receipt.gasUsed;
+      }
+      const batch = await (
+        await pingPayment.batchReward(1, receivers, receivers.map(() => REWARD))
+      ).wait();
+
+      // the 21000 base cost and the owner check are paid once instead of per receiver
+      expect(batch.gasUsed * 10n).to.be.lessThan(single * 6n);
+    });
+  });
+});